@@ -1,7 +1,7 @@
 "use server"
 
 import { getAdminDb } from "@/lib/firebase-admin"
-import type { Booking } from "@/types"
+import type { Booking, DailyStats } from "@/types"
 import { logger } from "@/lib/logger"
 import { verifyAdminAccess } from "./admin-auth"
 import {
@@ -10,6 +10,7 @@ import {
   sendAlternativeSlotsEmail,
 } from "./email"
 import { getCustomerById } from "./customers"
+import { syncSlotOccupancy } from "@/lib/slot-occupancy"
 
 export interface BookingWithDetails extends Booking {
   /** ISO string (es: 2025-12-24T10:15:00.000Z) */
@@ -47,10 +48,12 @@ export async function getPendingBookings(userId?: string): Promise<BookingWithDe
 
     const adminDb = getAdminDb()
 
-    // Query senza orderBy per evitare index requirement - ordiniamo in memoria
+    // Ordinate da Firestore (indice status, date, startTime)
     const bookingsSnapshot = await adminDb
       .collection("bookings")
       .where("status", "==", "PENDING")
+      .orderBy("date")
+      .orderBy("startTime")
       .get()
 
     const serviceCache = new Map<string, any>()
@@ -119,12 +122,6 @@ export async function getPendingBookings(userId?: string): Promise<BookingWithDe
       })
     }
 
-    // Sort in memory by date, then by startTime
-    bookingsWithDetails.sort((a, b) => {
-      if (a.date !== b.date) return a.date.localeCompare(b.date)
-      return a.startTime.localeCompare(b.startTime)
-    })
-
     const duration = Date.now() - startTime
     logger.info("Pending bookings fetched", { count: bookingsWithDetails.length, duration })
     return bookingsWithDetails
@@ -135,6 +132,9 @@ export async function getPendingBookings(userId?: string): Promise<BookingWithDe
   }
 }
 
+// Precomputed stats older than this fall back to the scan (daily-stats.py update --interval stopped)
+const STATS_MAX_AGE_MS = 10 * 60 * 1000
+
 export async function getTodayStats(
   userId?: string
 ): Promise<{ total: number; pending: number; confirmed: number; rejected: number }> {
@@ -146,6 +146,34 @@ export async function getTodayStats(
     const today = new Date().toISOString().split("T")[0]
     const adminDb = getAdminDb()
 
+    // Precomputed stats (scripts/daily-stats.py), read with the materializer watermark: the
+    // document is current if it was rewritten, or the last run covered changes, recently enough
+    const [statsSnap, metaSnap] = await adminDb.getAll(
+      adminDb.collection("stats").doc(`default_${today}`),
+      adminDb.collection("statsMeta").doc("materializer")
+    )
+    const stats = statsSnap.exists ? (statsSnap.data() as DailyStats | undefined) : undefined
+    const freshAt = Math.max(
+      Date.parse(stats?.updatedAt || "") || 0,
+      Date.parse(metaSnap.exists ? metaSnap.get("watermark") || "" : "") || 0
+    )
+    const fresh = Date.now() - freshAt <= STATS_MAX_AGE_MS
+    if (stats?.counts && !fresh) {
+      logger.warn("Daily stats are stale, scanning bookings", { date: today, freshAt: new Date(freshAt).toISOString() })
+    }
+    if (stats?.counts && fresh) {
+      const result = {
+        total: stats.total ?? 0,
+        pending: stats.counts.PENDING ?? 0,
+        confirmed: stats.counts.CONFIRMED ?? 0,
+        rejected: stats.counts.REJECTED ?? 0,
+      }
+      const duration = Date.now() - startTime
+      logger.info("Today stats fetched", { ...result, fromStats: true, statsUpdatedAt: stats.updatedAt, duration })
+      return result
+    }
+
+    // Fallback when the materializer has not produced today's document yet or has stopped
     const bookingsSnapshot = await adminDb.collection("bookings").where("date", "==", today).get()
 
     let pending = 0
@@ -223,6 +251,13 @@ export async function approveBooking(
       confirmedBy: userId || "unknown",
     })
 
+    // ALTERNATIVE_PROPOSED -> CONFIRMED takes capacity again
+    try {
+      await syncSlotOccupancy(adminDb, bookingData, bookingData?.status, "CONFIRMED")
+    } catch (occupancyError: any) {
+      logger.error("Error updating slot occupancy", { error: occupancyError?.message || occupancyError, bookingId: id })
+    }
+
     // Send confirmation email
     try {
       const customer = await getCustomerById(bookingData?.customerId)
@@ -294,6 +329,12 @@ export async function rejectBooking(
 
     await bookingRef.update(updateData)
 
+    try {
+      await syncSlotOccupancy(adminDb, bookingData, bookingData?.status, "REJECTED")
+    } catch (occupancyError: any) {
+      logger.error("Error updating slot occupancy", { error: occupancyError?.message || occupancyError, bookingId: id })
+    }
+
     const duration = Date.now() - startTime
     logger.info("Booking rejected", { bookingId: id, userId, reason, duration })
     return { success: true }
@@ -356,6 +397,12 @@ export async function proposeAlternatives(
       proposedBy: userId || "unknown",
     })
 
+    try {
+      await syncSlotOccupancy(adminDb, bookingData, "PENDING", "ALTERNATIVE_PROPOSED")
+    } catch (occupancyError: any) {
+      logger.error("Error updating slot occupancy", { error: occupancyError?.message || occupancyError, bookingId: id })
+    }
+
     // Send alternative slots email
     try {
       const customer = await getCustomerById(bookingData?.customerId)
@@ -2,8 +2,11 @@
 
 import { getAdminDb } from "@/lib/firebase-admin"
 import { parse, format, addMinutes, isAfter, isBefore, isEqual } from "date-fns"
-import type { SalonConfig, Booking } from "@/types"
+import type { SalonConfig, Booking, SlotOccupancy } from "@/types"
 import { logger } from "@/lib/logger"
+import { SLOT_OCCUPANCY_COLLECTION, maxOccupancy, occupancyDocId, timeToMinutes } from "@/lib/slot-occupancy"
+import { bookingMinutes } from "@/lib/booking-time"
+import { getSlotsFromSidecar } from "@/lib/availability-sidecar"
 
 interface TimeSlot {
   start: string
@@ -42,6 +45,19 @@ export async function getAvailableSlots(date: string, serviceDuration: number):
       return []
     }
 
+    // In-memory model kept up to date by snapshot listeners, when configured
+    const sidecarSlots = await getSlotsFromSidecar(date, serviceDuration)
+    if (sidecarSlots) {
+      logger.info("Available slots fetched", {
+        date,
+        serviceDuration,
+        slotsCount: sidecarSlots.length,
+        fromSidecar: true,
+        duration: Date.now() - startTime,
+      })
+      return sidecarSlots
+    }
+
     // 1) Day of week
     const dayOfWeek = bookingDate.getDay() // 0 = Sunday, 1 = Monday, etc.
 
@@ -101,23 +117,37 @@ export async function getAvailableSlots(date: string, serviceDuration: number):
     const resources = Number(finalConfig.resources ?? defaultConfig.resources)
     const bufferTime = Number(finalConfig.bufferTime ?? defaultConfig.bufferTime)
 
-    // 5) Fetch all bookings for the requested date
-    const bookingsSnapshot = await adminDb
-      .collection("bookings")
-      .where("date", "==", date)
+    // 5) Read the occupancy counters for the date (one document);
+    // fall back to scanning the day's bookings if missing or built with another timeStep/bufferTime
+    const occupancySnap = await adminDb
+      .collection(SLOT_OCCUPANCY_COLLECTION)
+      .doc(occupancyDocId(undefined, date))
       .get()
-
-    // ✅ Tipizzazione corretta: doc.data() -> Partial<Booking> e poi cast a Booking
-    // + filtro solo PENDING/CONFIRMED
-    const existingBookings: Booking[] = bookingsSnapshot.docs
-      .map((doc) => {
-        const data = doc.data() as Partial<Booking>
-        return {
-          id: doc.id,
-          ...data,
-        } as Booking
-      })
-      .filter((booking) => booking.status === "PENDING" || booking.status === "CONFIRMED")
+    const occupancyData = occupancySnap.exists ? (occupancySnap.data() as SlotOccupancy | undefined) : undefined
+    const occupancy =
+      occupancyData && occupancyData.bucketMinutes === timeStep && occupancyData.bufferTime === bufferTime
+        ? occupancyData
+        : null
+
+    let existingBookings: Booking[] = []
+    if (!occupancy) {
+      const bookingsSnapshot = await adminDb
+        .collection("bookings")
+        .where("date", "==", date)
+        .get()
+
+      // ✅ Tipizzazione corretta: doc.data() -> Partial<Booking> e poi cast a Booking
+      // + filtro solo PENDING/CONFIRMED
+      existingBookings = bookingsSnapshot.docs
+        .map((doc) => {
+          const data = doc.data() as Partial<Booking>
+          return {
+            id: doc.id,
+            ...data,
+          } as Booking
+        })
+        .filter((booking) => booking.status === "PENDING" || booking.status === "CONFIRMED")
+    }
 
     // 6) Parse opening and closing times using booking date as base
     const openingDateTime = parse(`${date} ${openingTime}`, "yyyy-MM-dd HH:mm", new Date())
@@ -140,11 +170,10 @@ export async function getAvailableSlots(date: string, serviceDuration: number):
       }
 
       // 8) Check for conflicts with existing bookings (buffer included)
-      const conflicts = countConflicts(
-        { start: slotStartTime, end: slotEndTime },
-        existingBookings,
-        bufferTime
-      )
+      const slotStartMin = timeToMinutes(slotStartTime)
+      const conflicts = occupancy
+        ? maxOccupancy(occupancy, slotStartMin, slotStartMin + serviceDuration + bufferTime)
+        : countConflicts({ start: slotStartTime, end: slotEndTime }, existingBookings, bufferTime)
 
       // 9) If conflicts < resources, the slot is available
       if (conflicts < resources) {
@@ -160,6 +189,7 @@ export async function getAvailableSlots(date: string, serviceDuration: number):
       date,
       serviceDuration,
       slotsCount: availableSlots.length,
+      fromCounters: Boolean(occupancy),
       duration,
     })
     return availableSlots
@@ -184,15 +214,14 @@ export async function getAvailableSlots(date: string, serviceDuration: number):
  * @returns Number of conflicting bookings
  */
 function countConflicts(slot: TimeSlot, bookings: Booking[], bufferTime: number): number {
-  return bookings.filter((booking) => {
-    // Parse booking times and add buffer to existing booking end time
-    const bookingStart = parse(booking.startTime, "HH:mm", new Date())
-    const bookingEnd = addMinutes(parse(booking.endTime, "HH:mm", new Date()), bufferTime)
+  const slotStart = timeToMinutes(slot.start)
+  const slotEnd = timeToMinutes(slot.end)
 
-    const slotStart = parse(slot.start, "HH:mm", new Date())
-    const slotEnd = parse(slot.end, "HH:mm", new Date())
+  return bookings.filter((booking) => {
+    // Booking occupies [start, end + buffer); numeric fields avoid re-parsing the strings
+    const [bookingStart, bookingEnd] = bookingMinutes(booking)
 
     // overlap: slotStart < bookingEnd && bookingStart < slotEnd
-    return isBefore(slotStart, bookingEnd) && isBefore(bookingStart, slotEnd)
+    return slotStart < bookingEnd + bufferTime && bookingStart < slotEnd
   }).length
 }
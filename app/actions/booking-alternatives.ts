@@ -5,6 +5,8 @@ import type { Booking, AlternativeSlot } from "@/types"
 import { logger } from "@/lib/logger"
 import { sendBookingConfirmationEmail } from "./email"
 import { getCustomerById } from "./customers"
+import { syncSlotOccupancy } from "@/lib/slot-occupancy"
+import { bookingTimeFields } from "@/lib/booking-time"
 
 /**
  * Accept an alternative slot for a booking
@@ -63,6 +65,7 @@ export async function acceptAlternativeSlot(
       date: selectedSlot.date,
       startTime: selectedSlot.startTime,
       endTime: selectedSlot.endTime,
+      ...bookingTimeFields(selectedSlot.date, selectedSlot.startTime, selectedSlot.endTime),
       status: "CONFIRMED",
       selectedAlternativeSlot: selectedSlot,
       updatedAt: new Date().toISOString(),
@@ -72,6 +75,13 @@ export async function acceptAlternativeSlot(
 
     await bookingRef.update(updateData)
 
+    // The booking now takes capacity on the selected slot
+    try {
+      await syncSlotOccupancy(adminDb, selectedSlot, "ALTERNATIVE_PROPOSED", "CONFIRMED")
+    } catch (occupancyError: any) {
+      logger.error("Error updating slot occupancy", { error: occupancyError?.message || occupancyError, bookingId })
+    }
+
     // Send confirmation email (non blocca se fallisce)
     try {
       const customerId = (bookingData.customerId || (bookingData as any).userId) as string | undefined
@@ -5,6 +5,14 @@ import { parse, addMinutes, format, isBefore, isAfter } from "date-fns"
 import { getAvailableSlots } from "./availability"
 import type { Service, Booking, SalonConfig } from "@/types"
 import { logger } from "@/lib/logger"
+import {
+  applyBookingToCounts,
+  maxOccupancy,
+  readOccupancyInTransaction,
+  timeToMinutes,
+  writeOccupancyInTransaction,
+} from "@/lib/slot-occupancy"
+import { bookingMinutes, bookingTimeFields } from "@/lib/booking-time"
 
 export interface CreateBookingInput {
   serviceId: string
@@ -79,16 +87,15 @@ async function checkConflictsInTransaction(
       })
       .filter((b) => b.status === "PENDING" || b.status === "CONFIRMED")
 
-    const slotStart = parse(startTime, "HH:mm", new Date())
-    const slotEnd = parse(endTime, "HH:mm", new Date())
+    const slotStart = timeToMinutes(startTime)
+    const slotEnd = timeToMinutes(endTime)
 
     let conflictCount = 0
 
     for (const booking of existingBookings) {
-      const bookingStart = parse(booking.startTime, "HH:mm", new Date())
-      const bookingEnd = addMinutes(parse(booking.endTime, "HH:mm", new Date()), bufferTime)
+      const [bookingStart, bookingEnd] = bookingMinutes(booking)
 
-      if (isBefore(slotStart, bookingEnd) && isBefore(bookingStart, slotEnd)) {
+      if (slotStart < bookingEnd + bufferTime && bookingStart < slotEnd) {
         conflictCount++
       }
     }
@@ -161,7 +168,6 @@ export async function createBooking(input: CreateBookingInput): Promise<CreateBo
       ? ({ ...defaultConfig, ...(configSnap.data() as any) } as SalonConfig)
       : defaultConfig
 
-    const bufferTime = Number(config.bufferTime ?? defaultConfig.bufferTime)
     const resources = Number(config.resources ?? defaultConfig.resources)
 
     // 4) Compute end time
@@ -188,38 +194,7 @@ export async function createBooking(input: CreateBookingInput): Promise<CreateBo
       }
     }
 
-    // 7) Final conflict check (double-check)
-    const bookingsSnapshot = await adminDb.collection("bookings").where("date", "==", date).get()
-
-    const existingBookings: Booking[] = bookingsSnapshot.docs
-      .map((doc) => {
-        const data = doc.data() as Partial<Booking>
-        return { id: doc.id, ...data } as Booking
-      })
-      .filter((b) => b.status === "PENDING" || b.status === "CONFIRMED")
-
-    const slotStart = parse(startTimeStr, "HH:mm", new Date())
-    const slotEnd = parse(endTime, "HH:mm", new Date())
-
-    let conflictCount = 0
-    for (const booking of existingBookings) {
-      const bookingStart = parse(booking.startTime, "HH:mm", new Date())
-      const bookingEnd = addMinutes(parse(booking.endTime, "HH:mm", new Date()), bufferTime)
-
-      if (isBefore(slotStart, bookingEnd) && isBefore(bookingStart, slotEnd)) {
-        conflictCount++
-      }
-    }
-
-    if (conflictCount >= resources) {
-      logger.warn("Slot conflict detected", { date, startTime: startTimeStr, conflictCount, resources })
-      return {
-        success: false,
-        error: "Questo slot temporale non è più disponibile. Si prega di selezionare un altro orario.",
-      }
-    }
-
-    // 8) Fetch customer data (safe)
+    // 7) Fetch customer data (safe)
     const customerRef = adminDb.collection("customers").doc(userId)
     const customerSnap = await customerRef.get()
 
@@ -236,13 +211,13 @@ export async function createBooking(input: CreateBookingInput): Promise<CreateBo
       }
     }
 
-    // 9) Create booking
+    // 8) Build booking
     const bookingData: Record<string, any> = {
       date,
       startTime: startTimeStr,
       endTime,
+      ...bookingTimeFields(date, startTimeStr, endTime),
       status: "PENDING" as const,
-      userId,
       customerId: userId,
       serviceId,
       serviceName: service.name || "",
@@ -253,8 +228,37 @@ export async function createBooking(input: CreateBookingInput): Promise<CreateBo
       createdAt: new Date().toISOString(),
     }
 
+    // 9) Final capacity check and write in one transaction on the occupancy counters
     const bookingRef = adminDb.collection("bookings").doc()
-    await bookingRef.set(bookingData)
+    const slotStartMin = timeToMinutes(startTimeStr)
+    const slotEndMin = slotStartMin + serviceDuration
+
+    const peakOccupancy = await adminDb.runTransaction(async (tx) => {
+      const { occupancy } = await readOccupancyInTransaction(tx, adminDb, undefined, date, config)
+      const peak = maxOccupancy(occupancy, slotStartMin, slotEndMin)
+      if (peak >= resources) {
+        return peak
+      }
+
+      applyBookingToCounts(
+        occupancy.counts,
+        { startTime: startTimeStr, endTime },
+        occupancy.bucketMinutes,
+        occupancy.bufferTime,
+        1
+      )
+      writeOccupancyInTransaction(tx, adminDb, occupancy)
+      tx.set(bookingRef, bookingData)
+      return peak
+    })
+
+    if (peakOccupancy >= resources) {
+      logger.warn("Slot conflict detected", { date, startTime: startTimeStr, peakOccupancy, resources })
+      return {
+        success: false,
+        error: "Questo slot temporale non è più disponibile. Si prega di selezionare un altro orario.",
+      }
+    }
 
     const bookingId = bookingRef.id
     const duration = Date.now() - startMs
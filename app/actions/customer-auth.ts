@@ -1,10 +1,12 @@
 "use server"
 
+import { Timestamp } from "firebase-admin/firestore"
 import { getAdminDb } from "@/lib/firebase-admin"
 import { auth } from "@/lib/firebase"
 import type { Customer, Gender, TimePreference, AcquisitionChannel } from "@/types"
 import { logger } from "@/lib/logger"
 import { convertTimestamp } from "@/lib/firestore-utils"
+import { customerSortKeys } from "@/lib/customer-sort-keys"
 
 export interface RegisterCustomerInput {
   firstName: string
@@ -95,9 +97,13 @@ export async function registerCustomer(input: RegisterCustomerInput): Promise<Re
       createdAt: new Date().toISOString(),
     }
 
-    // Create customer document
+    // Create customer document, with the sort keys used by getCustomersPage
     const customerRef = adminDb.collection("customers").doc()
-    await customerRef.set(customerData)
+    await customerRef.set({
+      ...customerData,
+      ...customerSortKeys(customerData.lastName, customerData.email),
+      createdAt: Timestamp.now(),
+    })
 
     const duration = Date.now() - startTime
     logger.info("Customer registered", { customerId: customerRef.id, email: input.email, duration })
@@ -1,9 +1,25 @@
 "use server"
 
+import { FieldPath, Timestamp, type Firestore, type Query, type QueryDocumentSnapshot } from "firebase-admin/firestore"
 import { getAdminDb } from "@/lib/firebase-admin"
 import type { Customer, Booking } from "@/types"
 import { logger } from "@/lib/logger"
 import { convertTimestamp } from "@/lib/firestore-utils"
+import {
+  CUSTOMER_SORT_KEYS_MIGRATION,
+  CUSTOMER_SORTS,
+  decodeCustomerCursor,
+  encodeCustomerCursor,
+  type CustomerSort,
+} from "@/lib/customer-sort-keys"
+import {
+  CUSTOMER_SEARCH_COLLECTION,
+  matchScore,
+  queryWords,
+  rankCandidates,
+  wordGrams,
+  type SearchGramDoc,
+} from "@/lib/customer-search"
 
 /**
  * Get customer by ID
@@ -110,8 +126,47 @@ export async function getCustomerByEmail(email: string): Promise<Customer | null
   }
 }
 
+function toCustomer(doc: QueryDocumentSnapshot): Customer {
+  const data = doc.data()
+  return {
+    id: doc.id,
+    firstName: data.firstName,
+    lastName: data.lastName,
+    email: data.email,
+    emailVerified: data.emailVerified || false,
+    gender: data.gender,
+    birthMonth: data.birthMonth,
+    birthDay: data.birthDay,
+    city: data.city,
+    postalCode: data.postalCode,
+    timePreference: data.timePreference,
+    acquisitionChannel: data.acquisitionChannel,
+    interests: data.interests || [],
+    tags: data.tags || [],
+    internalNotes: data.internalNotes,
+    createdAt: convertTimestamp(data.createdAt) || new Date().toISOString(),
+    updatedAt: convertTimestamp(data.updatedAt),
+  }
+}
+
+// Set once migrations/state reports the sort keys migration as applied
+let sortKeysMigrated = false
+
+async function hasSortKeys(adminDb: Firestore): Promise<boolean> {
+  if (!sortKeysMigrated) {
+    const stateSnap = await adminDb.collection("migrations").doc("state").get()
+    sortKeysMigrated = Boolean(stateSnap.get(`applied.${CUSTOMER_SORT_KEYS_MIGRATION}`))
+  }
+  return sortKeysMigrated
+}
+
 /**
  * Get all customers with pagination
+ * `lastDocId` is the id returned by the previous page; prefer getCustomersPage, which
+ * does not need the extra read of the last document.
+ * Until migration 0003 has run, createdAt mixes ISO strings and Timestamps, which Firestore
+ * orders by type rather than by date: pages then follow the document id and each page is
+ * sorted newest first in memory, as the listing did before the sort keys.
  */
 export async function getAllCustomers(
   limitCount: number = 50,
@@ -120,55 +175,35 @@ export async function getAllCustomers(
   const startTime = Date.now()
   try {
     const adminDb = getAdminDb()
-    // Query without orderBy to avoid index requirement - we'll sort in memory
-    let query = adminDb.collection("customers").limit(limitCount + 1)
-
-    const snapshot = await query.get()
-    const customers: Customer[] = []
-
-    snapshot.docs.forEach((doc) => {
-      const data = doc.data()
-      if (!data) {
-        logger.warn("Customer data is undefined, skipping", { docId: doc.id })
-        return
+    const migrated = await hasSortKeys(adminDb)
+    let query = migrated
+      ? adminDb.collection("customers").orderBy("createdAt", "desc").orderBy(FieldPath.documentId(), "desc")
+      : adminDb.collection("customers").orderBy(FieldPath.documentId())
+    if (lastDocId) {
+      if (migrated) {
+        const lastDoc = await adminDb.collection("customers").doc(lastDocId).get()
+        if (lastDoc.exists) {
+          query = query.startAfter(lastDoc)
+        }
+      } else {
+        query = query.startAfter(lastDocId)
       }
-      customers.push({
-        id: doc.id,
-        firstName: data.firstName,
-        lastName: data.lastName,
-        email: data.email,
-        emailVerified: data.emailVerified || false,
-        gender: data.gender,
-        birthMonth: data.birthMonth,
-        birthDay: data.birthDay,
-        city: data.city,
-        postalCode: data.postalCode,
-        timePreference: data.timePreference,
-        acquisitionChannel: data.acquisitionChannel,
-        interests: data.interests || [],
-        tags: data.tags || [],
-        internalNotes: data.internalNotes,
-        createdAt: convertTimestamp(data.createdAt) || new Date().toISOString(),
-        updatedAt: convertTimestamp(data.updatedAt),
-      })
-    })
-
-    // Sort in memory by createdAt descending
-    customers.sort((a, b) => {
-      if (!a.createdAt || !b.createdAt) return 0
-      return b.createdAt.localeCompare(a.createdAt)
-    })
+    }
 
-    const hasMore = customers.length > limitCount
-    const result = hasMore ? customers.slice(0, limitCount) : customers
-    const lastDoc = hasMore ? snapshot.docs[limitCount - 1] : undefined
+    const snapshot = await query.limit(limitCount + 1).get()
+    const hasMore = snapshot.docs.length > limitCount
+    const docs = hasMore ? snapshot.docs.slice(0, limitCount) : snapshot.docs
+    const customers = docs.map(toCustomer)
+    if (!migrated) {
+      customers.sort((a, b) => b.createdAt.localeCompare(a.createdAt))
+    }
 
     const duration = Date.now() - startTime
-    logger.info("Customers fetched", { count: result.length, hasMore, duration })
+    logger.info("Customers fetched", { count: customers.length, hasMore, duration })
     return {
-      customers: result,
+      customers,
       hasMore,
-      lastDocId: lastDoc?.id,
+      lastDocId: hasMore ? docs[docs.length - 1].id : undefined,
     }
   } catch (error: any) {
     const duration = Date.now() - startTime
@@ -177,6 +212,162 @@ export async function getAllCustomers(
   }
 }
 
+export interface CustomersPageInput {
+  sort?: CustomerSort
+  limit?: number
+  cursor?: string
+  tag?: string
+}
+
+export interface CustomersPage {
+  customers: Customer[]
+  hasMore: boolean
+  nextCursor?: string
+  error?: string
+  // Migration 0003 has not run yet: use getAllCustomers
+  needsMigration?: boolean
+}
+
+/**
+ * Keyset pagination of the customers list
+ * Orders by the sort key and then by document id, and resumes after the (value, id) pair
+ * in the cursor: every page costs `limit + 1` reads at any depth. With `tag` the query
+ * uses the tags + sort key composite indexes in firestore.indexes.json.
+ * Depends on migration 0003 (scripts/migrations/0003_customer_sort_keys.py): every sort
+ * returns an error with `needsMigration` until migrations/state records 0003 as applied.
+ * Before it, lastNameLower/emailLower are missing (Firestore skips those customers) and
+ * createdAt is partly an ISO string, which Firestore sorts above every Timestamp: "newest"
+ * would list the oldest legacy customers first. A createdAt the migration could not parse
+ * stays a string and round-trips in the cursor as one; customers without createdAt are not
+ * listed (the migration reports them as "no-date").
+ */
+export async function getCustomersPage(input: CustomersPageInput = {}): Promise<CustomersPage> {
+  const startTime = Date.now()
+  const sort = input.sort || "newest"
+  const limitCount = Math.min(Math.max(input.limit || 50, 1), 200)
+  try {
+    if (!CUSTOMER_SORTS[sort]) {
+      return { customers: [], hasMore: false, error: "Ordinamento non valido" }
+    }
+    const { field, direction } = CUSTOMER_SORTS[sort]
+    const adminDb = getAdminDb()
+    if (!(await hasSortKeys(adminDb))) {
+      logger.warn("Customer sort keys not migrated", { sort, migration: CUSTOMER_SORT_KEYS_MIGRATION })
+      return {
+        customers: [],
+        hasMore: false,
+        error: `Ordinamento non disponibile: eseguire la migrazione ${CUSTOMER_SORT_KEYS_MIGRATION} dei clienti`,
+        needsMigration: true,
+      }
+    }
+    let query = adminDb.collection("customers") as Query
+    if (input.tag) {
+      query = query.where("tags", "array-contains", input.tag)
+    }
+    query = query.orderBy(field, direction).orderBy(FieldPath.documentId(), direction)
+
+    if (input.cursor) {
+      const cursor = decodeCustomerCursor(input.cursor, sort)
+      if (!cursor) {
+        return { customers: [], hasMore: false, error: "Cursore non valido" }
+      }
+      const value = Array.isArray(cursor.v) ? new Timestamp(cursor.v[0], cursor.v[1]) : cursor.v
+      query = query.startAfter(value, cursor.id)
+    }
+
+    const snapshot = await query.limit(limitCount + 1).get()
+    const hasMore = snapshot.docs.length > limitCount
+    const docs = hasMore ? snapshot.docs.slice(0, limitCount) : snapshot.docs
+
+    let nextCursor: string | undefined
+    if (hasMore) {
+      const last = docs[docs.length - 1]
+      const value = last.get(field)
+      nextCursor = encodeCustomerCursor({
+        s: sort,
+        v: value instanceof Timestamp ? [value.seconds, value.nanoseconds] : String(value ?? ""),
+        id: last.id,
+      })
+    }
+
+    const duration = Date.now() - startTime
+    logger.info("Customers page fetched", { sort, tag: input.tag, count: docs.length, hasMore, duration })
+    return { customers: docs.map(toCustomer), hasMore, nextCursor }
+  } catch (error: any) {
+    const duration = Date.now() - startTime
+    logger.error("Error fetching customers page", { error: error.message || error, sort, duration })
+    return { customers: [], hasMore: false, error: "Errore durante il caricamento dei clienti" }
+  }
+}
+
+export interface CustomerSearchResult {
+  customers: Customer[]
+  tooGeneric?: boolean
+  error?: string
+}
+
+/**
+ * Partial-match search on name, email, city and postal code
+ * Reads the prefix/trigram documents of the query words from customerSearch (built by
+ * scripts/customer-search.py), then only the best candidates, and ranks them on their
+ * actual fields. Customers added after the last index update are not found yet.
+ */
+export async function searchCustomers(query: string, limitCount: number = 20): Promise<CustomerSearchResult> {
+  const startTime = Date.now()
+  try {
+    const terms = queryWords(query)
+    if (terms.length === 0) {
+      return { customers: [] }
+    }
+    const limit = Math.min(Math.max(limitCount, 1), 50)
+    const adminDb = getAdminDb()
+
+    const gramIds = [...new Set(terms.flatMap((term) => {
+      const { prefix, trigrams } = wordGrams(term)
+      return [prefix, ...trigrams]
+    }))]
+    const gramSnaps = await adminDb.getAll(
+      ...gramIds.map((id) => adminDb.collection(CUSTOMER_SEARCH_COLLECTION).doc(id))
+    )
+    const grams = new Map<string, SearchGramDoc>()
+    gramSnaps.forEach((snap) => {
+      if (snap.exists) grams.set(snap.id, snap.data() as SearchGramDoc)
+    })
+
+    const ranked = rankCandidates(terms, grams, limit * 2)
+    if (ranked === null) {
+      return { customers: [], tooGeneric: true }
+    }
+    if (ranked.length === 0) {
+      return { customers: [] }
+    }
+
+    const customerSnaps = await adminDb.getAll(
+      ...ranked.map(([id]) => adminDb.collection("customers").doc(id))
+    )
+    const results: Array<{ customer: Customer; score: number }> = []
+    customerSnaps.forEach((snap) => {
+      if (!snap.exists) return
+      const score = matchScore(snap.data() || {}, terms)
+      if (score !== null) results.push({ customer: toCustomer(snap as QueryDocumentSnapshot), score })
+    })
+    results.sort((a, b) => b.score - a.score || (a.customer.id < b.customer.id ? -1 : 1))
+
+    const duration = Date.now() - startTime
+    logger.info("Customers searched", {
+      terms,
+      reads: gramIds.length + ranked.length,
+      count: Math.min(results.length, limit),
+      duration,
+    })
+    return { customers: results.slice(0, limit).map((result) => result.customer) }
+  } catch (error: any) {
+    const duration = Date.now() - startTime
+    logger.error("Error searching customers", { error: error.message || error, query, duration })
+    return { customers: [], error: "Errore durante la ricerca dei clienti" }
+  }
+}
+
 /**
  * Get customer bookings history
  */
@@ -184,10 +375,11 @@ export async function getCustomerBookings(customerId: string): Promise<Booking[]
   const startTime = Date.now()
   try {
     const adminDb = getAdminDb()
-    // Query without orderBy to avoid index requirement - we'll sort in memory
+    // Newest first, served by the (customerId, date DESC) index
     const snapshot = await adminDb
       .collection("bookings")
       .where("customerId", "==", customerId)
+      .orderBy("date", "desc")
       .get()
 
     const bookings: Booking[] = []
@@ -220,15 +412,6 @@ export async function getCustomerBookings(customerId: string): Promise<Booking[]
       })
     })
 
-    // Sort in memory by date descending, then by createdAt descending
-    bookings.sort((a, b) => {
-      if (a.date !== b.date) {
-        return b.date.localeCompare(a.date)
-      }
-      if (!a.createdAt || !b.createdAt) return 0
-      return b.createdAt.localeCompare(a.createdAt)
-    })
-
     const duration = Date.now() - startTime
     logger.info("Customer bookings fetched", { customerId, count: bookings.length, duration })
     return bookings
@@ -15,11 +15,13 @@ export async function getAllBookingsForWeek(
   const startTime = Date.now()
   try {
     const adminDb = getAdminDb()
-    // Query without orderBy to avoid index requirement - we'll sort in memory
+    // Sorted by date, then startTime (date, startTime index)
     const bookingsSnapshot = await adminDb
       .collection("bookings")
       .where("date", ">=", weekStart)
       .where("date", "<=", weekEnd)
+      .orderBy("date")
+      .orderBy("startTime")
       .get()
 
     const bookings: Booking[] = []
@@ -52,14 +54,6 @@ export async function getAllBookingsForWeek(
       })
     })
 
-    // Sort in memory by date, then by startTime
-    bookings.sort((a, b) => {
-      if (a.date !== b.date) {
-        return a.date.localeCompare(b.date)
-      }
-      return a.startTime.localeCompare(b.startTime)
-    })
-
     const duration = Date.now() - startTime
     logger.info("All bookings for week fetched", { weekStart, weekEnd, count: bookings.length, duration })
     return bookings
@@ -0,0 +1,190 @@
+"use server"
+
+import { FieldValue } from "firebase-admin/firestore"
+import { getAdminDb } from "@/lib/firebase-admin"
+import { DEFAULT_SALON_KEY } from "@/lib/slot-occupancy"
+import type { TimePreference, WaitlistEntry } from "@/types"
+import { logger } from "@/lib/logger"
+import { createBooking, type CreateBookingResult } from "./create-booking"
+
+const WAITLIST_COLLECTION = "waitlist"
+
+// Longest date window accepted for a waitlist entry
+const MAX_WINDOW_DAYS = 60
+
+export interface JoinWaitlistInput {
+  customerId: string
+  serviceId: string
+  dateFrom: string // YYYY-MM-DD
+  dateTo: string // YYYY-MM-DD
+  timePreference?: TimePreference
+  salonId?: string
+}
+
+export interface WaitlistResult {
+  success: boolean
+  id?: string
+  bookingId?: string
+  error?: string
+}
+
+/**
+ * Add a customer to the waitlist for a service and date window.
+ * scripts/waitlist-matcher.py proposes a slot when a matching booking is cancelled or rejected.
+ */
+export async function joinWaitlist(input: JoinWaitlistInput): Promise<WaitlistResult> {
+  const startTime = Date.now()
+  try {
+    const { customerId, serviceId, dateFrom, dateTo } = input
+    if (!customerId || !serviceId) {
+      return { success: false, error: "Cliente e servizio sono obbligatori" }
+    }
+    if (!/^\d{4}-\d{2}-\d{2}$/.test(dateFrom) || !/^\d{4}-\d{2}-\d{2}$/.test(dateTo) || dateTo < dateFrom) {
+      return { success: false, error: "Intervallo di date non valido" }
+    }
+    const windowDays = (Date.parse(dateTo) - Date.parse(dateFrom)) / 86_400_000
+    if (windowDays > MAX_WINDOW_DAYS) {
+      return { success: false, error: `L'intervallo può coprire al massimo ${MAX_WINDOW_DAYS} giorni` }
+    }
+
+    const adminDb = getAdminDb()
+    const serviceSnap = await adminDb.collection("services").doc(serviceId).get()
+    const service = serviceSnap.exists ? (serviceSnap.data() as any) : null
+    if (!service || !service.active) {
+      return { success: false, error: "Il servizio selezionato non è disponibile." }
+    }
+
+    // WaitlistIndex in scripts/salon_tools/waitlist.py ignores entries without a duration
+    const serviceDuration = Number(service.duration ?? 0)
+    if (!Number.isFinite(serviceDuration) || serviceDuration <= 0) {
+      logger.warn("Waitlist join for service without duration", { serviceId, duration: service.duration })
+      return { success: false, error: "Durata del servizio non valida" }
+    }
+
+    const entry: Omit<WaitlistEntry, "id"> = {
+      salonId: input.salonId || DEFAULT_SALON_KEY,
+      customerId,
+      serviceId,
+      serviceName: service.name || "",
+      serviceDuration,
+      dateFrom,
+      dateTo,
+      timePreference: input.timePreference || "Flessibile",
+      status: "WAITING",
+      createdAt: new Date().toISOString(),
+    }
+
+    const entryRef = adminDb.collection(WAITLIST_COLLECTION).doc()
+    await entryRef.set(entry)
+
+    const duration = Date.now() - startTime
+    logger.info("Waitlist entry created", { entryId: entryRef.id, customerId, serviceId, dateFrom, dateTo, duration })
+    return { success: true, id: entryRef.id }
+  } catch (error: any) {
+    const duration = Date.now() - startTime
+    logger.error("Error joining waitlist", { error: error?.message || error, input, duration })
+    return { success: false, error: "Errore durante l'iscrizione alla lista d'attesa. Riprova." }
+  }
+}
+
+/**
+ * Accept the slot proposed to a waitlist entry: the booking goes through createBooking,
+ * which re-validates availability. If the slot is gone the entry returns to WAITING.
+ * The entry is claimed first (PROPOSED -> ACCEPTING in a transaction), so concurrent
+ * accepts create at most one booking and the matcher's expiry reset no longer applies.
+ */
+export async function acceptWaitlistProposal(entryId: string, customerId: string): Promise<WaitlistResult> {
+  const startTime = Date.now()
+  try {
+    const adminDb = getAdminDb()
+    const entryRef = adminDb.collection(WAITLIST_COLLECTION).doc(entryId)
+
+    const claim = await adminDb.runTransaction(async (tx) => {
+      const entrySnap = await tx.get(entryRef)
+      const entry = entrySnap.exists ? (entrySnap.data() as Omit<WaitlistEntry, "id">) : null
+
+      if (!entry || entry.customerId !== customerId) {
+        return { error: "Proposta non trovata" }
+      }
+      if (entry.status !== "PROPOSED" || !entry.proposedSlot) {
+        return { error: "Nessuno slot proposto per questa richiesta" }
+      }
+      if (entry.proposalExpiresAt && entry.proposalExpiresAt < new Date().toISOString()) {
+        return { error: "La proposta è scaduta" }
+      }
+      tx.update(entryRef, { status: "ACCEPTING", updatedAt: new Date().toISOString() })
+      return { entry }
+    })
+    if (!claim.entry) {
+      return { success: false, error: claim.error }
+    }
+    const entry = claim.entry
+    const proposedSlot = entry.proposedSlot!
+
+    let result: CreateBookingResult
+    try {
+      result = await createBooking({
+        serviceId: entry.serviceId,
+        date: proposedSlot.date,
+        startTime: proposedSlot.startTime,
+        userId: customerId,
+      })
+    } catch (bookingError) {
+      // Release the claim so the customer can retry
+      await entryRef.update({ status: "PROPOSED", updatedAt: new Date().toISOString() })
+      throw bookingError
+    }
+
+    if (!result.success) {
+      await entryRef.update({
+        status: "WAITING",
+        proposedSlot: FieldValue.delete(),
+        proposedAt: FieldValue.delete(),
+        proposalExpiresAt: FieldValue.delete(),
+        sourceBookingId: FieldValue.delete(),
+        updatedAt: new Date().toISOString(),
+      })
+      logger.warn("Waitlist proposal no longer available", { entryId, slot: proposedSlot })
+      return { success: false, error: result.error }
+    }
+
+    await entryRef.update({
+      status: "BOOKED",
+      bookingId: result.id,
+      updatedAt: new Date().toISOString(),
+    })
+
+    const duration = Date.now() - startTime
+    logger.info("Waitlist proposal accepted", { entryId, bookingId: result.id, duration })
+    return { success: true, id: entryId, bookingId: result.id }
+  } catch (error: any) {
+    const duration = Date.now() - startTime
+    logger.error("Error accepting waitlist proposal", { error: error?.message || error, entryId, duration })
+    return { success: false, error: "Errore durante la conferma della proposta. Riprova." }
+  }
+}
+
+/**
+ * Remove a customer from the waitlist
+ */
+export async function leaveWaitlist(entryId: string, customerId: string): Promise<WaitlistResult> {
+  const startTime = Date.now()
+  try {
+    const adminDb = getAdminDb()
+    const entryRef = adminDb.collection(WAITLIST_COLLECTION).doc(entryId)
+    const entrySnap = await entryRef.get()
+    if (!entrySnap.exists || entrySnap.data()?.customerId !== customerId) {
+      return { success: false, error: "Richiesta non trovata" }
+    }
+
+    await entryRef.update({ status: "CANCELLED", updatedAt: new Date().toISOString() })
+
+    const duration = Date.now() - startTime
+    logger.info("Waitlist entry cancelled", { entryId, duration })
+    return { success: true, id: entryId }
+  } catch (error: any) {
+    const duration = Date.now() - startTime
+    logger.error("Error leaving waitlist", { error: error?.message || error, entryId, duration })
+    return { success: false, error: "Errore durante la cancellazione dalla lista d'attesa. Riprova." }
+  }
+}
@@ -1,4 +1,4 @@
-import { getAllCustomers } from "@/app/actions/customers"
+import { getAllCustomers, getCustomersPage } from "@/app/actions/customers"
 import { Card, CardContent, CardDescription, CardHeader, CardTitle } from "@/components/ui/card"
 import { Button } from "@/components/ui/button"
 import { AdminAuthGuard } from "@/components/admin/auth-guard"
@@ -8,7 +8,9 @@ import Link from "next/link"
 import { CustomersList } from "@/components/admin/customers-list"
 
 export default async function CustomersPage() {
-  const { customers } = await getAllCustomers(50)
+  // Before migration 0003 the sort keys are incomplete: fall back to the unsorted listing
+  const page = await getCustomersPage({ sort: "newest", limit: 50 })
+  const { customers } = page.needsMigration ? await getAllCustomers(50) : page
 
   return (
     <AdminAuthGuard>
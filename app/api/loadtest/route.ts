@@ -0,0 +1,66 @@
+import { timingSafeEqual } from "crypto"
+import { NextResponse } from "next/server"
+import { createBooking } from "@/app/actions/create-booking"
+import { getAvailableSlots } from "@/app/actions/availability"
+import { getActiveServices } from "@/app/actions/get-services"
+import { rejectBooking } from "@/app/actions/admin-bookings"
+import { logger } from "@/lib/logger"
+
+/**
+ * Load-testing endpoint for the Python tools in scripts/ (stress-booking.py, load-test.py)
+ * Exposes the booking funnel server actions over plain HTTP so they can be called
+ * without the Next.js action IDs. Disabled unless LOADTEST_API_ENABLED=true.
+ * When LOADTEST_API_TOKEN is set every request must send it in the x-loadtest-token header;
+ * in production the endpoint stays disabled without it. Admin actions (rejectBooking, used by
+ * stress-booking.py --check-release) always require the token.
+ */
+const actions: Record<string, (...args: any[]) => Promise<unknown>> = {
+  getActiveServices,
+  getAvailableSlots,
+  createBooking,
+  rejectBooking,
+}
+
+const ADMIN_ACTIONS = new Set(["rejectBooking"])
+
+const LOADTEST_TOKEN_HEADER = "x-loadtest-token"
+
+function hasValidToken(request: Request, token: string): boolean {
+  const received = Buffer.from(request.headers.get(LOADTEST_TOKEN_HEADER) || "")
+  const expected = Buffer.from(token)
+  return received.length === expected.length && timingSafeEqual(received, expected)
+}
+
+export async function POST(request: Request) {
+  const token = process.env.LOADTEST_API_TOKEN || ""
+  if (process.env.LOADTEST_API_ENABLED !== "true" || (process.env.NODE_ENV === "production" && !token)) {
+    return NextResponse.json({ error: "Not found" }, { status: 404 })
+  }
+  if (token && !hasValidToken(request, token)) {
+    return NextResponse.json({ error: "Unauthorized" }, { status: 401 })
+  }
+
+  const startTime = Date.now()
+  let actionName = ""
+
+  try {
+    const body = await request.json()
+    actionName = String(body?.action || "")
+    const args = Array.isArray(body?.args) ? body.args : []
+
+    const action = actions[actionName]
+    if (!action) {
+      return NextResponse.json({ error: `Unknown action: ${actionName}` }, { status: 400 })
+    }
+    if (ADMIN_ACTIONS.has(actionName) && !token) {
+      return NextResponse.json({ error: `${actionName} requires LOADTEST_API_TOKEN` }, { status: 403 })
+    }
+
+    const result = await action(...args)
+    return NextResponse.json({ result, duration: Date.now() - startTime }, { status: 200 })
+  } catch (error: any) {
+    const duration = Date.now() - startTime
+    logger.error("Error in loadtest endpoint", { error: error?.message || error, action: actionName, duration })
+    return NextResponse.json({ error: error?.message || "Internal error", duration }, { status: 500 })
+  }
+}
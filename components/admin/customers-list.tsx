@@ -1,6 +1,6 @@
 "use client"
 
-import { useState } from "react"
+import { useEffect, useState } from "react"
 import { useRouter } from "next/navigation"
 import { format } from "date-fns"
 import { it } from "date-fns/locale"
@@ -9,6 +9,7 @@ import { Input } from "@/components/ui/input"
 import { Badge } from "@/components/ui/badge"
 import { User, Mail, Calendar, MapPin, Search } from "lucide-react"
 import type { Customer } from "@/types"
+import { searchCustomers } from "@/app/actions/customers"
 
 interface CustomersListProps {
   customers: Customer[]
@@ -17,8 +18,30 @@ interface CustomersListProps {
 export function CustomersList({ customers: initialCustomers }: CustomersListProps) {
   const router = useRouter()
   const [searchTerm, setSearchTerm] = useState("")
+  // Results from the customerSearch index; null while the local filter on the loaded page applies
+  const [searchResults, setSearchResults] = useState<Customer[] | null>(null)
+  const [tooGeneric, setTooGeneric] = useState(false)
 
-  const filteredCustomers = initialCustomers.filter((customer) => {
+  useEffect(() => {
+    if (searchTerm.trim().length < 2) {
+      setSearchResults(null)
+      setTooGeneric(false)
+      return
+    }
+    let cancelled = false
+    const timer = setTimeout(async () => {
+      const result = await searchCustomers(searchTerm)
+      if (cancelled) return
+      setTooGeneric(Boolean(result.tooGeneric))
+      setSearchResults(result.error || result.tooGeneric ? null : result.customers)
+    }, 250)
+    return () => {
+      cancelled = true
+      clearTimeout(timer)
+    }
+  }, [searchTerm])
+
+  const filteredCustomers = searchResults ?? initialCustomers.filter((customer) => {
     const searchLower = searchTerm.toLowerCase()
     return (
       customer.firstName.toLowerCase().includes(searchLower) ||
@@ -60,6 +83,11 @@ export function CustomersList({ customers: initialCustomers }: CustomersListProp
           className="pl-10"
         />
       </div>
+      {tooGeneric && (
+        <p className="text-sm text-muted-foreground">
+          Ricerca troppo generica: aggiungi lettere o un&apos;altra parola. Filtro sui clienti caricati.
+        </p>
+      )}
 
       {/* Desktop Table */}
       <div className="hidden md:block overflow-x-auto">
@@ -5,6 +5,7 @@ import { Calendar } from "@/components/ui/calendar"
 import { it } from "date-fns/locale"
 import { format } from "date-fns"
 import { getSalonConfigForClient } from "@/app/actions/get-salon-config"
+import { loadBookingSnapshot } from "@/lib/booking-snapshot"
 import type { SalonConfig } from "@/types"
 
 interface DateSelectorProps {
@@ -16,7 +17,9 @@ export function DateSelector({ selected, onSelect }: DateSelectorProps) {
   const [salonConfig, setSalonConfig] = useState<SalonConfig | null>(null)
   
   useEffect(() => {
-    getSalonConfigForClient().then(setSalonConfig)
+    loadBookingSnapshot().then((snapshot) =>
+      snapshot ? setSalonConfig(snapshot.config) : getSalonConfigForClient().then(setSalonConfig)
+    )
   }, [])
 
   // Disable past dates
@@ -7,6 +7,7 @@ import { Skeleton } from "@/components/ui/skeleton"
 import { cn } from "@/lib/utils"
 import type { Service } from "@/types"
 import { getServices } from "@/app/actions/get-services"
+import { loadBookingSnapshot, snapshotServices } from "@/lib/booking-snapshot"
 
 interface ServiceSelectorProps {
   selected: Service | null
@@ -20,7 +21,8 @@ export function ServiceSelector({ selected, onSelect }: ServiceSelectorProps) {
   useEffect(() => {
     async function loadServices() {
       try {
-        const data = await getServices()
+        const snapshot = await loadBookingSnapshot()
+        const data = snapshot ? snapshotServices(snapshot) : await getServices()
         setServices(data)
       } catch (error) {
         console.error("[v0] Error loading services:", error)
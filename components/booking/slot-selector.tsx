@@ -7,6 +7,7 @@ import { Skeleton } from "@/components/ui/skeleton"
 import { Spinner } from "@/components/ui/spinner"
 import { cn } from "@/lib/utils"
 import { getAvailableSlots } from "@/app/actions/availability"
+import { loadBookingSnapshot, snapshotSlots } from "@/lib/booking-snapshot"
 
 interface SlotSelectorProps {
   date: Date
@@ -24,7 +25,10 @@ export function SlotSelector({ date, serviceDuration, selected, onSelect }: Slot
       setLoading(true)
       try {
         const dateString = format(date, "yyyy-MM-dd")
-        const availableSlots = await getAvailableSlots(dateString, serviceDuration)
+        const snapshot = await loadBookingSnapshot()
+        const availableSlots =
+          (snapshot && snapshotSlots(snapshot, dateString, serviceDuration)) ||
+          (await getAvailableSlots(dateString, serviceDuration))
         setSlots(availableSlots)
       } catch (error) {
         console.error("[v0] Error loading slots:", error)
@@ -0,0 +1,32 @@
+/**
+ * Availability sidecar client
+ * scripts/availability-sidecar.py keeps config and the bookings of the next days in memory
+ * through Firestore snapshot listeners and answers slot queries locally.
+ * Used only when AVAILABILITY_SIDECAR_URL is set; any error, timeout, date outside the
+ * sidecar window or stale answer returns null and the caller reads Firestore as before.
+ */
+
+const SIDECAR_TIMEOUT_MS = 150
+
+interface SidecarSlots {
+  slots?: string[]
+  fresh?: boolean
+}
+
+export async function getSlotsFromSidecar(date: string, serviceDuration: number): Promise<string[] | null> {
+  const baseUrl = process.env.AVAILABILITY_SIDECAR_URL
+  if (!baseUrl) return null
+
+  try {
+    const params = new URLSearchParams({ date, duration: String(serviceDuration) })
+    const response = await fetch(`${baseUrl.replace(/\/$/, "")}/slots?${params}`, {
+      cache: "no-store",
+      signal: AbortSignal.timeout(SIDECAR_TIMEOUT_MS),
+    })
+    if (!response.ok) return null
+    const body = (await response.json()) as SidecarSlots
+    return body.fresh && Array.isArray(body.slots) ? body.slots : null
+  } catch {
+    return null
+  }
+}
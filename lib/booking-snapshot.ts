@@ -0,0 +1,111 @@
+/**
+ * Static booking-page snapshots
+ * scripts/booking-snapshots.py writes one content-hashed JSON per salon plus index.json
+ * (format in scripts/salon_tools/booking_snapshots.py). When NEXT_PUBLIC_BOOKING_SNAPSHOT_URL
+ * is set, the booking wizard reads services, closures and slots of the default salon from the
+ * snapshot; it falls back to the server actions when the snapshot is missing, older than
+ * SNAPSHOT_MAX_AGE_MS or does not cover the requested date/duration.
+ */
+
+import type { SalonConfig, Service } from "@/types"
+
+const SNAPSHOT_MAX_AGE_MS = 10 * 60 * 1000
+
+export interface SnapshotService {
+  id: string
+  name: string
+  duration: number
+  price: number
+  description?: string
+  image: { src: string; thumb: string; card: string } | null
+}
+
+export interface BookingSnapshot {
+  v: number
+  from: string
+  days: number
+  salon: { id: string; name?: string; slug?: string; email?: string; phone?: string; address?: string; city?: string }
+  config: SalonConfig
+  categories: Array<{ name: string; services: SnapshotService[] }>
+  // duration -> one bit string per day ("1" = start time openingTime + i * timeStep is free)
+  slots: Record<string, string[]>
+  checkedAt?: string
+}
+
+interface SnapshotIndex {
+  v: number
+  checkedAt: string
+  default: string | null
+  salons: Record<string, { file: string }>
+}
+
+let snapshotPromise: Promise<BookingSnapshot | null> | null = null
+
+function isFresh(checkedAt: string | undefined): boolean {
+  return Boolean(checkedAt) && Date.now() - Date.parse(checkedAt as string) < SNAPSHOT_MAX_AGE_MS
+}
+
+async function fetchSnapshot(): Promise<BookingSnapshot | null> {
+  const baseUrl = process.env.NEXT_PUBLIC_BOOKING_SNAPSHOT_URL
+  if (!baseUrl) return null
+  try {
+    const base = baseUrl.replace(/\/$/, "")
+    const indexResponse = await fetch(`${base}/index.json`)
+    if (!indexResponse.ok) return null
+    const index = (await indexResponse.json()) as SnapshotIndex
+    const entry = index.default ? index.salons[index.default] : undefined
+    if (!entry || !isFresh(index.checkedAt)) return null
+
+    const response = await fetch(`${base}/${entry.file}`)
+    if (!response.ok) return null
+    const snapshot = (await response.json()) as BookingSnapshot
+    return { ...snapshot, checkedAt: index.checkedAt }
+  } catch {
+    return null
+  }
+}
+
+/**
+ * Snapshot of the default salon, fetched once per page load; null when not configured or stale
+ */
+export async function loadBookingSnapshot(): Promise<BookingSnapshot | null> {
+  if (!snapshotPromise) snapshotPromise = fetchSnapshot()
+  const snapshot = await snapshotPromise
+  return snapshot && isFresh(snapshot.checkedAt) ? snapshot : null
+}
+
+export function snapshotServices(snapshot: BookingSnapshot): Service[] {
+  return snapshot.categories.flatMap((category) =>
+    category.services.map((service) => ({
+      id: service.id,
+      name: service.name,
+      category: category.name,
+      description: service.description,
+      duration: service.duration,
+      price: service.price,
+      active: true,
+      imageUrl: service.image?.src,
+      salonId: snapshot.salon.id,
+    }))
+  )
+}
+
+/**
+ * Available start times for a date and duration, or null if the snapshot does not cover them
+ */
+export function snapshotSlots(snapshot: BookingSnapshot, date: string, duration: number): string[] | null {
+  const days = snapshot.slots[String(duration)]
+  const offset = Math.round((Date.parse(`${date}T00:00:00Z`) - Date.parse(`${snapshot.from}T00:00:00Z`)) / 86400000)
+  if (!days || !(offset >= 0 && offset < days.length)) return null
+
+  const [hours, minutes] = snapshot.config.openingTime.split(":").map(Number)
+  const opening = hours * 60 + minutes
+  const step = Number(snapshot.config.timeStep)
+  const slots: string[] = []
+  days[offset].split("").forEach((bit, i) => {
+    if (bit !== "1") return
+    const start = opening + i * step
+    slots.push(`${String(Math.floor(start / 60)).padStart(2, "0")}:${String(start % 60).padStart(2, "0")}`)
+  })
+  return slots
+}
@@ -0,0 +1,47 @@
+/**
+ * Numeric booking time fields
+ * Bookings keep the "YYYY-MM-DD" date and "HH:mm" start/end strings and, alongside them,
+ * startMin/endMin (minutes from midnight) and startAt (minutes since the Unix epoch of the
+ * salon wall-clock time, read as UTC so it does not depend on the server timezone).
+ * startMin/endMin make overlap checks plain integer comparisons and allow range queries
+ * within a day; startAt sorts bookings across days with a single field.
+ * Older documents are filled in by scripts/booking-time-fields.py; until then the
+ * helpers fall back to parsing the strings.
+ */
+
+import type { Booking } from "@/types"
+import { timeToMinutes } from "@/lib/slot-occupancy"
+
+export interface BookingTimeFields {
+  startMin: number
+  endMin: number
+  startAt: number
+}
+
+/**
+ * Minutes since the epoch of date + minutes from midnight (wall-clock time read as UTC)
+ */
+export function epochMinutes(date: string, minutes: number): number {
+  const [year, month, day] = date.split("-").map(Number)
+  return Date.UTC(year, month - 1, day) / 60000 + minutes
+}
+
+export function bookingTimeFields(date: string, startTime: string, endTime: string): BookingTimeFields {
+  const startMin = timeToMinutes(startTime)
+  return {
+    startMin,
+    endMin: timeToMinutes(endTime),
+    startAt: epochMinutes(date, startMin),
+  }
+}
+
+/**
+ * [start, end) in minutes from midnight: the numeric fields when present, otherwise parsed
+ */
+export function bookingMinutes(
+  booking: Pick<Booking, "startTime" | "endTime"> & Partial<Pick<Booking, "startMin" | "endMin">>
+): [number, number] {
+  const start = typeof booking.startMin === "number" ? booking.startMin : timeToMinutes(booking.startTime)
+  const end = typeof booking.endMin === "number" ? booking.endMin : timeToMinutes(booking.endTime)
+  return [start, end]
+}
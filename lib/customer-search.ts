@@ -0,0 +1,143 @@
+/**
+ * Customer search index helpers
+ * The customerSearch collection holds one document per gram ("p_ros" for word prefixes,
+ * "t_oss" for trigrams inside words) with the posting list {p: {customerId: fieldMask}}.
+ * It is built by scripts/customer-search.py; these helpers mirror
+ * scripts/salon_tools/customer_search.py so both sides tokenize and rank the same way.
+ */
+
+import { normalizeSortKey } from "@/lib/customer-sort-keys"
+
+export const CUSTOMER_SEARCH_COLLECTION = "customerSearch"
+
+// field -> [mask bit, score weight]
+export const SEARCH_FIELDS: Record<string, [number, number]> = {
+  lastName: [1, 5],
+  firstName: [2, 4],
+  email: [4, 3],
+  postalCode: [8, 2],
+  city: [16, 1],
+}
+
+const MIN_PREFIX = 2
+const MAX_PREFIX = 12
+const MAX_QUERY_WORDS = 5
+const MAX_QUERY_TRIGRAMS = 3
+
+export interface SearchGramDoc {
+  p?: Record<string, number>
+  n?: number
+  common?: boolean
+}
+
+export function searchWords(value: unknown): string[] {
+  if (value === undefined || value === null) return []
+  return normalizeSortKey(String(value))
+    .split(/[^a-z0-9]+/)
+    .filter(Boolean)
+}
+
+export function queryWords(text: string): string[] {
+  const words: string[] = []
+  for (const word of searchWords(text)) {
+    if (word.length >= MIN_PREFIX && !words.includes(word)) words.push(word)
+  }
+  return words.slice(0, MAX_QUERY_WORDS)
+}
+
+/**
+ * Prefix gram and inner trigrams to read for a query word
+ */
+export function wordGrams(word: string): { prefix: string; trigrams: string[] } {
+  let trigrams: string[] = []
+  for (let i = 0; i + 3 <= word.length; i++) trigrams.push(word.slice(i, i + 3))
+  if (trigrams.length > MAX_QUERY_TRIGRAMS) {
+    trigrams = [trigrams[0], trigrams[Math.floor(trigrams.length / 2)], trigrams[trigrams.length - 1]]
+  }
+  return {
+    prefix: "p_" + word.slice(0, MAX_PREFIX),
+    trigrams: [...new Set(trigrams)].map((t) => "t_" + t),
+  }
+}
+
+function bestWeight(mask: number): number {
+  let best = 0
+  for (const [bit, weight] of Object.values(SEARCH_FIELDS)) {
+    if (mask & bit && weight > best) best = weight
+  }
+  return best
+}
+
+/**
+ * Candidate customer ids ranked by the posting masks, or null when every word
+ * has a common (unselective) prefix
+ */
+export function rankCandidates(
+  terms: string[],
+  grams: Map<string, SearchGramDoc>,
+  limit: number
+): Array<[string, number]> | null {
+  let scores: Map<string, number> | null = null
+  for (const term of terms) {
+    const { prefix, trigrams } = wordGrams(term)
+    const prefixDoc = grams.get(prefix) || {}
+    if (prefixDoc.common) continue
+
+    const matches = new Map<string, number>()
+    for (const [id, mask] of Object.entries(prefixDoc.p || {})) matches.set(id, bestWeight(mask) * 1.5)
+    const trigramDocs = trigrams.map((gram) => grams.get(gram) || {}).filter((doc) => !doc.common)
+    if (trigramDocs.length > 0) {
+      let inner = new Map(Object.entries(trigramDocs[0].p || {}))
+      for (const doc of trigramDocs.slice(1)) {
+        const postings = doc.p || {}
+        const next = new Map<string, number>()
+        inner.forEach((mask, id) => {
+          if (id in postings) next.set(id, mask & postings[id])
+        })
+        inner = next
+      }
+      inner.forEach((mask, id) => {
+        const weight = bestWeight(mask) * 0.5 || 0.25
+        if (weight > (matches.get(id) || 0)) matches.set(id, weight)
+      })
+    }
+
+    if (scores === null) {
+      scores = matches
+    } else {
+      const next = new Map<string, number>()
+      scores.forEach((score, id) => {
+        const match = matches.get(id)
+        if (match !== undefined) next.set(id, score + match)
+      })
+      scores = next
+    }
+  }
+  if (scores === null) return null
+  return [...scores.entries()]
+    .sort((a, b) => b[1] - a[1] || (a[0] < b[0] ? 1 : -1))
+    .slice(0, limit)
+}
+
+/**
+ * Final score of a customer: for each word the best field where it appears as a
+ * whole word, a prefix or a substring; null if a word is missing
+ */
+export function matchScore(customer: Record<string, unknown>, terms: string[]): number | null {
+  const fields = Object.keys(SEARCH_FIELDS).map((field) => [field, searchWords(customer[field] || "")] as const)
+  let total = 0
+  for (const term of terms) {
+    let best = 0
+    for (const [field, words] of fields) {
+      const weight = SEARCH_FIELDS[field][1]
+      for (const word of words) {
+        if (word === term) best = Math.max(best, weight * 2)
+        else if (word.startsWith(term)) best = Math.max(best, weight * 1.5)
+        else if (word.includes(term)) best = Math.max(best, weight * 0.5)
+      }
+    }
+    if (!best) return null
+    total += best
+  }
+  return total
+}
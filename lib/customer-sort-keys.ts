@@ -0,0 +1,61 @@
+/**
+ * Customer sort keys and keyset cursors
+ * Customers are listed by createdAt (a Firestore Timestamp), lastNameLower and emailLower:
+ * normalized copies of lastName/email (no accents, lowercase) so that Firestore orders them
+ * the way the admin list expects. Older documents are filled in by
+ * scripts/migrations/0003_customer_sort_keys.py: until it has run, createdAt may still be an
+ * ISO string and lastNameLower/emailLower are missing (Firestore leaves those customers out).
+ * A page cursor is the sort value and the id of the last customer shown, encoded as
+ * base64url JSON (same format as scripts/salon_tools/customers.py).
+ */
+
+export type CustomerSort = "newest" | "lastName" | "email"
+
+export const CUSTOMER_SORTS: Record<CustomerSort, { field: string; direction: "asc" | "desc" }> = {
+  newest: { field: "createdAt", direction: "desc" },
+  lastName: { field: "lastNameLower", direction: "asc" },
+  email: { field: "emailLower", direction: "asc" },
+}
+
+// Migration that writes the sort keys (migrations/state.applied.{id})
+export const CUSTOMER_SORT_KEYS_MIGRATION = "0003"
+
+export interface CustomerCursor {
+  s: CustomerSort
+  // Timestamps as [seconds, nanoseconds], strings as they are (also createdAt before migration 0003)
+  v: string | [number, number]
+  id: string
+}
+
+/**
+ * Lowercase, trimmed, without combining accents ("Rossì " -> "rossi")
+ */
+export function normalizeSortKey(value: string | undefined | null): string {
+  return (value || "").normalize("NFD").replace(/[\u0300-\u036f]/g, "").toLowerCase().trim()
+}
+
+export function customerSortKeys(lastName: string, email: string): { lastNameLower: string; emailLower: string } {
+  return {
+    lastNameLower: normalizeSortKey(lastName),
+    emailLower: (email || "").trim().toLowerCase(),
+  }
+}
+
+export function encodeCustomerCursor(cursor: CustomerCursor): string {
+  return Buffer.from(JSON.stringify(cursor), "utf8").toString("base64url")
+}
+
+/**
+ * Decoded cursor, or null if it is malformed or belongs to another sort
+ */
+export function decodeCustomerCursor(token: string, sort: CustomerSort): CustomerCursor | null {
+  try {
+    const cursor = JSON.parse(Buffer.from(token, "base64url").toString("utf8"))
+    if (cursor?.s !== sort || typeof cursor.id !== "string") return null
+    const isTimestamp = Array.isArray(cursor.v) && cursor.v.length === 2 && cursor.v.every(Number.isInteger)
+    if (typeof cursor.v !== "string" && (sort !== "newest" || !isTimestamp)) return null
+    return cursor as CustomerCursor
+  } catch {
+    return null
+  }
+}
@@ -0,0 +1,188 @@
+/**
+ * Slot occupancy counters
+ * One document per date (slotOccupancy/default_{date}) holding the number of
+ * active (PENDING/CONFIRMED) bookings per time bucket, so capacity checks read a
+ * single document instead of scanning all bookings of the day.
+ * The app has a single capacity (settings/config), so createBooking, getAvailableSlots
+ * and the status transitions all use the default key, whatever the booking's salonId.
+ * Nothing maintains per-salon documents ({salonId}_{date}): scripts/slot-occupancy.py verify
+ * reports leftovers from earlier versions and deletes them with --repair.
+ * Kept in sync by createBooking and the booking status transitions; rebuilt and
+ * verified by scripts/slot-occupancy.py.
+ */
+
+import type { Firestore, Transaction } from "firebase-admin/firestore"
+import type { Booking, BookingStatus, SalonConfig, SlotOccupancy } from "@/types"
+
+export const SLOT_OCCUPANCY_COLLECTION = "slotOccupancy"
+export const DEFAULT_SALON_KEY = "default"
+
+const MINUTES_PER_DAY = 24 * 60
+
+/**
+ * timeStep/bufferTime used for the counters: settings/config, as in createBooking
+ */
+export async function getOccupancyConfig(adminDb: Firestore): Promise<Pick<SalonConfig, "timeStep" | "bufferTime">> {
+  const configSnap = await adminDb.collection("settings").doc("config").get()
+  const data = configSnap.exists ? (configSnap.data() as Partial<SalonConfig> | undefined) : undefined
+  return {
+    timeStep: Number(data?.timeStep ?? 15),
+    bufferTime: Number(data?.bufferTime ?? 10),
+  }
+}
+
+export function occupancyDocId(salonId: string | undefined, date: string): string {
+  return `${salonId || DEFAULT_SALON_KEY}_${date}`
+}
+
+export function timeToMinutes(time: string): number {
+  const [hours, minutes] = time.split(":").map(Number)
+  return hours * 60 + minutes
+}
+
+/**
+ * Bucket indexes [from, to) covering the minute range [startMin, endMin)
+ */
+export function bucketRange(startMin: number, endMin: number, bucketMinutes: number): [number, number] {
+  const from = Math.max(0, Math.floor(startMin / bucketMinutes))
+  const to = Math.min(Math.ceil(MINUTES_PER_DAY / bucketMinutes), Math.ceil(endMin / bucketMinutes))
+  return [from, to]
+}
+
+/**
+ * Add (delta = 1) or remove (delta = -1) a booking from the counters.
+ * The booking occupies [startTime, endTime + bufferTime), like in countConflicts.
+ */
+export function applyBookingToCounts(
+  counts: number[],
+  booking: Pick<Booking, "startTime" | "endTime">,
+  bucketMinutes: number,
+  bufferTime: number,
+  delta: number
+): void {
+  const [from, to] = bucketRange(
+    timeToMinutes(booking.startTime),
+    timeToMinutes(booking.endTime) + bufferTime,
+    bucketMinutes
+  )
+  for (let i = from; i < to; i++) {
+    counts[i] = Math.max(0, (counts[i] || 0) + delta)
+  }
+}
+
+export function buildCounts(
+  bookings: Array<Pick<Booking, "startTime" | "endTime" | "status">>,
+  bucketMinutes: number,
+  bufferTime: number
+): number[] {
+  const counts = new Array(Math.ceil(MINUTES_PER_DAY / bucketMinutes)).fill(0)
+  for (const booking of bookings) {
+    if (booking.status !== "PENDING" && booking.status !== "CONFIRMED") continue
+    if (!booking.startTime || !booking.endTime) continue
+    applyBookingToCounts(counts, booking, bucketMinutes, bufferTime, 1)
+  }
+  return counts
+}
+
+/**
+ * Highest occupancy over the minute range [startMin, endMin)
+ */
+export function maxOccupancy(occupancy: SlotOccupancy, startMin: number, endMin: number): number {
+  const [from, to] = bucketRange(startMin, endMin, occupancy.bucketMinutes)
+  let max = 0
+  for (let i = from; i < to; i++) {
+    max = Math.max(max, occupancy.counts[i] || 0)
+  }
+  return max
+}
+
+/**
+ * Read the occupancy document inside a transaction.
+ * If it is missing or was built with a different timeStep/bufferTime, it is rebuilt
+ * from the day's bookings (read in the same transaction) and returned as `rebuilt`.
+ */
+export async function readOccupancyInTransaction(
+  tx: Transaction,
+  adminDb: Firestore,
+  salonId: string | undefined,
+  date: string,
+  config: Pick<SalonConfig, "timeStep" | "bufferTime">
+): Promise<{ occupancy: SlotOccupancy; rebuilt: boolean }> {
+  const bucketMinutes = Number(config.timeStep) || 15
+  const bufferTime = Number(config.bufferTime) || 0
+  const ref = adminDb.collection(SLOT_OCCUPANCY_COLLECTION).doc(occupancyDocId(salonId, date))
+  const snap = await tx.get(ref)
+  const data = snap.exists ? (snap.data() as SlotOccupancy | undefined) : undefined
+
+  if (data && data.bucketMinutes === bucketMinutes && data.bufferTime === bufferTime && Array.isArray(data.counts)) {
+    return { occupancy: data, rebuilt: false }
+  }
+
+  let bookingsQuery = adminDb.collection("bookings").where("date", "==", date)
+  if (salonId && salonId !== DEFAULT_SALON_KEY) {
+    bookingsQuery = bookingsQuery.where("salonId", "==", salonId)
+  }
+  const bookingsSnapshot = await tx.get(bookingsQuery)
+  const bookings = bookingsSnapshot.docs.map((doc) => doc.data() as Booking)
+
+  return {
+    occupancy: {
+      salonId: salonId || DEFAULT_SALON_KEY,
+      date,
+      bucketMinutes,
+      bufferTime,
+      counts: buildCounts(bookings, bucketMinutes, bufferTime),
+      updatedAt: new Date().toISOString(),
+    },
+    rebuilt: true,
+  }
+}
+
+export function writeOccupancyInTransaction(tx: Transaction, adminDb: Firestore, occupancy: SlotOccupancy): void {
+  const ref = adminDb
+    .collection(SLOT_OCCUPANCY_COLLECTION)
+    .doc(occupancyDocId(occupancy.salonId, occupancy.date))
+  tx.set(ref, { ...occupancy, updatedAt: new Date().toISOString() })
+}
+
+/**
+ * Apply a booking status change to the counters in its own transaction.
+ * Use delta = -1 when a booking leaves PENDING/CONFIRMED, delta = 1 when it enters them.
+ * Always updates the default document read by createBooking and getAvailableSlots.
+ */
+export async function adjustSlotOccupancy(
+  adminDb: Firestore,
+  booking: Pick<Booking, "date" | "startTime" | "endTime">,
+  delta: number,
+  config: Pick<SalonConfig, "timeStep" | "bufferTime">
+): Promise<void> {
+  await adminDb.runTransaction(async (tx) => {
+    const { occupancy, rebuilt } = await readOccupancyInTransaction(tx, adminDb, undefined, booking.date, config)
+    // A rebuilt document already reflects the booking's committed status
+    if (!rebuilt) {
+      applyBookingToCounts(occupancy.counts, booking, occupancy.bucketMinutes, occupancy.bufferTime, delta)
+    }
+    writeOccupancyInTransaction(tx, adminDb, occupancy)
+  })
+}
+
+function isActiveStatus(status: BookingStatus | undefined): boolean {
+  return status === "PENDING" || status === "CONFIRMED"
+}
+
+/**
+ * Update the counters after a booking moved from `fromStatus` to `toStatus`
+ * (no-op when both statuses are active or both inactive)
+ */
+export async function syncSlotOccupancy(
+  adminDb: Firestore,
+  booking: Pick<Booking, "date" | "startTime" | "endTime">,
+  fromStatus: BookingStatus | undefined,
+  toStatus: BookingStatus
+): Promise<void> {
+  const delta = Number(isActiveStatus(toStatus)) - Number(isActiveStatus(fromStatus))
+  if (delta === 0 || !booking.date || !booking.startTime || !booking.endTime) return
+
+  const config = await getOccupancyConfig(adminDb)
+  await adjustSlotOccupancy(adminDb, booking, delta, config)
+}
@@ -19,82 +19,21 @@ NOTE IMPORTANTI:
   Questo script lo carica esplicitamente usando python-dotenv.
 """
 
-import os
 import sys
-from pathlib import Path
 
-print("Inizializzazione Firebase Admin SDK...")
-
-# 1) Carica .env.local (root progetto: una cartella sopra /scripts)
-try:
-    from dotenv import load_dotenv  # pip install python-dotenv
-    env_path = Path(__file__).resolve().parents[1] / ".env.local"
-    if env_path.exists():
-        load_dotenv(env_path)
-        print(f"✅ File .env.local caricato da: {env_path}")
-    else:
-        print(f"⚠️  File .env.local non trovato in: {env_path}")
-        print("   Verrà cercato anche nel percorso corrente...")
-        load_dotenv()  # Prova anche il percorso corrente
-except ImportError:
-    print("❌ Errore: python-dotenv non installato")
-    print("Installa con: pip install python-dotenv")
-    sys.exit(1)
+from salon_tools.firebase import get_db
 
-# 2) Importa Firebase Admin
-try:
-    import firebase_admin
-    from firebase_admin import credentials, firestore, auth
-except ImportError:
-    print("❌ Errore: firebase-admin non installato")
-    print("Installa con: pip install firebase-admin")
-    sys.exit(1)
+print("Inizializzazione Firebase Admin SDK...")
 
-# 3) Inizializza Firebase Admin (con credenziali da env)
 try:
-    project_id = os.getenv("FIREBASE_ADMIN_PROJECT_ID")
-    client_email = os.getenv("FIREBASE_ADMIN_CLIENT_EMAIL")
-    private_key_raw = os.getenv("FIREBASE_ADMIN_PRIVATE_KEY")
-
-    if not project_id or not client_email or not private_key_raw:
-        print("❌ Errore: Variabili d'ambiente Firebase Admin mancanti")
-        print("Assicurati di aver configurato nel file .env.local (root progetto):")
-        print("- FIREBASE_ADMIN_PROJECT_ID")
-        print("- FIREBASE_ADMIN_CLIENT_EMAIL")
-        print("- FIREBASE_ADMIN_PRIVATE_KEY")
-        print("\nSuggerimento: verifica che il file sia davvero `.env.local` (non `.env.local.txt`).")
-        sys.exit(1)
-
-    # Converti i newline letterali \\n in newline reali
-    private_key = private_key_raw.replace("\\n", "\n")
-
-    # Costruisci il dizionario completo delle credenziali con tutti i campi richiesti
-    cred_dict = {
-        "type": "service_account",
-        "project_id": project_id,
-        "private_key_id": os.getenv("FIREBASE_ADMIN_PRIVATE_KEY_ID", ""),  # Opzionale
-        "private_key": private_key,
-        "client_email": client_email,
-        "client_id": os.getenv("FIREBASE_ADMIN_CLIENT_ID", ""),  # Opzionale
-        "auth_uri": "https://accounts.google.com/o/oauth2/auth",
-        "token_uri": "https://oauth2.googleapis.com/token",
-        "auth_provider_x509_cert_url": "https://www.googleapis.com/oauth2/v1/certs",
-        "client_x509_cert_url": f"https://www.googleapis.com/robot/v1/metadata/x509/{client_email.replace('@', '%40')}",
-    }
-
-    # Inizializza solo una volta
-    if not firebase_admin._apps:
-        cred = credentials.Certificate(cred_dict)
-        firebase_admin.initialize_app(cred)
-
-    db = firestore.client()
+    db = get_db()
+    from firebase_admin import auth, firestore
     print("✅ Connesso a Firestore")
-
 except Exception as e:
     print(f"❌ Errore di connessione: {e}")
     sys.exit(1)
 
-# 4) Richiedi input
+# 1) Richiedi input
 print("\n👤 Aggiunta utente esistente come admin")
 print("=" * 50)
 
@@ -103,7 +42,7 @@ if not email:
     print("❌ Email obbligatoria")
     sys.exit(1)
 
-# 5) Cerca utente e aggiorna/crea doc admins/{uid}
+# 2) Cerca utente e aggiorna/crea doc admins/{uid}
 try:
     print(f"\n🔍 Ricerca utente con email {email}...")
     user = auth.get_user_by_email(email)
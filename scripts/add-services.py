@@ -2,75 +2,20 @@
 Script per aggiungere servizi tipici di un salone di bellezza
 Esegui con: python scripts/add-services.py
 """
-import os
 import sys
-from pathlib import Path
 from datetime import datetime
 
-print("Inizializzazione Firebase Admin SDK...")
-
-# Carica .env.local se esiste
-try:
-    from dotenv import load_dotenv
-    env_path = Path(__file__).resolve().parents[1] / ".env.local"
-    if env_path.exists():
-        load_dotenv(env_path)
-        print(f"[OK] File .env.local caricato da: {env_path}")
-except ImportError:
-    pass
+from salon_tools.firebase import get_db
 
-# Importa Firebase Admin
-try:
-    import firebase_admin
-    from firebase_admin import credentials, firestore
-except ImportError:
-    print("[ERR] Errore: firebase-admin non installato")
-    print("Installa con: pip install firebase-admin")
-    exit(1)
+print("Inizializzazione Firebase Admin SDK...")
 
-# Inizializza Firebase Admin
 try:
-    project_id = os.getenv('FIREBASE_ADMIN_PROJECT_ID')
-    client_email = os.getenv('FIREBASE_ADMIN_CLIENT_EMAIL')
-    private_key_raw = os.getenv('FIREBASE_ADMIN_PRIVATE_KEY', '')
-    
-    if not all([project_id, client_email, private_key_raw]):
-        print("[ERR] Errore: Variabili d'ambiente Firebase Admin mancanti")
-        print("Assicurati di aver configurato:")
-        print("- FIREBASE_ADMIN_PROJECT_ID")
-        print("- FIREBASE_ADMIN_CLIENT_EMAIL")
-        print("- FIREBASE_ADMIN_PRIVATE_KEY")
-        exit(1)
-    
-    private_key = private_key_raw.replace("\\n", "\n")
-    
-    cred_dict = {
-        "type": "service_account",
-        "project_id": project_id,
-        "private_key_id": os.getenv('FIREBASE_ADMIN_PRIVATE_KEY_ID', ''),
-        "private_key": private_key,
-        "client_email": client_email,
-        "client_id": os.getenv('FIREBASE_ADMIN_CLIENT_ID', ''),
-        "auth_uri": "https://accounts.google.com/o/oauth2/auth",
-        "token_uri": "https://oauth2.googleapis.com/token",
-        "auth_provider_x509_cert_url": "https://www.googleapis.com/oauth2/v1/certs",
-        "client_x509_cert_url": f"https://www.googleapis.com/robot/v1/metadata/x509/{client_email.replace('@', '%40')}",
-    }
-    
-    cred = credentials.Certificate(cred_dict)
-    
-    # Inizializza solo se non è già inizializzato
-    try:
-        firebase_admin.get_app()
-    except ValueError:
-        firebase_admin.initialize_app(cred)
-    
-    db = firestore.client()
+    db = get_db()
+    from firebase_admin import firestore
     print("[OK] Connesso a Firestore")
-    
 except Exception as e:
     print(f"[ERR] Errore di connessione: {e}")
-    exit(1)
+    sys.exit(1)
 
 # Lista completa di servizi per salone di bellezza
 services = [
@@ -0,0 +1,319 @@
+"""
+Analisi dei log di `lib/logger.ts`: percentili di latenza, error rate e throughput.
+
+Legge file di log (anche di diversi GB) in memory-map, li divide in blocchi
+allineati alle righe ed elabora i blocchi in parallelo su più processi. Ogni
+blocco produce statistiche combinabili (istogrammi stile HDR, vedi
+`salon_tools/latency.py`), unite alla fine: stesso risultato di un'unica passata.
+
+Le righe sono raggruppate per azione: il messaggio di log viene ricondotto alla
+funzione che lo emette (es. "Available slots fetched" e "Error fetching available
+slots" -> getAvailableSlots) leggendo i sorgenti di app/ e lib/. La latenza è il
+campo `duration` del contesto JSON (righe INFO/ERROR).
+
+Uso:
+    python scripts/analyze-logs.py logs/app.log logs/app.log.1.gz --workers 8
+    python scripts/analyze-logs.py logs/*.log --window 300 --json report.json --csv windows.csv
+    python scripts/analyze-logs.py logs/app.log --state-out app.state.json
+    python scripts/analyze-logs.py --merge-state server1.state.json server2.state.json
+    python scripts/analyze-logs.py logs/app.log --follow --interval 10
+    pnpm start 2>&1 | python scripts/analyze-logs.py - --follow
+
+Requisiti: nessuno (solo libreria standard)
+"""
+import argparse
+import csv
+import gzip
+import json
+import mmap
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+
+from salon_tools.firebase import PROJECT_ROOT
+from salon_tools.logs import LogAggregator, load_action_map
+
+CHUNK_BYTES = 64 * 1024 * 1024
+
+
+# ==================== LETTURA ====================
+
+def split_file(path, workers):
+    """Blocchi (inizio, fine) in byte; i file compressi non sono divisibili."""
+    if path.endswith(".gz"):
+        return [(0, None)]
+    size = os.path.getsize(path)
+    if not size:
+        return []
+    parts = max(workers * 4, -(-size // CHUNK_BYTES))
+    step = -(-size // parts)
+    return [(start, min(size, start + step)) for start in range(0, size, step)]
+
+
+def analyze_range(path, start, end, window, action_map):
+    """
+    Elabora le righe che iniziano in [start, end): una riga a cavallo del confine
+    appartiene al blocco in cui comincia.
+    """
+    agg = LogAggregator(window, action_map)
+    if end is None:
+        with gzip.open(path, "rb") as f:
+            for line in f:
+                agg.feed(line)
+        return agg
+
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        if start > 0:
+            mm.seek(start - 1)
+            if mm.read_byte() != ord("\n"):
+                mm.readline()
+        readline = mm.readline
+        feed = agg.feed
+        while mm.tell() < end:
+            line = readline()
+            if not line:
+                break
+            feed(line)
+    return agg
+
+
+def analyze_files(paths, window, action_map, workers):
+    tasks = [(path, start, end) for path in paths for start, end in split_file(path, workers)]
+    total = LogAggregator(window, action_map)
+    if workers <= 1 or len(tasks) <= 1:
+        for path, start, end in tasks:
+            total.merge(analyze_range(path, start, end, window, action_map))
+        return total
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(analyze_range, path, start, end, window, action_map) for path, start, end in tasks]
+        for future in futures:
+            total.merge(future.result())
+    return total
+
+
+# ==================== FOLLOW ====================
+
+def follow_lines(path, from_start, poll=0.5):
+    """Genera le nuove righe di un file in crescita, gestendo rotazione e troncamento; None se non ci sono novità."""
+    handle = None
+    inode = None
+    partial = b""
+    while True:
+        if handle is None:
+            try:
+                handle = open(path, "rb")
+            except FileNotFoundError:
+                yield None
+                time.sleep(poll)
+                continue
+            inode = os.fstat(handle.fileno()).st_ino
+            if not from_start:
+                handle.seek(0, os.SEEK_END)
+            from_start = True  # dopo una rotazione il nuovo file va letto dall'inizio
+
+        chunk = handle.readline()
+        if chunk:
+            if chunk.endswith(b"\n"):
+                yield partial + chunk
+                partial = b""
+            else:
+                partial += chunk
+            continue
+
+        try:
+            stat = os.stat(path)
+            rotated = stat.st_ino != inode or stat.st_size < handle.tell()
+        except FileNotFoundError:
+            rotated = True
+        if rotated:
+            handle.close()
+            handle = None
+            partial = b""
+            continue
+        yield None
+        time.sleep(poll)
+
+
+def stdin_lines():
+    for line in sys.stdin.buffer:
+        yield line
+
+
+def run_follow(args, action_map):
+    agg = LogAggregator(args.window, action_map)
+    lines = stdin_lines() if args.files == ["-"] else follow_lines(args.files[0], args.from_start)
+    next_report = time.monotonic() + args.interval
+    try:
+        for line in lines:
+            if line is not None:
+                agg.feed(line)
+            if time.monotonic() >= next_report:
+                next_report = time.monotonic() + args.interval
+                now = time.time()
+                agg.drop_windows_before(now - args.keep_windows * args.window)
+                print_live(agg, now)
+    except KeyboardInterrupt:
+        pass
+    # Report complessivo all'uscita (Ctrl+C o fine dello stdin)
+    print_report(agg, args.top)
+
+
+# ==================== REPORT ====================
+
+def key_report(stats, span):
+    hist = stats.hist
+    row = {
+        "count": stats.count,
+        "errors": stats.errors,
+        "warnings": stats.warnings,
+        "errorRate": round(stats.errors / stats.count, 4) if stats.count else 0,
+        "throughputPerSec": round(stats.count / span, 3) if span else None,
+    }
+    if hist.count:
+        row["latencyMs"] = hist.summary(percentiles=(50, 95, 99))
+    return row
+
+
+def build_report(agg):
+    first = min((s.first for s in agg.totals.values() if s.first is not None), default=None)
+    last = max((s.last for s in agg.totals.values() if s.last is not None), default=None)
+    span = max(1.0, last - first) if first is not None else None
+    return {
+        "generatedAt": datetime.now(timezone.utc).isoformat(),
+        "lines": agg.lines,
+        "parsed": agg.lines - agg.skipped,
+        "from": datetime.fromtimestamp(first, timezone.utc).isoformat() if first is not None else None,
+        "to": datetime.fromtimestamp(last, timezone.utc).isoformat() if last is not None else None,
+        "windowSeconds": agg.window,
+        "keys": {
+            key: key_report(stats, span)
+            for key, stats in sorted(agg.totals.items(), key=lambda item: -item[1].count)
+        },
+    }
+
+
+def format_row(key, row):
+    lat = row.get("latencyMs") or {}
+
+    def ms(name):
+        return f"{lat[name]:>9.1f}" if name in lat else f"{'-':>9}"
+
+    return (f"{key[:40]:<40} {row['count']:>9} {row['errorRate']:>7.2%} "
+            f"{(row['throughputPerSec'] or 0):>9.3f} {ms('p50')} {ms('p95')} {ms('p99')}")
+
+
+HEADER = f"{'azione / messaggio':<40} {'righe':>9} {'err%':>7} {'righe/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}"
+
+
+def print_report(agg, top):
+    report = build_report(agg)
+    print(f"\nRighe: {report['lines']} (riconosciute {report['parsed']}), periodo {report['from']} -> {report['to']}")
+    print("=" * len(HEADER))
+    print(HEADER)
+    for key, row in list(report["keys"].items())[:top]:
+        print(format_row(key, row))
+    return report
+
+
+def print_live(agg, now):
+    """Ultima finestra completa, per chiave."""
+    current = int(now // agg.window) * agg.window
+    previous = current - agg.window
+    rows = {key: stats for (start, key), stats in agg.windows.items() if start == previous}
+    stamp = datetime.fromtimestamp(previous, timezone.utc).strftime("%H:%M:%S")
+    print(f"\n[{stamp} +{agg.window}s] {sum(s.count for s in rows.values())} righe")
+    if rows:
+        print(HEADER)
+        for key, stats in sorted(rows.items(), key=lambda item: -item[1].count):
+            print(format_row(key, key_report(stats, agg.window)))
+    sys.stdout.flush()
+
+
+def write_windows_csv(path, agg):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["window_start", "key", "count", "errors", "warnings", "per_sec", "p50_ms", "p95_ms", "p99_ms"])
+        for (start, key), stats in sorted(agg.windows.items()):
+            summary = stats.hist.summary()
+            writer.writerow([
+                datetime.fromtimestamp(start, timezone.utc).isoformat(),
+                key,
+                stats.count,
+                stats.errors,
+                stats.warnings,
+                round(stats.count / agg.window, 3),
+                summary.get("p50", ""),
+                summary.get("p95", ""),
+                summary.get("p99", ""),
+            ])
+
+
+# ==================== MAIN ====================
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Latenze, errori e throughput dai log di lib/logger.ts")
+    parser.add_argument("files", nargs="*", help="File di log (.log o .gz); '-' = stdin")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Processi paralleli")
+    parser.add_argument("--window", type=int, default=60, help="Ampiezza delle finestre temporali in secondi")
+    parser.add_argument("--group-by", choices=("action", "message"), default="action",
+                        help="Raggruppa per funzione che emette il log oppure per messaggio")
+    parser.add_argument("--top", type=int, default=30, help="Righe mostrate nel report")
+    parser.add_argument("--json", help="Report JSON")
+    parser.add_argument("--csv", help="CSV per finestra temporale e chiave")
+    parser.add_argument("--state-out", help="Salva le statistiche combinabili (per --merge-state)")
+    parser.add_argument("--merge-state", nargs="+", metavar="STATE", help="Unisce file prodotti con --state-out")
+    parser.add_argument("--follow", action="store_true", help="Segue il file (o stdin) e stampa un report periodico")
+    parser.add_argument("--interval", type=float, default=10, help="Secondi tra due report in --follow")
+    parser.add_argument("--from-start", action="store_true", help="In --follow legge anche il contenuto esistente")
+    parser.add_argument("--keep-windows", type=int, default=60, help="Finestre mantenute in memoria in --follow")
+    args = parser.parse_args(argv)
+    if not args.files and not args.merge_state:
+        parser.error("indicare almeno un file di log oppure --merge-state")
+    if args.follow and len(args.files) != 1:
+        parser.error("--follow accetta un solo file (o '-')")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    action_map = load_action_map(PROJECT_ROOT) if args.group_by == "action" else {}
+
+    if args.follow:
+        run_follow(args, action_map)
+        return
+
+    started = time.perf_counter()
+    if args.merge_state:
+        agg = None
+        for path in args.merge_state:
+            with open(path, encoding="utf-8") as f:
+                part = LogAggregator.from_dict(json.load(f))
+            agg = part if agg is None else agg.merge(part)
+    else:
+        files = [path for path in args.files if path != "-"]
+        agg = analyze_files(files, args.window, action_map, args.workers)
+        if "-" in args.files:
+            for line in stdin_lines():
+                agg.feed(line)
+
+    elapsed = time.perf_counter() - started
+    report = print_report(agg, args.top)
+    print(f"\nElaborazione: {elapsed:.2f}s ({agg.lines / elapsed if elapsed else 0:,.0f} righe/s)")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"[OK] Report JSON: {args.json}")
+    if args.csv:
+        write_windows_csv(args.csv, agg)
+        print(f"[OK] CSV finestre: {args.csv}")
+    if args.state_out:
+        with open(args.state_out, "w", encoding="utf-8") as f:
+            json.dump(agg.to_dict(), f)
+        print(f"[OK] Stato combinabile: {args.state_out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,418 @@
+"""
+Sidecar della disponibilità: modello in memoria aggiornato da `on_snapshot`.
+
+Ogni richiesta di slot della pagina di prenotazione (`getAvailableSlots`)
+legge il salone, `settings/config` e i contatori o le prenotazioni del giorno.
+Questo processo tiene configurazione e prenotazioni dei prossimi `--days`
+giorni in memoria (vedi `salon_tools/live_availability.py`), aggiornate dai
+listener Firestore, e risponde in locale:
+
+- GET /slots?date=YYYY-MM-DD&duration=60      orari disponibili
+- GET /capacity?date=...&duration=60[&start=HH:mm]   risorse libere per orario
+- GET /metrics                                 finestra, listener (lag, età degli snapshot), latenza
+- GET /healthz                                 200 se tutti i listener sono consistenti, altrimenti 503
+
+Le date fuori dalla finestra rispondono 404 e, finché i listener non sono
+consistenti, `fresh` è false: in entrambi i casi `getAvailableSlots` ripiega
+sulla lettura da Firestore. L'app usa il sidecar se è impostata
+`AVAILABILITY_SIDECAR_URL` (es. http://127.0.0.1:8787).
+
+Comandi:
+- serve:    avvia listener e server HTTP (--port) e/o su socket Unix (--socket)
+- selftest: esegue il sidecar su un Firestore in memoria (`fake_firestore`)
+            che emette snapshot, applica scritture casuali e confronta ogni
+            risposta con `rules.available_slots` sui dati completi; misura la
+            latenza delle risposte in memoria e via HTTP
+
+Uso:
+    python scripts/availability-sidecar.py serve --days 14 --port 8787
+    python scripts/availability-sidecar.py serve --socket /tmp/availability.sock
+    curl --unix-socket /tmp/availability.sock "http://x/slots?date=2025-03-10&duration=60"
+    python scripts/availability-sidecar.py selftest --bookings 3000 --writes 2000
+
+Requisiti:
+- pip install firebase-admin python-dotenv
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import socket
+import socketserver
+import statistics
+import sys
+import threading
+import time
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+
+from salon_tools.fake_firestore import FakeFirestore
+from salon_tools.live_availability import LiveAvailability, OutOfWindow
+from salon_tools.rules import DEFAULT_CONFIG, available_slots, from_minutes, merge_config
+
+MAX_DURATION = 24 * 60
+
+
+# ==================== SERVER ====================
+
+def make_handler(live):
+    model = live.model
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            url = urlsplit(self.path)
+            params = {key: values[0] for key, values in parse_qs(url.query).items()}
+            try:
+                if url.path == "/slots":
+                    date_str, duration = self.day_params(params)
+                    body = {"date": date_str, "duration": duration, "slots": model.slots(date_str, duration)}
+                elif url.path == "/capacity":
+                    date_str, duration = self.day_params(params)
+                    body = {"date": date_str, "duration": duration,
+                            **model.capacity(date_str, duration, params.get("start"))}
+                elif url.path == "/metrics":
+                    return self.reply(200, model.stats())
+                elif url.path == "/healthz":
+                    fresh = model.fresh()
+                    return self.reply(200 if fresh else 503, {"fresh": fresh})
+                else:
+                    return self.reply(404, {"error": "not found"})
+            except OutOfWindow as exc:
+                return self.reply(404, {"error": str(exc), "fresh": model.fresh()})
+            except ValueError as exc:
+                return self.reply(400, {"error": str(exc)})
+            body["fresh"] = model.fresh()
+            self.reply(200, body)
+
+        @staticmethod
+        def day_params(params):
+            date_str = params.get("date") or ""
+            date.fromisoformat(date_str)
+            duration = int(params.get("duration") or 0)
+            if not 0 < duration <= MAX_DURATION:
+                raise ValueError(f"durata non valida: {duration}")
+            return date_str, duration
+
+        def reply(self, status, body):
+            payload = json.dumps(body, separators=(",", ":")).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.send_header("Cache-Control", "no-store")
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def get_request(self):
+        request, _ = super().get_request()
+        # BaseHTTPRequestHandler si aspetta un indirizzo (host, porta)
+        return request, ("unix", 0)
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path, timeout=5):
+        super().__init__("localhost", timeout=timeout)
+        self.path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.path)
+
+
+def start_servers(live, host=None, port=None, socket_path=None):
+    """Avvia i server richiesti in thread separati; restituisce [(server, descrizione)]."""
+    handler = make_handler(live)
+    servers = []
+    if port is not None:
+        # Intestazioni e corpo sono scritti separatamente: senza Nagle niente attesa dell'ACK ritardato
+        tcp_handler = type("TcpHandler", (handler,), {"disable_nagle_algorithm": True})
+        server = ThreadingHTTPServer((host, port), tcp_handler)
+        server.daemon_threads = True
+        servers.append((server, f"http://{host}:{server.server_address[1]}"))
+    if socket_path:
+        path = Path(socket_path)
+        if path.exists():
+            path.unlink()
+        server = UnixHTTPServer(str(path), handler)
+        os.chmod(path, 0o600)
+        servers.append((server, f"unix:{path}"))
+    for server, _ in servers:
+        threading.Thread(target=server.serve_forever, name="availability-http", daemon=True).start()
+    return servers
+
+
+def wait_fresh(live, timeout):
+    deadline = time.monotonic() + timeout
+    while not live.model.fresh():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.05)
+    return True
+
+
+def status_line(stats):
+    bookings = stats["listeners"]["bookings"]
+    lag = bookings["lag"]
+    queries = stats["queries"]
+    return (f"fresh={stats['fresh']} prenotazioni={stats['bookings']} snapshot={bookings['snapshots']} "
+            f"lag p50={lag.get('p50', '-')}ms p99={lag.get('p99', '-')}ms "
+            f"età={bookings['ageS']}s query={queries['count']} p99={queries.get('p99', '-')}ms")
+
+
+def run_serve(args):
+    from salon_tools.firebase import get_db
+
+    if args.port is None and not args.socket:
+        args.port = 8787
+    live = LiveAvailability(get_db(), days=args.days, salon_id=args.salon).start()
+    first, last = live.model.window()
+    print(f"Listener aperti: prenotazioni dal {first} al {last}")
+    if wait_fresh(live, args.startup_timeout):
+        print(f"[OK] Snapshot iniziali ricevuti: {live.model.stats()['bookings']} prenotazioni attive")
+    else:
+        print(f"[WARN] Snapshot iniziali non ricevuti in {args.startup_timeout:.0f}s: le risposte hanno fresh=false")
+    servers = start_servers(live, args.host, args.port, args.socket)
+    for _, description in servers:
+        print(f"[OK] In ascolto su {description}")
+    try:
+        while True:
+            time.sleep(args.report or 3600)
+            if args.report:
+                print(status_line(live.model.stats()), flush=True)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        live.stop()
+        for server, _ in servers:
+            server.shutdown()
+            server.server_close()
+        if args.socket:
+            Path(args.socket).unlink(missing_ok=True)
+
+
+# ==================== SELFTEST ====================
+
+DURATIONS = (30, 45, 60, 90)
+
+
+def random_booking(rng, first_day, days):
+    day = first_day + timedelta(days=rng.randrange(-2, days + 2))
+    start = rng.randrange(8 * 60, 19 * 60, 15)
+    duration = rng.choice(DURATIONS)
+    data = {
+        "date": day.isoformat(),
+        "startTime": from_minutes(start),
+        "endTime": from_minutes(start + duration),
+        "status": rng.choices(("PENDING", "CONFIRMED", "CANCELLED", "REJECTED"), (3, 5, 1, 1))[0],
+        "serviceId": f"s{duration}",
+    }
+    if rng.random() < 0.5:
+        data["startMin"], data["endMin"] = start, start + duration
+    return data
+
+
+def random_config(rng, first_day, days):
+    closed = [(first_day + timedelta(days=rng.randrange(days))).isoformat() for _ in range(rng.randrange(3))]
+    return {
+        "openingTime": rng.choice(("08:00", "09:00", "09:30")),
+        "closingTime": rng.choice(("18:00", "19:00", "20:00")),
+        "timeStep": rng.choice((10, 15, 30)),
+        "resources": rng.randrange(1, 5),
+        "bufferTime": rng.choice((0, 5, 10)),
+        "closedDaysOfWeek": rng.sample(range(7), rng.randrange(2)),
+        "closedDates": closed,
+    }
+
+
+def expected_config(fake):
+    salons = fake.collections.get("salons", {})
+    first = salons[min(salons)] if salons else None
+    config = (first or {}).get("config") or fake.collections.get("settings", {}).get("config")
+    return merge_config(config or None)
+
+
+def verify(fake, live):
+    """Confronta tutte le date e durate con `rules.available_slots`; restituisce le differenze."""
+    fake.flush()
+    config = expected_config(fake)
+    by_date = {}
+    for data in fake.collections.get("bookings", {}).values():
+        by_date.setdefault(data["date"], []).append(data)
+    first, _ = live.model.window()
+    mismatches = []
+    for offset in range(live.model.days):
+        day = (date.fromisoformat(first) + timedelta(days=offset)).isoformat()
+        for duration in DURATIONS:
+            expected = available_slots(day, duration, config, by_date.get(day, []))
+            actual = live.model.slots(day, duration)
+            if expected != actual:
+                mismatches.append((day, duration, len(expected), len(actual)))
+    return mismatches
+
+
+def mutate(fake, rng, ids, first_day, days):
+    roll = rng.random()
+    if roll < 0.35 or not ids:
+        doc_id = f"b{len(ids):06d}"
+        ids.append(doc_id)
+        fake.set("bookings", doc_id, random_booking(rng, first_day, days))
+    elif roll < 0.6:
+        doc_id = rng.choice(ids)
+        moved = random_booking(rng, first_day, days)
+        fake.set("bookings", doc_id, moved)
+    elif roll < 0.8:
+        doc_id = rng.choice(ids)
+        if doc_id in fake.collections["bookings"]:
+            fake.update("bookings", doc_id, {"status": rng.choice(("CONFIRMED", "CANCELLED", "REJECTED"))})
+    elif roll < 0.97:
+        fake.delete("bookings", rng.choice(ids))
+    elif roll < 0.985:
+        fake.set("salons", "salon-a", {"name": "Salone", "config": random_config(rng, first_day, days)})
+    else:
+        fake.set("settings", "config", random_config(rng, first_day, days))
+
+
+def http_latency(live, requests, days):
+    """Latenze (ms) di GET /slots via TCP e socket Unix, con connessione persistente."""
+    socket_path = f"/tmp/availability-selftest-{os.getpid()}.sock"
+    servers = start_servers(live, "127.0.0.1", 0, socket_path)
+    first = date.fromisoformat(live.model.window()[0])
+    results = {}
+    try:
+        for server, description in servers:
+            if description.startswith("unix:"):
+                conn = UnixHTTPConnection(socket_path)
+            else:
+                conn = http.client.HTTPConnection("127.0.0.1", server.server_address[1], timeout=5)
+            samples = []
+            for i in range(requests):
+                day = (first + timedelta(days=i % days)).isoformat()
+                started = time.perf_counter()
+                conn.request("GET", f"/slots?date={day}&duration={DURATIONS[i % len(DURATIONS)]}")
+                response = conn.getresponse()
+                body = json.loads(response.read())
+                samples.append((time.perf_counter() - started) * 1000)
+                if response.status != 200 or not body["fresh"]:
+                    raise RuntimeError(f"risposta inattesa: {response.status} {body}")
+            conn.close()
+            results[description.split(":")[0]] = samples
+    finally:
+        for server, _ in servers:
+            server.shutdown()
+            server.server_close()
+        Path(socket_path).unlink(missing_ok=True)
+    return results
+
+
+def run_selftest(args):
+    rng = random.Random(args.seed)
+    today = [date.today()]
+    fake = FakeFirestore(delay=args.delay)
+    fake.set("settings", "config", dict(DEFAULT_CONFIG))
+    fake.set("salons", "salon-a", {"name": "Salone", "config": random_config(rng, today[0], args.days)})
+    ids = []
+    for _ in range(args.bookings):
+        doc_id = f"b{len(ids):06d}"
+        ids.append(doc_id)
+        fake.set("bookings", doc_id, random_booking(rng, today[0], args.days))
+
+    started = time.perf_counter()
+    live = LiveAvailability(fake, days=args.days, today=lambda: today[0]).start(maintenance_interval=0)
+    if not wait_fresh(live, 10):
+        print("[ERR] Snapshot iniziali non ricevuti dal fake")
+        sys.exit(1)
+    print(f"Modello caricato: {live.model.stats()['bookings']} prenotazioni attive in "
+          f"{(time.perf_counter() - started) * 1000:.0f} ms")
+
+    failures = verify(fake, live)
+    for i in range(args.writes):
+        mutate(fake, rng, ids, today[0], args.days)
+        if (i + 1) % args.verify_every == 0:
+            failures += verify(fake, live)
+    failures += verify(fake, live)
+    print(f"{args.writes} scritture casuali, verifiche ogni {args.verify_every}: {len(failures)} differenze")
+
+    # Cambio di giorno: la finestra si sposta e viene ricaricata dal nuovo listener
+    today[0] += timedelta(days=1)
+    live.check()
+    wait_fresh(live, 10)
+    rolled = verify(fake, live)
+    failures += rolled
+    print(f"Finestra spostata al {live.model.window()[0]}: {len(rolled)} differenze")
+
+    # Latenza in memoria: metà richieste su slot già in cache
+    for i in range(args.queries):
+        if i % 2 == 0:
+            mutate(fake, rng, ids, today[0], args.days)
+        day = (today[0] + timedelta(days=rng.randrange(args.days))).isoformat()
+        live.model.slots(day, rng.choice(DURATIONS))
+    fake.flush()
+    stats = live.model.stats()
+    queries = stats["queries"]
+    print(f"Risposte in memoria: {queries['count']} p50={queries['p50'] * 1000:.0f}µs "
+          f"p99={queries['p99'] * 1000:.0f}µs max={queries['max'] * 1000:.0f}µs")
+    lag = stats["listeners"]["bookings"]["lag"]
+    print(f"Lag degli snapshot (fake, delay {args.delay * 1000:.0f} ms): p50={lag['p50']}ms p99={lag['p99']}ms")
+
+    for transport, samples in http_latency(live, args.http_requests, args.days).items():
+        samples.sort()
+        print(f"HTTP via {transport}: p50={statistics.median(samples) * 1000:.0f}µs "
+              f"p99={samples[int(len(samples) * 0.99) - 1] * 1000:.0f}µs")
+
+    live.stop()
+    if failures:
+        for day, duration, expected, actual in failures[:10]:
+            print(f"   [ERR] {day} durata {duration}: attesi {expected} slot, modello {actual}")
+        sys.exit(1)
+    print("\n[OK] Il modello coincide con rules.available_slots dopo ogni verifica")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Sidecar della disponibilità basato su on_snapshot")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    serve = sub.add_parser("serve", help="Avvia listener e API locale")
+    serve.add_argument("--days", type=int, default=14, help="Giorni tenuti in memoria da oggi")
+    serve.add_argument("--salon", help="Id del salone (default: il primo, come getAvailableSlots)")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, help="Porta HTTP (default 8787 se non c'è --socket)")
+    serve.add_argument("--socket", help="Percorso del socket Unix")
+    serve.add_argument("--startup-timeout", type=float, default=30.0)
+    serve.add_argument("--report", type=float, default=0, help="Secondi tra le righe di stato (0 = nessuna)")
+
+    test = sub.add_parser("selftest", help="Verifica il modello su un Firestore in memoria")
+    test.add_argument("--days", type=int, default=14)
+    test.add_argument("--bookings", type=int, default=2000)
+    test.add_argument("--writes", type=int, default=2000)
+    test.add_argument("--verify-every", type=int, default=100)
+    test.add_argument("--queries", type=int, default=20000)
+    test.add_argument("--http-requests", type=int, default=2000)
+    test.add_argument("--delay", type=float, default=0.0, help="Ritardo di consegna degli snapshot (s)")
+    test.add_argument("--seed", type=int, default=0)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.command == "serve":
+        run_serve(args)
+    else:
+        run_selftest(args)
+
+
+if __name__ == "__main__":
+    main()
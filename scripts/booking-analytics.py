@@ -0,0 +1,237 @@
+"""
+Analisi dello storico prenotazioni: utilizzo, ricavi, funnel degli stati e anticipo.
+
+Complementare a `getTodayStats` (una sola data): carica le prenotazioni di un
+intervallo arbitrario in colonne NumPy/pandas e calcola tutte le metriche in
+modo vettoriale (vedi `salon_tools/analytics.py`), così anche più anni di
+storico si elaborano in pochi secondi.
+
+Output:
+- riepilogo a terminale
+- --out DIR: summary.json più CSV (heatmap, ricavi per servizio/mese, stati per mese)
+- --write-firestore: documento compatto `analytics/bookings_{salone}_{from}_{to}`
+
+Uso:
+    python scripts/booking-analytics.py --from 2024-01-01 --to 2025-12-31 --out analytics/
+    python scripts/booking-analytics.py --from 2025-01-01 --to 2025-03-31 --salon <salonId> --write-firestore
+    python scripts/booking-analytics.py --synthetic 1000000 --from 2022-01-01 --to 2025-12-31
+
+Requisiti:
+- pip install firebase-admin python-dotenv numpy pandas
+"""
+import argparse
+import json
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+from salon_tools.analytics import (
+    BOOKING_FIELDS,
+    bookings_frame,
+    lead_time_stats,
+    prepare,
+    revenue_breakdown,
+    status_funnel,
+    synthetic_bookings,
+    utilization_heatmap,
+)
+from salon_tools.rules import merge_config
+
+ANALYTICS_COLLECTION = "analytics"
+
+SYNTHETIC_SERVICES = {
+    "taglio": {"name": "Taglio", "category": "Capelli", "duration": 30, "price": 25},
+    "piega": {"name": "Piega", "category": "Capelli", "duration": 45, "price": 30},
+    "colore": {"name": "Colore", "category": "Capelli", "duration": 90, "price": 60},
+    "manicure": {"name": "Manicure", "category": "Unghie", "duration": 45, "price": 25},
+    "pulizia-viso": {"name": "Pulizia viso", "category": "Estetica", "duration": 60, "price": 50},
+    "ceretta": {"name": "Ceretta gambe", "category": "Depilazione", "duration": 30, "price": 20},
+}
+
+
+def load_services(db):
+    services = {}
+    for doc in db.collection("services").stream():
+        data = doc.to_dict() or {}
+        services[doc.id] = {
+            "name": data.get("name"),
+            "category": data.get("category") or "Altro",
+            "duration": data.get("duration"),
+            "price": data.get("price"),
+        }
+    return services
+
+
+def load_bookings(db, start_date, end_date, salon_id=None):
+    """Solo i campi necessari (projection), convertiti in colonne durante lo streaming."""
+    from salon_tools.queries import bookings_query
+
+    query = bookings_query(db, start_date, end_date, salon_id).select(list(BOOKING_FIELDS))
+    return bookings_frame(doc.to_dict() or {} for doc in query.stream())
+
+
+# ==================== REPORT ====================
+
+def compute(df, config, services, start_date, end_date, tz):
+    timings = {}
+
+    def timed(name, fn, *args):
+        started = time.perf_counter()
+        result = fn(*args)
+        timings[name] = round(time.perf_counter() - started, 3)
+        return result
+
+    prepared = timed("prepare", prepare, df, tz)
+    slots, utilization, occupied = timed("heatmap", utilization_heatmap, prepared, config, start_date, end_date)
+    revenue = timed("revenue", revenue_breakdown, prepared, services)
+    funnel = timed("funnel", status_funnel, prepared)
+    lead = timed("leadTime", lead_time_stats, prepared)
+    return {
+        "rows": int(len(prepared)),
+        "discarded": int(len(df) - len(prepared)),
+        "slots": slots,
+        "utilization": utilization,
+        "occupiedMinutes": occupied,
+        "revenue": revenue,
+        "funnel": funnel,
+        "leadTime": lead,
+        "timings": timings,
+    }
+
+
+def summary_doc(result, config, start_date, end_date, salon_id, top_services=50):
+    """
+    Documento compatto per Firestore: niente array annidati (non supportati),
+    la heatmap è una mappa giorno della settimana -> utilizzo per slot.
+    """
+    revenue = result["revenue"]
+    return {
+        "salonId": salon_id or "default",
+        "from": start_date,
+        "to": end_date,
+        "bookings": result["rows"],
+        "config": {k: config[k] for k in ("openingTime", "closingTime", "timeStep", "resources", "bufferTime")},
+        "slots": result["slots"],
+        "utilization": {
+            str(weekday): [round(float(v), 4) for v in row] for weekday, row in enumerate(result["utilization"])
+        },
+        "revenue": {
+            "total": round(revenue["total"], 2),
+            "bookings": revenue["bookings"],
+            "byCategory": {
+                row.category: {"bookings": int(row.bookings), "revenue": round(float(row.revenue), 2)}
+                for row in revenue["byCategory"].itertuples()
+            },
+            "topServices": [
+                {
+                    "serviceId": row.serviceId,
+                    "serviceName": row.serviceName,
+                    "bookings": int(row.bookings),
+                    "revenue": round(float(row.revenue), 2),
+                }
+                for row in revenue["byService"].head(top_services).itertuples()
+            ],
+        },
+        "funnel": {k: v for k, v in result["funnel"].items() if k != "byMonth"},
+        "leadTime": result["leadTime"],
+        "generatedAt": datetime.now(timezone.utc).isoformat(),
+    }
+
+
+def write_files(out_dir, result, doc):
+    out = Path(out_dir)
+    out.mkdir(parents=True, exist_ok=True)
+    (out / "summary.json").write_text(json.dumps(doc, indent=2, ensure_ascii=False), encoding="utf-8")
+
+    import pandas as pd
+
+    weekdays = ["Dom", "Lun", "Mar", "Mer", "Gio", "Ven", "Sab"]
+    pd.DataFrame(result["utilization"], index=weekdays, columns=result["slots"]).round(4).to_csv(out / "heatmap.csv")
+    result["revenue"]["byService"].to_csv(out / "revenue_by_service.csv", index=False)
+    result["revenue"]["byMonth"].round(2).to_csv(out / "revenue_by_month.csv")
+    result["funnel"]["byMonth"].to_csv(out / "status_by_month.csv")
+    return out
+
+
+def print_report(result, doc):
+    print(f"\nPrenotazioni analizzate: {result['rows']} (scartate {result['discarded']} senza data/orari validi)")
+
+    print("\nUtilizzo medio per giorno della settimana:")
+    weekdays = ["Dom", "Lun", "Mar", "Mer", "Gio", "Ven", "Sab"]
+    for weekday, row in enumerate(result["utilization"]):
+        if row.any():
+            peak = int(row.argmax())
+            print(f"  {weekdays[weekday]}: media {row.mean():6.1%}, picco {row[peak]:6.1%} alle {result['slots'][peak]}")
+
+    revenue = doc["revenue"]
+    print(f"\nRicavi (CONFIRMED): {revenue['total']:.2f} EUR su {revenue['bookings']} prenotazioni")
+    for category, values in revenue["byCategory"].items():
+        print(f"  {category:<12} {values['revenue']:>12.2f} EUR  ({values['bookings']})")
+
+    funnel = doc["funnel"]
+    print(f"\nStati ({funnel['total']} richieste, conferma {funnel['confirmationRate']:.1%} delle decise):")
+    for status, count in funnel["counts"].items():
+        print(f"  {status:<22} {count:>8}  {funnel['shares'][status]:6.1%}")
+
+    lead = doc["leadTime"]["all"]
+    if lead["count"]:
+        p = lead["percentilesHours"]
+        print(f"\nAnticipo: media {lead['meanHours']}h, p50 {p['p50']}h, p90 {p['p90']}h, p99 {p['p99']}h")
+        print("  " + "  ".join(f"{label}: {n}" for label, n in lead["histogram"].items()))
+
+    print(f"\nTempi di calcolo (s): {result['timings']}")
+
+
+# ==================== MAIN ====================
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Analisi vettoriali dello storico prenotazioni")
+    parser.add_argument("--from", dest="start", required=True, help="Data iniziale YYYY-MM-DD")
+    parser.add_argument("--to", dest="end", required=True, help="Data finale YYYY-MM-DD")
+    parser.add_argument("--salon", help="Solo le prenotazioni di questo salonId (e la sua configurazione)")
+    parser.add_argument("--tz", default="Europe/Rome", help="Fuso orario del salone per l'anticipo (createdAt è UTC)")
+    parser.add_argument("--out", help="Cartella per summary.json e i CSV")
+    parser.add_argument("--write-firestore", action="store_true",
+                        help=f"Salva il riepilogo in {ANALYTICS_COLLECTION}/bookings_{{salone}}_{{from}}_{{to}}")
+    parser.add_argument("--synthetic", type=int, metavar="N",
+                        help="Usa N prenotazioni casuali invece di Firestore (misura dei tempi)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    started = time.perf_counter()
+
+    if args.synthetic:
+        db = None
+        config = merge_config()
+        services = SYNTHETIC_SERVICES
+        df = synthetic_bookings(args.synthetic, args.start, args.end, config, services)
+        print(f"Generate {len(df)} prenotazioni sintetiche in {time.perf_counter() - started:.1f}s")
+    else:
+        from salon_tools.firebase import get_db
+        from salon_tools.queries import load_salon_config
+
+        db = get_db()
+        config = load_salon_config(db, args.salon)
+        services = load_services(db)
+        df = load_bookings(db, args.start, args.end, args.salon)
+        print(f"Caricate {len(df)} prenotazioni {args.start} -> {args.end} in {time.perf_counter() - started:.1f}s")
+
+    result = compute(df, config, services, args.start, args.end, args.tz)
+    doc = summary_doc(result, config, args.start, args.end, args.salon)
+    print_report(result, doc)
+
+    if args.out:
+        out = write_files(args.out, result, doc)
+        print(f"\n[OK] File scritti in {out}")
+    if args.write_firestore and db is not None:
+        doc_id = f"bookings_{args.salon or 'default'}_{args.start}_{args.end}"
+        db.collection(ANALYTICS_COLLECTION).document(doc_id).set(doc)
+        print(f"[OK] Riepilogo salvato in {ANALYTICS_COLLECTION}/{doc_id}")
+
+    print(f"\nTempo totale: {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Serie di prenotazioni ricorrenti per un cliente abituale.
+
+Crea le prenotazioni di uno stesso servizio e orario ogni N settimane per M
+occorrenze. Le prenotazioni di tutte le date coinvolte sono lette con una sola
+query e le occorrenze controllate insieme con le regole di `getAvailableSlots`
+(`resources`, `bufferTime`, orari e giorni di chiusura). Le occorrenze accettate,
+i contatori `slotOccupancy` e il documento `bookingSeries/{id}` sono scritti in
+un'unica transaction; per quelle rifiutate vengono proposti gli orari liberi più
+vicini dello stesso giorno. Vedi `salon_tools/series.py`.
+
+Uso:
+    python scripts/booking-series.py --customer <id> --service <id> --start 2025-03-04 --time 10:00 \\
+        --every 1 --count 12 --dry-run
+    python scripts/booking-series.py --customer <id> --service <id> --start 2025-03-04 --time 10:00 \\
+        --every 2 --count 6 --status CONFIRMED --all-or-nothing
+
+Requisiti:
+- pip install firebase-admin python-dotenv numpy
+"""
+import argparse
+import json
+import sys
+
+from salon_tools.firebase import get_db
+from salon_tools.series import MAX_OCCURRENCES, SeriesConflictError, create_series
+
+REASONS = {
+    "past": "data passata",
+    "closed": "salone chiuso",
+    "outside-hours": "fuori dagli orari di apertura",
+    "off-grid": "orario non allineato alla griglia",
+    "full": "capacità esaurita",
+}
+
+
+def print_report(args, outcome):
+    occurrences = outcome["occurrences"]
+    accepted = sum(1 for r in occurrences if r["ok"])
+    print(f"Serie {args.start} {args.time}, ogni {args.every} settimane, {len(occurrences)} occorrenze\n")
+    for r in occurrences:
+        if r["ok"]:
+            print(f"  [OK]  {r['date']} {r['startTime']}-{r['endTime']} ({r['conflicts']} prenotazioni sovrapposte)")
+            continue
+        hint = f" -> proposte: {', '.join(r['suggestions'])}" if r["suggestions"] else ""
+        print(f"  [NO]  {r['date']} {r['startTime']}-{r['endTime']}: {REASONS[r['reason']]}{hint}")
+
+    print()
+    if outcome["written"]:
+        print(f"[OK] Serie {outcome['seriesId']}: {len(outcome['bookingIds'])} prenotazioni create")
+    elif args.dry_run:
+        print(f"[DRY-RUN] {accepted}/{len(occurrences)} occorrenze disponibili, nessuna scrittura")
+    elif accepted and args.all_or_nothing:
+        print(f"[ERR] {len(occurrences) - accepted} occorrenze non disponibili: nessuna prenotazione creata "
+              "(--all-or-nothing)")
+    else:
+        print("[ERR] Nessuna occorrenza disponibile")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Crea una serie di prenotazioni ricorrenti")
+    parser.add_argument("--customer", required=True, help="ID del cliente (customers/{id})")
+    parser.add_argument("--service", required=True, help="ID del servizio")
+    parser.add_argument("--start", required=True, help="Data della prima occorrenza YYYY-MM-DD")
+    parser.add_argument("--time", required=True, help="Orario di inizio HH:mm")
+    parser.add_argument("--every", type=int, default=1, help="Intervallo in settimane")
+    parser.add_argument("--count", type=int, required=True, help=f"Numero di occorrenze (max {MAX_OCCURRENCES})")
+    parser.add_argument("--status", choices=("PENDING", "CONFIRMED"), default="PENDING",
+                        help="Status delle prenotazioni create")
+    parser.add_argument("--suggestions", type=int, default=3, help="Orari alternativi proposti per conflitto")
+    parser.add_argument("--all-or-nothing", action="store_true",
+                        help="Non crea nulla se anche una sola occorrenza non è disponibile")
+    parser.add_argument("--dry-run", action="store_true", help="Solo controllo, nessuna scrittura")
+    parser.add_argument("--json", action="store_true", help="Esito in JSON")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    db = get_db()
+    try:
+        outcome = create_series(
+            db, args.customer, args.service, args.start, args.time, args.every, args.count,
+            status=args.status, suggestions=args.suggestions,
+            all_or_nothing=args.all_or_nothing, dry_run=args.dry_run,
+        )
+    except SeriesConflictError as exc:
+        print(f"[ERR] {exc}: nessuna prenotazione creata, riprovare")
+        sys.exit(1)
+    except ValueError as exc:
+        print(f"[ERR] {exc}")
+        sys.exit(1)
+
+    if args.json:
+        print(json.dumps(outcome, indent=2, ensure_ascii=False))
+    else:
+        print_report(args, outcome)
+    if not outcome["written"] and not args.dry_run:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
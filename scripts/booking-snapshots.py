@@ -0,0 +1,257 @@
+"""
+Generatore degli snapshot statici della pagina di prenotazione.
+
+Per ogni salone scrive un JSON con hash del contenuto nel nome (salone,
+configurazione, servizi attivi per categoria con varianti dell'immagine, orari
+disponibili dei prossimi 14 giorni: vedi `salon_tools/booking_snapshots.py`) e
+aggiorna `index.json`. Con `NEXT_PUBLIC_BOOKING_SNAPSHOT_URL` impostata, `/book`
+legge servizi, giorni di chiusura e orari dallo snapshot invece di chiamare le
+server actions, finché `checkedAt` è più recente di 10 minuti.
+
+Rigenera solo i saloni i cui dati sono cambiati dall'ultima esecuzione:
+
+- nuovo giorno (la finestra si sposta) o --full: tutti
+- salone, configurazione o servizi diversi (hash in `index.json`)
+- prenotazioni create o modificate dopo il watermark (`createdAt`/`updatedAt`,
+  con --overlap secondi di sovrapposizione) con data nella finestra
+
+Le prenotazioni eliminate non vengono rilevate fino al giorno successivo o a --full.
+Gli snapshot con lo stesso contenuto non vengono riscritti; dei file precedenti
+di ogni salone resta l'ultimo, per i client che hanno appena letto l'indice.
+
+Destinazioni:
+- --out DIR:            directory servita da CDN/hosting statico; servire
+                        `*.json` con hash come `Cache-Control: public, max-age=31536000, immutable`
+                        e `index.json` con `max-age=60`
+- --bucket NOME:        bucket Cloud Storage (firebase-admin), con gli header di cache impostati
+                        (--prefix per la cartella)
+
+Uso:
+    python scripts/booking-snapshots.py --out public/booking-snapshots
+    python scripts/booking-snapshots.py --bucket my-app.appspot.com --prefix booking-snapshots --interval 120
+    python scripts/booking-snapshots.py --out /var/www/snapshots --full
+
+Requisiti:
+- pip install firebase-admin python-dotenv
+"""
+import argparse
+import gzip
+import json
+import re
+import time
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+
+from salon_tools.booking_snapshots import (
+    MANIFEST_NAME,
+    SNAPSHOT_DAYS,
+    SNAPSHOT_VERSION,
+    build_snapshot,
+    canonical_json,
+    content_hash,
+    effective_config,
+    salon_services,
+    snapshot_file_name,
+    static_inputs,
+    window_dates,
+)
+from salon_tools.booking_time import js_iso
+from salon_tools.firebase import get_db
+from salon_tools.queries import iter_bookings
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+SHORT = "public, max-age=60"
+
+
+# ==================== DESTINAZIONI ====================
+
+class DirectoryTarget:
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+
+    def read(self, name):
+        path = self.path / name
+        return path.read_bytes() if path.exists() else None
+
+    def write(self, name, data, cache_control):
+        # Scrittura atomica: chi serve la directory non vede mai file a metà
+        tmp = self.path / f".{name}.tmp"
+        tmp.write_bytes(data)
+        tmp.replace(self.path / name)
+
+    def delete(self, name):
+        (self.path / name).unlink(missing_ok=True)
+
+    def describe(self):
+        return str(self.path)
+
+
+class BucketTarget:
+    def __init__(self, bucket_name, prefix=""):
+        from firebase_admin import storage
+
+        get_db()  # inizializza l'app Firebase
+        self.bucket = storage.bucket(bucket_name)
+        self.prefix = prefix.strip("/") + "/" if prefix.strip("/") else ""
+
+    def read(self, name):
+        blob = self.bucket.blob(self.prefix + name)
+        return blob.download_as_bytes() if blob.exists() else None
+
+    def write(self, name, data, cache_control):
+        blob = self.bucket.blob(self.prefix + name)
+        blob.cache_control = cache_control
+        blob.upload_from_string(data, content_type="application/json")
+
+    def delete(self, name):
+        blob = self.bucket.blob(self.prefix + name)
+        if blob.exists():
+            blob.delete()
+
+    def describe(self):
+        return f"gs://{self.bucket.name}/{self.prefix}"
+
+
+# ==================== GENERAZIONE ====================
+
+def file_slug(salon_id, data):
+    slug = re.sub(r"[^a-z0-9-]+", "-", str(data.get("slug") or salon_id).lower()).strip("-")
+    return slug or salon_id
+
+
+def changed_salons(db, since, salons, window_start, window_end):
+    """Id dei saloni con prenotazioni create o modificate da `since` nella finestra."""
+    changed = set()
+    for field in ("createdAt", "updatedAt"):
+        for doc in db.collection("bookings").where(field, ">=", since).stream():
+            data = doc.to_dict() or {}
+            if not window_start <= (data.get("date") or "") <= window_end:
+                continue
+            salon_id = data.get("salonId")
+            # Prenotazioni senza salonId valgono per tutti i saloni
+            changed |= {salon_id} if salon_id in salons else set(salons)
+    return changed
+
+
+def generate_once(db, target, args):
+    today = date.today()
+    dates = window_dates(today, args.days)
+    run_started = datetime.now(timezone.utc)
+    raw = target.read(MANIFEST_NAME)
+    manifest = json.loads(raw) if raw else {}
+    entries = manifest.get("salons") or {}
+
+    salons = {doc.id: doc.to_dict() or {} for doc in db.collection("salons").stream()}
+    settings = db.collection("settings").document("config").get()
+    settings_config = settings.to_dict() if settings.exists else None
+    services = [(doc.id, doc.to_dict() or {}) for doc in db.collection("services").stream()]
+
+    static_hashes = {
+        salon_id: content_hash(static_inputs(
+            salon_id, data, effective_config(data, settings_config), salon_services(services, salon_id)))
+        for salon_id, data in salons.items()
+    }
+    by_id = {entry["id"]: entry for entry in entries.values()}
+    full = args.full or manifest.get("v") != SNAPSHOT_VERSION or manifest.get("from") != dates[0] \
+        or manifest.get("days") != args.days or not manifest.get("watermark")
+    if full:
+        reasons = {salon_id: "completa" for salon_id in salons}
+    else:
+        reasons = {salon_id: "salone/servizi" for salon_id in salons
+                   if by_id.get(salon_id, {}).get("staticHash") != static_hashes[salon_id]}
+        since = js_iso(datetime.fromisoformat(manifest["watermark"]) - timedelta(seconds=args.overlap))
+        for salon_id in changed_salons(db, since, salons, dates[0], dates[-1]):
+            reasons.setdefault(salon_id, "prenotazioni")
+
+    bookings = list(iter_bookings(db, dates[0], dates[-1])) if reasons else []
+    results = []
+    new_entries = {}
+    obsolete = []
+    for salon_id, data in sorted(salons.items()):
+        slug = file_slug(salon_id, data)
+        entry = by_id.get(salon_id)
+        if salon_id not in reasons and entry:
+            new_entries[slug] = entry
+            continue
+        snapshot = build_snapshot(salon_id, data, settings_config, services, bookings, today, args.days)
+        digest = content_hash(snapshot)
+        name = snapshot_file_name(slug, digest)
+        payload = canonical_json(snapshot).encode("utf-8")
+        written = not entry or entry.get("file") != name
+        if written:
+            target.write(name, payload, IMMUTABLE)
+            if entry:
+                obsolete += entry.get("previous") or []
+        new_entries[slug] = {
+            "id": salon_id,
+            "file": name,
+            "hash": digest,
+            "staticHash": static_hashes[salon_id],
+            "generatedAt": js_iso(run_started) if written else entry.get("generatedAt"),
+            "previous": ([entry["file"]] if written and entry else (entry or {}).get("previous") or []),
+            "bytes": len(payload),
+        }
+        results.append((slug, reasons[salon_id], written, len(payload), len(gzip.compress(payload))))
+    # Saloni eliminati: resta solo il file, rimosso alla prossima esecuzione
+    for slug, entry in entries.items():
+        if entry["id"] not in salons:
+            obsolete += [entry["file"], *(entry.get("previous") or [])]
+
+    manifest = {
+        "v": SNAPSHOT_VERSION,
+        "from": dates[0],
+        "days": args.days,
+        "checkedAt": js_iso(datetime.now(timezone.utc)),
+        "watermark": js_iso(run_started),
+        "default": next((slug for slug, entry in new_entries.items() if entry["id"] == min(salons)), None)
+        if salons else None,
+        "salons": new_entries,
+    }
+    target.write(MANIFEST_NAME, json.dumps(manifest, ensure_ascii=False, indent=2).encode("utf-8"), SHORT)
+    for name in obsolete:
+        target.delete(name)
+    return results, len(bookings)
+
+
+def run(args):
+    db = get_db()
+    target = BucketTarget(args.bucket, args.prefix) if args.bucket else DirectoryTarget(args.out)
+    print(f"Snapshot della pagina di prenotazione -> {target.describe()}")
+    while True:
+        started = time.perf_counter()
+        results, bookings = generate_once(db, target, args)
+        elapsed = time.perf_counter() - started
+        stamp = datetime.now().strftime("%H:%M:%S")
+        if not results:
+            print(f"[OK] {stamp} nessun salone da rigenerare ({elapsed:.1f}s)", flush=True)
+        else:
+            print(f"[OK] {stamp} {len(results)} saloni rigenerati su {bookings} prenotazioni lette "
+                  f"in {elapsed:.1f}s", flush=True)
+            for slug, reason, written, size, gz in results:
+                state = "scritto" if written else "invariato"
+                print(f"   {slug:<24} {reason:<15} {state:<10} {size / 1024:6.1f} KB ({gz / 1024:.1f} KB gzip)")
+        if not args.interval:
+            return
+        time.sleep(args.interval)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Snapshot statici della pagina di prenotazione per salone")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--out", help="Directory di destinazione")
+    target.add_argument("--bucket", help="Bucket Cloud Storage di destinazione")
+    parser.add_argument("--prefix", default="booking-snapshots", help="Cartella nel bucket")
+    parser.add_argument("--days", type=int, default=SNAPSHOT_DAYS, help="Giorni di disponibilità da oggi")
+    parser.add_argument("--full", action="store_true", help="Rigenera tutti i saloni")
+    parser.add_argument("--overlap", type=int, default=120, help="Secondi riletti prima del watermark")
+    parser.add_argument("--interval", type=float, default=0, help="Ripeti ogni N secondi (0 = una volta)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    run(parse_args(argv))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,349 @@
+"""
+Campi orario numerici delle prenotazioni (`startMin`, `endMin`, `startAt`).
+
+Le server actions scrivono i campi numerici sulle nuove prenotazioni e li usano
+per i controlli di sovrapposizione (vedi `lib/booking-time.ts`); questo script
+li porta sulle prenotazioni esistenti e ne controlla la coerenza con le stringhe.
+
+- backfill:  scrive i campi mancanti o incoerenti, per blocchi di date elaborati
+             in parallelo. Un file di stato registra i blocchi completati:
+             con --resume si riparte da quelli mancanti
+- verify:    confronta i campi numerici con date/startTime/endTime e riporta le
+             differenze (exit code 1 se ce ne sono)
+- benchmark: conteggio dei conflitti slot × prenotazioni su minuti interi rispetto
+             al parsing delle stringhe, su dati sintetici (nessun accesso a Firestore)
+
+Senza --from/--to l'intervallo va dalla prima all'ultima data presente in `bookings`.
+
+Uso:
+    python scripts/booking-time-fields.py backfill --dry-run
+    python scripts/booking-time-fields.py backfill --workers 8 --chunk-days 30
+    python scripts/booking-time-fields.py backfill --resume
+    python scripts/booking-time-fields.py verify --from 2025-01-01 --to 2025-12-31
+    python scripts/booking-time-fields.py benchmark --days 200
+
+Requisiti:
+- pip install firebase-admin python-dotenv numpy
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from salon_tools.booking_time import field_mismatches, time_fields
+from salon_tools.rules import DEFAULT_CONFIG, from_minutes, to_minutes
+from salon_tools.queries import commit_in_batches, iter_bookings, split_date_range
+
+DEFAULT_STATE_FILE = ".booking-time-fields.json"
+
+
+# ==================== INTERVALLO E STATO ====================
+
+def detect_range(db):
+    """Prima e ultima data presenti in `bookings` (indice a campo singolo su date)."""
+    first = list(db.collection("bookings").order_by("date").limit(1).stream())
+    last = list(db.collection("bookings").order_by("date", direction="DESCENDING").limit(1).stream())
+    if not first or not last:
+        return None, None
+    return first[0].get("date"), last[0].get("date")
+
+
+def load_state(path):
+    if path.exists():
+        return json.loads(path.read_text(encoding="utf-8"))
+    return None
+
+
+def save_state(path, state):
+    """Scrittura atomica (file temporaneo + rename)."""
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(state, indent=2), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def resolve_range(db, args):
+    start, end = args.start, args.end
+    if not start or not end:
+        first, last = detect_range(db)
+        if not first:
+            print("[OK] Nessuna prenotazione con campo date")
+            sys.exit(0)
+        start, end = start or first, end or last
+    return start, end
+
+
+# ==================== BACKFILL ====================
+
+def scan_chunk(db, start_date, end_date, write):
+    """Controlla un blocco di date; con `write` aggiorna i documenti incoerenti."""
+    stats = Counter()
+    operations = []
+    ref = db.collection("bookings").document
+    for doc_id, data in iter_bookings(db, start_date, end_date):
+        stats["scanned"] += 1
+        expected = time_fields(data)
+        if expected is None:
+            stats["incomplete"] += 1
+            continue
+        mismatches = field_mismatches(data)
+        if not mismatches:
+            stats["ok"] += 1
+            continue
+        stats["missing" if all(data.get(f) is None for f in mismatches) else "wrong"] += 1
+        operations.append(("update", ref(doc_id), expected))
+    if write:
+        stats["written"] = commit_in_batches(db, operations)
+    return (start_date, end_date), stats
+
+
+def run_backfill(args):
+    from salon_tools.firebase import get_db
+
+    db = get_db()
+    state_path = Path(args.state_file)
+    state = load_state(state_path) if args.resume else None
+    if args.resume and not state:
+        print(f"[ERR] Nessuno stato da riprendere in {state_path}")
+        sys.exit(1)
+
+    if state:
+        start, end, chunk_days = state["from"], state["to"], state["chunkDays"]
+        print(f"Ripresa di {start} -> {end}: {len(state['done'])} blocchi già completati")
+    else:
+        start, end = resolve_range(db, args)
+        chunk_days = args.chunk_days
+        state = {"from": start, "to": end, "chunkDays": chunk_days, "done": [], "totals": {},
+                 "startedAt": datetime.now(timezone.utc).isoformat()}
+
+    done = {tuple(chunk) for chunk in state["done"]}
+    chunks = [c for c in split_date_range(start, end, chunk_days) if c not in done]
+    mode = " [DRY-RUN]" if args.dry_run else ""
+    print(f"Backfill {start} -> {end}: {len(chunks)} blocchi da {chunk_days} giorni, {args.workers} worker{mode}")
+
+    totals = Counter(state["totals"])
+    started = time.perf_counter()
+    scanned = 0
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        futures = [pool.submit(scan_chunk, db, s, e, not args.dry_run) for s, e in chunks]
+        for future in as_completed(futures):
+            (chunk_start, chunk_end), stats = future.result()
+            totals.update(stats)
+            scanned += stats["scanned"]
+            rate = scanned / (time.perf_counter() - started)
+            print(f"  [OK] {chunk_start} -> {chunk_end}: {stats['scanned']} lette, "
+                  f"{stats['missing']} senza campi, {stats['wrong']} incoerenti, "
+                  f"{stats['written']} scritte ({rate:.0f} doc/s)", flush=True)
+            if not args.dry_run:
+                state["done"].append([chunk_start, chunk_end])
+                state["totals"] = dict(totals)
+                state["updatedAt"] = datetime.now(timezone.utc).isoformat()
+                save_state(state_path, state)
+
+    if not args.dry_run:
+        state["completedAt"] = datetime.now(timezone.utc).isoformat()
+        save_state(state_path, state)
+    elapsed = time.perf_counter() - started
+    print(f"\n[OK] {totals['scanned']} prenotazioni: {totals['ok']} già coerenti, {totals['missing']} senza campi, "
+          f"{totals['wrong']} incoerenti, {totals['incomplete']} senza data/orari, "
+          f"{totals['written']} aggiornate in {elapsed:.1f}s")
+    if args.dry_run:
+        print("Nessuna scrittura (dry-run)")
+
+
+# ==================== VERIFY ====================
+
+def verify_chunk(db, start_date, end_date, limit):
+    fields = Counter()
+    samples = []
+    scanned = 0
+    for doc_id, data in iter_bookings(db, start_date, end_date):
+        scanned += 1
+        mismatches = field_mismatches(data)
+        fields.update(mismatches)
+        if mismatches and len(samples) < limit:
+            samples.append((doc_id, data.get("date"), data.get("startTime"), data.get("endTime"), mismatches))
+    return scanned, fields, samples
+
+
+def run_verify(args):
+    from salon_tools.firebase import get_db
+
+    db = get_db()
+    start, end = resolve_range(db, args)
+    chunks = list(split_date_range(start, end, args.chunk_days))
+    print(f"Verifica {start} -> {end}: {len(chunks)} blocchi, {args.workers} worker")
+
+    scanned = 0
+    fields = Counter()
+    samples = []
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        for chunk_scanned, chunk_fields, chunk_samples in pool.map(
+            lambda chunk: verify_chunk(db, *chunk, args.samples), chunks
+        ):
+            scanned += chunk_scanned
+            fields.update(chunk_fields)
+            samples.extend(chunk_samples)
+
+    if not fields:
+        print(f"[OK] {scanned} prenotazioni: campi numerici coerenti con date/startTime/endTime")
+        return
+    print(f"[ERR] {scanned} prenotazioni, differenze per campo: {dict(fields)}")
+    for doc_id, day, start_time, end_time, mismatches in samples[:args.samples]:
+        detail = ", ".join(f"{f}={saved!r} (atteso {expected})" for f, (saved, expected) in mismatches.items())
+        print(f"  {doc_id} {day} {start_time}-{end_time}: {detail}")
+    sys.exit(1)
+
+
+# ==================== BENCHMARK ====================
+
+def synthetic_days(days, per_day, seed):
+    """Prenotazioni sintetiche per giorno, nell'orario di apertura predefinito."""
+    rng = random.Random(seed)
+    opening = to_minutes(DEFAULT_CONFIG["openingTime"])
+    closing = to_minutes(DEFAULT_CONFIG["closingTime"])
+    result = []
+    for _ in range(days):
+        bookings = []
+        for _ in range(per_day):
+            duration = rng.choice((30, 45, 60, 90))
+            start = rng.randrange(opening, closing - duration + 1, 15)
+            bookings.append({"startTime": from_minutes(start), "endTime": from_minutes(start + duration),
+                             "startMin": start, "endMin": start + duration})
+        result.append(bookings)
+    return result
+
+
+def slot_grid(duration):
+    opening = to_minutes(DEFAULT_CONFIG["openingTime"])
+    closing = to_minutes(DEFAULT_CONFIG["closingTime"])
+    step = DEFAULT_CONFIG["timeStep"]
+    return [(from_minutes(s), from_minutes(s + duration)) for s in range(opening, closing - duration + 1, step)]
+
+
+def bench_strptime(days, slots, buffer_time):
+    """Come `countConflicts` prima dei campi numerici: parsing di ogni orario a ogni confronto."""
+    parse = datetime.strptime
+    buffer = timedelta(minutes=buffer_time)
+    total = 0
+    for bookings in days:
+        for slot_start, slot_end in slots:
+            for b in bookings:
+                end = parse(b["endTime"], "%H:%M") + buffer
+                start = parse(b["startTime"], "%H:%M")
+                total += parse(slot_start, "%H:%M") < end and start < parse(slot_end, "%H:%M")
+    return total
+
+
+def bench_split(days, slots, buffer_time):
+    """Stringhe convertite in minuti a ogni confronto (`timeToMinutes` senza campi numerici)."""
+    total = 0
+    for bookings in days:
+        for slot_start, slot_end in slots:
+            s_start, s_end = to_minutes(slot_start), to_minutes(slot_end)
+            for b in bookings:
+                total += s_start < to_minutes(b["endTime"]) + buffer_time and to_minutes(b["startTime"]) < s_end
+    return total
+
+
+def bench_int(days, slots, buffer_time):
+    """Campi `startMin`/`endMin`: solo confronti tra interi."""
+    total = 0
+    for bookings in days:
+        for slot_start, slot_end in slots:
+            s_start, s_end = to_minutes(slot_start), to_minutes(slot_end)
+            for b in bookings:
+                total += s_start < b["endMin"] + buffer_time and b["startMin"] < s_end
+    return total
+
+
+def bench_numpy(days, slots, buffer_time):
+    """Campi numerici in array: tutti gli slot del giorno in un'unica operazione."""
+    import numpy as np
+
+    starts = np.array([to_minutes(s) for s, _ in slots], dtype=np.int32)[:, None]
+    ends = np.array([to_minutes(e) for _, e in slots], dtype=np.int32)[:, None]
+    total = 0
+    for bookings in days:
+        b_start = np.fromiter((b["startMin"] for b in bookings), dtype=np.int32, count=len(bookings))
+        b_end = np.fromiter((b["endMin"] for b in bookings), dtype=np.int32, count=len(bookings))
+        total += int(np.count_nonzero((starts < b_end + buffer_time) & (b_start < ends)))
+    return total
+
+
+def run_benchmark(args):
+    days = synthetic_days(args.days, args.per_day, args.seed)
+    slots = slot_grid(args.duration)
+    buffer_time = DEFAULT_CONFIG["bufferTime"]
+    checks = args.days * args.per_day * len(slots)
+    print(f"{args.days} giorni × {len(slots)} slot × {args.per_day} prenotazioni = {checks:,} confronti\n")
+
+    methods = [
+        ("stringhe (strptime)", bench_strptime),
+        ("stringhe (split)", bench_split),
+        ("interi (startMin/endMin)", bench_int),
+        ("interi (numpy)", bench_numpy),
+    ]
+    results = []
+    for name, fn in methods:
+        best, total = float("inf"), None
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            total = fn(days, slots, buffer_time)
+            best = min(best, time.perf_counter() - started)
+        results.append((name, best, total))
+
+    baseline = results[0][1]
+    print(f"{'metodo':<26}{'tempo':>10}{'ns/confronto':>15}{'speedup':>10}{'conflitti':>12}")
+    for name, elapsed, total in results:
+        print(f"{name:<26}{elapsed * 1000:>8.1f}ms{elapsed / checks * 1e9:>15.1f}"
+              f"{baseline / elapsed:>9.1f}x{total:>12,}")
+    if len({total for _, _, total in results}) != 1:
+        print("[ERR] I metodi non concordano sul numero di conflitti")
+        sys.exit(1)
+
+
+# ==================== MAIN ====================
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Campi orario numerici delle prenotazioni (startMin, endMin, startAt)")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    backfill = sub.add_parser("backfill", help="Scrive i campi mancanti o incoerenti")
+    verify = sub.add_parser("verify", help="Controlla la coerenza con date/startTime/endTime")
+    for p, chunk_days in ((backfill, 30), (verify, 90)):
+        p.add_argument("--from", dest="start", help="Data iniziale YYYY-MM-DD (default: prima prenotazione)")
+        p.add_argument("--to", dest="end", help="Data finale YYYY-MM-DD (default: ultima prenotazione)")
+        p.add_argument("--workers", type=int, default=8, help="Blocchi di date elaborati in parallelo")
+        p.add_argument("--chunk-days", type=int, default=chunk_days, help="Giorni per blocco")
+    backfill.add_argument("--state-file", default=DEFAULT_STATE_FILE, help="File con i blocchi completati")
+    backfill.add_argument("--resume", action="store_true", help="Riprende dai blocchi non completati")
+    backfill.add_argument("--dry-run", action="store_true", help="Solo conteggi, nessuna scrittura")
+    verify.add_argument("--samples", type=int, default=20, help="Prenotazioni incoerenti mostrate")
+
+    bench = sub.add_parser("benchmark", help="Sovrapposizioni su interi vs parsing delle stringhe")
+    bench.add_argument("--days", type=int, default=100, help="Giorni sintetici")
+    bench.add_argument("--per-day", type=int, default=40, help="Prenotazioni per giorno")
+    bench.add_argument("--duration", type=int, default=60, help="Durata del servizio richiesto (minuti)")
+    bench.add_argument("--repeat", type=int, default=3, help="Ripetizioni (si tiene la migliore)")
+    bench.add_argument("--seed", type=int, default=42)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.command == "backfill":
+        run_backfill(args)
+    elif args.command == "verify":
+        run_verify(args)
+    else:
+        run_benchmark(args)
+
+
+if __name__ == "__main__":
+    main()
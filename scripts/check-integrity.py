@@ -0,0 +1,281 @@
+"""
+Controllo dell'integrità referenziale tra le collezioni Firestore.
+
+`deleteService` e la cancellazione dei clienti non toccano le prenotazioni: i
+riferimenti rimasti rompono le ricerche per riga delle pagine admin. Lo script
+legge ogni collezione una sola volta, in streaming, e controlla:
+
+- `bookings.serviceId` -> `services`, `bookings.customerId` (o `userId`) ->
+  `customers`, `bookings.salonId` -> `salons`
+- `adminUsers.uid` -> `admins`
+- `services.salonId` -> `salons`
+
+Le destinazioni sono tenute come insiemi compatti di hash (array ordinato, 8
+byte per ID, o filtro di Bloom con --bloom); i riferimenti sono controllati a
+blocchi (vedi `salon_tools/integrity.py`). Tempo lineare, memoria limitata
+agli insiemi e a un blocco di documenti.
+
+Con --fix i documenti con riferimenti mancanti vengono, in scritture batch:
+- `mark`: marcati con `danglingRefs` (campi mancanti; rimosso quando tornano validi)
+- `repair`: corretti dove ha senso (`adminUsers` disattivati, `salonId`
+  rimosso), marcati negli altri casi
+- `quarantine`: spostati in `integrityQuarantine/{collezione}_{id}` con i dati
+  originali. Un servizio spostato resta valido per le prenotazioni fino
+  all'esecuzione successiva
+
+Uso:
+    python scripts/check-integrity.py
+    python scripts/check-integrity.py --only bookings.serviceId --out dangling.jsonl
+    python scripts/check-integrity.py --fix mark
+    python scripts/check-integrity.py --bloom 20000000 --fp-rate 0.0001
+
+Requisiti:
+- pip install firebase-admin python-dotenv numpy
+"""
+import argparse
+import json
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+
+from salon_tools.booking_time import js_iso
+from salon_tools.integrity import (
+    CHECK_CHUNK,
+    REFERENCES,
+    REPAIRS,
+    BloomIdSet,
+    ReferenceChecker,
+    SortedIdSet,
+    reference_type,
+    reference_value,
+    scan_order,
+)
+from salon_tools.queries import BATCH_LIMIT, commit_in_batches
+
+QUARANTINE_COLLECTION = "integrityQuarantine"
+MARK_FIELD = "danglingRefs"
+
+
+class FixWriter:
+    """Accoda le correzioni e le scrive in batch da `BATCH_LIMIT` operazioni."""
+
+    def __init__(self, db, mode, now):
+        from firebase_admin import firestore
+
+        self.db = db
+        self.mode = mode
+        self.now = now
+        self.delete_field = firestore.DELETE_FIELD
+        self.operations = []
+        self.written = defaultdict(int)
+
+    def fix(self, collection, doc_id, data, dangling):
+        ref = self.db.collection(collection).document(doc_id)
+        fields = sorted({checker.field for checker, _ in dangling})
+        if self.mode == "quarantine":
+            target = self.db.collection(QUARANTINE_COLLECTION).document(f"{collection}_{doc_id}")
+            self.operations.append(("set", target, {
+                "collection": collection,
+                "docId": doc_id,
+                "data": data,
+                MARK_FIELD: fields,
+                "quarantinedAt": self.now,
+            }))
+            self.operations.append(("delete", ref, None))
+            self.written["quarantined"] += 1
+        else:
+            update = {}
+            marked = []
+            for checker, _ in dangling:
+                repair = REPAIRS.get(checker.type) if self.mode == "repair" else None
+                if repair is None:
+                    marked.append(checker.field)
+                    continue
+                update.update({key: self.delete_field if value is None else value for key, value in repair.items()})
+            if marked:
+                update[MARK_FIELD] = sorted(marked)
+            elif data.get(MARK_FIELD) is not None:
+                update[MARK_FIELD] = self.delete_field
+            if all(self._unchanged(data, key, value) for key, value in update.items()):
+                self.written["unchanged"] += 1
+                return
+            if marked:
+                update["integrityCheckedAt"] = self.now
+            self.operations.append(("update", ref, update))
+            self.written["repaired" if len(marked) < len(dangling) else "marked"] += 1
+        self.flush(partial=True)
+
+    def _unchanged(self, data, key, value):
+        if value is self.delete_field:
+            return key not in data
+        return data.get(key) == value
+
+    def clear(self, collection, doc_id):
+        """Rimuove il segno di un documento i cui riferimenti sono tornati validi."""
+        ref = self.db.collection(collection).document(doc_id)
+        self.operations.append(("update", ref, {MARK_FIELD: self.delete_field}))
+        self.written["cleared"] += 1
+        self.flush(partial=True)
+
+    def flush(self, partial=False):
+        if partial and len(self.operations) < BATCH_LIMIT:
+            return
+        commit_in_batches(self.db, self.operations)
+        self.operations = []
+
+
+# ==================== SCANSIONE ====================
+
+def new_id_set(args):
+    return BloomIdSet(args.bloom, args.fp_rate) if args.bloom else SortedIdSet()
+
+
+def scan(db, references, args, report, writer=None):
+    """Legge le collezioni nell'ordine di `scan_order`; restituisce (riepiloghi, dimensioni degli insiemi)."""
+    targets = {target for _, _, target, _ in references}
+    id_sets = {name: new_id_set(args) for name in targets}
+    sizes = {}
+    for collection in scan_order(references):
+        started = time.perf_counter()
+        checkers = [ReferenceChecker(ref, id_sets[ref[2]].freeze()) for ref in references if ref[0] == collection]
+        fields = sorted({ref[1] for ref in references if ref[0] == collection}
+                        | {ref[3] for ref in references if ref[0] == collection and ref[3]})
+        if writer is not None:
+            fields.append(MARK_FIELD)
+            if writer.mode == "repair":
+                fields.extend(key for ref in references if ref[0] == collection
+                              for key in REPAIRS.get(reference_type(ref), {}))
+        query = db.collection(collection)
+        if writer is None or writer.mode != "quarantine":
+            query = query.select(sorted(set(fields)))
+        id_set = id_sets.get(collection)
+
+        docs, ids, read = {}, [], 0
+        for doc in query.stream():
+            read += 1
+            data = doc.to_dict() or {}
+            for checker in checkers:
+                checker.add(doc.id, reference_value(data, checker.reference))
+            if checkers:
+                docs[doc.id] = data
+            if id_set is not None:
+                ids.append(doc.id)
+            if len(docs) >= CHECK_CHUNK or len(ids) >= CHECK_CHUNK:
+                check_chunk(collection, checkers, docs, report, writer)
+                docs = {}
+                if id_set is not None:
+                    id_set.add(ids)
+                    ids = []
+        check_chunk(collection, checkers, docs, report, writer)
+        if id_set is not None:
+            id_set.add(ids)
+            id_set.freeze()
+            sizes[collection] = {"ids": id_set.count, "bytes": id_set.nbytes}
+        report.collection_done(collection, read, time.perf_counter() - started)
+        for checker in checkers:
+            report.summaries.append(checker.summary())
+    if writer is not None:
+        writer.flush()
+    return report.summaries, sizes
+
+
+def check_chunk(collection, checkers, docs, report, writer):
+    by_doc = defaultdict(list)
+    for checker in checkers:
+        for doc_id, value in checker.flush():
+            by_doc[doc_id].append((checker, value))
+            report.dangling(collection, doc_id, checker, value)
+    if writer is None:
+        return
+    for doc_id, data in docs.items():
+        if doc_id in by_doc:
+            writer.fix(collection, doc_id, data, by_doc[doc_id])
+        elif data.get(MARK_FIELD) is not None and writer.mode != "quarantine":
+            writer.clear(collection, doc_id)
+
+
+# ==================== REPORT ====================
+
+class Report:
+    """Esempi in console (i primi `show` per tipo) e, con --out, ogni riferimento mancante in JSON Lines."""
+
+    def __init__(self, show, out=None):
+        self.show = show
+        self.out = out
+        self.examples = defaultdict(list)
+        self.summaries = []
+
+    def dangling(self, collection, doc_id, checker, value):
+        if len(self.examples[checker.type]) < self.show:
+            self.examples[checker.type].append((doc_id, value))
+        if self.out is not None:
+            self.out.write(json.dumps({"type": checker.type, "collection": collection, "docId": doc_id,
+                                       "field": checker.field, "value": value, "target": checker.reference[2]},
+                                      ensure_ascii=False) + "\n")
+
+    def collection_done(self, collection, read, elapsed):
+        print(f"  {collection:<12} {read:>10} documenti in {elapsed:.1f}s")
+
+    def print_summary(self, sizes):
+        print("\nInsiemi di ID: " + ", ".join(f"{name} {size['ids']} ({size['bytes'] / 1024:.0f} KB)"
+                                               for name, size in sorted(sizes.items())))
+        print(f"\n{'riferimento':<22} {'controllati':>12} {'mancanti':>10} {'destinazioni':>13}")
+        for summary in self.summaries:
+            print(f"{summary['type']:<22} {summary['checked']:>12} {summary['dangling']:>10} "
+                  f"{summary['missingTargets']:>13}")
+            for doc_id, value in self.examples[summary["type"]]:
+                print(f"    {doc_id} -> {summary['target']}/{value}")
+            extra = summary["dangling"] - len(self.examples[summary["type"]])
+            if extra > 0:
+                print(f"    ... altri {extra}")
+
+
+# ==================== MAIN ====================
+
+def parse_args(argv=None):
+    types = [reference_type(ref) for ref in REFERENCES]
+    parser = argparse.ArgumentParser(description="Integrità referenziale tra le collezioni")
+    parser.add_argument("--only", action="append", choices=types, default=[],
+                        help="Solo questo riferimento (ripetibile)")
+    parser.add_argument("--bloom", type=int, metavar="CAPACITY",
+                        help="Filtri di Bloom per CAPACITY ID per collezione invece degli array ordinati")
+    parser.add_argument("--fp-rate", type=float, default=1e-3, help="Probabilità di falso positivo dei filtri di Bloom")
+    parser.add_argument("--out", metavar="FILE", help="Scrive ogni riferimento mancante in JSON Lines")
+    parser.add_argument("--show", type=int, default=10, help="Esempi mostrati per tipo")
+    parser.add_argument("--fix", choices=("mark", "repair", "quarantine"),
+                        help="Corregge i documenti con riferimenti mancanti (scritture batch)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    references = [ref for ref in REFERENCES if not args.only or reference_type(ref) in args.only]
+
+    from salon_tools.firebase import get_db
+
+    started = time.perf_counter()
+    db = get_db()
+    writer = FixWriter(db, args.fix, js_iso(datetime.now(timezone.utc))) if args.fix else None
+    out = open(args.out, "w", encoding="utf-8") if args.out else None
+    try:
+        report = Report(args.show, out)
+        print("Lettura delle collezioni:")
+        summaries, sizes = scan(db, references, args, report, writer)
+    finally:
+        if out is not None:
+            out.close()
+
+    report.print_summary(sizes)
+    total = sum(summary["dangling"] for summary in summaries)
+    print(f"\n{total} riferimenti mancanti in {time.perf_counter() - started:.1f}s")
+    if args.bloom:
+        print(f"[INFO] Filtri di Bloom: fino a circa {args.fp_rate:.2%} dei riferimenti mancanti "
+              "può non essere rilevato")
+    if args.out:
+        print(f"[OK] Dettaglio in {args.out}")
+    if writer is not None:
+        print("[OK] Correzioni: " + (", ".join(f"{k} {v}" for k, v in sorted(writer.written.items())) or "nessuna"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,451 @@
+"""
+Chiusure straordinarie dei saloni e ricollocazione delle prenotazioni.
+
+`updateSalonConfig` con nuove `closedDates` blocca solo i nuovi slot; le
+prenotazioni già presenti restano e vanno spostate una per una con
+`proposeAlternatives`. `apply` lo fa per tutte le date e tutti i saloni in una volta:
+
+1. espande le chiusure (date, intervalli, festività ricorrenti) e le aggiunge a
+   `config.closedDates` dei saloni scelti
+2. legge con una query per intervallo le prenotazioni dei giorni chiusi e dei
+   --search-days giorni attorno (una lettura per tutti i saloni)
+3. per ogni prenotazione PENDING/CONFIRMED in un giorno chiuso calcola fino a
+   --alternatives `AlternativeSlot` (`salon_tools/closures.py`) e la porta ad
+   ALTERNATIVE_PROPOSED, in batch con precondizione sull'ultima versione letta:
+   una prenotazione modificata nel frattempo viene saltata
+4. nello stesso batch accoda l'email al cliente in `emailLogs`
+   (`alternative-slots_{bookingId}_{closureId}`, status "queued")
+5. ricostruisce i contatori `slotOccupancy` dei giorni chiusi
+
+Le email accodate vengono inviate da `send` (o subito con `apply --send`) in
+asincrono, con concorrenza limitata e token bucket come `send-reminders.py`.
+Le prenotazioni senza un'alternativa libera restano invariate e vengono elencate.
+
+Le prenotazioni senza `salonId` appartengono al primo salone (come `getDefaultSalon`).
+
+Uso:
+    python scripts/closures.py apply 2025-12-24..2025-12-27 --dry-run
+    python scripts/closures.py apply 2025-08-10..2025-08-16 --salon centro --salon nord --send
+    python scripts/closures.py apply 01-01 12-25 12-26 --until 2026-12-31
+    python scripts/closures.py send --rate 5 --retry-failed
+
+Requisiti:
+- pip install firebase-admin python-dotenv aiohttp
+- RESEND_API_KEY, EMAIL_FROM e NEXT_PUBLIC_APP_URL in .env.local per `send`
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta, timezone
+
+from salon_tools.booking_snapshots import effective_config
+from salon_tools.booking_time import js_iso
+from salon_tools.closures import (
+    DEFAULT_ALTERNATIVES,
+    DEFAULT_SEARCH_DAYS,
+    MIN_ALTERNATIVES,
+    ClosurePlanner,
+    contiguous_ranges,
+    expand_closures,
+)
+from salon_tools.emails import (
+    ALTERNATIVES_TEMPLATE,
+    DEFAULT_FROM,
+    EMAIL_LOGS_COLLECTION,
+    RESEND_API_URL,
+    ResendClient,
+    TokenBucket,
+    render_alternatives,
+)
+from salon_tools.firebase import get_db, load_env
+from salon_tools.occupancy import DEFAULT_SALON_KEY, SLOT_OCCUPANCY_COLLECTION, build_doc, occupancy_doc_id
+from salon_tools.queries import BATCH_LIMIT, bookings_query, commit_in_batches, iter_bookings, load_settings_config
+from salon_tools.rules import ACTIVE_STATUSES, merge_config
+
+PROPOSED_BY = "closures"
+
+
+def conflict_errors():
+    from google.api_core import exceptions
+
+    return exceptions.AlreadyExists, exceptions.FailedPrecondition, exceptions.Conflict
+
+
+# ==================== LETTURE ====================
+
+def load_salons(db, selected):
+    """Tutti i saloni {id: dati} e gli id scelti (tutti se `selected` è vuoto)."""
+    salons = {doc.id: doc.to_dict() or {} for doc in db.collection("salons").stream()}
+    missing = [salon_id for salon_id in selected if salon_id not in salons]
+    if missing:
+        raise SystemExit(f"[ERR] Saloni non trovati: {', '.join(missing)}")
+    return salons, set(selected or salons)
+
+
+def load_window(db, closed_dates, today, search_days, owner):
+    """
+    Prenotazioni da `search_days` giorni prima della prima chiusura a `search_days`
+    dopo l'ultima: snapshot dei giorni chiusi e dati per salone e data.
+    """
+    start = max(today, date.fromisoformat(closed_dates[0]) - timedelta(days=search_days))
+    end = date.fromisoformat(closed_dates[-1]) + timedelta(days=search_days)
+    closed = set(closed_dates)
+    affected = defaultdict(list)
+    day_bookings = defaultdict(lambda: defaultdict(list))
+    for snap in bookings_query(db, start.isoformat(), end.isoformat()).stream():
+        data = snap.to_dict()
+        if not data or not data.get("date"):
+            continue
+        salon_id = owner(data)
+        if data["date"] in closed:
+            if data.get("status") in ACTIVE_STATUSES and data.get("startTime") and data.get("endTime"):
+                affected[salon_id].append(snap)
+        else:
+            day_bookings[salon_id][data["date"]].append(data)
+    return affected, day_bookings
+
+
+def load_customers(db, snaps):
+    bookings = [snap.to_dict() or {} for snap in snaps]
+    ids = {booking.get("customerId") or booking.get("userId") for booking in bookings}
+    refs = [db.collection("customers").document(i) for i in ids if i]
+    return {snap.id: snap.to_dict() or {} for snap in db.get_all(refs) if snap.exists} if refs else {}
+
+
+# ==================== SCRITTURE ====================
+
+def commit_moves(db, moves, workers):
+    """
+    Scrive le ricollocazioni (prenotazione + email accodata) in batch paralleli,
+    con precondizione sull'ultima versione letta della prenotazione. Se un batch
+    fallisce, le sue ricollocazioni vengono ritentate una per una e quelle in
+    conflitto scartate. Restituisce (scritte, in conflitto).
+    """
+    errors = conflict_errors()
+
+    def write(batch, move):
+        batch.update(move["ref"], move["update"], option=db.write_option(last_update_time=move["updateTime"]))
+        if move["email"]:
+            batch.create(move["emailRef"], move["email"])
+
+    def commit_chunk(chunk):
+        batch = db.batch()
+        for move in chunk:
+            write(batch, move)
+        try:
+            batch.commit()
+            return chunk, []
+        except errors:
+            pass
+        written, conflicts = [], []
+        for move in chunk:
+            single = db.batch()
+            write(single, move)
+            try:
+                single.commit()
+                written.append(move)
+            except errors:
+                conflicts.append(move)
+        return written, conflicts
+
+    # Due scritture per ricollocazione
+    size = BATCH_LIMIT // 2
+    chunks = [moves[i:i + size] for i in range(0, len(moves), size)]
+    written, conflicts = [], []
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(chunks)))) as pool:
+        for ok, failed in pool.map(commit_chunk, chunks):
+            written += ok
+            conflicts += failed
+    return written, conflicts
+
+
+def rebuild_occupancy(db, closed_dates):
+    """Riscrive i contatori `slotOccupancy` già presenti per i giorni chiusi."""
+    config = load_settings_config(db)
+    groups = defaultdict(list)
+    for start, end in contiguous_ranges(closed_dates):
+        for _, booking in iter_bookings(db, start, end):
+            groups[(DEFAULT_SALON_KEY, booking["date"])].append(booking)
+    keys = set(groups) | {(DEFAULT_SALON_KEY, day) for day in closed_dates}
+    collection = db.collection(SLOT_OCCUPANCY_COLLECTION)
+    keys_by_id = {occupancy_doc_id(*key): key for key in keys}
+    operations = []
+    for snap in db.get_all([collection.document(doc_id) for doc_id in keys_by_id]):
+        if snap.exists:
+            salon_id, day = keys_by_id[snap.id]
+            doc = build_doc(salon_id, day, groups[(salon_id, day)], config["timeStep"], config["bufferTime"])
+            operations.append(("set", snap.reference, doc))
+    return commit_in_batches(db, operations)
+
+
+# ==================== APPLY ====================
+
+def plan_closure(db, args):
+    today = date.today()
+    until = date.fromisoformat(args.until) if args.until else today + timedelta(days=365)
+    closed_dates = expand_closures(args.closures, today, until)
+    if not closed_dates:
+        raise SystemExit("[ERR] Nessuna data di chiusura da oggi a " + until.isoformat())
+
+    salons, selected = load_salons(db, args.salon)
+    settings = db.collection("settings").document("config").get()
+    settings_config = settings.to_dict() if settings.exists else None
+    default_salon = min(salons) if salons else None
+
+    def owner(booking):
+        return booking.get("salonId") or default_salon
+
+    affected, day_bookings = load_window(db, closed_dates, today, args.search_days, owner)
+    customers = load_customers(db, [s for salon_id in selected for s in affected.get(salon_id, [])])
+
+    now = js_iso(datetime.now(timezone.utc))
+    closure_id = "closure-" + datetime.now(timezone.utc).strftime("%Y%m%d%H%M%S")
+    app_url = os.getenv("NEXT_PUBLIC_APP_URL") or "http://localhost:3000"
+    salon_updates, moves, unplaced, short = [], [], [], []
+    for salon_id in sorted(selected):
+        data = salons[salon_id]
+        # Come updateSalonConfig: { ...currentConfig, closedDates }; senza config si parte da quella effettiva
+        base = dict(data.get("config") or effective_config(data, settings_config))
+        merged_dates = sorted(set(base.get("closedDates") or []) | set(closed_dates))
+        salon_updates.append((salon_id, {**base, "closedDates": merged_dates}))
+
+        config = merge_config({**effective_config(data, settings_config), "closedDates": merged_dates})
+        planner = ClosurePlanner(config, day_bookings.get(salon_id, {}), today, args.search_days)
+        snaps = {snap.id: snap for snap in affected.get(salon_id, [])}
+        for booking_id, booking, slots in planner.plan(
+                [(i, s.to_dict()) for i, s in snaps.items()], args.alternatives):
+            if not slots:
+                unplaced.append((salon_id, booking_id, booking))
+                continue
+            if len(slots) < MIN_ALTERNATIVES:
+                short.append(booking_id)
+            customer_id = booking.get("customerId") or booking.get("userId")
+            customer = customers.get(customer_id) or {}
+            to = customer.get("email") or booking.get("customerEmail")
+            email_id = f"{ALTERNATIVES_TEMPLATE}_{booking_id}_{closure_id}"
+            email = None
+            if to:
+                subject, _ = render_alternatives(booking.get("serviceName"), "", slots, app_url)
+                email = {
+                    "to": to,
+                    "subject": subject,
+                    "template": ALTERNATIVES_TEMPLATE,
+                    "bookingId": booking_id,
+                    "customerId": customer_id,
+                    "firstName": customer.get("firstName") or (booking.get("customerName") or "").split(" ")[0],
+                    "serviceName": booking.get("serviceName") or "",
+                    "alternativeSlots": slots,
+                    "closureId": closure_id,
+                    "status": "queued",
+                    "queuedAt": now,
+                    "sentAt": now,
+                }
+            moves.append({
+                "salonId": salon_id,
+                "bookingId": booking_id,
+                "booking": booking,
+                "slots": slots,
+                "ref": snaps[booking_id].reference,
+                "updateTime": snaps[booking_id].update_time,
+                "update": {
+                    "status": "ALTERNATIVE_PROPOSED",
+                    "alternativeSlots": slots,
+                    "updatedAt": now,
+                    "proposedBy": PROPOSED_BY,
+                },
+                "emailRef": db.collection(EMAIL_LOGS_COLLECTION).document(email_id),
+                "email": email,
+            })
+    return {
+        "closedDates": closed_dates,
+        "salonUpdates": salon_updates,
+        "moves": moves,
+        "unplaced": unplaced,
+        "short": short,
+        "closureId": closure_id,
+        "now": now,
+    }
+
+
+def run_apply(args):
+    db = get_db()
+    started = time.perf_counter()
+    plan = plan_closure(db, args)
+    planned_s = time.perf_counter() - started
+    closed_dates, moves = plan["closedDates"], plan["moves"]
+
+    print(f"Chiusure: {len(closed_dates)} giorni ({closed_dates[0]} -> {closed_dates[-1]}), "
+          f"{len(plan['salonUpdates'])} saloni")
+    print(f"Prenotazioni da ricollocare: {len(moves)}, senza alternative: {len(plan['unplaced'])}, "
+          f"con meno di {MIN_ALTERNATIVES} alternative: {len(plan['short'])} (calcolo in {planned_s:.2f}s)")
+    for move in moves[:args.show]:
+        booking = move["booking"]
+        options = ", ".join(f"{s['date']} {s['startTime']}" for s in move["slots"])
+        print(f"   {move['salonId']:<16} {move['bookingId']:<24} {booking['date']} {booking['startTime']} -> {options}")
+    for salon_id, booking_id, booking in plan["unplaced"]:
+        print(f"   [WARN] {salon_id} {booking_id} {booking['date']} {booking['startTime']}: nessuno slot libero "
+              f"entro {args.search_days} giorni")
+    if args.dry_run:
+        return
+
+    salons = db.collection("salons")
+    # Prima la configurazione: da qui i giorni chiusi non accettano nuove prenotazioni
+    commit_in_batches(db, [
+        ("update", salons.document(salon_id), {"config": config, "updatedAt": plan["now"]})
+        for salon_id, config in plan["salonUpdates"]
+    ])
+    written, conflicts = commit_moves(db, moves, args.workers)
+    counters = rebuild_occupancy(db, closed_dates)
+    queued = sum(1 for move in written if move["email"])
+    elapsed = time.perf_counter() - started
+    print(f"[OK] {len(written)} prenotazioni in ALTERNATIVE_PROPOSED, {queued} email in coda, "
+          f"{counters} contatori slotOccupancy ricostruiti in {elapsed:.1f}s (chiusura {plan['closureId']})")
+    if conflicts:
+        print(f"[WARN] {len(conflicts)} prenotazioni modificate durante l'esecuzione e saltate: "
+              "rilanciare il comando per ricollocarle")
+    if args.send and queued:
+        run_send(args, db)
+
+
+# ==================== SEND ====================
+
+def claim_queued(db, statuses, limit):
+    """Porta a "pending" le email accodate (precondizione sull'ultima versione letta)."""
+    errors = conflict_errors()
+    query = (
+        db.collection(EMAIL_LOGS_COLLECTION)
+        .where("template", "==", ALTERNATIVES_TEMPLATE)
+        .where("status", "in", list(statuses))
+        .limit(limit)
+    )
+    snaps = list(query.stream())
+    claimed_at = js_iso(datetime.now(timezone.utc))
+    claimed = []
+    for offset in range(0, len(snaps), BATCH_LIMIT):
+        chunk = snaps[offset:offset + BATCH_LIMIT]
+        batch = db.batch()
+        for snap in chunk:
+            batch.update(snap.reference, {"status": "pending", "claimedAt": claimed_at},
+                         option=db.write_option(last_update_time=snap.update_time))
+        try:
+            batch.commit()
+            claimed += chunk
+            continue
+        except errors:
+            pass
+        for snap in chunk:
+            single = db.batch()
+            single.update(snap.reference, {"status": "pending", "claimedAt": claimed_at},
+                          option=db.write_option(last_update_time=snap.update_time))
+            try:
+                single.commit()
+                claimed.append(snap)
+            except errors:
+                continue
+    return claimed
+
+
+async def dispatch(db, snaps, args):
+    import aiohttp
+
+    app_url = os.getenv("NEXT_PUBLIC_APP_URL") or "http://localhost:3000"
+    semaphore = asyncio.Semaphore(args.concurrency)
+    outcomes = Counter()
+    operations = []
+
+    async def send(client, snap):
+        log = snap.to_dict() or {}
+        subject, html_body = render_alternatives(
+            log.get("serviceName"), log.get("firstName"), log.get("alternativeSlots") or [], app_url)
+        async with semaphore:
+            result = await client.send(log["to"], subject, html_body, sender=args.sender,
+                                       idempotency_key=f"{ALTERNATIVES_TEMPLATE}/{snap.id}")
+        outcomes["inviate" if result["success"] else "fallite"] += 1
+        data = {
+            "status": "sent" if result["success"] else "failed",
+            "sentAt": js_iso(datetime.now(timezone.utc)),
+            "attempts": result["attempts"],
+        }
+        if result.get("messageId"):
+            data["messageId"] = result["messageId"]
+        if result.get("error"):
+            data["error"] = str(result["error"])
+        operations.append(("update", snap.reference, data))
+
+    connector = aiohttp.TCPConnector(limit=args.concurrency, keepalive_timeout=30)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        client = ResendClient(session, os.getenv("RESEND_API_KEY"), args.resend_url,
+                              TokenBucket(args.rate), args.max_retries)
+        await asyncio.gather(*(send(client, snap) for snap in snaps))
+    await asyncio.to_thread(commit_in_batches, db, operations)
+    return outcomes
+
+
+def run_send(args, db=None):
+    load_env()
+    if not os.getenv("RESEND_API_KEY"):
+        print("[ERR] RESEND_API_KEY non impostata: le email restano in coda")
+        sys.exit(1)
+    args.sender = args.sender or os.getenv("EMAIL_FROM") or DEFAULT_FROM
+    db = db or get_db()
+    statuses = ("queued", "failed") if args.retry_failed else ("queued",)
+    snaps = claim_queued(db, statuses, args.limit)
+    if not snaps:
+        print("Nessuna email in coda")
+        return
+    started = time.perf_counter()
+    outcomes = asyncio.run(dispatch(db, snaps, args))
+    print(f"[OK] Email di proposta: {dict(outcomes)} in {time.perf_counter() - started:.1f}s")
+    if outcomes.get("fallite"):
+        sys.exit(1)
+
+
+def add_send_options(parser):
+    parser.add_argument("--concurrency", type=int, default=10, help="Invii contemporanei")
+    parser.add_argument("--rate", type=float, default=2, help="Richieste al secondo verso Resend (token bucket)")
+    parser.add_argument("--max-retries", type=int, default=4, help="Ritentativi su 429/5xx/errori di rete")
+    parser.add_argument("--limit", type=int, default=5000, help="Email inviate per esecuzione")
+    parser.add_argument("--retry-failed", action="store_true", help="Ritenta anche le email fallite")
+    parser.add_argument("--sender", default=None, help="Mittente (default: EMAIL_FROM)")
+    parser.add_argument("--resend-url", default=RESEND_API_URL)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Chiusure straordinarie e ricollocazione delle prenotazioni")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    apply = sub.add_parser("apply", help="Applica le chiusure e propone alternative alle prenotazioni coinvolte")
+    apply.add_argument("closures", nargs="+",
+                       help="YYYY-MM-DD, YYYY-MM-DD..YYYY-MM-DD o MM-DD (ogni anno fino a --until)")
+    apply.add_argument("--salon", action="append", default=[], help="Id del salone (ripetibile, default: tutti)")
+    apply.add_argument("--until", help="Ultima data per le chiusure ricorrenti (default: fra un anno)")
+    apply.add_argument("--alternatives", type=int, default=DEFAULT_ALTERNATIVES, help="Alternative per prenotazione")
+    apply.add_argument("--search-days", type=int, default=DEFAULT_SEARCH_DAYS,
+                       help="Giorni cercati prima e dopo la chiusura")
+    apply.add_argument("--workers", type=int, default=8, help="Batch scritti in parallelo")
+    apply.add_argument("--show", type=int, default=20, help="Ricollocazioni mostrate")
+    apply.add_argument("--dry-run", action="store_true", help="Mostra le alternative senza scrivere")
+    apply.add_argument("--send", action="store_true", help="Invia subito le email accodate")
+    add_send_options(apply)
+
+    send = sub.add_parser("send", help="Invia le email di proposta accodate")
+    add_send_options(send)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.command == "apply":
+        if args.alternatives < 1 or args.alternatives > 3:
+            raise SystemExit("[ERR] --alternatives deve essere tra 1 e 3 (limite di proposeAlternatives)")
+        run_apply(args)
+    else:
+        run_send(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,300 @@
+"""
+Compattazione di `emailLogs` in rollup giornalieri.
+
+Ogni email inviata dall'app aggiunge un documento a `emailLogs`: la collezione
+cresce senza limiti e ogni statistica di consegna deve leggerla tutta. Questo
+script, per i log con `sentAt` più vecchio di N giorni:
+
+1. li legge a pagine, in ordine di `sentAt` (indice a campo singolo)
+2. li archivia in locale in file JSONL compressi (gzip), uno per batch,
+   sotto `<archivio>/<YYYY-MM>/`
+3. in un unico WriteBatch atomico incrementa i rollup
+   `emailLogRollups/{date}_{template}` (conteggi per status ed errori) ed elimina
+   gli originali: un batch interrotto non lascia conteggi parziali
+4. salva un checkpoint dopo ogni batch: rilanciando lo script si riparte dal
+   primo log non ancora eliminato con lo stesso cutoff
+
+I file di archivio prendono il nome dal primo log del batch, quindi un batch
+ripetuto dopo un'interruzione sovrascrive il proprio file invece di duplicarlo.
+
+Uso:
+    python scripts/compact-email-logs.py --older-than 90 --archive-dir archive/emailLogs --dry-run
+    python scripts/compact-email-logs.py --older-than 90 --archive-dir archive/emailLogs
+    python scripts/compact-email-logs.py --archive-dir archive/emailLogs --resume
+
+Requisiti:
+- pip install firebase-admin python-dotenv
+"""
+import argparse
+import gzip
+import json
+import os
+import re
+import sys
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from salon_tools.emails import EMAIL_LOGS_COLLECTION
+from salon_tools.firebase import get_db
+from salon_tools.queries import BATCH_LIMIT
+
+ROLLUP_COLLECTION = "emailLogRollups"
+CHECKPOINT_FILE = "checkpoint.json"
+
+# Messaggi di errore distinti conservati per rollup (il resto confluisce in "altro")
+MAX_ERROR_KEYS = 20
+ERROR_KEY_LENGTH = 120
+
+# Prezzo indicativo delle letture Firestore (USD per 100.000 documenti)
+DEFAULT_READ_PRICE = 0.06
+
+
+def error_key(error):
+    """Normalizza un messaggio di errore per raggrupparlo (numeri e ID resi generici)."""
+    text = str(error or "").strip() or "sconosciuto"
+    text = re.sub(r"\d+", "#", text)
+    return text[:ERROR_KEY_LENGTH]
+
+
+def rollup_id(day, template):
+    return f"{day}_{template}"
+
+
+# ==================== CHECKPOINT ====================
+
+def load_checkpoint(archive_dir):
+    path = archive_dir / CHECKPOINT_FILE
+    if path.exists():
+        return json.loads(path.read_text(encoding="utf-8"))
+    return None
+
+
+def save_checkpoint(archive_dir, checkpoint):
+    """Scrittura atomica (file temporaneo + rename)."""
+    path = archive_dir / CHECKPOINT_FILE
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(checkpoint, indent=2), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+# ==================== ARCHIVIO ====================
+
+def _json_default(value):
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return str(value)
+
+
+def archive_batch(archive_dir, docs):
+    """Scrive i log del batch in un file JSONL gzip; restituisce (byte grezzi, byte compressi)."""
+    first_id, first = docs[0]
+    month_dir = archive_dir / str(first.get("sentAt", ""))[:7]
+    month_dir.mkdir(parents=True, exist_ok=True)
+    path = month_dir / f"emailLogs_{str(first.get('sentAt', ''))[:10]}_{first_id}.jsonl.gz"
+
+    raw = "".join(
+        json.dumps({"id": doc_id, **data}, ensure_ascii=False, default=_json_default) + "\n" for doc_id, data in docs
+    ).encode("utf-8")
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "wb") as f:
+        with gzip.GzipFile(fileobj=f, mode="wb", compresslevel=9, mtime=0) as gz:
+            gz.write(raw)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    return len(raw), path.stat().st_size
+
+
+# ==================== ROLLUP ====================
+
+def aggregate(docs):
+    """Conteggi per (giorno, template): status ed errori normalizzati."""
+    groups = defaultdict(lambda: {"counts": Counter(), "errors": Counter(), "total": 0})
+    for _, data in docs:
+        key = (str(data.get("sentAt", ""))[:10], data.get("template") or "sconosciuto")
+        group = groups[key]
+        group["total"] += 1
+        group["counts"][data.get("status") or "unknown"] += 1
+        if data.get("status") == "failed":
+            group["errors"][error_key(data.get("error"))] += 1
+    return groups
+
+
+def rollup_update(group, day, template, now):
+    from firebase_admin import firestore
+
+    errors = group["errors"].most_common(MAX_ERROR_KEYS)
+    other = sum(group["errors"].values()) - sum(n for _, n in errors)
+    error_counts = {message: firestore.Increment(n) for message, n in errors}
+    if other:
+        error_counts["altro"] = firestore.Increment(other)
+    data = {
+        "date": day,
+        "template": template,
+        "total": firestore.Increment(group["total"]),
+        "counts": {status: firestore.Increment(n) for status, n in group["counts"].items()},
+        "updatedAt": now,
+    }
+    if error_counts:
+        data["errorCounts"] = error_counts
+    return data
+
+
+def plan_batches(docs):
+    """
+    Divide i log in batch tali che eliminazioni + rollup toccati restino entro
+    il limite di 500 scritture per WriteBatch.
+    """
+    batch, keys = [], set()
+    for doc_id, data in docs:
+        key = (str(data.get("sentAt", ""))[:10], data.get("template") or "sconosciuto")
+        extra = 0 if key in keys else 1
+        if batch and len(batch) + len(keys) + extra + 1 > BATCH_LIMIT:
+            yield batch
+            batch, keys = [], set()
+        batch.append((doc_id, data))
+        keys.add(key)
+    if batch:
+        yield batch
+
+
+def commit_batch(db, docs, now):
+    batch = db.batch()
+    groups = aggregate(docs)
+    rollups = db.collection(ROLLUP_COLLECTION)
+    for (day, template), group in groups.items():
+        batch.set(rollups.document(rollup_id(day, template)), rollup_update(group, day, template, now), merge=True)
+    logs = db.collection(EMAIL_LOGS_COLLECTION)
+    for doc_id, _ in docs:
+        batch.delete(logs.document(doc_id))
+    batch.commit()
+    return set(groups)
+
+
+# ==================== MAIN ====================
+
+def iter_pages(db, cutoff, page_size):
+    """Log con sentAt < cutoff, a pagine, dal più vecchio."""
+    query = (
+        db.collection(EMAIL_LOGS_COLLECTION)
+        .where("sentAt", "<", cutoff)
+        .order_by("sentAt")
+        .limit(page_size)
+    )
+    last = None
+    while True:
+        page = list((query.start_after(last) if last is not None else query).stream())
+        if not page:
+            return
+        yield [(snap.id, snap.to_dict() or {}) for snap in page]
+        last = page[-1]
+
+
+def run(args):
+    archive_dir = Path(args.archive_dir)
+    archive_dir.mkdir(parents=True, exist_ok=True)
+    checkpoint = load_checkpoint(archive_dir) if args.resume else None
+    if not args.resume and not args.dry_run:
+        previous = load_checkpoint(archive_dir)
+        if previous and not previous.get("completedAt"):
+            print(f"[WARN] Checkpoint incompleto in {archive_dir} (cutoff {previous['cutoff']}): "
+                  "usare --resume per riprenderlo, ora viene sostituito")
+
+    if checkpoint:
+        cutoff = checkpoint["cutoff"]
+        print(f"Ripresa dal checkpoint del {checkpoint['updatedAt']} (cutoff {cutoff})")
+    else:
+        if args.older_than is None:
+            print("[ERR] --older-than è obbligatorio senza --resume (o nessun checkpoint trovato)")
+            sys.exit(1)
+        cutoff_day = datetime.now(timezone.utc).date() - timedelta(days=args.older_than)
+        cutoff = cutoff_day.isoformat()
+        checkpoint = {
+            "cutoff": cutoff,
+            "startedAt": datetime.now(timezone.utc).isoformat(),
+            "updatedAt": datetime.now(timezone.utc).isoformat(),
+            "deleted": 0,
+            "batches": 0,
+            "rawBytes": 0,
+            "archivedBytes": 0,
+            "rollups": [],
+        }
+    print(f"Compattazione dei log con sentAt < {cutoff}" + (" [DRY-RUN]" if args.dry_run else ""))
+
+    db = get_db()
+    rollups_touched = set(tuple(key) for key in checkpoint["rollups"])
+    preview = defaultdict(Counter)
+    started = time.perf_counter()
+    processed = 0
+
+    for page in iter_pages(db, cutoff, args.page_size):
+        if args.dry_run:
+            for (day, template), group in aggregate(page).items():
+                preview[(day, template)].update(group["counts"])
+            processed += len(page)
+            continue
+
+        for docs in plan_batches(page):
+            raw, compressed = archive_batch(archive_dir, docs)
+            now = datetime.now(timezone.utc).isoformat()
+            rollups_touched |= commit_batch(db, docs, now)
+
+            processed += len(docs)
+            checkpoint["deleted"] += len(docs)
+            checkpoint["batches"] += 1
+            checkpoint["rawBytes"] += raw
+            checkpoint["archivedBytes"] += compressed
+            checkpoint["rollups"] = sorted(rollups_touched)
+            checkpoint["lastSentAt"] = docs[-1][1].get("sentAt")
+            checkpoint["updatedAt"] = now
+            save_checkpoint(archive_dir, checkpoint)
+        rate = processed / (time.perf_counter() - started)
+        print(f"  [OK] {checkpoint['deleted']} log compattati (fino a {checkpoint.get('lastSentAt')}, {rate:.0f}/s)")
+
+    if args.dry_run:
+        print(f"\n{processed} log da compattare in {len(preview)} rollup (giorno × template)")
+        for (day, template), counts in sorted(preview.items())[:20]:
+            print(f"  {day} {template:<28} {dict(counts)}")
+        report(processed, len(preview), args.read_price)
+        return
+
+    checkpoint["completedAt"] = datetime.now(timezone.utc).isoformat()
+    save_checkpoint(archive_dir, checkpoint)
+    ratio = checkpoint["rawBytes"] / checkpoint["archivedBytes"] if checkpoint["archivedBytes"] else 0
+    print(f"\n[OK] Eliminati {checkpoint['deleted']} log in {checkpoint['batches']} batch, "
+          f"{len(rollups_touched)} rollup aggiornati")
+    print(f"Archivio: {checkpoint['archivedBytes'] / 1e6:.1f} MB compressi "
+          f"({checkpoint['rawBytes'] / 1e6:.1f} MB JSON, rapporto {ratio:.1f}x) in {archive_dir}")
+    report(checkpoint["deleted"], len(rollups_touched), args.read_price)
+
+
+def report(removed, rollups, read_price):
+    """Letture risparmiate da una statistica di consegna sull'intero periodo compattato."""
+    if not removed:
+        return
+    saved = removed - rollups
+    print(f"Statistiche di consegna sul periodo: {rollups} letture invece di {removed} "
+          f"(-{saved}, {removed / max(1, rollups):.0f}x meno), "
+          f"circa {saved / 100_000 * read_price:.4f} USD risparmiati per interrogazione")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Compatta emailLogs in rollup giornalieri per template e status")
+    parser.add_argument("--older-than", type=int, help="Compatta i log con sentAt più vecchio di N giorni")
+    parser.add_argument("--archive-dir", required=True, help="Cartella locale per archivio compresso e checkpoint")
+    parser.add_argument("--page-size", type=int, default=2000, help="Log letti per pagina")
+    parser.add_argument("--resume", action="store_true", help="Riprende dal checkpoint (stesso cutoff)")
+    parser.add_argument("--dry-run", action="store_true", help="Solo anteprima dei rollup, nessuna scrittura")
+    parser.add_argument("--read-price", type=float, default=DEFAULT_READ_PRICE,
+                        help="USD per 100.000 letture, per la stima del risparmio")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    run(parse_args(argv))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+"""
+Lista clienti paginata a cursore e benchmark keyset/offset.
+
+- list:      stampa una pagina della lista clienti (ordinamento `newest`,
+             `lastName` o `email`, filtro opzionale per tag) e il cursore della
+             successiva, come `getCustomersPage` in `app/actions/customers.ts`
+- benchmark: crea N clienti sintetici con il tag `bench`, poi legge una pagina
+             a varie profondità con cursore (keyset) e con `offset`, e confronta
+             tempi e documenti letti. Richiede FIRESTORE_EMULATOR_HOST, salvo
+             --allow-production; --cleanup elimina i clienti creati
+
+I documenti senza chiavi di ordinamento non compaiono nella lista: prima
+eseguire la migrazione `0003_customer_sort_keys` (`python scripts/migrate.py up`).
+Vedi `salon_tools/customers.py`.
+
+Uso:
+    python scripts/customer-pages.py list --sort lastName --limit 20
+    python scripts/customer-pages.py list --sort newest --cursor <cursore>
+    python scripts/customer-pages.py benchmark --customers 100000 --cleanup
+
+Requisiti:
+- pip install firebase-admin python-dotenv
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+from salon_tools.customers import SORTS, encode_cursor, page_query, read_page, sort_key
+from salon_tools.firebase import get_db
+from salon_tools.queries import commit_in_batches
+
+BENCH_TAG = "bench"
+LAST_NAMES = ("Rossi", "Russo", "Ferrari", "Esposito", "Bianchi", "Romano", "Colombo", "Ricci", "Marino", "Greco",
+              "Bruno", "Gallo", "Conti", "De Luca", "Mancini", "Costa", "Giordano", "Rizzo", "Lombardi", "Moretti",
+              "Nicolò", "Fabbri", "Mazzà", "Caruso", "Benedetti")
+FIRST_NAMES = ("Giulia", "Sofia", "Aurora", "Alice", "Ginevra", "Emma", "Giorgia", "Marco", "Luca", "Andrea")
+
+
+# ==================== LIST ====================
+
+def run_list(args):
+    db = get_db()
+    try:
+        page = read_page(db, args.sort, args.limit, args.cursor, args.tag)
+    except ValueError as exc:
+        print(f"[ERR] {exc}")
+        sys.exit(2)
+    field = SORTS[args.sort][0]
+    for doc_id, data in page["customers"]:
+        value = data.get(field)
+        if isinstance(value, datetime):
+            value = value.strftime("%Y-%m-%d %H:%M")
+        name = f"{data.get('lastName', '')} {data.get('firstName', '')}".strip()
+        print(f"{doc_id:<28} {str(value or '-'):<24} {name:<30} {data.get('email', '')}")
+    print(f"\n{len(page['customers'])} clienti")
+    if page["hasMore"]:
+        print(f"Pagina successiva: --cursor {page['nextCursor']}")
+
+
+# ==================== BENCHMARK ====================
+
+def synthetic_customers(db, n, seed):
+    """(ref, dati) di `n` clienti sintetici, con alcuni `createdAt` uguali per verificare lo spareggio per id."""
+    rng = random.Random(seed)
+    now = datetime.now(timezone.utc).replace(microsecond=0)
+    collection = db.collection("customers")
+    for i in range(n):
+        last_name = rng.choice(LAST_NAMES)
+        email = f"bench{i}@example.com"
+        created = now - timedelta(seconds=rng.randrange(3 * 365 * 86400) // 60 * 60)
+        yield collection.document(), {
+            "firstName": rng.choice(FIRST_NAMES),
+            "lastName": last_name,
+            "email": email,
+            "emailVerified": False,
+            "gender": rng.choice(("female", "male")),
+            "interests": [],
+            "tags": [BENCH_TAG],
+            "lastNameLower": sort_key(last_name),
+            "emailLower": email,
+            "createdAt": created,
+        }
+
+
+def seed(db, n, seed_value):
+    """Scrive i clienti in batch; restituisce {id: dati} per calcolare i cursori senza letture."""
+    docs = {}
+
+    def operations():
+        for ref, data in synthetic_customers(db, n, seed_value):
+            docs[ref.id] = data
+            yield "set", ref, data
+
+    started = time.perf_counter()
+    commit_in_batches(db, operations())
+    print(f"   {n:,} clienti creati in {time.perf_counter() - started:.1f}s")
+    return docs
+
+
+def cleanup(db):
+    query = db.collection("customers").where("tags", "array_contains", BENCH_TAG).select([])
+    deleted = commit_in_batches(db, (("delete", snap.reference, None) for snap in query.stream()))
+    print(f"   {deleted:,} clienti di benchmark eliminati")
+
+
+def local_order(docs, sort):
+    """Id nell'ordine della query: chiave e poi id, nella stessa direzione."""
+    field, direction = SORTS[sort]
+    return sorted(docs, key=lambda doc_id: (docs[doc_id][field], doc_id), reverse=direction == "DESCENDING")
+
+
+def timed(fn, repeat):
+    samples = []
+    count = 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        count = fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples), count
+
+
+def run_benchmark(args):
+    if not os.getenv("FIRESTORE_EMULATOR_HOST") and not args.allow_production:
+        print("[ERR] Il benchmark scrive migliaia di documenti: imposta FIRESTORE_EMULATOR_HOST "
+              "(es. localhost:8080) o usa --allow-production")
+        sys.exit(1)
+    db = get_db()
+    print(f"Benchmark paginazione su {args.customers:,} clienti (pagine da {args.limit})\n")
+    docs = seed(db, args.customers, args.seed)
+    try:
+        depths = sorted({d for d in (0, 1_000, 10_000, 50_000, args.customers - args.limit) if 0 <= d < args.customers})
+        for sort in args.sorts:
+            order = local_order(docs, sort)
+            field = SORTS[sort][0]
+            print(f"\nOrdinamento {sort} ({field}):")
+            print(f"   {'profondità':>10} {'keyset ms':>10} {'letture':>8} {'offset ms':>10} {'letture':>8}")
+            for depth in depths:
+                cursor = None
+                if depth:
+                    last = order[depth - 1]
+                    cursor = encode_cursor(sort, docs[last][field], last)
+                expected = order[depth:depth + args.limit]
+
+                def keyset():
+                    page = read_page(db, sort, args.limit, cursor, BENCH_TAG)
+                    ids = [doc_id for doc_id, _ in page["customers"]]
+                    if ids != expected:
+                        raise RuntimeError(f"pagina keyset errata a profondità {depth}")
+                    return len(ids) + (1 if page["hasMore"] else 0)
+
+                def offset():
+                    query = page_query(db, sort, BENCH_TAG).offset(depth).limit(args.limit + 1)
+                    return sum(1 for _ in query.stream()) + depth
+
+                keyset_ms, keyset_reads = timed(keyset, args.repeat)
+                offset_ms, offset_reads = timed(offset, args.repeat) if not args.skip_offset else (None, None)
+                offset_cols = f"{'-':>10} {'-':>8}" if offset_ms is None else f"{offset_ms:>10.1f} {offset_reads:>8,}"
+                print(f"   {depth:>10,} {keyset_ms:>10.1f} {keyset_reads:>8,} {offset_cols}")
+        print("\n[OK] Le pagine keyset corrispondono all'ordine atteso a ogni profondità")
+        print("     Le letture di offset includono i documenti saltati, addebitati da Firestore")
+    finally:
+        if args.cleanup:
+            cleanup(db)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Lista clienti paginata a cursore")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    list_ = sub.add_parser("list", help="Stampa una pagina di clienti")
+    list_.add_argument("--sort", choices=list(SORTS), default="newest")
+    list_.add_argument("--limit", type=int, default=50)
+    list_.add_argument("--cursor", help="Cursore restituito dalla pagina precedente")
+    list_.add_argument("--tag", help="Solo i clienti con questo tag")
+
+    bench = sub.add_parser("benchmark", help="Confronta keyset e offset su clienti sintetici")
+    bench.add_argument("--customers", type=int, default=100_000)
+    bench.add_argument("--limit", type=int, default=50)
+    bench.add_argument("--repeat", type=int, default=3, help="Ripetizioni per misura (mediana)")
+    bench.add_argument("--sorts", nargs="+", choices=list(SORTS), default=list(SORTS))
+    bench.add_argument("--skip-offset", action="store_true", help="Misura solo la paginazione keyset")
+    bench.add_argument("--seed", type=int, default=0)
+    bench.add_argument("--cleanup", action="store_true", help="Elimina i clienti sintetici alla fine")
+    bench.add_argument("--allow-production", action="store_true", help="Consente l'esecuzione fuori dall'emulatore")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.command == "list":
+        run_list(args)
+    else:
+        run_benchmark(args)
+
+
+if __name__ == "__main__":
+    main()
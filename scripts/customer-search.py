@@ -0,0 +1,328 @@
+"""
+Indice di ricerca dei clienti per prefisso e trigrammi.
+
+La pagina admin dei clienti può solo scorrere la lista: per trovare "Rossi" o
+un frammento di CAP bisognava leggere tutta la collezione. Questo script
+mantiene l'indice `customerSearch` (un documento per gram con la posting list
+dei clienti, vedi `salon_tools/customer_search.py`), letto da `searchCustomers`
+in `app/actions/customers.ts`.
+
+- rebuild:   ricostruisce l'intero indice (e rimuove i gram e i clienti non più presenti)
+- update:    aggiorna i soli clienti con `updatedAt`/`createdAt` dopo il watermark
+             (`customerSearchMeta/state`); con --interval resta attivo
+- query:     esegue una ricerca e mostra risultati, letture e tempo
+- benchmark: costruisce l'indice in memoria su N clienti sintetici e misura la
+             latenza delle ricerche rispetto alla scansione completa
+
+Uso:
+    python scripts/customer-search.py rebuild --workers 8
+    python scripts/customer-search.py update --interval 60
+    python scripts/customer-search.py query "rossi mar"
+    python scripts/customer-search.py benchmark --customers 100000
+
+Requisiti:
+- pip install firebase-admin python-dotenv
+"""
+import argparse
+import random
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+from salon_tools.booking_time import js_iso
+from salon_tools.customer_search import (
+    FIELDS,
+    INDEX_VERSION,
+    MAX_POSTINGS,
+    SEARCH_COLLECTION,
+    SEARCH_DOCS_COLLECTION,
+    SEARCH_META_COLLECTION,
+    SEARCH_META_DOC,
+    build_postings,
+    candidates,
+    estimated_bytes,
+    gram_docs,
+    incremental_operations,
+    match_score,
+    query_words,
+    search,
+)
+from salon_tools.queries import BATCH_LIMIT, commit_in_batches
+
+SOURCE_FIELDS = [*FIELDS, "createdAt", "updatedAt"]
+
+
+def meta_ref(db):
+    return db.collection(SEARCH_META_COLLECTION).document(SEARCH_META_DOC)
+
+
+def commit_parallel(db, operations, workers):
+    """Scritture divise in gruppi di batch completi, eseguiti in parallelo."""
+    size = BATCH_LIMIT * 4
+    groups = [operations[i:i + size] for i in range(0, len(operations), size)]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return sum(pool.map(lambda group: commit_in_batches(db, group), groups))
+
+
+# ==================== REBUILD ====================
+
+def run_rebuild(args):
+    from salon_tools.firebase import get_db
+
+    db = get_db()
+    # Watermark preso prima delle letture: le modifiche concorrenti saranno riprese da update
+    watermark = js_iso(datetime.now(timezone.utc))
+    started = time.perf_counter()
+    customers = ((snap.id, snap.to_dict() or {}) for snap in db.collection("customers").select(SOURCE_FIELDS).stream())
+    postings, forward = build_postings(customers)
+    docs, common = gram_docs(postings, args.max_postings)
+    print(f"   {len(forward):,} clienti, {len(docs):,} gram ({len(common)} comuni) "
+          f"in {time.perf_counter() - started:.1f}s")
+
+    existing = {snap.id for snap in db.collection(SEARCH_COLLECTION).select([]).stream()}
+    indexed = {snap.id for snap in db.collection(SEARCH_DOCS_COLLECTION).select([]).stream()}
+    index, forward_ref = db.collection(SEARCH_COLLECTION), db.collection(SEARCH_DOCS_COLLECTION)
+    operations = [("set", index.document(gram), data) for gram, data in docs.items()]
+    operations += [("delete", index.document(gram), None) for gram in existing - docs.keys()]
+    operations += [("set", forward_ref.document(cid), {"v": values}) for cid, values in forward.items()]
+    operations += [("delete", forward_ref.document(cid), None) for cid in indexed - forward.keys()]
+    if args.dry_run:
+        print(f"[DRY-RUN] {len(operations):,} scritture, nessuna eseguita")
+        return
+
+    written = commit_parallel(db, operations, args.workers)
+    meta_ref(db).set({
+        "version": INDEX_VERSION,
+        "watermark": watermark,
+        "common": sorted(common),
+        "customers": len(forward),
+        "grams": len(docs),
+        "lastRunAt": datetime.now(timezone.utc).isoformat(),
+        "lastRunMode": "rebuild",
+    })
+    print(f"\n[OK] Indice ricostruito: {written:,} scritture in {time.perf_counter() - started:.1f}s "
+          f"(watermark {watermark})")
+
+
+# ==================== UPDATE ====================
+
+def changed_customers(db, since):
+    """Clienti creati o modificati da `since`: `updatedAt` è una stringa ISO, `createdAt` un Timestamp."""
+    changed = {}
+    since_ts = datetime.fromisoformat(since.replace("Z", "+00:00"))
+    for field, value in (("updatedAt", since), ("createdAt", since_ts)):
+        for snap in db.collection("customers").where(field, ">=", value).select(SOURCE_FIELDS).stream():
+            changed[snap.id] = snap.to_dict() or {}
+    return changed
+
+
+def update_once(db, args):
+    meta = meta_ref(db).get()
+    meta = (meta.to_dict() or {}) if meta.exists else {}
+    if meta.get("version") != INDEX_VERSION or not meta.get("watermark"):
+        raise SystemExit("[ERR] Indice assente o di una versione precedente: eseguire prima `rebuild`")
+    run_started = datetime.now(timezone.utc)
+    # Sovrapposizione per scarti di orologio: riscrivere le posting è idempotente
+    previous = datetime.fromisoformat(meta["watermark"].replace("Z", "+00:00"))
+    since = js_iso(previous - timedelta(seconds=args.overlap))
+    changed = changed_customers(db, since)
+    refs = [db.collection(SEARCH_DOCS_COLLECTION).document(cid) for cid in changed]
+    old = {snap.id: (snap.to_dict() or {}).get("v") or {} for snap in db.get_all(refs) if snap.exists}
+    operations = incremental_operations(db, changed, old, set(meta.get("common") or []))
+    commit_in_batches(db, operations)
+    meta_ref(db).set({
+        "watermark": js_iso(run_started),
+        "lastRunAt": datetime.now(timezone.utc).isoformat(),
+        "lastRunMode": "update",
+    }, merge=True)
+    return {"since": since, "customers": len(changed), "writes": len(operations)}
+
+
+def run_update(args):
+    from salon_tools.firebase import get_db
+
+    db = get_db()
+    while True:
+        started = time.perf_counter()
+        result = update_once(db, args)
+        print(f"[OK] {datetime.now().strftime('%H:%M:%S')} da {result['since']}: {result['customers']} clienti, "
+              f"{result['writes']} scritture in {time.perf_counter() - started:.1f}s", flush=True)
+        if not args.interval:
+            return
+        time.sleep(args.interval)
+
+
+# ==================== QUERY ====================
+
+def run_query(args):
+    from salon_tools.firebase import get_db
+
+    db = get_db()
+    started = time.perf_counter()
+    result = search(db, args.text, args.limit)
+    elapsed = (time.perf_counter() - started) * 1000
+    if result["tooGeneric"]:
+        print("[WARN] Ricerca troppo generica: aggiungere lettere o parole")
+    for customer_id, data, score in result["results"]:
+        name = f"{data.get('lastName', '')} {data.get('firstName', '')}".strip()
+        print(f"{score:>5.1f}  {customer_id:<28} {name:<30} {data.get('email', ''):<32} "
+              f"{data.get('city') or ''} {data.get('postalCode') or ''}")
+    print(f"\n{len(result['results'])} risultati, {result['reads']} letture, {elapsed:.0f} ms")
+
+
+# ==================== BENCHMARK ====================
+
+LAST_NAMES = ("Rossi", "Russo", "Ferrari", "Esposito", "Bianchi", "Romano", "Colombo", "Ricci", "Marino", "Greco",
+              "Bruno", "Gallo", "Conti", "De Luca", "Mancini", "Costa", "Giordano", "Rizzo", "Lombardi", "Moretti",
+              "Barbieri", "Fontana", "Santoro", "Mariani", "Rinaldi", "Caruso", "Ferrara", "Galli", "Martini",
+              "Leone", "Longo", "Gentile", "Martinelli", "Vitale", "Lombardo", "Serra", "Coppola", "De Santis",
+              "D'Angelo", "Marchetti", "Parisi", "Villa", "Conte", "Ferraro", "Ferri", "Fabbri", "Bianco",
+              "Marini", "Grasso", "Valentini", "Messina", "Sala", "De Angelis", "Gatti", "Pellegrini", "Palumbo",
+              "Sanna", "Farina", "Rizzi", "Monti", "Cattaneo", "Morelli", "Amato", "Silvestri", "Mazza", "Testa",
+              "Dell'Acqua", "Nicolò", "Benedetti", "Orlando")
+FIRST_NAMES = ("Giulia", "Sofia", "Aurora", "Alice", "Ginevra", "Emma", "Giorgia", "Greta", "Beatrice", "Anna",
+               "Chiara", "Martina", "Sara", "Francesca", "Elena", "Marta", "Noemi", "Gaia", "Ludovica", "Vittoria",
+               "Marco", "Luca", "Andrea", "Matteo", "Lorenzo", "Davide", "Federico", "Simone", "Niccolò", "Mattia")
+CITIES = (("Milano", "201"), ("Roma", "001"), ("Torino", "101"), ("Napoli", "801"), ("Bologna", "401"),
+          ("Firenze", "501"), ("Genova", "161"), ("Bergamo", "241"), ("Monza", "209"), ("Brescia", "251"),
+          ("Verona", "371"), ("Padova", "351"), ("Forlì", "471"), ("Cantù", "228"), ("Sesto San Giovanni", "200"))
+DOMAINS = ("gmail.com", "libero.it", "hotmail.it", "yahoo.it", "outlook.com", "icloud.com", "tiscali.it")
+
+
+def synthetic_customers(n, seed):
+    rng = random.Random(seed)
+    for i in range(n):
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        city, cap = rng.choice(CITIES)
+        local = f"{first}.{last}".lower().replace("'", "").replace(" ", "")
+        yield f"c{i:07d}", {
+            "firstName": first,
+            "lastName": last,
+            "email": f"{local}{rng.randrange(1000)}@{rng.choice(DOMAINS)}",
+            "city": city,
+            "postalCode": f"{cap}{rng.randrange(100):02d}",
+        }
+
+
+def sample_queries(customers, count, seed):
+    """Ricerche tipiche: prefisso del cognome, nome e cognome, frammento di email, CAP, sottostringa."""
+    rng = random.Random(seed + 1)
+    ids = list(customers)
+    queries = []
+    for i in range(count):
+        data = customers[rng.choice(ids)]
+        last = query_words(data["lastName"])[-1]
+        kind = i % 5
+        if kind == 0:
+            queries.append(last[:rng.randint(3, max(3, len(last)))])
+        elif kind == 1:
+            queries.append(f"{data['firstName']} {last[:4]}")
+        elif kind == 2:
+            queries.append(data["email"].split("@")[0][-6:])
+        elif kind == 3:
+            queries.append(data["postalCode"][:4])
+        else:
+            queries.append(last[1:5] if len(last) > 4 else last)
+    return queries
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def run_benchmark(args):
+    print(f"Benchmark ricerca su {args.customers:,} clienti sintetici\n")
+    customers = dict(synthetic_customers(args.customers, args.seed))
+
+    started = time.perf_counter()
+    postings, _ = build_postings(customers.items())
+    docs, common = gram_docs(postings, args.max_postings)
+    build_s = time.perf_counter() - started
+    sizes = [estimated_bytes(gram, data) for gram, data in docs.items()]
+    print(f"Indice: {len(docs):,} documenti gram ({len(common)} comuni), "
+          f"{sum(len(d.get('p') or {}) for d in docs.values()):,} posting, costruito in {build_s:.1f}s")
+    print(f"   dimensione documenti: mediana {statistics.median(sizes) / 1024:.1f} KB, "
+          f"massima {max(sizes) / 1024:.0f} KB (limite Firestore 1024 KB)")
+
+    def fetch(ids):
+        return {gram: docs[gram] for gram in ids if gram in docs}
+
+    queries = sample_queries(customers, args.queries, args.seed)
+    index_ms, scan_ms, reads, found = [], [], [], []
+    mismatches = 0
+    for text in queries:
+        started = time.perf_counter()
+        ranked, gram_reads, terms = candidates(fetch, text, args.limit * 2)
+        results = []
+        for customer_id, _ in ranked or []:
+            score = match_score(customers[customer_id], terms)
+            if score is not None:
+                results.append((customer_id, score))
+        results.sort(key=lambda item: (-item[1], item[0]))
+        results = results[:args.limit]
+        index_ms.append((time.perf_counter() - started) * 1000)
+        reads.append(gram_reads + len(ranked or []))
+        found.append(len(results))
+
+        if len(scan_ms) < args.scan_queries:
+            started = time.perf_counter()
+            scanned = [(cid, score) for cid, data in customers.items()
+                       if (score := match_score(data, terms)) is not None]
+            scanned.sort(key=lambda item: (-item[1], item[0]))
+            scan_ms.append((time.perf_counter() - started) * 1000)
+            best = scanned[0][1] if scanned else None
+            if best is not None and (not results or results[0][1] != best):
+                mismatches += 1
+
+    print(f"\n{len(queries)} ricerche (primi {args.limit} risultati):")
+    print(f"   indice:    p50 {statistics.median(index_ms):.2f} ms, p95 {percentile(index_ms, 0.95):.2f} ms, "
+          f"letture medie {statistics.mean(reads):.1f} (gram + clienti), risultati medi {statistics.mean(found):.1f}")
+    if scan_ms:
+        print(f"   scansione: p50 {statistics.median(scan_ms):.1f} ms, p95 {percentile(scan_ms, 0.95):.1f} ms, "
+              f"{args.customers:,} letture ({len(scan_ms)} ricerche)")
+        print(f"   miglior risultato diverso dalla scansione: {mismatches}/{len(scan_ms)}")
+    for text in queries[:5]:
+        print(f"   esempio: {text!r}")
+
+
+# ==================== MAIN ====================
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Indice di ricerca dei clienti (customerSearch)")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    rebuild = sub.add_parser("rebuild", help="Ricostruisce l'intero indice")
+    rebuild.add_argument("--workers", type=int, default=8, help="Gruppi di batch scritti in parallelo")
+    rebuild.add_argument("--dry-run", action="store_true", help="Calcola l'indice senza scrivere")
+
+    update = sub.add_parser("update", help="Aggiornamento incrementale dal watermark")
+    update.add_argument("--overlap", type=int, default=120, help="Secondi riletti prima del watermark")
+    update.add_argument("--interval", type=float, default=0, help="Ripeti ogni N secondi (0 = una volta)")
+
+    query = sub.add_parser("query", help="Esegue una ricerca")
+    query.add_argument("text", help="Testo da cercare (nome, cognome, email, città, CAP)")
+    query.add_argument("--limit", type=int, default=20)
+
+    bench = sub.add_parser("benchmark", help="Latenza su clienti sintetici, senza Firestore")
+    bench.add_argument("--customers", type=int, default=100_000)
+    bench.add_argument("--queries", type=int, default=500)
+    bench.add_argument("--scan-queries", type=int, default=20, help="Ricerche confrontate con la scansione completa")
+    bench.add_argument("--limit", type=int, default=20)
+    bench.add_argument("--seed", type=int, default=0)
+
+    for p in (rebuild, bench):
+        p.add_argument("--max-postings", type=int, default=MAX_POSTINGS,
+                       help=f"Clienti oltre i quali un gram è considerato comune (default {MAX_POSTINGS})")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    commands = {"rebuild": run_rebuild, "update": run_update, "query": run_query, "benchmark": run_benchmark}
+    commands[args.command](args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+"""
+Punteggi RFM e valore stimato (LTV) dei clienti, scritti in `customers`.
+
+`updateCustomerTags` segmenta solo per inattività (30/60 giorni). Questo script
+calcola per ogni cliente, in un solo passaggio vettoriale sulle colonne delle
+prenotazioni CONFIRMED (vedi `salon_tools/customer_value.py`):
+
+- `customers/{id}.value`: ultima e prima visita, visite, spesa, punteggi R/F/M
+  1-5, segmento e LTV stimato; scritto solo se diverso dal valore salvato
+  (rimosso per i clienti senza più prenotazioni CONFIRMED)
+- `analytics/customerValue_{salonId}`: distribuzione dei punteggi, segmenti,
+  istogramma dell'LTV e percentili dei clienti di ogni salone
+
+Sorgenti: Firestore (query su `status` con projection dei soli campi usati),
+il dataset Arrow di `export-arrow.py` (--arrow) o dati sintetici (--synthetic,
+solo tempi di calcolo, nessuna scrittura).
+
+Uso:
+    python scripts/customer-value.py --dry-run
+    python scripts/customer-value.py --arrow data/arrow
+    python scripts/customer-value.py --synthetic 1000000 --customers 120000
+
+Requisiti:
+- pip install firebase-admin python-dotenv numpy pandas (pyarrow per --arrow)
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta, timezone
+
+from salon_tools.analytics import REVENUE_STATUSES
+from salon_tools.booking_time import js_iso
+from salon_tools.customer_value import (
+    VALUE_FIELDS,
+    compute_values,
+    customer_value_doc,
+    salon_histogram,
+    synthetic_value_bookings,
+    value_frame,
+)
+from salon_tools.queries import BATCH_LIMIT, commit_in_batches
+
+ANALYTICS_COLLECTION = "analytics"
+
+
+# ==================== SORGENTI ====================
+
+def load_firestore(db):
+    query = db.collection("bookings").where("status", "in", list(REVENUE_STATUSES)).select(list(VALUE_FIELDS))
+    return value_frame(doc.to_dict() or {} for doc in query.stream())
+
+
+def load_arrow(directory):
+    from salon_tools.arrow_store import open_dataset, to_pandas
+
+    tables = open_dataset(directory, ("bookings",))
+    if "bookings" not in tables:
+        raise SystemExit(f"[ERR] bookings.arrow non trovato in {directory} (eseguire export-arrow.py)")
+    df = to_pandas(tables["bookings"], ["customerId", "date", "status", "servicePrice", "salonId"])
+    df["status"] = df["status"].astype(object)
+    df["salonId"] = df["salonId"].astype(object)
+    return df
+
+
+def load_saved_values(db):
+    """Valori salvati {customerId: value | None} di tutti i clienti esistenti (projection su `value`)."""
+    return {doc.id: (doc.to_dict() or {}).get("value") for doc in db.collection("customers").select(["value"]).stream()}
+
+
+# ==================== SCRITTURE ====================
+
+def plan_writes(db, per_customer, saved, now):
+    """Aggiornamenti dei soli clienti con valore cambiato (i clienti non più in `customers` vengono saltati)."""
+    from firebase_admin import firestore
+
+    customers = db.collection("customers")
+    operations = []
+    seen = set()
+    for row in per_customer.itertuples():
+        customer_id = row.Index
+        seen.add(customer_id)
+        if customer_id not in saved:
+            continue
+        value = customer_value_doc(row)
+        if saved[customer_id] != value:
+            operations.append(("update", customers.document(customer_id), {"value": value, "valueUpdatedAt": now}))
+    for customer_id, value in saved.items():
+        if value is not None and customer_id not in seen:
+            operations.append(("update", customers.document(customer_id),
+                               {"value": firestore.DELETE_FIELD, "valueUpdatedAt": now}))
+    return operations
+
+
+def commit_parallel(db, operations, workers):
+    chunks = [operations[i:i + BATCH_LIMIT] for i in range(0, len(operations), BATCH_LIMIT)]
+    if not chunks:
+        return 0
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(chunks)))) as pool:
+        return sum(pool.map(lambda chunk: commit_in_batches(db, chunk), chunks))
+
+
+def histogram_docs(per_salon, as_of, now):
+    docs = {}
+    for salon_id, frame in per_salon.groupby(level="salonId", sort=True):
+        docs[f"customerValue_{salon_id}"] = {
+            "salonId": salon_id,
+            "asOf": as_of.isoformat(),
+            **salon_histogram(frame),
+            "generatedAt": now,
+        }
+    return docs
+
+
+# ==================== MAIN ====================
+
+def print_report(per_customer, docs, timings):
+    print(f"\nClienti con prenotazioni CONFIRMED: {len(per_customer)}")
+    for doc in docs.values():
+        segments = ", ".join(f"{name} {count}" for name, count in doc["segments"].items() if count)
+        print(f"  {doc['salonId']:<20} {doc['customers']:>8} clienti  {doc['revenue']:>12.2f} EUR  "
+              f"LTV p50 {doc['ltvPercentiles'].get('p50', 0):.0f} EUR  | {segments}")
+    print(f"\nTempi (s): {timings}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Punteggi RFM e LTV dei clienti")
+    parser.add_argument("--as-of", help="Data di riferimento YYYY-MM-DD (default: ieri)")
+    parser.add_argument("--arrow", metavar="DIR", help="Legge le prenotazioni dal dataset Arrow invece che da Firestore")
+    parser.add_argument("--workers", type=int, default=8, help="Batch scritti in parallelo")
+    parser.add_argument("--dry-run", action="store_true", help="Calcola e mostra senza scrivere")
+    parser.add_argument("--synthetic", type=int, metavar="N", help="Usa N prenotazioni casuali (nessuna scrittura)")
+    parser.add_argument("--customers", type=int, default=100_000, help="Clienti distinti con --synthetic")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    as_of = date.fromisoformat(args.as_of) if args.as_of else date.today() - timedelta(days=1)
+    timings = {}
+    started = time.perf_counter()
+    db = None
+
+    if args.synthetic:
+        df = synthetic_value_bookings(args.synthetic, args.customers, as_of - timedelta(days=3 * 365), as_of)
+    elif args.arrow:
+        df = load_arrow(args.arrow)
+    else:
+        from salon_tools.firebase import get_db
+
+        db = get_db()
+        df = load_firestore(db)
+    timings["load"] = round(time.perf_counter() - started, 3)
+
+    step = time.perf_counter()
+    per_customer, per_salon = compute_values(df, as_of)
+    timings["compute"] = round(time.perf_counter() - step, 3)
+    now = js_iso(datetime.now(timezone.utc))
+    docs = histogram_docs(per_salon, as_of, now)
+    print(f"Prenotazioni lette: {len(df)} (riferimento {as_of.isoformat()})")
+
+    if args.synthetic or args.dry_run:
+        print_report(per_customer, docs, timings)
+        return
+
+    if db is None:
+        from salon_tools.firebase import get_db
+
+        db = get_db()
+    step = time.perf_counter()
+    saved = load_saved_values(db)
+    operations = plan_writes(db, per_customer, saved, now)
+    timings["diff"] = round(time.perf_counter() - step, 3)
+    step = time.perf_counter()
+    written = commit_parallel(db, operations, args.workers)
+    analytics = db.collection(ANALYTICS_COLLECTION)
+    commit_in_batches(db, [("set", analytics.document(doc_id), doc) for doc_id, doc in docs.items()])
+    timings["write"] = round(time.perf_counter() - step, 3)
+
+    print_report(per_customer, docs, timings)
+    print(f"\n[OK] {written} clienti aggiornati su {len(saved)}, {len(docs)} riepiloghi in {ANALYTICS_COLLECTION}/ "
+          f"in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
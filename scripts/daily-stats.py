@@ -0,0 +1,239 @@
+"""
+Materializzazione delle statistiche giornaliere `stats/{salonId}_{date}`.
+
+Sostituisce la scansione di `getTodayStats` (tutte le prenotazioni della data a
+ogni caricamento della dashboard) con la lettura di un solo documento,
+indipendente dal numero di prenotazioni. `getTodayStats` usa il documento solo
+se esso o il watermark sono più recenti di 10 minuti: con `update` va quindi
+usato un --interval più breve. Vedi `salon_tools/daily_stats.py` per
+il contenuto dei documenti.
+
+- update:  aggiornamento incrementale su una finestra mobile (es. da 7 giorni fa
+           a 30 giorni avanti). Trova le prenotazioni create o modificate dopo
+           l'ultimo watermark (`statsMeta/materializer`), ricalcola solo i giorni
+           toccati e crea i documenti mancanti della finestra. Con --interval resta
+           in esecuzione e ripete l'aggiornamento
+- rebuild: ricostruzione completa di un intervallo, con blocchi di date in parallelo
+
+Uso:
+    python scripts/daily-stats.py rebuild --from 2024-01-01 --to 2026-12-31 --workers 8
+    python scripts/daily-stats.py update --days-back 7 --days-ahead 30
+    python scripts/daily-stats.py update --interval 60
+
+Requisiti:
+- pip install firebase-admin python-dotenv
+"""
+import argparse
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta, timezone
+
+from salon_tools.booking_time import js_iso
+from salon_tools.daily_stats import (
+    STATS_COLLECTION,
+    STATS_META_COLLECTION,
+    STATS_META_DOC,
+    build_stats,
+    stats_doc_id,
+)
+from salon_tools.firebase import get_db
+from salon_tools.occupancy import DEFAULT_SALON_KEY
+from salon_tools.queries import commit_in_batches, date_range, iter_bookings, load_salon_config, split_date_range
+
+
+class ConfigCache:
+    """Configurazione per salone, letta una volta per esecuzione."""
+
+    def __init__(self, db):
+        self.db = db
+        self.configs = {}
+
+    def get(self, salon_key):
+        if salon_key not in self.configs:
+            salon_id = None if salon_key == DEFAULT_SALON_KEY else salon_key
+            self.configs[salon_key] = load_salon_config(self.db, salon_id)
+        return self.configs[salon_key]
+
+
+def stats_ref(db, salon_key, date_str):
+    return db.collection(STATS_COLLECTION).document(stats_doc_id(salon_key, date_str))
+
+
+def group_by_day(bookings, per_salon):
+    """(salonKey, date) -> prenotazioni; "default" copre tutte le prenotazioni della data."""
+    groups = defaultdict(list)
+    for booking in bookings:
+        if not booking.get("date"):
+            continue
+        groups[(DEFAULT_SALON_KEY, booking["date"])].append(booking)
+        if per_salon and booking.get("salonId"):
+            groups[(booking["salonId"], booking["date"])].append(booking)
+    return groups
+
+
+# ==================== REBUILD ====================
+
+def rebuild_chunk(db, configs, start_date, end_date, per_salon):
+    groups = group_by_day((data for _, data in iter_bookings(db, start_date, end_date)), per_salon)
+    # Anche i giorni senza prenotazioni, così la dashboard trova sempre il documento
+    for day in date_range(start_date, end_date):
+        groups.setdefault((DEFAULT_SALON_KEY, day), [])
+    operations = [
+        ("set", stats_ref(db, salon_key, day), build_stats(salon_key, day, bookings, configs.get(salon_key)))
+        for (salon_key, day), bookings in groups.items()
+    ]
+    commit_in_batches(db, operations)
+    return {"range": (start_date, end_date), "docs": len(operations),
+            "bookings": sum(len(b) for (k, _), b in groups.items() if k == DEFAULT_SALON_KEY)}
+
+
+def run_rebuild(args):
+    db = get_db()
+    configs = ConfigCache(db)
+    configs.get(DEFAULT_SALON_KEY)
+    chunks = list(split_date_range(args.start, args.end, args.chunk_days))
+    # Watermark preso prima delle letture: le modifiche concorrenti saranno riprese da update
+    watermark = js_iso(datetime.now(timezone.utc))
+    print(f"Ricostruzione {args.start} -> {args.end}: {len(chunks)} blocchi, {args.workers} worker")
+
+    started = time.perf_counter()
+    docs = 0
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        futures = [pool.submit(rebuild_chunk, db, configs, s, e, args.per_salon) for s, e in chunks]
+        for future in futures:
+            result = future.result()
+            docs += result["docs"]
+            start, end = result["range"]
+            print(f"  [OK] {start} -> {end}: {result['bookings']} prenotazioni, {result['docs']} documenti")
+
+    write_meta(db, watermark, docs, mode="rebuild")
+    print(f"\n[OK] {docs} documenti in {time.perf_counter() - started:.1f}s (watermark {watermark})")
+
+
+# ==================== UPDATE ====================
+
+def read_watermark(db):
+    snap = db.collection(STATS_META_COLLECTION).document(STATS_META_DOC).get()
+    return (snap.to_dict() or {}).get("watermark") if snap.exists else None
+
+
+def write_meta(db, watermark, docs, mode):
+    db.collection(STATS_META_COLLECTION).document(STATS_META_DOC).set({
+        "watermark": watermark,
+        "lastRunAt": datetime.now(timezone.utc).isoformat(),
+        "lastRunMode": mode,
+        "lastRunDocs": docs,
+    }, merge=True)
+
+
+def changed_days(db, since, window_start, window_end, per_salon):
+    """
+    Giorni (salonKey, date) con prenotazioni create o modificate da `since`:
+    due query a campo singolo (createdAt, updatedAt), limitate alla finestra.
+    """
+    keys = set()
+    for field in ("createdAt", "updatedAt"):
+        for doc in db.collection("bookings").where(field, ">=", since).stream():
+            data = doc.to_dict() or {}
+            day = data.get("date")
+            if not day or not (window_start <= day <= window_end):
+                continue
+            keys.add((DEFAULT_SALON_KEY, day))
+            if per_salon and data.get("salonId"):
+                keys.add((data["salonId"], day))
+    return keys
+
+
+def missing_days(db, window_start, window_end):
+    refs = [stats_ref(db, DEFAULT_SALON_KEY, day) for day in date_range(window_start, window_end)]
+    return {(DEFAULT_SALON_KEY, snap.id.split("_", 1)[1]) for snap in db.get_all(refs) if not snap.exists}
+
+
+def recompute_day(db, configs, salon_key, day):
+    query = db.collection("bookings").where("date", "==", day)
+    if salon_key != DEFAULT_SALON_KEY:
+        query = query.where("salonId", "==", salon_key)
+    bookings = [data for data in (doc.to_dict() for doc in query.stream()) if data]
+    return ("set", stats_ref(db, salon_key, day), build_stats(salon_key, day, bookings, configs.get(salon_key)))
+
+
+def update_once(db, args):
+    today = date.today()
+    window_start = (today - timedelta(days=args.days_back)).isoformat()
+    window_end = (today + timedelta(days=args.days_ahead)).isoformat()
+    configs = ConfigCache(db)
+
+    previous = read_watermark(db)
+    run_started = datetime.now(timezone.utc)
+    if previous:
+        # Sovrapposizione per scarti di orologio tra server e scritture in corso: ricalcolare è idempotente
+        since = js_iso(datetime.fromisoformat(previous) - timedelta(seconds=args.overlap))
+        keys = changed_days(db, since, window_start, window_end, args.per_salon)
+    else:
+        since = None
+        keys = {(DEFAULT_SALON_KEY, day) for day in date_range(window_start, window_end)}
+    keys |= missing_days(db, window_start, window_end)
+
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        operations = list(pool.map(lambda key: recompute_day(db, configs, *key), sorted(keys)))
+    commit_in_batches(db, operations)
+    write_meta(db, js_iso(run_started), len(operations), mode="update")
+    return {
+        "since": since,
+        "window": (window_start, window_end),
+        "days": sorted(stats_doc_id(salon, day) for salon, day in keys),
+    }
+
+
+def run_update(args):
+    db = get_db()
+    while True:
+        started = time.perf_counter()
+        result = update_once(db, args)
+        elapsed = time.perf_counter() - started
+        since = result["since"] or "nessun watermark (finestra completa)"
+        days = result["days"]
+        preview = ", ".join(days[:8]) + (" ..." if len(days) > 8 else "")
+        print(f"[OK] {datetime.now().strftime('%H:%M:%S')} da {since}: {len(days)} giorni ricalcolati "
+              f"in {elapsed:.1f}s {preview}", flush=True)
+        if not args.interval:
+            return
+        time.sleep(args.interval)
+
+
+# ==================== MAIN ====================
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Statistiche giornaliere precalcolate (stats/{salonId}_{date})")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    rebuild = sub.add_parser("rebuild", help="Ricostruisce un intervallo di date")
+    rebuild.add_argument("--from", dest="start", required=True, help="Data iniziale YYYY-MM-DD")
+    rebuild.add_argument("--to", dest="end", required=True, help="Data finale YYYY-MM-DD")
+    rebuild.add_argument("--workers", type=int, default=8, help="Blocchi di date elaborati in parallelo")
+    rebuild.add_argument("--chunk-days", type=int, default=7, help="Giorni per blocco")
+
+    update = sub.add_parser("update", help="Aggiornamento incrementale dal watermark")
+    update.add_argument("--days-back", type=int, default=7, help="Inizio della finestra mobile (giorni fa)")
+    update.add_argument("--days-ahead", type=int, default=30, help="Fine della finestra mobile (giorni avanti)")
+    update.add_argument("--overlap", type=int, default=120, help="Secondi riletti prima del watermark")
+    update.add_argument("--workers", type=int, default=8, help="Giorni ricalcolati in parallelo")
+    update.add_argument("--interval", type=float, default=0, help="Ripeti ogni N secondi (0 = una volta)")
+
+    for p in (rebuild, update):
+        p.add_argument("--per-salon", action="store_true",
+                       help="Anche documenti per salonId, oltre a quello 'default' per data")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.command == "rebuild":
+        run_rebuild(args)
+    else:
+        run_update(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+"""
+Previsione della domanda per giorno della settimana × slot e risorse consigliate.
+
+`SalonConfig.resources` è uguale per tutte le ore: il personale è troppo la
+mattina e manca il sabato pomeriggio. Per ogni salone lo script:
+
+1. legge lo storico delle richieste (una query per intervallo di date, solo i
+   campi usati) e costruisce il carico settimane × giorno × slot di `timeStep`
+2. confronta con un backtest a una settimana exponential smoothing (più alpha),
+   media storica e settimana precedente, e sceglie il modello con WAPE minore
+3. calcola le risorse consigliate per slot (quantile di Poisson del carico
+   previsto al --service-level) per le prossime --horizon settimane
+
+Dettagli dei modelli in `salon_tools/forecast.py`. Con --write-firestore il
+risultato va in `forecasts/{salonId}`; le richieste senza `salonId` formano
+il salone "default" con la configurazione del primo salone.
+
+Uso:
+    python scripts/demand-forecast.py --weeks 26 --horizon 4
+    python scripts/demand-forecast.py --salon <salonId> --service-level 0.95 --json forecast.json
+    python scripts/demand-forecast.py --write-firestore                 # job notturno
+    python scripts/demand-forecast.py --synthetic 200                   # tempi su 200 saloni sintetici
+
+Requisiti:
+- pip install firebase-admin python-dotenv numpy pandas
+"""
+import argparse
+import json
+import time
+from datetime import date, datetime, timedelta, timezone
+
+import numpy as np
+import pandas as pd
+
+from salon_tools.analytics import hhmm_to_minutes
+from salon_tools.booking_time import js_iso
+from salon_tools.forecast import DEMAND_STATUSES, forecast_salon, history_window, synthetic_requests
+from salon_tools.occupancy import DEFAULT_SALON_KEY
+from salon_tools.rules import merge_config
+
+FORECASTS_COLLECTION = "forecasts"
+REQUEST_FIELDS = ("date", "startTime", "endTime", "startMin", "endMin", "status", "salonId")
+WEEKDAYS = ("Dom", "Lun", "Mar", "Mer", "Gio", "Ven", "Sab")
+
+
+# ==================== SORGENTI ====================
+
+def load_requests(db, first_day, end_day):
+    """Richieste dell'intervallo come DataFrame (salone, giorni dall'inizio, minuti di inizio e fine)."""
+    from salon_tools.queries import bookings_query
+
+    query = bookings_query(db, first_day.isoformat(), end_day.isoformat()).select(list(REQUEST_FIELDS))
+    columns = {field: [] for field in REQUEST_FIELDS}
+    for doc in query.stream():
+        data = doc.to_dict() or {}
+        for field in REQUEST_FIELDS:
+            columns[field].append(data.get(field))
+    df = pd.DataFrame(columns)
+    df = df[df["status"].isin(DEMAND_STATUSES)]
+    day = pd.to_datetime(df["date"], format="%Y-%m-%d", errors="coerce")
+    start = pd.to_numeric(df["startMin"], errors="coerce").fillna(pd.Series(hhmm_to_minutes(df["startTime"]),
+                                                                            index=df.index))
+    end = pd.to_numeric(df["endMin"], errors="coerce").fillna(pd.Series(hhmm_to_minutes(df["endTime"]),
+                                                                        index=df.index))
+    frame = pd.DataFrame({
+        "salonId": df["salonId"].fillna(DEFAULT_SALON_KEY).astype(object),
+        "offset": (day - pd.Timestamp(first_day)).dt.days,
+        "start": start,
+        "end": end,
+    }).dropna()
+    return frame
+
+
+# ==================== OUTPUT ====================
+
+def forecast_doc(salon_id, result, config, args, now):
+    """Documento `forecasts/{salonId}`: mappe giorno della settimana -> array per slot (niente array annidati)."""
+    def by_weekday(values, digits=None):
+        return {str(w): [round(float(v), digits) if digits is not None else int(v) for v in row]
+                for w, row in sorted(values.items())}
+
+    chosen = result["metrics"][result["model"]]
+    return {
+        "salonId": salon_id,
+        "from": result["from"],
+        "to": result["to"],
+        "horizonWeeks": args.horizon,
+        "serviceLevel": args.service_level,
+        "currentResources": config["resources"],
+        "timeStep": config["timeStep"],
+        "slots": result["slots"],
+        "model": result["model"],
+        "backtest": {"weeks": args.backtest_weeks, **chosen, "models": result["metrics"]},
+        "expected": by_weekday(result["expected"], 3),
+        "resources": by_weekday(result["resources"]),
+        "upcoming": result["upcoming"],
+        "generatedAt": now,
+    }
+
+
+def print_forecast(salon_id, result, config):
+    chosen = result["metrics"][result["model"]]
+    baseline = result["metrics"]["mean"]
+    print(f"\n{salon_id}: modello {result['model']} (WAPE {chosen.get('wape')}, MAE {chosen.get('mae')}, "
+          f"copertura {chosen.get('coverage')}; media storica WAPE {baseline.get('wape')})")
+    slots = result["slots"]
+    current = config["resources"]
+    closed_weekdays = set(config.get("closedDaysOfWeek") or [])
+    for weekday in (1, 2, 3, 4, 5, 6, 0):
+        if weekday in closed_weekdays:
+            continue
+        resources = result["resources"][weekday]
+        hours = {}
+        for slot, value in zip(slots, resources):
+            hours[slot[:2]] = max(hours.get(slot[:2], 0), int(value))
+        profile = " ".join(f"{hour}:{value}" for hour, value in hours.items())
+        under = int((resources > current).sum())
+        over = int((resources < current).sum())
+        print(f"  {WEEKDAYS[weekday]}  {profile}  | sotto {under}, sopra {over} slot (attuale {current})")
+
+
+def result_json(salon_id, result):
+    return {
+        "salonId": salon_id,
+        **{k: v for k, v in result.items() if k not in ("expected", "resources", "historyMean", "historyPeak")},
+        **{key: {str(w): np.round(row, 3).tolist() for w, row in result[key].items()}
+           for key in ("expected", "resources", "historyMean", "historyPeak")},
+    }
+
+
+# ==================== MAIN ====================
+
+def run_synthetic(args, end_day):
+    config = merge_config({"openingTime": "09:00", "closingTime": "20:00", "closedDaysOfWeek": [0]})
+    started = time.perf_counter()
+    data = [synthetic_requests(args.weeks, end_day, config, daily_requests=30 + i % 40, seed=i)
+            for i in range(args.synthetic)]
+    requests = sum(len(offsets) for offsets, _, _ in data)
+    print(f"Generate {requests} richieste per {args.synthetic} saloni in {time.perf_counter() - started:.1f}s")
+    started = time.perf_counter()
+    results = [forecast_salon(*item, config, end_day, args.weeks, args.backtest_weeks, args.service_level,
+                              args.horizon, args.min_resources) for item in data]
+    elapsed = time.perf_counter() - started
+    print_forecast("salone-0", results[0], config)
+    wapes = [r["metrics"][r["model"]].get("wape") or 0 for r in results]
+    models = pd.Series([r["model"] for r in results]).value_counts().to_dict()
+    print(f"\n{args.synthetic} saloni in {elapsed:.2f}s ({elapsed / args.synthetic * 1000:.1f} ms/salone), "
+          f"WAPE medio {np.mean(wapes):.3f}, modelli {models}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Previsione della domanda e risorse consigliate per slot")
+    parser.add_argument("--salon", action="append", default=[], help="Solo questo salonId (ripetibile)")
+    parser.add_argument("--to", dest="end", help="Ultimo giorno di storico YYYY-MM-DD (default: ieri)")
+    parser.add_argument("--weeks", type=int, default=26, help="Settimane di storico")
+    parser.add_argument("--backtest-weeks", type=int, default=8, help="Settimane valutate nel backtest")
+    parser.add_argument("--horizon", type=int, default=4, help="Settimane previste")
+    parser.add_argument("--service-level", type=float, default=0.9,
+                        help="Probabilità che le risorse consigliate coprano la domanda di uno slot")
+    parser.add_argument("--min-resources", type=int, default=1, help="Risorse minime negli slot aperti")
+    parser.add_argument("--json", metavar="FILE", help="Scrive le previsioni in un file JSON")
+    parser.add_argument("--write-firestore", action="store_true",
+                        help=f"Salva le previsioni in {FORECASTS_COLLECTION}/{{salonId}}")
+    parser.add_argument("--synthetic", type=int, metavar="N", help="N saloni con richieste casuali (solo tempi)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.weeks <= args.backtest_weeks:
+        raise SystemExit("[ERR] --weeks deve essere maggiore di --backtest-weeks")
+    end_day = date.fromisoformat(args.end) if args.end else date.today() - timedelta(days=1)
+    if args.synthetic:
+        run_synthetic(args, end_day)
+        return
+
+    from salon_tools.firebase import get_db
+    from salon_tools.queries import load_salon_configs
+
+    started = time.perf_counter()
+    db = get_db()
+    first_day = history_window(end_day, args.weeks)
+    frame = load_requests(db, first_day, end_day)
+    salon_ids = sorted(args.salon or frame["salonId"].unique())
+    configs = load_salon_configs(db, salon_ids, DEFAULT_SALON_KEY)
+    print(f"Richieste {first_day.isoformat()} -> {end_day.isoformat()}: {len(frame)} "
+          f"({time.perf_counter() - started:.1f}s)")
+
+    now = js_iso(datetime.now(timezone.utc))
+    docs, output = {}, []
+    step = time.perf_counter()
+    groups = dict(tuple(frame.groupby("salonId", sort=False)))
+    for salon_id in salon_ids:
+        if salon_id not in configs:
+            print(f"[WARN] {salon_id}: salone non trovato, saltato")
+            continue
+        group = groups.get(salon_id, frame.iloc[:0])
+        config = configs[salon_id]
+        result = forecast_salon(
+            group["offset"].to_numpy(dtype="int64"), group["start"].to_numpy(dtype="float64"),
+            group["end"].to_numpy(dtype="float64"), config, end_day, args.weeks, args.backtest_weeks,
+            args.service_level, args.horizon, args.min_resources,
+        )
+        print_forecast(salon_id, result, config)
+        docs[salon_id] = forecast_doc(salon_id, result, config, args, now)
+        output.append(result_json(salon_id, result))
+    print(f"\n{len(docs)} saloni previsti in {time.perf_counter() - step:.2f}s")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as handle:
+            json.dump(output, handle, ensure_ascii=False, indent=2)
+        print(f"[OK] Previsioni scritte in {args.json}")
+    if args.write_firestore and docs:
+        from salon_tools.queries import commit_in_batches
+
+        collection = db.collection(FORECASTS_COLLECTION)
+        commit_in_batches(db, [("set", collection.document(salon_id), doc) for salon_id, doc in docs.items()])
+        print(f"[OK] {len(docs)} documenti in {FORECASTS_COLLECTION}/")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+"""
+Esporta `bookings`, `customers` e `services` in file Arrow IPC/Feather per i notebook.
+
+Invece di rileggere Firestore a ogni riavvio del notebook, le tre collezioni
+vengono materializzate una volta in `--out` (default `data/arrow/`) come file
+non compressi con stringhe codificate a dizionario e date/orari interi (vedi
+`salon_tools/arrow_store.py`). Nel notebook:
+
+    import sys; sys.path.insert(0, "scripts")
+    from salon_tools.arrow_store import open_dataset, to_pandas
+    tables = open_dataset("data/arrow")          # mmap, nessuna copia
+    bookings = to_pandas(tables["bookings"], ["date", "startMin", "status", "servicePrice"])
+
+`info` apre il dataset e misura l'apertura in memory map rispetto alla lettura
+completa, verificando che l'apertura non allochi memoria.
+
+Uso:
+    python scripts/export-arrow.py export --out data/arrow
+    python scripts/export-arrow.py export --out /tmp/arrow --synthetic 5000000
+    python scripts/export-arrow.py info --dir data/arrow
+
+Requisiti:
+- pip install firebase-admin python-dotenv numpy pandas pyarrow
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from pathlib import Path
+
+from salon_tools.arrow_store import (
+    SOURCE_FIELDS,
+    bookings_batch,
+    open_dataset,
+    read_manifest,
+    record_batches,
+    write_manifest,
+    write_table,
+)
+
+DEFAULT_OUT = "data/arrow"
+
+
+def stream_collection(db, name):
+    query = db.collection(name).select(list(SOURCE_FIELDS[name]))
+    return ((snap.id, snap.to_dict() or {}) for snap in query.stream())
+
+
+def export_firestore(out):
+    from salon_tools.firebase import get_db
+
+    db = get_db()
+    services_docs = list(stream_collection(db, "services"))
+    services = {doc_id: data for doc_id, data in services_docs}
+    rows = {"services": write_table(out / "services.arrow", "services", record_batches("services", services_docs))}
+
+    def export(name):
+        started = time.perf_counter()
+        count = write_table(out / f"{name}.arrow", name,
+                            record_batches(name, stream_collection(db, name), services))
+        return name, count, time.perf_counter() - started
+
+    # Le due collezioni grandi in parallelo: il tempo è dominato dalla rete
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        for name, count, elapsed in pool.map(export, ("bookings", "customers")):
+            rows[name] = count
+            print(f"   {name}: {count:,} righe in {elapsed:.1f}s")
+    return rows
+
+
+def export_synthetic(out, n, seed):
+    """Dataset sintetico di `n` prenotazioni (nessun accesso a Firestore) per misurare dimensioni e tempi."""
+    import numpy as np
+
+    from salon_tools.analytics import synthetic_bookings
+    from salon_tools.rules import merge_config
+
+    services = {
+        "taglio": {"name": "Taglio", "category": "Capelli", "duration": 30, "price": 25, "active": True},
+        "colore": {"name": "Colore", "category": "Capelli", "duration": 90, "price": 60, "active": True},
+        "manicure": {"name": "Manicure", "category": "Unghie", "duration": 45, "price": 25, "active": True},
+        "pulizia-viso": {"name": "Pulizia viso", "category": "Estetica", "duration": 60, "price": 50, "active": True},
+        "ceretta": {"name": "Ceretta gambe", "category": "Depilazione", "duration": 30, "price": 20, "active": True},
+    }
+    end = date.today()
+    df = synthetic_bookings(n, (end - timedelta(days=3 * 365)).isoformat(), end.isoformat(), merge_config(), services,
+                            seed=seed)
+    rng = np.random.default_rng(seed)
+    customers = max(1, n // 20)
+    df["customerId"] = np.char.add("c", rng.integers(0, customers, n).astype(str))
+    for field in ("startMin", "endMin", "seriesId", "updatedAt"):
+        df[field] = None
+
+    def chunks():
+        for offset in range(0, n, 100_000):
+            part = df.iloc[offset:offset + 100_000]
+            columns = {field: part[field].tolist() for field in SOURCE_FIELDS["bookings"]}
+            columns["id"] = [f"b{i}" for i in range(offset, offset + len(part))]
+            yield columns
+
+    rows = {
+        "services": write_table(out / "services.arrow", "services",
+                                record_batches("services", list(services.items()))),
+        "bookings": write_table(out / "bookings.arrow", "bookings",
+                                (bookings_batch(columns, services) for columns in chunks())),
+    }
+    return rows
+
+
+def run_export(args):
+    out = Path(args.out)
+    out.mkdir(parents=True, exist_ok=True)
+    started = time.perf_counter()
+    if args.synthetic:
+        rows = export_synthetic(out, args.synthetic, args.seed)
+        source = f"synthetic:{args.synthetic}"
+    else:
+        rows = export_firestore(out)
+        source = "firestore"
+    manifest = write_manifest(out, rows, source)
+    print(f"\n[OK] Dataset scritto in {out} in {time.perf_counter() - started:.1f}s")
+    for name, table in manifest["tables"].items():
+        print(f"   {table['file']:<16} {table['rows']:>12,} righe {table['bytes'] / 1e6:>10.1f} MB")
+
+
+def run_info(args):
+    import pyarrow as pa
+    import pyarrow.feather as feather
+
+    directory = Path(args.dir)
+    manifest = read_manifest(directory)
+    if manifest is None:
+        print(f"[ERR] Nessun dataset in {directory}: eseguire prima `export`")
+        return
+    print(f"Dataset v{manifest['version']} ({manifest['source']}), generato {manifest['generatedAt']}\n")
+
+    allocated = pa.total_allocated_bytes()
+    started = time.perf_counter()
+    tables = open_dataset(directory)
+    open_ms = (time.perf_counter() - started) * 1000
+    copied = pa.total_allocated_bytes() - allocated
+    print(f"Apertura in memory map: {open_ms:.1f} ms, memoria allocata {copied / 1e6:.1f} MB")
+
+    for name, table in tables.items():
+        started = time.perf_counter()
+        feather.read_table(directory / f"{name}.arrow", memory_map=False)
+        read_ms = (time.perf_counter() - started) * 1000
+        print(f"   {name:<10} {table.num_rows:>12,} righe, {table.num_columns} colonne, "
+              f"lettura completa {read_ms:.0f} ms")
+        for field in table.schema:
+            if pa.types.is_dictionary(field.type):
+                values = table.column(field.name).chunk(0).dictionary if table.num_rows else []
+                print(f"      {field.name:<20} dizionario di {len(values)} valori")
+
+    if "bookings" in tables and tables["bookings"].num_rows:
+        import pyarrow.compute as pc
+
+        bookings = tables["bookings"]
+        started = time.perf_counter()
+        counts = pc.value_counts(bookings.column("status"))
+        print(f"\nConteggio per status su {bookings.num_rows:,} righe mappate: "
+              f"{(time.perf_counter() - started) * 1000:.1f} ms")
+        for item in counts.to_pylist():
+            print(f"   {item['values'] or '-':<22} {item['counts']:>12,}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Dataset Arrow IPC/Feather delle prenotazioni per le analisi")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    export = sub.add_parser("export", help="Materializza le collezioni in file Arrow")
+    export.add_argument("--out", default=DEFAULT_OUT, help=f"Directory di output (default {DEFAULT_OUT})")
+    export.add_argument("--synthetic", type=int, metavar="N", help="N prenotazioni sintetiche, senza Firestore")
+    export.add_argument("--seed", type=int, default=0)
+
+    info = sub.add_parser("info", help="Apre il dataset e misura apertura e lettura")
+    info.add_argument("--dir", default=DEFAULT_OUT, help=f"Directory del dataset (default {DEFAULT_OUT})")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.command == "export":
+        run_export(args)
+    else:
+        run_info(args)
+
+
+if __name__ == "__main__":
+    main()
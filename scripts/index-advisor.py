@@ -0,0 +1,177 @@
+"""
+Analisi delle forme delle query e consigli sugli indici di `firestore.indexes.json`.
+
+Estrae in modo statico le query Firestore di `app/`, `lib/` e `scripts/`
+(vedi `salon_tools/index_advisor.py`), calcola l'indice composto che ognuna
+richiede e lo confronta con gli indici dichiarati. Riporta:
+
+- indici mancanti: query che in produzione fallirebbero con FAILED_PRECONDITION
+- indici duplicati e indici a un solo campo (già automatici in Firestore)
+- indici non usati da nessuna query trovata: costano scritture e storage
+- query ordinate in memoria "per evitare l'indice"
+
+Con --write scrive il file corretto (senza duplicati, indici a un campo e non
+usati, con i mancanti); --keep-unused conserva gli indici non usati, ad
+esempio se servono a query costruite fuori da questo repository. Con --check
+esce con codice 1 se il file dichiarato va corretto (per la CI).
+
+Il confronto tra indice richiesto e dichiarato è esatto (stessi campi nello
+stesso ordine, uguaglianze in qualsiasi ordine): Firestore può a volte servire
+una query con un indice più lungo o unendo indici, ma il deploy dell'indice
+esatto è la scelta sicura.
+
+Uso:
+    python scripts/index-advisor.py
+    python scripts/index-advisor.py --json
+    python scripts/index-advisor.py --write firestore.indexes.json
+    python scripts/index-advisor.py --check
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+
+from salon_tools.firebase import PROJECT_ROOT
+from salon_tools.index_advisor import (
+    analyze,
+    corrected_spec,
+    describe_fields,
+    extract_all,
+    index_key,
+    load_index_file,
+    to_index,
+)
+
+
+def describe_index(index):
+    return f"{index['collectionGroup']}({describe_fields(index_key(index['collectionGroup'], None, index['fields'])[2])})"
+
+
+def describe_shape(shape):
+    parts = [f"{field} {op}" for field, op in shape["filters"]]
+    parts += [f"orderBy {field} {direction}" for field, direction in shape["orders"]]
+    if shape["limit"]:
+        parts.append("limit")
+    return f"{shape['collection']}[{', '.join(parts)}]"
+
+
+def location(shape):
+    return f"{shape['source']}:{shape['line']} ({shape['function']})"
+
+
+def print_report(report, shapes_count):
+    declared = report["declared"]
+    counts = {}
+    for entry in report["queries"]:
+        counts[entry["status"]] = counts.get(entry["status"], 0) + 1
+    print(f"Query trovate: {shapes_count} "
+          f"(indice composto: {counts.get('covered', 0) + counts.get('missing', 0)}, "
+          f"campo singolo: {counts.get('single-field', 0)}, dinamiche: {counts.get('dynamic', 0)})")
+    print(f"Indici dichiarati: {len(declared)}\n")
+
+    print("Query con indice composto:")
+    for entry in report["queries"]:
+        if entry["status"] not in ("covered", "dynamic", "missing"):
+            continue
+        tag = {"covered": "[OK]  ", "dynamic": "[DYN] ", "missing": "[MISS]"}[entry["status"]]
+        required = describe_fields(entry["required"]) if entry["required"] else "-"
+        print(f"   {tag} {describe_shape(entry['shape'])}")
+        print(f"          {location(entry['shape'])} -> ({required})")
+
+    if report["missing"]:
+        print("\n[ERR] Indici mancanti:")
+        for (collection, fields), shapes in sorted(report["missing"].items()):
+            print(f"   - {describe_index(to_index(collection, list(fields)))}")
+            for shape in shapes:
+                print(f"       {location(shape)}")
+    if report["duplicates"]:
+        print("\n[WARN] Indici duplicati:")
+        for pos, original in report["duplicates"]:
+            print(f"   - #{pos} {describe_index(declared[pos][2])} (uguale a #{original})")
+    if report["singleField"]:
+        print("\n[WARN] Indici a un solo campo (automatici, non vanno dichiarati):")
+        for pos in report["singleField"]:
+            print(f"   - #{pos} {describe_index(declared[pos][2])}")
+    if report["unused"]:
+        print("\n[WARN] Indici non usati dalle query trovate:")
+        for pos in report["unused"]:
+            print(f"   - #{pos} {describe_index(declared[pos][2])}")
+
+    in_memory = [entry["shape"] for entry in report["queries"] if entry["shape"]["inMemorySort"]]
+    if in_memory:
+        print("\n[INFO] Funzioni che ordinano in memoria per evitare un indice:")
+        for shape in in_memory:
+            print(f"   - {location(shape)} {describe_shape(shape)}")
+
+
+def json_report(report):
+    declared = report["declared"]
+    return {
+        "queries": [
+            {
+                "source": entry["shape"]["source"],
+                "line": entry["shape"]["line"],
+                "function": entry["shape"]["function"],
+                "collection": entry["shape"]["collection"],
+                "filters": entry["shape"]["filters"],
+                "orders": entry["shape"]["orders"],
+                "limit": entry["shape"]["limit"],
+                "inMemorySort": entry["shape"]["inMemorySort"],
+                "required": entry["required"],
+                "status": entry["status"],
+                "index": entry["index"],
+            }
+            for entry in report["queries"]
+        ],
+        "missing": [
+            {"collection": collection, "fields": list(fields),
+             "queries": [location(shape) for shape in shapes]}
+            for (collection, fields), shapes in sorted(report["missing"].items())
+        ],
+        "duplicates": [{"index": pos, "duplicateOf": original, "description": describe_index(declared[pos][2])}
+                       for pos, original in report["duplicates"]],
+        "singleField": [{"index": pos, "description": describe_index(declared[pos][2])}
+                        for pos in report["singleField"]],
+        "unused": [{"index": pos, "description": describe_index(declared[pos][2])} for pos in report["unused"]],
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Consigli sugli indici Firestore dalle forme delle query")
+    parser.add_argument("--indexes", type=Path, default=PROJECT_ROOT / "firestore.indexes.json",
+                        help="File degli indici da confrontare")
+    parser.add_argument("--root", type=Path, default=PROJECT_ROOT, help="Radice del progetto da analizzare")
+    parser.add_argument("--json", action="store_true", help="Report in JSON")
+    parser.add_argument("--write", type=Path, metavar="PATH", help="Scrive il file degli indici corretto")
+    parser.add_argument("--keep-unused", action="store_true", help="Con --write conserva gli indici non usati")
+    parser.add_argument("--check", action="store_true",
+                        help="Esce con codice 1 se ci sono indici mancanti, duplicati, a un campo o non usati")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    spec = load_index_file(args.indexes)
+    shapes = extract_all(args.root)
+    report = analyze(shapes, spec)
+
+    if args.json:
+        print(json.dumps(json_report(report), indent=2, ensure_ascii=False))
+    else:
+        print_report(report, len(shapes))
+
+    if args.write:
+        corrected = corrected_spec(spec, report, keep_unused=args.keep_unused)
+        args.write.write_text(json.dumps(corrected, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+        if not args.json:
+            print(f"\n[OK] {args.write}: {len(corrected['indexes'])} indici "
+                  f"(prima {len(spec.get('indexes', []))}). Deploy: firebase deploy --only firestore:indexes")
+
+    if args.check:
+        problems = report["missing"] or report["duplicates"] or report["singleField"] \
+            or (report["unused"] and not args.keep_unused)
+        sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()
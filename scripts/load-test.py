@@ -0,0 +1,462 @@
+"""
+Load test HTTP per il server Next.js (endpoint di health, pagina /book e server actions).
+
+Esegue uno scenario (file JSON in scripts/loadtest-scenarios/) contro un server
+avviato in locale (`pnpm dev` o `pnpm build && pnpm start`) con
+LOADTEST_API_ENABLED=true, così che le server actions `getActiveServices`,
+`getAvailableSlots` e `createBooking` siano raggiungibili via POST /api/loadtest.
+Se sul server è impostato LOADTEST_API_TOKEN (obbligatorio in produzione), lo
+stesso valore va in LOADTEST_API_TOKEN qui: viene inviato nell'header
+`x-loadtest-token`.
+
+Modalità:
+- closed: N utenti virtuali ripetono lo scenario (con think time) in loop
+- open:   nuove iterazioni dello scenario avviate a un tasso fisso (arrivi di
+          Poisson), indipendentemente dai tempi di risposta; la latenza è misurata
+          dall'istante pianificato (niente coordinated omission)
+
+Il carico segue una rampa a stadi: "--stages 30:10,60:10,15:0" = 30s per salire
+a 10 (utenti o iterazioni/s), 60s stabili, 15s per scendere a 0.
+
+Formato scenario:
+    {
+      "name": "booking-funnel",
+      "variables": {"daysAhead": [1, 14]},
+      "steps": [
+        {"name": "services", "action": "getActiveServices", "args": [],
+         "extract": {"service": "result[random]"}},
+        {"name": "slots", "action": "getAvailableSlots", "args": ["{{date}}", "{{service.duration}}"],
+         "extract": {"startTime": "result[random]"}},
+        {"name": "book", "action": "createBooking",
+         "args": [{"serviceId": "{{service.id}}", "date": "{{date}}",
+                   "startTime": "{{startTime}}", "userId": "{{userId}}"}],
+         "expect": "result.success"},
+        {"name": "health", "method": "GET", "path": "/api/health"}
+      ]
+    }
+Ogni step è una richiesta HTTP (`method` + `path`) oppure una server action
+(`action` + `args`). `{{var}}` e `{{var.campo}}` sono sostituiti con le variabili
+dell'iterazione: `date` (oggi + daysAhead casuale), `userId`, `vu` e quelle
+estratte con `extract` (percorso con indici `[0]`, `[-1]`, `[random]`). Se un
+estrattore non trova valori (es. nessuno slot libero) l'iterazione termina.
+
+Uso:
+    python scripts/load-test.py scripts/loadtest-scenarios/health.json --mode open --stages 10:50,30:50
+    python scripts/load-test.py scripts/loadtest-scenarios/booking-funnel.json --mode closed \\
+        --stages 15:10,60:10 --json report.json --csv steps.csv
+
+Requisiti:
+- pip install aiohttp
+"""
+import argparse
+import asyncio
+import csv
+import json
+import os
+import random
+import re
+import sys
+import time
+import uuid
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+from urllib.parse import urlparse
+
+from salon_tools.firebase import load_env
+from salon_tools.latency import LatencyHistogram
+
+LOCAL_HOSTS = {"localhost", "127.0.0.1", "::1", "0.0.0.0"}
+TEMPLATE = re.compile(r"\{\{\s*([\w.]+)\s*\}\}")
+PATH_TOKEN = re.compile(r"([^.\[\]]+)|\[(-?\d+|random)\]")
+
+
+class IterationAborted(Exception):
+    """L'iterazione dello scenario non può proseguire (es. nessuno slot disponibile)."""
+
+
+# ==================== SCENARIO ====================
+
+def load_scenario(path):
+    scenario = json.loads(Path(path).read_text(encoding="utf-8"))
+    if not scenario.get("steps"):
+        raise ValueError("Lo scenario non contiene steps")
+    for i, step in enumerate(scenario["steps"]):
+        step.setdefault("name", f"step-{i + 1}")
+        if "action" not in step and "path" not in step:
+            raise ValueError(f"Step {step['name']}: serve 'action' oppure 'path'")
+    return scenario
+
+
+def lookup(value, path):
+    """Risolve un percorso tipo `result[random].id` su un valore JSON."""
+    for key, index in PATH_TOKEN.findall(path):
+        if key:
+            if not isinstance(value, dict) or key not in value:
+                return None
+            value = value[key]
+        else:
+            if not isinstance(value, list) or not value:
+                return None
+            if index == "random":
+                value = random.choice(value)
+            elif -len(value) <= int(index) < len(value):
+                value = value[int(index)]
+            else:
+                return None
+        if value is None:
+            return None
+    return value
+
+
+def render(template, variables):
+    """Sostituisce i `{{var}}`; un valore composto solo da un placeholder mantiene il tipo."""
+    if isinstance(template, str):
+        whole = TEMPLATE.fullmatch(template.strip())
+        if whole:
+            return lookup(variables, whole.group(1))
+        return TEMPLATE.sub(lambda m: str(lookup(variables, m.group(1))), template)
+    if isinstance(template, list):
+        return [render(item, variables) for item in template]
+    if isinstance(template, dict):
+        return {key: render(item, variables) for key, item in template.items()}
+    return template
+
+
+def iteration_variables(scenario, vu):
+    low, high = scenario.get("variables", {}).get("daysAhead", [1, 14])
+    return {
+        "date": (date.today() + timedelta(days=random.randint(low, high))).isoformat(),
+        "userId": f"loadtest-{uuid.uuid4().hex[:12]}",
+        "vu": vu,
+    }
+
+
+# ==================== METRICHE ====================
+
+class StepStats:
+    def __init__(self):
+        self.hist = LatencyHistogram()
+        self.ok = 0
+        self.failed = 0
+        self.statuses = {}
+        self.errors = {}
+
+    def record(self, latency_ms, status, error=None):
+        self.hist.record_ms(latency_ms)
+        self.statuses[str(status)] = self.statuses.get(str(status), 0) + 1
+        if error:
+            self.failed += 1
+            self.errors[error] = self.errors.get(error, 0) + 1
+        else:
+            self.ok += 1
+
+
+class Metrics:
+    def __init__(self, window_s):
+        self.steps = {}
+        self.iterations = {"started": 0, "completed": 0, "aborted": 0, "failed": 0}
+        self.iteration_hist = LatencyHistogram()
+        self.window_s = window_s
+        self.timeline = {}
+        self.started = time.perf_counter()
+
+    def step(self, name):
+        return self.steps.setdefault(name, StepStats())
+
+    def record(self, name, latency_ms, status, error=None):
+        self.step(name).record(latency_ms, status, error)
+        window = int((time.perf_counter() - self.started) // self.window_s)
+        slot = self.timeline.setdefault(window, {"requests": 0, "errors": 0, "hist": LatencyHistogram()})
+        slot["requests"] += 1
+        slot["errors"] += 1 if error else 0
+        slot["hist"].record_ms(latency_ms)
+
+
+# ==================== ESECUZIONE ====================
+
+class Runner:
+    def __init__(self, session, base_url, scenario, metrics):
+        self.session = session
+        self.base_url = base_url.rstrip("/")
+        self.scenario = scenario
+        self.metrics = metrics
+
+    async def run_step(self, step, variables, scheduled_at):
+        if "action" in step:
+            method, url = "POST", self.base_url + "/api/loadtest"
+            payload = {"action": step["action"], "args": render(step.get("args", []), variables)}
+        else:
+            method, url = step.get("method", "GET").upper(), self.base_url + render(step["path"], variables)
+            payload = render(step["body"], variables) if "body" in step else None
+
+        started = scheduled_at if scheduled_at is not None else time.perf_counter()
+        status, body, error = 0, None, None
+        try:
+            async with self.session.request(method, url, json=payload) as response:
+                status = response.status
+                if "json" in response.headers.get("Content-Type", ""):
+                    body = await response.json()
+                else:
+                    await response.read()
+                if status >= 400:
+                    error = f"HTTP {status}"
+        except asyncio.TimeoutError:
+            error = "timeout"
+        except Exception as e:
+            error = type(e).__name__
+        latency_ms = (time.perf_counter() - started) * 1000
+
+        if not error and step.get("expect") and not lookup(body, step["expect"]):
+            error = f"expect {step['expect']}"
+        self.metrics.record(step["name"], latency_ms, status, error)
+        return body, error
+
+    async def run_iteration(self, vu, scheduled_at=None):
+        metrics = self.metrics
+        metrics.iterations["started"] += 1
+        variables = iteration_variables(self.scenario, vu)
+        started = scheduled_at if scheduled_at is not None else time.perf_counter()
+        try:
+            for i, step in enumerate(self.scenario["steps"]):
+                # Solo il primo step eredita l'istante pianificato (modalità open)
+                body, error = await self.run_step(step, variables, scheduled_at if i == 0 else None)
+                if error:
+                    metrics.iterations["failed"] += 1
+                    return
+                for name, path in step.get("extract", {}).items():
+                    value = lookup(body, path)
+                    if value is None:
+                        raise IterationAborted(name)
+                    variables[name] = value
+                if step.get("thinkTimeMs"):
+                    await asyncio.sleep(random.expovariate(1000 / step["thinkTimeMs"]))
+        except IterationAborted:
+            metrics.iterations["aborted"] += 1
+            return
+        metrics.iterations["completed"] += 1
+        metrics.iteration_hist.record_ms((time.perf_counter() - started) * 1000)
+
+
+def parse_stages(text):
+    stages = []
+    for part in text.split(","):
+        duration, target = part.split(":")
+        stages.append((float(duration), float(target)))
+    return stages
+
+
+def target_at(stages, elapsed, start_value=0.0):
+    """Valore della rampa a stadi (interpolazione lineare) al tempo `elapsed`; None a fine rampa."""
+    previous = start_value
+    for duration, target in stages:
+        if elapsed < duration:
+            return previous + (target - previous) * (elapsed / duration if duration else 1)
+        elapsed -= duration
+        previous = target
+    return None
+
+
+async def run_closed(runner, stages):
+    """Utenti virtuali: ognuno ripete lo scenario finché il target della rampa lo include."""
+    started = time.perf_counter()
+    users = {}
+
+    async def user_loop(vu):
+        while True:
+            target = target_at(stages, time.perf_counter() - started)
+            if target is None or vu >= round(target):
+                return
+            await runner.run_iteration(vu)
+
+    while True:
+        target = target_at(stages, time.perf_counter() - started)
+        if target is None:
+            break
+        for vu in range(round(target)):
+            if vu not in users or users[vu].done():
+                users[vu] = asyncio.create_task(user_loop(vu))
+        await asyncio.sleep(0.1)
+    await asyncio.gather(*users.values())
+
+
+async def run_open(runner, stages, max_in_flight, tick_s=0.1):
+    """
+    Arrivi di Poisson al tasso della rampa; le iterazioni oltre `max_in_flight`
+    vengono scartate. Il tasso viene rivalutato almeno ogni `tick_s`: se il
+    prossimo arrivo cade oltre il tick si ricampiona (l'esponenziale è senza memoria).
+    """
+    started = time.perf_counter()
+    in_flight = set()
+    dropped = 0
+    next_at = started
+    vu = 0
+    while True:
+        rate = target_at(stages, next_at - started)
+        if rate is None:
+            break
+        gap = random.expovariate(rate) if rate > 0 else float("inf")
+        next_at += min(gap, tick_s)
+        # Cede sempre il controllo al loop, anche quando si è in ritardo sul piano
+        await asyncio.sleep(max(0.0, next_at - time.perf_counter()))
+        if gap > tick_s:
+            continue
+        if len(in_flight) >= max_in_flight:
+            dropped += 1
+            continue
+        task = asyncio.create_task(runner.run_iteration(vu, scheduled_at=next_at))
+        in_flight.add(task)
+        task.add_done_callback(in_flight.discard)
+        vu += 1
+    await asyncio.gather(*in_flight)
+    return dropped
+
+
+# ==================== REPORT ====================
+
+def build_report(args, scenario, metrics, wall_s, dropped):
+    steps = {}
+    for name, stats in metrics.steps.items():
+        steps[name] = {
+            "requests": stats.hist.count,
+            "ok": stats.ok,
+            "failed": stats.failed,
+            "errorRate": round(stats.failed / stats.hist.count, 4) if stats.hist.count else 0,
+            "throughputPerSec": round(stats.hist.count / wall_s, 2) if wall_s else None,
+            "latencyMs": stats.hist.summary((50, 90, 95, 99, 99.9)),
+            "statuses": stats.statuses,
+            "errors": stats.errors,
+            "histogram": stats.hist.to_dict(),
+        }
+    timeline = [
+        {
+            "second": window * args.window,
+            "requests": slot["requests"],
+            "errors": slot["errors"],
+            "rps": round(slot["requests"] / args.window, 2),
+            "p50": slot["hist"].percentile_ms(50),
+            "p95": slot["hist"].percentile_ms(95),
+            "p99": slot["hist"].percentile_ms(99),
+        }
+        for window, slot in sorted(metrics.timeline.items())
+    ]
+    return {
+        "tool": "load-test",
+        "generatedAt": datetime.now(timezone.utc).isoformat(),
+        "scenario": scenario.get("name", Path(args.scenario).stem),
+        "baseUrl": args.base_url,
+        "mode": args.mode,
+        "stages": args.stages,
+        "wallSeconds": round(wall_s, 3),
+        "iterations": dict(metrics.iterations, dropped=dropped),
+        "iterationLatencyMs": metrics.iteration_hist.summary(),
+        "steps": steps,
+        "timeline": timeline,
+    }
+
+
+def write_csv(path, report):
+    fields = ["step", "requests", "ok", "failed", "errorRate", "throughputPerSec",
+              "min", "mean", "p50", "p90", "p95", "p99", "p99.9", "max"]
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=fields)
+        writer.writeheader()
+        for name, step in report["steps"].items():
+            row = {"step": name, **{k: step[k] for k in ("requests", "ok", "failed", "errorRate", "throughputPerSec")}}
+            row.update({k: step["latencyMs"].get(k) for k in fields[6:]})
+            writer.writerow(row)
+
+
+def write_timeline_csv(path, report):
+    fields = ["second", "requests", "errors", "rps", "p50", "p95", "p99"]
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=fields)
+        writer.writeheader()
+        writer.writerows(report["timeline"])
+
+
+# ==================== MAIN ====================
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Load test HTTP del server Next.js locale")
+    parser.add_argument("scenario", help="File JSON dello scenario")
+    parser.add_argument("--base-url", default="http://localhost:3000")
+    parser.add_argument("--mode", choices=["closed", "open"], default="closed")
+    parser.add_argument("--stages", default="10:5,30:5",
+                        help="Rampa 'durata:target,...' (target = utenti in closed, iterazioni/s in open)")
+    parser.add_argument("--max-in-flight", type=int, default=1000, help="Limite iterazioni contemporanee (open)")
+    parser.add_argument("--connections", type=int, default=100, help="Connessioni HTTP nel pool")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Timeout per richiesta (secondi)")
+    parser.add_argument("--window", type=int, default=1, help="Ampiezza finestre della timeline (secondi)")
+    parser.add_argument("--json", help="Report completo JSON (istogrammi inclusi)")
+    parser.add_argument("--csv", help="Riepilogo per step in CSV")
+    parser.add_argument("--timeline-csv", help="Timeline per finestra in CSV")
+    parser.add_argument("--allow-remote", action="store_true", help="Consente un base URL non locale")
+    return parser.parse_args(argv)
+
+
+async def run(args, scenario):
+    try:
+        import aiohttp
+    except ImportError:
+        print("[ERR] Errore: aiohttp non installato")
+        print("Installa con: pip install aiohttp")
+        sys.exit(1)
+
+    metrics = Metrics(args.window)
+    stages = parse_stages(args.stages)
+    connector = aiohttp.TCPConnector(limit=args.connections)
+    timeout = aiohttp.ClientTimeout(total=args.timeout)
+    load_env()
+    token = os.getenv("LOADTEST_API_TOKEN")
+    headers = {"x-loadtest-token": token} if token else None
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout, headers=headers) as session:
+        runner = Runner(session, args.base_url, scenario, metrics)
+        started = time.perf_counter()
+        dropped = 0
+        if args.mode == "closed":
+            await run_closed(runner, stages)
+        else:
+            dropped = await run_open(runner, stages, args.max_in_flight)
+        wall_s = time.perf_counter() - started
+    return build_report(args, scenario, metrics, wall_s, dropped)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    host = urlparse(args.base_url).hostname
+    if host not in LOCAL_HOSTS and not args.allow_remote:
+        print(f"[ERR] {args.base_url} non è un server locale (usa --allow-remote per forzare)")
+        sys.exit(1)
+
+    try:
+        scenario = load_scenario(args.scenario)
+    except (OSError, ValueError) as e:
+        print(f"[ERR] Scenario non valido: {e}")
+        sys.exit(1)
+
+    print(f"Scenario: {scenario.get('name', args.scenario)} | modalità {args.mode} | stadi {args.stages}")
+    report = asyncio.run(run(args, scenario))
+
+    print("\n" + "=" * 78)
+    print(f"{'step':<20}{'req':>8}{'err%':>8}{'rps':>9}{'p50':>10}{'p95':>10}{'p99':>10}")
+    for name, step in report["steps"].items():
+        lat = step["latencyMs"]
+        print(f"{name:<20}{step['requests']:>8}{step['errorRate'] * 100:>7.1f}%{step['throughputPerSec']:>9}"
+              f"{lat.get('p50', '-'):>10}{lat.get('p95', '-'):>10}{lat.get('p99', '-'):>10}")
+    it = report["iterations"]
+    print(f"\nIterazioni: {it['completed']} completate, {it['aborted']} interrotte, "
+          f"{it['failed']} fallite, {it['dropped']} scartate")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2), encoding="utf-8")
+        print(f"[OK] Report JSON: {args.json}")
+    if args.csv:
+        write_csv(args.csv, report)
+        print(f"[OK] CSV per step: {args.csv}")
+    if args.timeline_csv:
+        write_timeline_csv(args.timeline_csv, report)
+        print(f"[OK] CSV timeline: {args.timeline_csv}")
+
+
+if __name__ == "__main__":
+    main()
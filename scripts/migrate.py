@@ -0,0 +1,123 @@
+"""
+Migrazioni versionate dello schema Firestore.
+
+Le migrazioni sono i file `scripts/migrations/NNNN_nome.py`, applicate in ordine
+di numero; `migrations/state` registra quelle già applicate. Ogni migrazione
+attraversa la sua collezione in blocchi di ID elaborati in parallelo, con un
+checkpoint per blocco in `migrations/{id}`: rilanciando `up` dopo un crash
+l'esecuzione riprende dall'ultimo documento elaborato. Vedi
+`salon_tools/migrations.py`.
+
+- status: migrazioni applicate, in corso (con blocchi completati) e da applicare
+- up:     applica le migrazioni in sospeso (o fino a --to); con --dry-run conta
+          i documenti da modificare e mostra alcuni esempi, senza scrivere
+
+Uso:
+    python scripts/migrate.py status
+    python scripts/migrate.py up --dry-run
+    python scripts/migrate.py up --workers 8 --chunks 32
+    python scripts/migrate.py up --to 0001
+
+Requisiti:
+- pip install firebase-admin python-dotenv
+"""
+import argparse
+import sys
+from pathlib import Path
+
+from salon_tools.firebase import get_db
+from salon_tools.migrations import load_migrations, read_run, read_state, run_migration
+
+MIGRATIONS_DIR = Path(__file__).resolve().parent / "migrations"
+
+
+def format_value(value):
+    from firebase_admin import firestore
+
+    return "<eliminato>" if value is firestore.DELETE_FIELD else repr(value)
+
+
+def print_summary(migration, summary, dry_run):
+    outcomes = ", ".join(f"{name} {count}" for name, count in sorted(summary["outcomes"].items()))
+    verb = "da scrivere" if dry_run else "scritture"
+    print(f"[OK] {migration.id} {migration.name}: {summary['docs']} documenti, {summary['written']} {verb} "
+          f"in {summary['seconds']:.1f}s ({summary['docsPerSec']:.0f} doc/s)")
+    if outcomes:
+        print(f"     esiti: {outcomes}")
+    if dry_run:
+        for doc_id, outcome, ops in summary["samples"]:
+            for op, ref, data in ops:
+                fields = ", ".join(f"{k}={format_value(v)}" for k, v in (data or {}).items())
+                print(f"     {outcome:<10} {op} {ref.path}: {fields}")
+
+
+def run_status(args):
+    db = get_db()
+    state = read_state(db)
+    print(f"Versione corrente: {state['version'] or 'nessuna'}\n")
+    for migration in load_migrations(MIGRATIONS_DIR):
+        applied = state["applied"].get(migration.id)
+        if applied:
+            detail = (f"applicata il {applied.get('completedAt', '?')[:19]}, {applied.get('docs', 0)} documenti, "
+                      f"{applied.get('docsPerSec', 0):.0f} doc/s")
+        else:
+            run = read_run(db, migration.id)
+            if run and run.get("status") == "running":
+                done = sum(1 for c in run.get("chunks", {}).values() if c.get("done"))
+                docs = sum(c.get("docs", 0) for c in run.get("chunks", {}).values())
+                detail = f"IN CORSO: {done}/{run.get('chunkCount')} blocchi, {docs} documenti (riprendere con up)"
+            else:
+                detail = "da applicare"
+        print(f"  {migration.id} {migration.name:<28} {migration.description:<42} {detail}")
+
+
+def run_up(args):
+    db = get_db()
+    state = read_state(db)
+    pending = [
+        m for m in load_migrations(MIGRATIONS_DIR)
+        if m.id not in state["applied"] and (args.to is None or m.id <= args.to)
+    ]
+    if not pending:
+        print(f"[OK] Nessuna migrazione da applicare (versione {state['version'] or 'nessuna'})")
+        return
+
+    mode = " [DRY-RUN]" if args.dry_run else ""
+    print(f"Migrazioni da applicare{mode}: {', '.join(m.id for m in pending)}\n")
+    for migration in pending:
+        try:
+            summary = run_migration(db, migration, workers=args.workers, chunk_count=args.chunks,
+                                    page_size=args.page_size, dry_run=args.dry_run)
+        except Exception as exc:
+            print(f"[ERR] {migration.id} {migration.name} interrotta: {exc}")
+            print("      Il checkpoint è salvato: rilanciare `up` per riprendere")
+            sys.exit(1)
+        print_summary(migration, summary, args.dry_run)
+        print()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Migrazioni versionate dello schema Firestore")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    sub.add_parser("status", help="Stato delle migrazioni")
+
+    up = sub.add_parser("up", help="Applica le migrazioni in sospeso")
+    up.add_argument("--to", help="Applica solo fino a questo id (es. 0001)")
+    up.add_argument("--dry-run", action="store_true", help="Conta le modifiche senza scrivere")
+    up.add_argument("--workers", type=int, default=8, help="Blocchi elaborati in parallelo")
+    up.add_argument("--chunks", type=int, default=32, help="Blocchi di ID per collezione (nuove esecuzioni)")
+    up.add_argument("--page-size", type=int, default=500, help="Documenti letti per pagina")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.command == "status":
+        run_status(args)
+    else:
+        run_up(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+"""
+0001 - `bookings.userId` -> `bookings.customerId`.
+
+Le prenotazioni più vecchie hanno solo `userId`; quelle create da `createBooking`
+li hanno entrambi. Copia `userId` in `customerId` dove manca ed elimina `userId`.
+Se i due campi sono presenti e diversi il documento non viene toccato ed è
+contato come "conflict", da controllare a mano.
+"""
+from salon_tools.migrations import Migration
+
+
+class BookingCustomerId(Migration):
+    id = "0001"
+    name = "booking-customer-id"
+    description = "bookings: userId -> customerId"
+    collection = "bookings"
+
+    def migrate_doc(self, db, doc_id, data):
+        from firebase_admin import firestore
+
+        if "userId" not in data:
+            return ("ok" if data.get("customerId") else "orphan"), []
+        user_id = data.get("userId")
+        customer_id = data.get("customerId")
+        if customer_id and user_id and customer_id != user_id:
+            return "conflict", []
+
+        ref = db.collection(self.collection).document(doc_id)
+        if customer_id:
+            return "migrated", [("update", ref, {"userId": firestore.DELETE_FIELD})]
+        if not user_id:
+            return "orphan", [("update", ref, {"userId": firestore.DELETE_FIELD})]
+        return "migrated", [("update", ref, {"customerId": user_id, "userId": firestore.DELETE_FIELD})]
+
+
+MIGRATION = BookingCustomerId()
@@ -0,0 +1,72 @@
+"""
+0002 - `settings/config` -> `salons/{id}.config`.
+
+La configurazione è passata da `settings/config` al campo `config` dei saloni
+(`updateSalonConfig`). Per ogni salone completa `config` con i valori di
+`settings/config` che mancano, senza sovrascrivere quelli già presenti; se non
+esiste alcun salone crea quello predefinito (come `getDefaultSalon`) con la
+configurazione di `settings/config`. `settings/config` resta come fallback ed è
+marcato con `migratedTo`.
+"""
+import threading
+from collections import Counter
+from datetime import datetime, timezone
+
+from salon_tools.migrations import Migration
+from salon_tools.rules import DEFAULT_CONFIG
+
+CONFIG_KEYS = tuple(DEFAULT_CONFIG)
+
+
+class SettingsConfigToSalons(Migration):
+    id = "0002"
+    name = "settings-config-to-salons"
+    description = "settings/config -> salons/{id}.config"
+    collection = "salons"
+
+    def prepare(self, db):
+        snap = db.collection("settings").document("config").get()
+        data = (snap.to_dict() or {}) if snap.exists else {}
+        self.settings = {key: data[key] for key in CONFIG_KEYS if data.get(key) is not None}
+        self.salon_ids = []
+        self._lock = threading.Lock()
+
+    def migrate_doc(self, db, doc_id, data):
+        with self._lock:
+            self.salon_ids.append(doc_id)
+        config = data.get("config") or {}
+        missing = {key: value for key, value in self.settings.items() if config.get(key) is None}
+        if not missing:
+            return "ok", []
+        # I valori presenti vincono; quelli null vengono sostituiti da settings/config
+        update = {"config": {**config, **missing}, "updatedAt": datetime.now(timezone.utc).isoformat()}
+        return "migrated", [("update", db.collection(self.collection).document(doc_id), update)]
+
+    def finalize(self, db, dry_run):
+        outcomes = Counter()
+        if not self.settings:
+            outcomes["no-settings"] += 1
+            return outcomes
+        now = datetime.now(timezone.utc).isoformat()
+        # Dopo una ripresa i blocchi già completati non sono riletti qui
+        salon_ids = sorted(self.salon_ids) or [snap.id for snap in db.collection(self.collection).stream()]
+        if not salon_ids:
+            outcomes["created"] += 1
+            if dry_run:
+                return outcomes
+            ref = db.collection(self.collection).document()
+            ref.set({
+                "name": "Salone di Bellezza",
+                "slug": "default",
+                "email": "info@salone.it",
+                "publicLink": "/book/default",
+                "config": {**DEFAULT_CONFIG, **self.settings},
+                "createdAt": now,
+            })
+            salon_ids = [ref.id]
+        if not dry_run:
+            db.collection("settings").document("config").set({"migratedTo": salon_ids, "migratedAt": now}, merge=True)
+        return outcomes
+
+
+MIGRATION = SettingsConfigToSalons()
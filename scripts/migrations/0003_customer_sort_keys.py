@@ -0,0 +1,39 @@
+"""
+0003 - chiavi di ordinamento dei clienti.
+
+`createdAt` era salvato come stringa ISO: la converte in Timestamp (o la prende
+da `updatedAt` se manca) e aggiunge `lastNameLower` ed `emailLower`, così la
+lista clienti può essere ordinata e paginata a cursore da Firestore (vedi
+`salon_tools/customers.py`). I clienti senza alcuna data valida ricevono solo
+le chiavi di testo e sono contati come "no-date": non compaiono
+nell'ordinamento per data finché `createdAt` non viene corretto a mano.
+"""
+from datetime import datetime
+
+from salon_tools.customers import expected_sort_fields
+from salon_tools.migrations import Migration
+
+
+class CustomerSortKeys(Migration):
+    id = "0003"
+    name = "customer-sort-keys"
+    description = "customers: createdAt Timestamp, lastNameLower, emailLower"
+    collection = "customers"
+
+    def migrate_doc(self, db, doc_id, data):
+        expected = expected_sort_fields(data)
+        update = {}
+        if expected["createdAt"] is not None and not (
+            isinstance(data.get("createdAt"), datetime) and data["createdAt"] == expected["createdAt"]
+        ):
+            update["createdAt"] = expected["createdAt"]
+        for field in ("lastNameLower", "emailLower"):
+            if data.get(field) != expected[field]:
+                update[field] = expected[field]
+        if not update:
+            return ("ok" if expected["createdAt"] is not None else "no-date"), []
+        outcome = "migrated" if expected["createdAt"] is not None else "no-date"
+        return outcome, [("update", db.collection(self.collection).document(doc_id), update)]
+
+
+MIGRATION = CustomerSortKeys()
@@ -0,0 +1,146 @@
+"""
+Controllo rapido di configurazione e salute, con tutti i probe in parallelo.
+
+Sostituisce l'esecuzione in serie di `check-env.py`, `check-config.py`,
+`check-services.py` e la chiamata a `/healthz`: credenziali, validità di
+`settings/config` e `salons/*.config`, servizi attivi per salone, indici di
+`firestore.indexes.json` presenti nel database e risposta dell'endpoint di
+salute. Ogni probe ha la propria scadenza (`--deadline nome=ms`); un probe che
+non risponde in tempo viene segnalato come `timeout` senza bloccare gli altri.
+Vedi `salon_tools/probes.py`.
+
+Con `--watch N` i probe vengono ripetuti ogni N secondi nello stesso processo
+(connessione già calda) e per ciascuno viene mostrata la tendenza della
+latenza sulle ultime `--window` esecuzioni.
+
+Codice di uscita: 0 se nessun probe è fallito o scaduto, 1 altrimenti.
+
+Uso:
+    python scripts/probe.py
+    python scripts/probe.py --json --url https://salone.onrender.com
+    python scripts/probe.py --only env,config --deadline config=400
+    python scripts/probe.py --watch 10 --window 30
+
+Requisiti:
+- pip install firebase-admin python-dotenv
+"""
+import argparse
+import json
+import statistics
+import sys
+import time
+from collections import deque
+from datetime import datetime, timezone
+
+from salon_tools.probes import DEFAULT_DEADLINES, PROBES, run_probes
+
+SYMBOLS = {"ok": "[OK]  ", "warn": "[WARN]", "fail": "[ERR] ", "timeout": "[TIME]", "skip": "[SKIP]"}
+
+
+def print_report(report):
+    for probe in report["probes"]:
+        print(f"{SYMBOLS[probe['status']]} {probe['name']:<9} {probe['ms']:>7.0f} ms  {probe['detail']}")
+    verdict = "OK" if report["ok"] else "ERRORE"
+    print(f"\n{verdict} in {report['ms']:.0f} ms")
+
+
+def trend(history):
+    """Mediana, p95 e variazione dell'ultima misura rispetto alla mediana delle precedenti."""
+    values = list(history)
+    previous = values[:-1]
+    median = statistics.median(values)
+    p95 = sorted(values)[min(len(values) - 1, int(round(0.95 * (len(values) - 1))))]
+    change = None
+    if previous and statistics.median(previous) > 0:
+        change = (values[-1] / statistics.median(previous) - 1) * 100
+    return {"p50": round(median, 1), "p95": round(p95, 1), "changePct": None if change is None else round(change)}
+
+
+def watch(args, deadlines, names):
+    histories = {}
+    runs = 0
+    while True:
+        report = run_probes(names, deadlines, args.url)
+        report["checkedAt"] = datetime.now(timezone.utc).isoformat()
+        for probe in report["probes"]:
+            if probe["status"] == "skip":
+                continue
+            history = histories.setdefault(probe["name"], deque(maxlen=args.window))
+            history.append(probe["ms"])
+            probe["trend"] = trend(history)
+        if args.json:
+            print(json.dumps(report, ensure_ascii=False, default=str), flush=True)
+        else:
+            parts = []
+            for probe in report["probes"]:
+                if probe["status"] == "skip":
+                    continue
+                t = probe["trend"]
+                change = "" if t["changePct"] is None else f" {t['changePct']:+d}%"
+                flag = "" if probe["status"] == "ok" else f" {probe['status'].upper()}"
+                parts.append(f"{probe['name']} {probe['ms']:.0f}ms (p50 {t['p50']:.0f}, p95 {t['p95']:.0f}{change}){flag}")
+            print(f"{datetime.now().strftime('%H:%M:%S')} {'OK ' if report['ok'] else 'ERR'} "
+                  f"{report['ms']:>5.0f}ms | " + " | ".join(parts), flush=True)
+        runs += 1
+        if args.count and runs >= args.count:
+            return report["ok"]
+        time.sleep(args.watch)
+
+
+def parse_deadlines(values):
+    deadlines = {}
+    for value in values:
+        name, _, ms = value.partition("=")
+        if name not in PROBES or not ms.isdigit():
+            raise argparse.ArgumentTypeError(f"scadenza non valida: {value} (nome=ms, nomi: {', '.join(PROBES)})")
+        deadlines[name] = int(ms)
+    return deadlines
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Probe paralleli di configurazione e salute")
+    parser.add_argument("--only", help=f"Probe da eseguire, separati da virgola ({', '.join(PROBES)})")
+    parser.add_argument("--deadline", action="append", default=[], metavar="NOME=MS",
+                        help="Scadenza di un probe in ms (predefinite: "
+                             + ", ".join(f"{k}={v}" for k, v in DEFAULT_DEADLINES.items()) + ")")
+    parser.add_argument("--url", help="URL base dell'app per /healthz (default NEXT_PUBLIC_APP_URL)")
+    parser.add_argument("--json", action="store_true", help="Esito in JSON (una riga per esecuzione con --watch)")
+    parser.add_argument("--watch", type=float, metavar="SECONDI", help="Ripeti i probe ogni N secondi")
+    parser.add_argument("--window", type=int, default=20, help="Esecuzioni considerate per la tendenza")
+    parser.add_argument("--count", type=int, default=0, help="Con --watch, numero di esecuzioni (0 = infinite)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    names = None
+    if args.only:
+        names = [name.strip() for name in args.only.split(",") if name.strip()]
+        unknown = [name for name in names if name not in PROBES]
+        if unknown:
+            print(f"[ERR] Probe sconosciuti: {', '.join(unknown)}")
+            sys.exit(2)
+    try:
+        deadlines = parse_deadlines(args.deadline)
+    except argparse.ArgumentTypeError as exc:
+        print(f"[ERR] {exc}")
+        sys.exit(2)
+
+    if args.watch:
+        try:
+            ok = watch(args, deadlines, names)
+        except KeyboardInterrupt:
+            return
+        sys.exit(0 if ok else 1)
+
+    report = run_probes(names, deadlines, args.url)
+    if args.json:
+        report["checkedAt"] = datetime.now(timezone.utc).isoformat()
+        print(json.dumps(report, indent=2, ensure_ascii=False, default=str))
+    else:
+        print_report(report)
+    sys.exit(0 if report["ok"] else 1)
+
+
+if __name__ == "__main__":
+    main()
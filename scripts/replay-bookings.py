@@ -0,0 +1,205 @@
+"""
+Replay "what-if" delle richieste di prenotazione con configurazioni alternative.
+
+Prima di cambiare `timeStep`, `bufferTime` o gli orari di apertura: ricostruisce
+dalle prenotazioni del periodo il flusso ordinato delle richieste (`createdAt`,
+data e orario richiesti, durata) e lo riproduce con le regole di disponibilità
+sotto la configurazione attuale e sotto ogni scenario, confrontando richieste
+accettate e rifiutate, revenue e utilizzo.
+
+La traccia è scritta una volta in un file `.npy` (--trace) e ogni scenario
+viene riprodotto in un processo separato che la apre in memory map. Dettagli
+delle regole in `salon_tools/replay.py`.
+
+Scenari: "nome chiave=valore ..." con chiavi di `SalonConfig` applicate a
+tutti i saloni; le liste (`closedDaysOfWeek`, `closedDates`) separate da "|".
+
+Uso:
+    python scripts/replay-bookings.py --from 2025-07-01 --to 2025-09-30 \\
+        --scenario "step10 timeStep=10" --scenario "buffer5 bufferTime=5" \\
+        --scenario "sera closingTime=20:00 resources=4"
+    python scripts/replay-bookings.py --trace data/q3.npy --scenarios scenari.json --shift 30 --json replay.json
+    python scripts/replay-bookings.py --synthetic 500000 --scenario "step30 timeStep=30"
+
+Requisiti:
+- pip install firebase-admin python-dotenv numpy pandas
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
+
+from salon_tools.occupancy import DEFAULT_SALON_KEY
+from salon_tools.replay import (
+    REJECT_REASONS,
+    TRACE_FIELDS,
+    build_trace,
+    historical,
+    open_trace,
+    parse_scenario,
+    run_scenario,
+    save_trace,
+    synthetic_trace,
+)
+from salon_tools.rules import DEFAULT_CONFIG
+
+BASELINE = "attuale"
+
+
+# ==================== TRACCIA ====================
+
+def load_trace_firestore(args, path):
+    from salon_tools.firebase import get_db
+    from salon_tools.queries import bookings_query, load_salon_configs
+
+    db = get_db()
+    query = bookings_query(db, args.start, args.end)
+    if len(args.salon) == 1:
+        query = query.where("salonId", "==", args.salon[0])
+    records = (doc.to_dict() or {} for doc in query.select(list(TRACE_FIELDS)).stream())
+    if len(args.salon) > 1:
+        records = (r for r in records if (r.get("salonId") or DEFAULT_SALON_KEY) in args.salon)
+    trace, salons = build_trace(records, DEFAULT_SALON_KEY)
+    configs = load_salon_configs(db, salons, DEFAULT_SALON_KEY)
+    missing = [salon for salon in salons if salon not in configs]
+    if missing:
+        print(f"[WARN] Saloni non trovati, uso la configurazione di default: {', '.join(missing)}")
+    meta = {"from": args.start, "to": args.end, "salons": salons,
+            "configs": {salon: configs.get(salon, DEFAULT_CONFIG) for salon in salons}}
+    save_trace(path, trace, meta)
+    return trace, meta
+
+
+def load_trace_synthetic(args, path):
+    first_day, last_day = date.fromisoformat(args.start), date.fromisoformat(args.end)
+    days = (last_day - first_day).days + 1
+    # Circa 30 richieste per salone al giorno
+    salons = max(1, args.synthetic // (days * 30))
+    trace, salons = synthetic_trace(args.synthetic, first_day, last_day, salons)
+    meta = {"from": args.start, "to": args.end, "salons": salons,
+            "configs": {salon: dict(DEFAULT_CONFIG, closedDaysOfWeek=[0]) for salon in salons}}
+    save_trace(path, trace, meta)
+    return trace, meta
+
+
+# ==================== REPORT ====================
+
+def delta(value, base, digits=0):
+    diff = value - base
+    if digits:
+        return f"{diff:+.{digits}f}"
+    return f"{diff:+d}" if isinstance(diff, int) else f"{diff:+.2f}"
+
+
+def print_report(history, results):
+    print(f"\nStorico: {history['requests']} richieste, "
+          + ", ".join(f"{status} {count}" for status, count in history["statuses"].items() if count)
+          + f", revenue CONFIRMED {history['revenue']:.2f} EUR")
+    base = results[0]["total"]
+    header = f"{'scenario':<22} {'accettate':>10} {'spostate':>9} " \
+             + " ".join(f"{reason:>7}" for reason in REJECT_REASONS) \
+             + f" {'revenue':>12} {'utilizzo':>9}   delta vs {BASELINE}"
+    print("\n" + header)
+    for result in results:
+        total = result["total"]
+        utilization = total["utilization"] or 0
+        line = (f"{result['name'][:22]:<22} {total['accepted']:>10} {total['moved']:>9} "
+                + " ".join(f"{total['rejected'][reason]:>7}" for reason in REJECT_REASONS)
+                + f" {total['revenue']:>12.2f} {utilization:>8.1%}")
+        if result is not results[0]:
+            line += (f"   accettate {delta(total['accepted'], base['accepted'])}, "
+                     f"revenue {delta(total['revenue'], base['revenue'])} EUR, "
+                     f"utilizzo {delta(utilization * 100, (base['utilization'] or 0) * 100, 1)} pp")
+        print(line)
+
+
+# ==================== MAIN ====================
+
+def load_scenarios(args):
+    scenarios = [(BASELINE, {})]
+    for spec in args.scenario:
+        try:
+            scenarios.append(parse_scenario(spec))
+        except ValueError as e:
+            raise SystemExit(f"[ERR] --scenario {spec!r}: {e}")
+    if args.scenarios:
+        with open(args.scenarios, encoding="utf-8") as handle:
+            scenarios.extend(json.load(handle).items())
+    if len(scenarios) == 1:
+        raise SystemExit("[ERR] Indicare almeno uno scenario con --scenario o --scenarios")
+    return scenarios
+
+
+def parse_args(argv=None):
+    today = date.today()
+    quarter_start = date(today.year, 3 * ((today.month - 1) // 3) + 1, 1)
+    last_quarter_end = quarter_start - timedelta(days=1)
+    last_quarter_start = date(last_quarter_end.year, 3 * ((last_quarter_end.month - 1) // 3) + 1, 1)
+
+    parser = argparse.ArgumentParser(description="Replay what-if delle richieste con configurazioni alternative")
+    parser.add_argument("--from", dest="start", default=last_quarter_start.isoformat(),
+                        help="Prima data delle prenotazioni YYYY-MM-DD (default: inizio del trimestre scorso)")
+    parser.add_argument("--to", dest="end", default=last_quarter_end.isoformat(),
+                        help="Ultima data YYYY-MM-DD (default: fine del trimestre scorso)")
+    parser.add_argument("--salon", action="append", default=[], help="Solo questo salonId (ripetibile)")
+    parser.add_argument("--scenario", action="append", default=[], metavar="SPEC",
+                        help='Scenario "nome chiave=valore ..." (ripetibile)')
+    parser.add_argument("--scenarios", metavar="FILE", help="File JSON {nome: {chiave: valore}}")
+    parser.add_argument("--shift", type=int, default=0,
+                        help="Minuti entro cui il cliente accetta lo slot libero più vicino "
+                             "(default 0: solo l'orario richiesto)")
+    parser.add_argument("--trace", metavar="FILE", help="File .npy della traccia (riusato se esiste)")
+    parser.add_argument("--rebuild", action="store_true", help="Ricostruisce la traccia anche se --trace esiste")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Processi di replay")
+    parser.add_argument("--json", metavar="FILE", help="Scrive i risultati (anche per salone) in un file JSON")
+    parser.add_argument("--synthetic", type=int, metavar="N", help="Traccia di N richieste casuali (solo tempi)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    scenarios = load_scenarios(args)
+    started = time.perf_counter()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = args.trace or os.path.join(tmp, "trace.npy")
+        if not path.endswith(".npy"):
+            path += ".npy"
+        if args.trace and os.path.exists(path) and not args.rebuild:
+            trace, meta = open_trace(path)
+            print(f"Traccia {path}: {len(trace)} richieste {meta['from']} -> {meta['to']}")
+        else:
+            trace, meta = (load_trace_synthetic if args.synthetic else load_trace_firestore)(args, path)
+            print(f"Traccia {meta['from']} -> {meta['to']}: {len(trace)} richieste, {len(meta['salons'])} saloni "
+                  f"({time.perf_counter() - started:.1f}s)")
+        if not len(trace):
+            print("Nessuna richiesta nel periodo.")
+            return
+
+        step = time.perf_counter()
+        workers = max(1, min(args.workers, len(scenarios)))
+        if workers == 1:
+            results = [run_scenario(path, name, overrides, args.shift) for name, overrides in scenarios]
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = [pool.submit(run_scenario, path, name, overrides, args.shift)
+                           for name, overrides in scenarios]
+                results = [future.result() for future in futures]
+        history = historical(trace)
+        del trace
+    elapsed = time.perf_counter() - step
+
+    print_report(history, results)
+    print(f"\n{len(results)} replay in {elapsed:.1f}s con {workers} processi")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as handle:
+            json.dump({"from": meta["from"], "to": meta["to"], "shift": args.shift, "history": history,
+                       "configs": meta["configs"], "scenarios": results}, handle, ensure_ascii=False, indent=2)
+        print(f"[OK] Risultati scritti in {args.json}")
+
+
+if __name__ == "__main__":
+    main()
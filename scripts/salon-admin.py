@@ -0,0 +1,25 @@
+"""
+Punto di ingresso unico degli script di amministrazione (vedi `salon_tools/cli.py`).
+
+I comandi vengono caricati solo quando invocati e il client Firestore viene
+inizializzato solo dai comandi che lo usano. `shell` e `serve` mantengono una
+connessione autenticata tra un comando e l'altro.
+
+Uso:
+    python scripts/salon-admin.py help
+    python scripts/salon-admin.py check-config
+    python scripts/salon-admin.py migrate status
+    python scripts/salon-admin.py shell
+    python scripts/salon-admin.py serve --socket /tmp/salon-admin.sock
+    python scripts/salon-admin.py --socket /tmp/salon-admin.sock check-services
+    python scripts/salon-admin.py bench --command check-config --repeat 5
+
+Requisiti:
+- pip install firebase-admin python-dotenv (solo per i comandi che usano Firestore)
+"""
+import sys
+
+from salon_tools.cli import main
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
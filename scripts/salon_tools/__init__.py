@@ -0,0 +1,31 @@
+"""
+Moduli condivisi dagli script Python in `scripts/`.
+
+- `firebase`: caricamento di `.env.local` e client Firestore (inizializzato una sola volta)
+- `probes`: controlli di salute paralleli con scadenza per probe (`scripts/probe.py`)
+- `cli`: CLI unica `salon-admin` con caricamento pigro dei comandi e modalità con connessione calda
+- `rules`: porting Python delle regole di disponibilità di `app/actions/availability.ts`
+- `latency`: istogramma di latenza (stile HDR) con percentili e merge
+- `occupancy`: contatori di occupazione degli slot (`slotOccupancy`)
+- `queries`: letture/scritture Firestore ricorrenti (configurazione, prenotazioni, batch)
+- `logs`: parsing e statistiche combinabili dei log di `lib/logger.ts`
+- `emails`: template dei promemoria e client Resend asincrono con token bucket
+- `booking_time`: campi orario numerici delle prenotazioni (`startMin`, `endMin`, `startAt`)
+- `migrations`: framework delle migrazioni versionate (`scripts/migrate.py`)
+- `customers`: chiavi di ordinamento dei clienti e paginazione a cursore (keyset)
+- `customer_search`: indice di ricerca dei clienti per prefisso e trigrammi (`customerSearch`)
+- `live_availability`: modello della disponibilità in memoria aggiornato da listener `on_snapshot`
+- `fake_firestore`: Firestore in memoria con listener `on_snapshot` per le verifiche senza emulatore
+- `closures`: chiusure straordinarie e alternative per le prenotazioni dei giorni chiusi
+- `booking_snapshots`: snapshot JSON statici della pagina di prenotazione per salone
+- `index_advisor`: forme delle query Firestore del codice e confronto con `firestore.indexes.json`
+- `series`: serie di prenotazioni ricorrenti con controllo vettoriale della capacità
+- `waitlist`: indice in memoria della lista d'attesa e abbinamento degli slot liberati
+- `daily_stats`: statistiche giornaliere precalcolate (`stats/{salonId}_{date}`)
+- `arrow_store`: dataset Arrow IPC/Feather delle collezioni, aperto in memory map
+- `customer_value`: punteggi RFM e LTV dei clienti calcolati sulle colonne delle prenotazioni
+- `forecast`: previsione della domanda per giorno × slot e risorse consigliate
+- `replay`: traccia delle richieste storiche e replay con configurazioni alternative
+- `integrity`: insiemi compatti di ID e controllo dei riferimenti tra collezioni
+- `analytics`: analisi vettoriali (NumPy/pandas) sullo storico delle prenotazioni
+"""
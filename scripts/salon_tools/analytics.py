@@ -0,0 +1,270 @@
+"""
+Analisi vettoriali sullo storico delle prenotazioni (NumPy/pandas).
+
+Le prenotazioni vengono caricate una volta in colonne (`bookings_frame`) e
+tutte le metriche sono calcolate con operazioni sugli array, senza cicli per
+prenotazione:
+
+- `utilization_heatmap`: occupazione per giorno della settimana × slot di
+  `timeStep` minuti, rapportata alla capacità `resources`
+- `revenue_breakdown`: ricavi da `servicePrice` per servizio, categoria e mese
+- `status_funnel`: distribuzione degli stati a partire dalle richieste PENDING
+- `lead_time_stats`: anticipo tra `createdAt` e l'inizio dell'appuntamento
+
+Stesse convenzioni di `rules.py`: giorni della settimana come JS `getDay()`
+(0 = domenica), una prenotazione occupa [startTime, endTime + bufferTime).
+"""
+import numpy as np
+import pandas as pd
+
+from salon_tools.rules import ACTIVE_STATUSES, to_minutes
+
+BOOKING_FIELDS = (
+    "date",
+    "startTime",
+    "endTime",
+    "status",
+    "serviceId",
+    "serviceName",
+    "servicePrice",
+    "salonId",
+    "createdAt",
+)
+
+STATUSES = ("PENDING", "CONFIRMED", "REJECTED", "ALTERNATIVE_PROPOSED", "CANCELLED")
+
+# Stati che generano ricavo (prenotazione confermata dal salone)
+REVENUE_STATUSES = ("CONFIRMED",)
+
+LEAD_TIME_BINS_HOURS = (0, 1, 24, 72, 168, 336, 720, np.inf)
+LEAD_TIME_LABELS = ("<1h", "1-24h", "1-3g", "3-7g", "7-14g", "14-30g", ">30g")
+
+# Righe elaborate per volta nella matrice prenotazioni × slot della heatmap
+HEATMAP_CHUNK = 200_000
+
+
+def bookings_frame(records):
+    """DataFrame colonnare da un iterabile di dizionari `bookings` (campi mancanti = NaN)."""
+    columns = {field: [] for field in BOOKING_FIELDS}
+    for record in records:
+        for field in BOOKING_FIELDS:
+            columns[field].append(record.get(field))
+    df = pd.DataFrame(columns)
+    df["servicePrice"] = pd.to_numeric(df["servicePrice"], errors="coerce")
+    return df
+
+
+def hhmm_to_minutes(series):
+    """
+    Colonna "HH:mm" -> minuti dalla mezzanotte (NaN se il formato non è valido).
+    Lavora sui byte (array S5 visto come uint8) invece che con regex sulle stringhe.
+    """
+    digits = series.fillna("").to_numpy(dtype="S5").view(np.uint8).reshape(-1, 5).astype(np.int16) - ord("0")
+    numeric = digits[:, [0, 1, 3, 4]]
+    valid = (digits[:, 2] == ord(":") - ord("0")) & ((numeric >= 0) & (numeric <= 9)).all(axis=1)
+    minutes = (digits[:, 0] * 10 + digits[:, 1]) * 60 + digits[:, 3] * 10 + digits[:, 4]
+    return np.where(valid, minutes, np.nan)
+
+
+def parse_iso_utc(series):
+    """
+    `createdAt` (ISO 8601 UTC di `toISOString()`) -> datetime64 naive UTC.
+    Percorso veloce sui primi 19 caratteri; formati diversi passano da pandas.
+    """
+    try:
+        return pd.Series(series.fillna("").to_numpy(dtype="S19").astype("datetime64[s]"), index=series.index)
+    except ValueError:
+        parsed = pd.to_datetime(series, utc=True, errors="coerce", format="ISO8601")
+        return parsed.dt.tz_localize(None)
+
+
+def _month_labels(days):
+    """Mese "YYYY-MM" di ogni data come colonna categorica (formattazione solo dei valori distinti)."""
+    months, codes = np.unique(days.to_numpy().astype("datetime64[M]"), return_inverse=True)
+    labels = np.datetime_as_string(months)
+    return pd.Categorical.from_codes(codes, categories=labels) if len(labels) else pd.Categorical([])
+
+
+def prepare(df, timezone="Europe/Rome"):
+    """
+    Aggiunge le colonne derivate usate dalle analisi: `day` (datetime64),
+    `weekday` (JS getDay), `month`, `startMin`/`endMin`, `startAt` (ora locale)
+    e `leadHours` (da `createdAt`, convertito da UTC a `timezone`).
+    Le righe senza data o orari validi vengono scartate.
+    """
+    df = df.copy()
+    df["day"] = pd.to_datetime(df["date"], format="%Y-%m-%d", errors="coerce")
+    df["startMin"] = hhmm_to_minutes(df["startTime"])
+    df["endMin"] = hhmm_to_minutes(df["endTime"])
+    df = df[df["day"].notna() & np.isfinite(df["startMin"]) & np.isfinite(df["endMin"])].copy()
+
+    df["weekday"] = ((df["day"].dt.dayofweek.to_numpy() + 1) % 7).astype("int8")
+    df["month"] = _month_labels(df["day"])
+    df["startAt"] = df["day"] + pd.to_timedelta(df["startMin"], unit="m")
+    created_local = parse_iso_utc(df["createdAt"]).dt.tz_localize("UTC").dt.tz_convert(timezone).dt.tz_localize(None)
+    df["leadHours"] = (df["startAt"] - created_local).dt.total_seconds() / 3600
+    df["status"] = df["status"].astype("category")
+    return df
+
+
+def open_days_per_weekday(start_date, end_date, config):
+    """Numero di giorni di apertura per giorno della settimana (indice JS getDay) nell'intervallo."""
+    days = pd.date_range(start_date, end_date, freq="D")
+    weekday = (days.dayofweek.to_numpy() + 1) % 7
+    closed = np.isin(weekday, list(config.get("closedDaysOfWeek") or []))
+    closed |= days.strftime("%Y-%m-%d").isin(list(config.get("closedDates") or []))
+    return np.bincount(weekday[~closed], minlength=7)
+
+
+def utilization_heatmap(df, config, start_date, end_date):
+    """
+    Utilizzo per giorno della settimana × slot: minuti-risorsa occupati dalle
+    prenotazioni PENDING/CONFIRMED diviso la capacità (`resources` × minuti dello
+    slot × giorni di apertura). Restituisce (slots "HH:mm", matrice 7 × slot, minuti occupati).
+    """
+    step = config["timeStep"]
+    opening = to_minutes(config["openingTime"])
+    closing = to_minutes(config["closingTime"])
+    slot_start = np.arange(opening, closing, step, dtype="float64")
+    slot_end = np.minimum(slot_start + step, closing)
+
+    active = df[df["status"].isin(ACTIVE_STATUSES)]
+    starts = active["startMin"].to_numpy()
+    ends = active["endMin"].to_numpy() + config["bufferTime"]
+    weekdays = active["weekday"].to_numpy()
+
+    occupied = np.zeros((7, len(slot_start)))
+    for offset in range(0, len(active), HEATMAP_CHUNK):
+        s = starts[offset:offset + HEATMAP_CHUNK, None]
+        e = ends[offset:offset + HEATMAP_CHUNK, None]
+        overlap = np.clip(np.minimum(e, slot_end) - np.maximum(s, slot_start), 0, None)
+        np.add.at(occupied, weekdays[offset:offset + HEATMAP_CHUNK], overlap)
+
+    capacity = np.outer(open_days_per_weekday(start_date, end_date, config), (slot_end - slot_start) * config["resources"])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        utilization = np.where(capacity > 0, occupied / capacity, 0.0)
+
+    slots = [f"{int(m) // 60:02d}:{int(m) % 60:02d}" for m in slot_start]
+    return slots, utilization, occupied
+
+
+def revenue_breakdown(df, services=None):
+    """
+    Ricavi delle prenotazioni confermate per servizio, categoria e mese.
+    `services` è {serviceId: {"name", "category", "price"}}: fornisce la categoria
+    e il prezzo per le prenotazioni senza `servicePrice` denormalizzato.
+    """
+    services = services or {}
+    confirmed = df[df["status"].isin(REVENUE_STATUSES)]
+    catalog_price = confirmed["serviceId"].map({k: v.get("price") for k, v in services.items()})
+    price = confirmed["servicePrice"].fillna(pd.to_numeric(catalog_price, errors="coerce")).fillna(0.0)
+    category = confirmed["serviceId"].map({k: v.get("category") for k, v in services.items()}).fillna("Altro")
+    name = confirmed["serviceName"].fillna(confirmed["serviceId"].map({k: v.get("name") for k, v in services.items()}))
+
+    frame = pd.DataFrame({
+        "serviceId": confirmed["serviceId"].fillna("?"),
+        "serviceName": name.fillna("?"),
+        "category": category,
+        "month": confirmed["month"],
+        "price": price,
+    })
+    by_service = (
+        frame.groupby(["serviceId", "serviceName"], observed=True)["price"]
+        .agg(bookings="size", revenue="sum")
+        .reset_index()
+        .sort_values("revenue", ascending=False)
+    )
+    by_category = frame.groupby("category")["price"].agg(bookings="size", revenue="sum").reset_index()
+    by_month = frame.pivot_table(
+        index="month", columns="category", values="price", aggfunc="sum", fill_value=0.0, observed=True
+    )
+    return {
+        "total": float(price.sum()),
+        "bookings": int(len(frame)),
+        "byService": by_service,
+        "byCategory": by_category.sort_values("revenue", ascending=False),
+        "byMonth": by_month,
+    }
+
+
+def status_funnel(df):
+    """
+    Funnel degli stati: ogni prenotazione nasce PENDING e resta tale finché il
+    salone non la conferma, rifiuta o propone alternative. Restituisce i conteggi
+    per stato, le quote sul totale e il tasso di conferma sulle richieste decise.
+    """
+    counts = df["status"].value_counts().reindex(STATUSES, fill_value=0).astype(int)
+    total = int(counts.sum())
+    decided = int(counts[["CONFIRMED", "REJECTED", "ALTERNATIVE_PROPOSED"]].sum())
+    by_month = (
+        df.groupby(["month", "status"], observed=True)
+        .size()
+        .unstack(fill_value=0)
+        .reindex(columns=list(STATUSES), fill_value=0)
+    )
+    return {
+        "total": total,
+        "counts": {status: int(n) for status, n in counts.items()},
+        "shares": {status: (round(int(n) / total, 4) if total else 0.0) for status, n in counts.items()},
+        "stillPending": int(counts["PENDING"]),
+        "confirmationRate": round(int(counts["CONFIRMED"]) / decided, 4) if decided else 0.0,
+        "byMonth": by_month,
+    }
+
+
+def lead_time_stats(df, percentiles=(50, 90, 99)):
+    """Distribuzione dell'anticipo di prenotazione (ore) per fascia, con percentili, per stato."""
+    lead = df["leadHours"].to_numpy(dtype="float64")
+    valid = np.isfinite(lead) & (lead >= 0)
+    bins = np.asarray(LEAD_TIME_BINS_HOURS, dtype="float64")
+
+    def describe(values):
+        if not len(values):
+            return {"count": 0}
+        hist, _ = np.histogram(values, bins=bins)
+        quantiles = np.percentile(values, percentiles)
+        return {
+            "count": int(len(values)),
+            "meanHours": round(float(values.mean()), 2),
+            "percentilesHours": {f"p{p}": round(float(q), 2) for p, q in zip(percentiles, quantiles)},
+            "histogram": dict(zip(LEAD_TIME_LABELS, (int(n) for n in hist))),
+        }
+
+    statuses = df["status"].to_numpy()
+    return {
+        "all": describe(lead[valid]),
+        "invalid": int((~valid).sum()),
+        "byStatus": {status: describe(lead[valid & (statuses == status)]) for status in STATUSES},
+    }
+
+
+def synthetic_bookings(n, start_date, end_date, config, services, seed=0):
+    """Prenotazioni casuali (già in colonne) per misurare i tempi delle analisi senza Firestore."""
+    rng = np.random.default_rng(seed)
+    days = pd.date_range(start_date, end_date, freq="D")
+    service_ids = np.array(list(services))
+    durations = np.array([services[s].get("duration", 30) for s in service_ids])
+    prices = np.array([services[s].get("price", 0) for s in service_ids], dtype="float64")
+
+    pick = rng.integers(0, len(service_ids), n)
+    opening = to_minutes(config["openingTime"])
+    closing = to_minutes(config["closingTime"])
+    start = opening + config["timeStep"] * rng.integers(0, max(1, (closing - opening) // config["timeStep"]), n)
+    end = np.minimum(start + durations[pick], closing)
+    day = days[rng.integers(0, len(days), n)]
+    created = day + pd.to_timedelta(start, unit="m") - pd.to_timedelta(rng.exponential(96, n), unit="h")
+
+    def hhmm(minutes):
+        return pd.Series(minutes // 60).astype(str).str.zfill(2) + ":" + pd.Series(minutes % 60).astype(str).str.zfill(2)
+
+    return pd.DataFrame({
+        "date": day.strftime("%Y-%m-%d"),
+        "startTime": hhmm(start),
+        "endTime": hhmm(end),
+        "status": rng.choice(STATUSES, n, p=(0.1, 0.65, 0.08, 0.05, 0.12)),
+        "serviceId": service_ids[pick],
+        "serviceName": None,
+        "servicePrice": prices[pick],
+        "salonId": None,
+        "createdAt": created.tz_localize("UTC").strftime("%Y-%m-%dT%H:%M:%S.000Z"),
+    })
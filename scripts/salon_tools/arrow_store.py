@@ -0,0 +1,274 @@
+"""
+Dataset Arrow (IPC/Feather v2) di `bookings`, `customers` e `services` per le analisi.
+
+I file sono scritti non compressi, così `open_dataset` li apre con
+`pa.memory_map` senza copie: l'apertura costa millisecondi anche con milioni di
+righe, le colonne vengono lette dal disco solo quando usate e più processi
+condividono le stesse pagine della page cache.
+
+- stringhe ripetute (`status`, `serviceName`, `category`, `salonId`, ...)
+  codificate a dizionario: una colonna di indici interi più i valori distinti
+- `date` come `date32` (giorni dall'epoch), `startMin`/`endMin` in minuti
+  dalla mezzanotte e `startAt` in minuti dall'epoch (vedi `booking_time.py`)
+- `createdAt`/`updatedAt` come timestamp UTC al secondo
+
+Le righe sono convertite a blocchi di `BATCH_ROWS` durante lo streaming; a fine
+tabella i dizionari dei blocchi vengono unificati, come richiesto dal formato file IPC.
+"""
+import json
+import os
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from salon_tools.analytics import hhmm_to_minutes, parse_iso_utc
+from salon_tools.booking_time import js_iso
+from salon_tools.occupancy import DEFAULT_SALON_KEY
+
+DATASET_VERSION = 2
+TABLES = ("bookings", "customers", "services")
+MANIFEST_FILE = "manifest.json"
+BATCH_ROWS = 100_000
+
+# Indici int8 (al massimo 128 valori) solo per gli enum chiusi (`status`, `gender`, `timePreference`);
+# i valori liberi o definiti dal salone (`category`, `acquisitionChannel`, ...) usano int32
+_SMALL_DICT = pa.dictionary(pa.int8(), pa.string())
+_DICT = pa.dictionary(pa.int32(), pa.string())
+_TIMESTAMP = pa.timestamp("s", tz="UTC")
+
+SCHEMAS = {
+    "bookings": pa.schema([
+        ("id", pa.string()),
+        ("date", pa.date32()),
+        ("startMin", pa.int16()),
+        ("endMin", pa.int16()),
+        ("startAt", pa.int32()),
+        ("status", _SMALL_DICT),
+        ("salonId", _DICT),
+        ("serviceId", _DICT),
+        ("serviceName", _DICT),
+        ("category", _DICT),
+        ("servicePrice", pa.float64()),
+        ("customerId", pa.string()),
+        ("seriesId", pa.string()),
+        ("createdAt", _TIMESTAMP),
+        ("updatedAt", _TIMESTAMP),
+    ]),
+    "customers": pa.schema([
+        ("id", pa.string()),
+        ("firstName", pa.string()),
+        ("lastName", pa.string()),
+        ("email", pa.string()),
+        ("emailVerified", pa.bool_()),
+        ("gender", _SMALL_DICT),
+        ("city", _DICT),
+        ("postalCode", _DICT),
+        ("timePreference", _SMALL_DICT),
+        ("acquisitionChannel", _DICT),
+        ("birthMonth", pa.int8()),
+        ("birthDay", pa.int8()),
+        ("tags", pa.list_(pa.string())),
+        ("createdAt", _TIMESTAMP),
+        ("updatedAt", _TIMESTAMP),
+    ]),
+    "services": pa.schema([
+        ("id", pa.string()),
+        ("name", pa.string()),
+        ("category", _DICT),
+        ("duration", pa.int16()),
+        ("price", pa.float64()),
+        ("active", pa.bool_()),
+        ("salonId", _DICT),
+    ]),
+}
+
+# Campi letti da Firestore (projection); gli altri campi dello schema sono derivati
+SOURCE_FIELDS = {
+    "bookings": ("date", "startTime", "endTime", "startMin", "endMin", "status", "salonId", "serviceId",
+                 "serviceName", "servicePrice", "customerId", "seriesId", "createdAt", "updatedAt"),
+    "customers": tuple(field for field in SCHEMAS["customers"].names if field != "id"),
+    "services": ("name", "category", "duration", "price", "active", "salonId"),
+}
+
+
+# ==================== CONVERSIONE ====================
+
+def _dictionary(values, type_):
+    return pa.array(values, pa.string()).dictionary_encode().cast(type_)
+
+
+def _integers(values, type_):
+    numeric = pd.to_numeric(pd.Series(values, dtype="object"), errors="coerce")
+    return pa.array(numeric, type_, from_pandas=True)
+
+
+def _dates(values):
+    strings = pa.array(values, pa.string())
+    try:
+        return strings.cast(pa.date32())
+    except pa.ArrowInvalid:
+        parsed = pd.to_datetime(pd.Series(values, dtype="object"), format="%Y-%m-%d", errors="coerce")
+        return pa.array(parsed.dt.date, pa.date32(), from_pandas=True)
+
+
+def _timestamps(values):
+    """ISO 8601 (stringa di `toISOString()` o datetime/Timestamp di Firestore) -> timestamp UTC."""
+    strings = pd.Series([js_iso(v) if hasattr(v, "astimezone") else v for v in values], dtype="object")
+    return pa.array(parse_iso_utc(strings), _TIMESTAMP, from_pandas=True)
+
+
+def _minutes(stored, hhmm):
+    """Campi numerici salvati se presenti, altrimenti derivati da "HH:mm"."""
+    numeric = pd.to_numeric(pd.Series(stored, dtype="object"), errors="coerce").to_numpy(dtype="float64")
+    parsed = hhmm_to_minutes(pd.Series(hhmm, dtype="object"))
+    return np.where(np.isnan(numeric), parsed, numeric)
+
+
+def bookings_batch(columns, services):
+    """RecordBatch da colonne grezze {campo: lista}; `category` e `serviceName` mancanti arrivano da `services`."""
+    service_ids = pd.Series(columns["serviceId"], dtype="object")
+    names = {sid: s.get("name") for sid, s in services.items()}
+    categories = {sid: s.get("category") for sid, s in services.items()}
+    service_name = pd.Series(columns["serviceName"], dtype="object").fillna(service_ids.map(names))
+
+    day = _dates(columns["date"])
+    start = _minutes(columns["startMin"], columns["startTime"])
+    end = _minutes(columns["endMin"], columns["endTime"])
+    start_at = day.cast(pa.int32()).to_numpy(zero_copy_only=False) * 1440.0 + start
+
+    salon = pd.Series(columns["salonId"], dtype="object").fillna(DEFAULT_SALON_KEY)
+    arrays = [
+        pa.array(columns["id"], pa.string()),
+        day,
+        pa.array(start, pa.int16(), from_pandas=True),
+        pa.array(end, pa.int16(), from_pandas=True),
+        pa.array(start_at, pa.int32(), from_pandas=True),
+        _dictionary(columns["status"], _SMALL_DICT),
+        _dictionary(salon, _DICT),
+        _dictionary(service_ids, _DICT),
+        _dictionary(service_name, _DICT),
+        _dictionary(service_ids.map(categories), _DICT),
+        pa.array(pd.to_numeric(pd.Series(columns["servicePrice"], dtype="object"), errors="coerce"),
+                 pa.float64(), from_pandas=True),
+        pa.array(columns["customerId"], pa.string()),
+        pa.array(columns["seriesId"], pa.string()),
+        _timestamps(columns["createdAt"]),
+        _timestamps(columns["updatedAt"]),
+    ]
+    return pa.RecordBatch.from_arrays(arrays, schema=SCHEMAS["bookings"])
+
+
+def customers_batch(columns, services=None):
+    tags = [value if isinstance(value, list) else None for value in columns["tags"]]
+    arrays = [
+        pa.array(columns["id"], pa.string()),
+        pa.array(columns["firstName"], pa.string()),
+        pa.array(columns["lastName"], pa.string()),
+        pa.array(columns["email"], pa.string()),
+        pa.array([v if isinstance(v, bool) else None for v in columns["emailVerified"]], pa.bool_()),
+        _dictionary(columns["gender"], _SMALL_DICT),
+        _dictionary(columns["city"], _DICT),
+        _dictionary([str(v) if v is not None else None for v in columns["postalCode"]], _DICT),
+        _dictionary(columns["timePreference"], _SMALL_DICT),
+        _dictionary(columns["acquisitionChannel"], _DICT),
+        _integers(columns["birthMonth"], pa.int8()),
+        _integers(columns["birthDay"], pa.int8()),
+        pa.array(tags, pa.list_(pa.string())),
+        _timestamps(columns["createdAt"]),
+        _timestamps(columns["updatedAt"]),
+    ]
+    return pa.RecordBatch.from_arrays(arrays, schema=SCHEMAS["customers"])
+
+
+def services_batch(columns, services=None):
+    arrays = [
+        pa.array(columns["id"], pa.string()),
+        pa.array(columns["name"], pa.string()),
+        _dictionary(columns["category"], _DICT),
+        _integers(columns["duration"], pa.int16()),
+        pa.array(pd.to_numeric(pd.Series(columns["price"], dtype="object"), errors="coerce"),
+                 pa.float64(), from_pandas=True),
+        pa.array([v if isinstance(v, bool) else None for v in columns["active"]], pa.bool_()),
+        _dictionary(pd.Series(columns["salonId"], dtype="object").fillna(DEFAULT_SALON_KEY), _DICT),
+    ]
+    return pa.RecordBatch.from_arrays(arrays, schema=SCHEMAS["services"])
+
+
+BATCH_BUILDERS = {"bookings": bookings_batch, "customers": customers_batch, "services": services_batch}
+
+
+def record_batches(name, docs, services=None, batch_rows=BATCH_ROWS):
+    """RecordBatch da un iterabile di (id, dati) in blocchi di `batch_rows` righe."""
+    fields = ("id",) + SOURCE_FIELDS[name]
+    build = BATCH_BUILDERS[name]
+    columns = {field: [] for field in fields}
+    for doc_id, data in docs:
+        columns["id"].append(doc_id)
+        for field in fields[1:]:
+            columns[field].append(data.get(field))
+        if len(columns["id"]) >= batch_rows:
+            yield build(columns, services or {})
+            columns = {field: [] for field in fields}
+    if columns["id"]:
+        yield build(columns, services or {})
+
+
+# ==================== SCRITTURA E LETTURA ====================
+
+def write_table(path, name, batches):
+    """
+    Scrive la tabella in un file IPC non compresso. Il file viene sostituito in
+    modo atomico: i processi che lo hanno già mappato continuano a leggere la versione precedente.
+    """
+    table = pa.Table.from_batches(list(batches), schema=SCHEMAS[name]).unify_dictionaries()
+    path = Path(path)
+    tmp = path.with_name(f".{path.name}.tmp")
+    with pa.OSFile(str(tmp), "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    os.replace(tmp, path)
+    return table.num_rows
+
+
+def write_manifest(directory, rows, source):
+    directory = Path(directory)
+    manifest = {
+        "version": DATASET_VERSION,
+        "generatedAt": js_iso(datetime.now(timezone.utc)),
+        "source": source,
+        "tables": {
+            name: {"file": f"{name}.arrow", "rows": count, "bytes": (directory / f"{name}.arrow").stat().st_size}
+            for name, count in rows.items()
+        },
+    }
+    (directory / MANIFEST_FILE).write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+    return manifest
+
+
+def read_manifest(directory):
+    path = Path(directory) / MANIFEST_FILE
+    return json.loads(path.read_text(encoding="utf-8")) if path.exists() else None
+
+
+def open_table(path):
+    """Tabella Arrow mappata in memoria: nessuna copia, i buffer puntano al file."""
+    return pa.ipc.open_file(pa.memory_map(str(path), "r")).read_all()
+
+
+def open_dataset(directory, tables=TABLES):
+    """{nome: pa.Table} per le tabelle richieste presenti in `directory`."""
+    directory = Path(directory)
+    return {name: open_table(directory / f"{name}.arrow") for name in tables if (directory / f"{name}.arrow").exists()}
+
+
+def to_pandas(table, columns=None):
+    """
+    DataFrame da una tabella mappata. Le colonne a dizionario diventano
+    `Categorical`; le colonne numeriche senza null restano viste sul file
+    quando possibile (`split_blocks`), le stringhe vengono materializzate.
+    """
+    if columns is not None:
+        table = table.select(columns)
+    return table.to_pandas(split_blocks=True, self_destruct=False, date_as_object=False)
@@ -0,0 +1,169 @@
+"""
+Snapshot statici della pagina di prenotazione, uno per salone.
+
+Ogni snapshot è un JSON compatto con i dati che `/book` legge da Firestore a
+ogni visita: informazioni del salone, configurazione effettiva, servizi attivi
+raggruppati per `category` (con le varianti dell'immagine) e gli orari di
+inizio disponibili dei prossimi `SNAPSHOT_DAYS` giorni per ogni durata di
+servizio. Gli orari sono codificati come stringa di bit per giorno: il
+carattere `i` vale "1" se è libero l'orario `openingTime + i * timeStep`
+(stessa logica di `rules.available_slots`).
+
+Il file si chiama `{slug}.{hash}.json`, con l'hash del contenuto: può essere
+servito con cache immutabile. `index.json` (cache breve) indica per ogni
+salone il file corrente, il salone di default (il primo, come
+`getDefaultSalon`) e `checkedAt`, l'ultima esecuzione del generatore: il
+client usa gli orari dello snapshot solo se è abbastanza recente.
+
+Per ogni salone valgono i servizi e le prenotazioni con il suo `salonId` o
+senza `salonId` (dati precedenti al multi-salone).
+"""
+import hashlib
+import json
+from datetime import date, timedelta
+from urllib.parse import quote
+
+from salon_tools.customers import sort_key
+from salon_tools.rules import (
+    DEFAULT_CONFIG,
+    active_intervals,
+    count_conflicts,
+    from_minutes,
+    is_closed,
+    merge_config,
+    to_minutes,
+)
+
+SNAPSHOT_VERSION = 1
+SNAPSHOT_DAYS = 14
+MANIFEST_NAME = "index.json"
+DEFAULT_CATEGORY = "Altro"
+
+# Varianti servite dall'ottimizzatore di next/image (larghezze in px)
+IMAGE_WIDTHS = {"thumb": 256, "card": 640}
+IMAGE_QUALITY = 75
+
+SALON_FIELDS = ("name", "slug", "email", "phone", "address", "city")
+
+
+def canonical_json(data):
+    return json.dumps(data, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+
+
+def content_hash(data, length=16):
+    return hashlib.sha256(canonical_json(data).encode("utf-8")).hexdigest()[:length]
+
+
+def image_variants(url):
+    """{src, thumb, card} per l'immagine del servizio, None se il servizio non ne ha."""
+    if not url:
+        return None
+    variants = {"src": url}
+    for name, width in IMAGE_WIDTHS.items():
+        variants[name] = f"/_next/image?url={quote(url, safe='')}&w={width}&q={IMAGE_QUALITY}"
+    return variants
+
+
+def belongs_to(data, salon_id):
+    return not data.get("salonId") or data.get("salonId") == salon_id
+
+
+def salon_services(services, salon_id):
+    """Servizi attivi del salone raggruppati per categoria: [{name, services}], ordinati per nome."""
+    groups = {}
+    for service_id, data in services:
+        if data.get("active") is not True or not belongs_to(data, salon_id):
+            continue
+        entry = {
+            "id": service_id,
+            "name": data.get("name") or "",
+            "duration": int(data.get("duration") or 0),
+            "price": data.get("price") or 0,
+            "image": image_variants(data.get("imageUrl")),
+        }
+        if data.get("description"):
+            entry["description"] = data["description"]
+        groups.setdefault(data.get("category") or DEFAULT_CATEGORY, []).append(entry)
+    return [
+        {"name": category, "services": sorted(entries, key=lambda s: (sort_key(s["name"]), s["id"]))}
+        for category, entries in sorted(groups.items(), key=lambda item: sort_key(item[0]))
+    ]
+
+
+def effective_config(salon_data, settings_config):
+    """Configurazione del salone, con fallback su `settings/config` e sui default (come `getAvailableSlots`)."""
+    config = (salon_data or {}).get("config") or settings_config
+    return merge_config(config or None)
+
+
+def day_bits(date_str, duration, config, intervals):
+    """Orari liberi della giornata come stringa di "0"/"1" sulla griglia `timeStep`."""
+    if duration <= 0 or is_closed(date_str, config):
+        return ""
+    opening = to_minutes(config["openingTime"])
+    closing = to_minutes(config["closingTime"])
+    step = config["timeStep"]
+    buffer_time = config["bufferTime"]
+    bits = []
+    current = opening
+    while current + duration + buffer_time <= closing:
+        conflicts = count_conflicts(current, current + duration + buffer_time, intervals, buffer_time)
+        bits.append("1" if conflicts < config["resources"] else "0")
+        current += step
+    return "".join(bits).rstrip("0")
+
+
+def window_dates(first_day, days=SNAPSHOT_DAYS):
+    return [(first_day + timedelta(days=offset)).isoformat() for offset in range(days)]
+
+
+def static_inputs(salon_id, salon_data, config, categories):
+    """Parte dello snapshot che non dipende dalle prenotazioni (per il rilevamento dei cambiamenti)."""
+    return {
+        "salon": {"id": salon_id, **{field: salon_data.get(field) for field in SALON_FIELDS if salon_data.get(field)}},
+        "config": {key: config[key] for key in DEFAULT_CONFIG},
+        "categories": categories,
+    }
+
+
+def build_snapshot(salon_id, salon_data, settings_config, services, bookings, first_day, days=SNAPSHOT_DAYS):
+    """
+    Snapshot di un salone. `services` e `bookings` sono [(id, dati)]; le
+    prenotazioni possono essere di tutti i saloni, vengono filtrate qui.
+    """
+    config = effective_config(salon_data, settings_config)
+    categories = salon_services(services, salon_id)
+    snapshot = static_inputs(salon_id, salon_data, config, categories)
+    dates = window_dates(first_day, days)
+
+    by_date = {day: [] for day in dates}
+    for _, data in bookings:
+        if data.get("date") in by_date and belongs_to(data, salon_id):
+            by_date[data["date"]].append(data)
+    intervals = {day: active_intervals(by_date[day]) for day in dates}
+
+    durations = sorted({s["duration"] for group in categories for s in group["services"] if s["duration"] > 0})
+    snapshot.update({
+        "v": SNAPSHOT_VERSION,
+        "from": dates[0],
+        "days": days,
+        "slots": {str(duration): [day_bits(day, duration, config, intervals[day]) for day in dates]
+                  for duration in durations},
+    })
+    return snapshot
+
+
+def decode_slots(snapshot, date_str, duration):
+    """Orari "HH:mm" disponibili da uno snapshot, None se data o durata non sono coperte."""
+    days = snapshot["slots"].get(str(duration))
+    offset = (date.fromisoformat(date_str) - date.fromisoformat(snapshot["from"])).days
+    if days is None or not 0 <= offset < len(days):
+        return None
+    opening = to_minutes(snapshot["config"]["openingTime"])
+    step = snapshot["config"]["timeStep"]
+    return [from_minutes(opening + i * step)
+            for i, bit in enumerate(days[offset]) if bit == "1"]
+
+
+def snapshot_file_name(slug, digest):
+    return f"{slug}.{digest}.json"
@@ -0,0 +1,57 @@
+"""
+Campi orario numerici delle prenotazioni, come `lib/booking-time.ts`.
+
+Accanto a `date` ("YYYY-MM-DD") e `startTime`/`endTime` ("HH:mm") ogni
+prenotazione porta:
+
+- `startMin`/`endMin`: minuti dalla mezzanotte
+- `startAt`: minuti dall'epoch Unix di data + ora di inizio, con l'orario del
+  salone letto come UTC (indipendente dal fuso del server), ordinabile tra giorni
+
+`js_iso` produce i timestamp (`createdAt`, `updatedAt`) nel formato di
+`new Date().toISOString()` usato dall'app.
+"""
+from datetime import date, timezone
+
+from salon_tools.rules import to_minutes
+
+TIME_FIELDS = ("startMin", "endMin", "startAt")
+
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+def js_iso(moment):
+    """Timestamp nel formato di `toISOString()` (ms, "Z"), confrontabile come stringa con createdAt/updatedAt."""
+    return moment.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.") + f"{moment.microsecond // 1000:03d}Z"
+
+
+def epoch_minutes(date_str, minutes):
+    """Minuti dall'epoch di `date_str` + `minutes` dalla mezzanotte (come `epochMinutes`)."""
+    return (date.fromisoformat(date_str).toordinal() - _EPOCH_ORDINAL) * 1440 + minutes
+
+
+def time_fields(booking):
+    """Valori attesi dei campi numerici, o None se mancano data o orari."""
+    if not (booking.get("date") and booking.get("startTime") and booking.get("endTime")):
+        return None
+    start = to_minutes(booking["startTime"])
+    return {
+        "startMin": start,
+        "endMin": to_minutes(booking["endTime"]),
+        "startAt": epoch_minutes(booking["date"], start),
+    }
+
+
+def field_mismatches(booking):
+    """
+    Campi numerici assenti o diversi da quelli derivati dalle stringhe:
+    {campo: (valore salvato, valore atteso)}.
+    """
+    expected = time_fields(booking)
+    if expected is None:
+        return {}
+    return {
+        field: (booking.get(field), value)
+        for field, value in expected.items()
+        if booking.get(field) != value or isinstance(booking.get(field), bool)
+    }
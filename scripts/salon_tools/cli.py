@@ -0,0 +1,385 @@
+"""
+CLI unica `salon-admin` per gli script di `scripts/`.
+
+I comandi sono gli script stessi (`salon-admin check-config` esegue
+`scripts/check-config.py`), caricati solo quando vengono invocati: l'avvio
+della CLI non importa `firebase_admin` né gRPC, e il client Firestore viene
+creato da `get_db()` solo dai comandi che lo usano.
+
+Modalità con connessione calda:
+
+- `shell`: prompt interattivo (o comandi da stdin) in un solo processo; il
+  client viene autenticato una volta e riusato da tutti i comandi
+- `serve --socket PATH`: stesso processo in ascolto su un socket Unix; con
+  `--socket PATH <comando>` (o `SALON_ADMIN_SOCKET`) il client invia il
+  comando al processo caldo e ne stampa l'output, senza importare nulla
+
+I comandi che usano processi figli (`ISOLATED`) girano sempre in un processo
+separato; quelli che chiedono input (`INTERACTIVE`) non sono inviati al socket.
+"""
+import os
+import shlex
+import sys
+import time
+from pathlib import Path
+
+SCRIPTS_DIR = Path(__file__).resolve().parents[1]
+SOCKET_ENV = "SALON_ADMIN_SOCKET"
+EXIT_MARKER = "\x00EXIT "
+
+COMMANDS = {
+    "probe": "Controlli paralleli di credenziali, configurazione, servizi, indici e /healthz",
+    "check-env": "Verifica le variabili d'ambiente Firebase Admin",
+    "check-config": "Mostra (o crea) la configurazione del salone",
+    "check-services": "Conta e mostra i servizi attivi",
+    "seed-database": "Popola il database con dati di esempio",
+    "add-services": "Aggiunge i servizi tipici di un salone",
+    "create-admin": "Crea un utente admin (interattivo)",
+    "create-admin-quick": "Crea un admin con username e password da riga di comando",
+    "create-admin-with-username": "Crea un admin con username (interattivo)",
+    "add-existing-user-as-admin": "Abilita come admin un utente già presente in Firebase Auth",
+    "analyze-logs": "Percentili di latenza, error rate e throughput dai log",
+    "load-test": "Load test HTTP del server Next.js",
+    "stress-booking": "Stress test concorrente di createBooking",
+    "slot-occupancy": "Migrazione e verifica dei contatori slotOccupancy",
+    "booking-analytics": "Analisi dello storico prenotazioni",
+    "send-reminders": "Promemoria per le prenotazioni di domani",
+    "compact-email-logs": "Compattazione di emailLogs in rollup giornalieri",
+    "daily-stats": "Statistiche giornaliere precalcolate",
+    "booking-time-fields": "Campi orario numerici delle prenotazioni",
+    "migrate": "Migrazioni versionate dello schema Firestore",
+    "booking-series": "Serie di prenotazioni ricorrenti",
+    "waitlist-matcher": "Abbinamento della lista d'attesa agli slot liberati",
+    "export-arrow": "Dataset Arrow delle collezioni per i notebook",
+    "customer-pages": "Lista clienti paginata a cursore e benchmark keyset/offset",
+    "customer-search": "Indice di ricerca dei clienti per prefisso e trigrammi",
+    "index-advisor": "Indici Firestore mancanti, duplicati e non usati dalle query del codice",
+    "availability-sidecar": "Sidecar della disponibilità in memoria con listener on_snapshot",
+    "booking-snapshots": "Snapshot statici della pagina di prenotazione per CDN",
+    "closures": "Chiusure straordinarie e ricollocazione delle prenotazioni",
+    "customer-value": "Punteggi RFM e LTV dei clienti",
+    "demand-forecast": "Previsione della domanda e risorse consigliate per slot",
+    "replay-bookings": "Replay what-if delle richieste con configurazioni alternative",
+    "check-integrity": "Riferimenti mancanti tra collezioni ed eventuale correzione",
+}
+
+# Usano ProcessPoolExecutor: eseguiti sempre in un processo separato
+ISOLATED = {"analyze-logs", "replay-bookings"}
+
+# Chiedono input all'utente: non eseguibili tramite socket
+INTERACTIVE = {"create-admin", "create-admin-with-username", "add-existing-user-as-admin"}
+
+_code_cache = {}
+
+
+def print_help(out=None):
+    out = out or sys.stdout
+    print("Uso: salon-admin [--socket PATH] <comando> [argomenti]\n", file=out)
+    print("Comandi:", file=out)
+    for name, description in COMMANDS.items():
+        print(f"  {name:<28} {description}", file=out)
+    print("\nModalità:", file=out)
+    print(f"  {'shell':<28} Prompt con connessione Firestore calda", file=out)
+    print(f"  {'serve --socket PATH':<28} Processo caldo in ascolto su un socket Unix", file=out)
+    print(f"  {'bench':<28} Tempi di avvio a freddo (-X importtime) e a caldo", file=out)
+    print("\n`salon-admin <comando> --help` mostra le opzioni del comando.", file=out)
+
+
+# ==================== ESECUZIONE ====================
+
+def _compiled(name):
+    """Codice dello script, compilato una sola volta per processo."""
+    code = _code_cache.get(name)
+    if code is None:
+        path = SCRIPTS_DIR / f"{name}.py"
+        code = _code_cache[name] = compile(path.read_text(encoding="utf-8"), str(path), "exec")
+    return code
+
+
+def _run_isolated(name, args):
+    import subprocess
+
+    proc = subprocess.Popen([sys.executable, str(SCRIPTS_DIR / f"{name}.py"), *args],
+                            stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, bufsize=1)
+    for line in proc.stdout:
+        sys.stdout.write(line)
+    return proc.wait()
+
+
+def run_command(name, args):
+    """
+    Esegue lo script `name` nel processo corrente come se fosse `__main__`,
+    con `sys.argv` impostato. Restituisce il codice di uscita.
+    """
+    if name not in COMMANDS:
+        print(f"[ERR] Comando sconosciuto: {name} (salon-admin help)")
+        return 2
+    if name in ISOLATED:
+        return _run_isolated(name, args)
+    path = str(SCRIPTS_DIR / f"{name}.py")
+    saved_argv = sys.argv
+    sys.argv = [path, *args]
+    try:
+        exec(_compiled(name), {"__name__": "__main__", "__file__": path, "__builtins__": __builtins__})
+        return 0
+    except SystemExit as exc:
+        if exc.code is None or isinstance(exc.code, int):
+            return exc.code or 0
+        print(exc.code)
+        return 1
+    except KeyboardInterrupt:
+        print("\n[ERR] Interrotto")
+        return 130
+    finally:
+        sys.argv = saved_argv
+        sys.stdout.flush()
+
+
+def warm_up():
+    """Inizializza il client e completa autenticazione e canale gRPC con una lettura."""
+    from salon_tools.firebase import get_db
+
+    started = time.perf_counter()
+    get_db().collection("settings").document("config").get()
+    return (time.perf_counter() - started) * 1000
+
+
+def _warm_or_report():
+    try:
+        ms = warm_up()
+        print(f"[OK] Connessione Firestore pronta in {ms:.0f} ms")
+        return True
+    except Exception as exc:
+        print(f"[WARN] Connessione non inizializzata ({exc}): verrà creata dal primo comando che la usa")
+        return False
+
+
+# ==================== SHELL ====================
+
+def shell(stdin=None):
+    stdin = stdin or sys.stdin
+    interactive = stdin.isatty()
+    if interactive:
+        try:
+            import readline  # noqa: F401 - cronologia e modifica della riga
+        except ImportError:
+            pass
+        print("salon-admin shell: `help` per i comandi, `exit` per uscire")
+    _warm_or_report()
+    last = 0
+    while True:
+        try:
+            line = input("salon-admin> ") if interactive else stdin.readline()
+        except EOFError:
+            break
+        if not interactive and not line:
+            break
+        argv = shlex.split(line, comments=True)
+        if not argv:
+            continue
+        if argv[0] in ("exit", "quit"):
+            break
+        if argv[0] == "help":
+            print_help()
+            continue
+        started = time.perf_counter()
+        last = run_command(argv[0], argv[1:])
+        print(f"[{argv[0]}: codice {last}, {(time.perf_counter() - started) * 1000:.0f} ms]")
+    return last
+
+
+# ==================== SOCKET ====================
+
+def serve(socket_path, keepalive=240):
+    """
+    Processo caldo su socket Unix. Un comando alla volta: l'output (stdout e
+    stderr) viene inviato al client riga per riga, seguito dal codice di uscita.
+    Ogni `keepalive` secondi senza richieste rilegge `settings/config` per
+    tenere aperto il canale.
+    """
+    import contextlib
+    import json
+    import socketserver
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            request = json.loads(self.rfile.readline().decode("utf-8"))
+            argv, cwd = request.get("argv") or ["help"], request.get("cwd") or os.getcwd()
+            out = self.wfile
+            stream = _SocketWriter(out)
+            started = time.perf_counter()
+            previous = os.getcwd()
+            with contextlib.redirect_stdout(stream), contextlib.redirect_stderr(stream):
+                if argv[0] == "help":
+                    print_help()
+                    code = 0
+                elif argv[0] in INTERACTIVE:
+                    print(f"[ERR] {argv[0]} è interattivo: eseguirlo senza --socket")
+                    code = 2
+                else:
+                    try:
+                        os.chdir(cwd)
+                        code = run_command(argv[0], argv[1:])
+                    finally:
+                        os.chdir(previous)
+            elapsed = (time.perf_counter() - started) * 1000
+            print(f"   {' '.join(argv)} -> {code} ({elapsed:.0f} ms)", flush=True)
+            out.write(f"{EXIT_MARKER}{code}\n".encode("utf-8"))
+
+    class Server(socketserver.UnixStreamServer):
+        def handle_timeout(self):
+            with contextlib.suppress(Exception):
+                warm_up()
+
+    path = Path(socket_path)
+    if path.exists():
+        path.unlink()
+    _warm_or_report()
+    with Server(str(path), Handler) as server:
+        server.timeout = keepalive
+        os.chmod(path, 0o600)
+        print(f"[OK] In ascolto su {path} (Ctrl+C per terminare)", flush=True)
+        try:
+            while True:
+                server.handle_request()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            path.unlink(missing_ok=True)
+    return 0
+
+
+class _SocketWriter:
+    """File di testo minimale che inoltra l'output al client."""
+
+    encoding = "utf-8"
+
+    def __init__(self, wfile):
+        self._wfile = wfile
+
+    def write(self, text):
+        self._wfile.write(text.encode("utf-8", errors="replace"))
+        return len(text)
+
+    def flush(self):
+        self._wfile.flush()
+
+    def isatty(self):
+        return False
+
+
+def send(socket_path, argv):
+    """Invia un comando al processo caldo e ne stampa l'output. Restituisce il codice di uscita."""
+    import json
+    import socket
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conn:
+        conn.connect(socket_path)
+        conn.sendall((json.dumps({"argv": argv, "cwd": os.getcwd()}) + "\n").encode("utf-8"))
+        code = 1
+        for raw in conn.makefile("rb"):
+            line = raw.decode("utf-8", errors="replace")
+            if line.startswith(EXIT_MARKER):
+                code = int(line[len(EXIT_MARKER):])
+                break
+            sys.stdout.write(line)
+    sys.stdout.flush()
+    return code
+
+
+# ==================== BENCHMARK ====================
+
+def parse_importtime(stderr):
+    """
+    Righe di `-X importtime` -> (totale µs dei moduli importati al primo livello,
+    [(µs cumulativi, pacchetto)] dei pacchetti di primo livello più pesanti).
+    """
+    top = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|", 2)
+        if not name.startswith("  ") and name.strip():
+            top.append((int(cumulative), name.strip()))
+    return sum(us for us, _ in top), sorted(top, reverse=True)
+
+
+def bench(args):
+    import statistics
+    import subprocess
+
+    probes = [
+        ("salon-admin help", [str(SCRIPTS_DIR / "salon-admin.py"), "help"]),
+        ("import firebase_admin.firestore", ["-c", "from firebase_admin import firestore"]),
+    ]
+    probes += [(f"salon-admin {cmd}", [str(SCRIPTS_DIR / "salon-admin.py"), *shlex.split(cmd)])
+               for cmd in args.command]
+
+    width = max(len(label) for label, _ in probes)
+    print(f"Avvio a freddo (processo nuovo, mediana di {args.repeat}):\n")
+    for label, argv in probes:
+        walls, imports, heaviest = [], [], []
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            proc = subprocess.run([sys.executable, "-X", "importtime", *argv], capture_output=True, text=True)
+            walls.append((time.perf_counter() - started) * 1000)
+            total, heaviest = parse_importtime(proc.stderr)
+            imports.append(total / 1000)
+        print(f"  {label:<{width}} {statistics.median(walls):>8.0f} ms totali, "
+              f"{statistics.median(imports):>7.0f} ms di import")
+        for us, name in heaviest[:args.top]:
+            print(f"      {us / 1000:>8.1f} ms  {name}")
+
+    if not args.command:
+        print("\nAggiungere --command \"<comando>\" per misurare anche l'esecuzione a caldo.")
+        return 0
+
+    print(f"\nA caldo (stesso processo, connessione già autenticata, mediana di {args.repeat}):\n")
+    _warm_or_report()
+    import contextlib
+    import io
+
+    for cmd in args.command:
+        argv = shlex.split(cmd)
+        times = []
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                run_command(argv[0], argv[1:])
+            times.append((time.perf_counter() - started) * 1000)
+        print(f"  salon-admin {cmd:<{width - 12}} {statistics.median(times):>8.1f} ms (min {min(times):.1f}, max {max(times):.1f})")
+    return 0
+
+
+# ==================== INGRESSO ====================
+
+def main(argv):
+    socket_path = os.getenv(SOCKET_ENV)
+    if argv[:1] == ["--socket"] and len(argv) > 1:
+        socket_path, argv = argv[1], argv[2:]
+    if not argv or argv[0] in ("help", "-h", "--help"):
+        print_help()
+        return 0
+
+    name, args = argv[0], argv[1:]
+    if name == "shell":
+        return shell()
+    if name in ("serve", "bench"):
+        import argparse
+
+        parser = argparse.ArgumentParser(prog=f"salon-admin {name}")
+        if name == "serve":
+            parser.add_argument("--socket", default=socket_path, required=not socket_path,
+                                help=f"Percorso del socket Unix (o {SOCKET_ENV})")
+            parser.add_argument("--keepalive", type=int, default=240, help="Secondi tra due letture di keepalive")
+            options = parser.parse_args(args)
+            return serve(options.socket, options.keepalive)
+        parser.add_argument("--command", action="append", default=[],
+                            help='Comando da misurare, ripetibile (es. "check-config")')
+        parser.add_argument("--repeat", type=int, default=5, help="Ripetizioni per misura")
+        parser.add_argument("--top", type=int, default=5, help="Pacchetti più lenti da mostrare")
+        return bench(parser.parse_args(args))
+
+    if socket_path and name not in INTERACTIVE and os.path.exists(socket_path):
+        return send(socket_path, argv)
+    return run_command(name, args)
@@ -0,0 +1,151 @@
+"""
+Chiusure straordinarie dei saloni e ricollocazione delle prenotazioni.
+
+Aggiungere una data a `closedDates` (`updateSalonConfig`) blocca solo i nuovi
+slot: le prenotazioni PENDING/CONFIRMED già presenti restano. Qui:
+
+- `expand_closures`: date singole, intervalli e festività ricorrenti -> date
+- `ClosurePlanner`: per ogni prenotazione coinvolta cerca fino a `count`
+  `AlternativeSlot` nei giorni vicini aperti (un'alternativa per giorno,
+  l'orario più vicino a quello originale), con la stessa regola di
+  `getAvailableSlots`. Gli intervalli di ogni giorno sono calcolati una sola
+  volta e gli slot proposti vengono aggiunti come occupati, così due
+  prenotazioni non ricevono lo stesso ultimo posto.
+"""
+import re
+from datetime import date, timedelta
+
+from salon_tools.rules import ACTIVE_STATUSES, count_conflicts, from_minutes, is_closed, to_minutes
+from salon_tools.waitlist import day_intervals
+
+DEFAULT_ALTERNATIVES = 3
+MIN_ALTERNATIVES = 2
+DEFAULT_SEARCH_DAYS = 14
+
+_DATE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+_RANGE = re.compile(r"^(\d{4}-\d{2}-\d{2})\.\.(\d{4}-\d{2}-\d{2})$")
+_RECURRING = re.compile(r"^(\d{2})-(\d{2})$")
+
+
+def expand_closures(specs, first_day, last_day):
+    """
+    Date YYYY-MM-DD delle chiusure comprese tra `first_day` e `last_day` (date).
+
+    Formati: "2025-12-25", "2025-08-10..2025-08-16" (estremi inclusi) e
+    "12-25" (ogni anno). Solleva ValueError per un formato non valido.
+    """
+    dates = set()
+    for spec in specs:
+        spec = spec.strip()
+        if _DATE.match(spec):
+            days = [date.fromisoformat(spec)]
+        elif _RANGE.match(spec):
+            start, end = (date.fromisoformat(part) for part in _RANGE.match(spec).groups())
+            if end < start:
+                raise ValueError(f"Intervallo di chiusura invertito: {spec}")
+            days = [start + timedelta(days=offset) for offset in range((end - start).days + 1)]
+        elif _RECURRING.match(spec):
+            month, day = (int(part) for part in _RECURRING.match(spec).groups())
+            days = []
+            for year in range(first_day.year, last_day.year + 1):
+                try:
+                    days.append(date(year, month, day))
+                except ValueError:
+                    if (month, day) != (2, 29):
+                        raise ValueError(f"Data ricorrente non valida: {spec}") from None
+        else:
+            raise ValueError(f"Chiusura non valida: {spec} (YYYY-MM-DD, YYYY-MM-DD..YYYY-MM-DD o MM-DD)")
+        dates.update(day.isoformat() for day in days if first_day <= day <= last_day)
+    return sorted(dates)
+
+
+def contiguous_ranges(dates):
+    """Date ordinate -> intervalli (inizio, fine) di giorni consecutivi, per le query per intervallo."""
+    ranges = []
+    for day in dates:
+        if ranges and date.fromisoformat(day) - date.fromisoformat(ranges[-1][1]) == timedelta(days=1):
+            ranges[-1][1] = day
+        else:
+            ranges.append([day, day])
+    return [tuple(item) for item in ranges]
+
+
+def booking_minutes(booking):
+    start = booking.get("startMin")
+    end = booking.get("endMin")
+    return (
+        start if isinstance(start, int) else to_minutes(booking["startTime"]),
+        end if isinstance(end, int) else to_minutes(booking["endTime"]),
+    )
+
+
+def candidate_days(day, today, search_days):
+    """Giorni vicini a `day` in ordine di distanza, prima il successivo; mai prima di `today`."""
+    origin = date.fromisoformat(day)
+    for offset in range(1, search_days + 1):
+        for candidate in (origin + timedelta(days=offset), origin - timedelta(days=offset)):
+            if candidate >= today:
+                yield candidate.isoformat()
+
+
+class ClosurePlanner:
+    """
+    Alternative per le prenotazioni di un salone.
+
+    `config` è la configurazione del salone con le nuove chiusure già in
+    `closedDates`; `day_bookings` sono le prenotazioni del salone per data
+    nei giorni attorno alle chiusure.
+    """
+
+    def __init__(self, config, day_bookings, today, search_days=DEFAULT_SEARCH_DAYS):
+        self.config = config
+        self.today = today
+        self.search_days = search_days
+        self.intervals = {day: day_intervals(bookings) for day, bookings in day_bookings.items()}
+        self.opening = to_minutes(config["openingTime"])
+        self.closing = to_minutes(config["closingTime"])
+
+    def _best_start(self, day, start, duration):
+        """Orario della griglia `timeStep` libero più vicino a `start`, None se il giorno è pieno."""
+        buffer_time = self.config["bufferTime"]
+        intervals = self.intervals.setdefault(day, [])
+        last = self.closing - duration - buffer_time
+        if last < self.opening:
+            return None
+        grid = range(self.opening, last + 1, self.config["timeStep"])
+        for candidate in sorted(grid, key=lambda minute: (abs(minute - start), minute)):
+            if count_conflicts(candidate, candidate + duration + buffer_time, intervals, buffer_time) \
+                    < self.config["resources"]:
+                return candidate
+        return None
+
+    def alternatives(self, booking, count=DEFAULT_ALTERNATIVES):
+        """Fino a `count` AlternativeSlot per la prenotazione, uno per giorno, tenuti come occupati."""
+        start, end = booking_minutes(booking)
+        duration = end - start
+        slots = []
+        for day in candidate_days(booking["date"], self.today, self.search_days):
+            if len(slots) >= count:
+                break
+            if is_closed(day, self.config):
+                continue
+            found = self._best_start(day, start, duration)
+            if found is None:
+                continue
+            self.intervals[day].append((found, found + duration))
+            slots.append({"date": day, "startTime": from_minutes(found), "endTime": from_minutes(found + duration)})
+        return sorted(slots, key=lambda slot: (slot["date"], slot["startTime"]))
+
+    def plan(self, affected, count=DEFAULT_ALTERNATIVES):
+        """
+        Alternative per le prenotazioni coinvolte [(id, dati)]: prima le CONFIRMED,
+        poi per data, orario e data di creazione. Restituisce [(id, dati, slot)].
+        """
+        ordered = sorted(affected, key=lambda item: (
+            item[1].get("status") != "CONFIRMED",
+            item[1].get("date") or "",
+            item[1].get("startTime") or "",
+            item[1].get("createdAt") or "",
+        ))
+        return [(booking_id, booking, self.alternatives(booking, count)) for booking_id, booking in ordered
+                if booking.get("status") in ACTIVE_STATUSES]
@@ -0,0 +1,265 @@
+"""
+Indice di ricerca dei clienti per prefisso e trigrammi (collezione `customerSearch`).
+
+I campi `firstName`, `lastName`, `email`, `city` e `postalCode` vengono
+normalizzati come le chiavi di ordinamento (`customers.sort_key`) e divisi in
+parole alfanumeriche. Per ogni parola l'indice contiene:
+
+- i prefissi da `MIN_PREFIX` a `MAX_PREFIX` caratteri (`p_ros`, `p_ross`, ...)
+- i trigrammi che non iniziano la parola (`t_oss`, `t_ssi`), per le ricerche
+  all'interno delle parole ("ossi", un frammento di CAP o di email)
+
+Ogni gram è un documento `customerSearch/{gram}` con la posting list
+`{"p": {customerId: maschera}, "n": conteggio}`; la maschera dice in quali
+campi compare il gram e serve per l'ordinamento dei risultati. I gram con più
+di `MAX_POSTINGS` clienti non sono selettivi: vengono salvati come
+`{"common": true}` senza posting e ignorati in ricerca (restano le altre parole
+e la verifica sui documenti).
+
+Una ricerca legge un documento di prefisso e al massimo `MAX_QUERY_TRIGRAMS`
+trigrammi per parola, poi i documenti dei migliori candidati, su cui verifica
+le parole e calcola il punteggio finale (`match_score`, come `matchScore` in
+`lib/customer-search.ts`).
+
+`customerSearchDocs/{customerId}` conserva i valori indicizzati, così
+l'aggiornamento incrementale (clienti con `updatedAt` o `createdAt` dopo il
+watermark in `customerSearchMeta/state`) rimuove i gram che non valgono più.
+I clienti eliminati spariscono dall'indice solo con la ricostruzione completa.
+"""
+import heapq
+import re
+
+from salon_tools.customers import sort_key
+
+SEARCH_COLLECTION = "customerSearch"
+SEARCH_DOCS_COLLECTION = "customerSearchDocs"
+SEARCH_META_COLLECTION = "customerSearchMeta"
+SEARCH_META_DOC = "state"
+INDEX_VERSION = 1
+
+# campo -> (bit della maschera, peso nel punteggio)
+FIELDS = {
+    "lastName": (1, 5.0),
+    "firstName": (2, 4.0),
+    "email": (4, 3.0),
+    "postalCode": (8, 2.0),
+    "city": (16, 1.0),
+}
+
+MIN_PREFIX = 2
+MAX_PREFIX = 12
+MAX_POSTINGS = 25_000
+MAX_QUERY_WORDS = 5
+MAX_QUERY_TRIGRAMS = 3
+
+_SPLIT = re.compile(r"[^a-z0-9]+")
+
+
+def words(value):
+    """Parole normalizzate di un valore ("Dell'Acqua" -> ["dell", "acqua"])."""
+    if value is None:
+        return []
+    return [word for word in _SPLIT.split(sort_key(str(value))) if word]
+
+
+def indexed_values(data):
+    """Valori dei campi indicizzati di un cliente, come stringhe."""
+    return {field: str(data[field]) for field in FIELDS if data.get(field) not in (None, "")}
+
+
+def doc_grams(values):
+    """{gram: maschera} di un cliente a partire da `indexed_values`."""
+    grams = {}
+    for field, value in values.items():
+        bit = FIELDS[field][0]
+        for word in words(value):
+            for n in range(MIN_PREFIX, min(len(word), MAX_PREFIX) + 1):
+                key = "p_" + word[:n]
+                grams[key] = grams.get(key, 0) | bit
+            for i in range(1, len(word) - 2):
+                key = "t_" + word[i:i + 3]
+                grams[key] = grams.get(key, 0) | bit
+    return grams
+
+
+def build_postings(docs):
+    """
+    Indice completo da (id, dati): ({gram: {customerId: maschera}}, {customerId: valori}).
+    """
+    postings = {}
+    forward = {}
+    for doc_id, data in docs:
+        values = indexed_values(data)
+        forward[doc_id] = values
+        for gram, mask in doc_grams(values).items():
+            postings.setdefault(gram, {})[doc_id] = mask
+    return postings, forward
+
+
+def gram_docs(postings, max_postings=MAX_POSTINGS):
+    """Documenti `customerSearch` da scrivere e insieme dei gram comuni."""
+    docs = {}
+    common = set()
+    for gram, entries in postings.items():
+        if len(entries) > max_postings:
+            docs[gram] = {"common": True, "n": len(entries)}
+            common.add(gram)
+        else:
+            docs[gram] = {"p": entries, "n": len(entries)}
+    return docs, common
+
+
+def estimated_bytes(doc_id, data):
+    """Dimensione del documento secondo le regole di calcolo di Firestore (approssimata)."""
+    size = len(doc_id) + 1 + 16 + 32
+    entries = data.get("p") or {}
+    size += 2 + 8 + 2 + sum(len(key) + 1 + 8 for key in entries)
+    return size
+
+
+# ==================== RICERCA ====================
+
+def query_words(text):
+    """Parole della ricerca (almeno `MIN_PREFIX` caratteri, senza duplicati, al massimo `MAX_QUERY_WORDS`)."""
+    seen = []
+    for word in words(text):
+        if len(word) >= MIN_PREFIX and word not in seen:
+            seen.append(word)
+    return seen[:MAX_QUERY_WORDS]
+
+
+def word_grams(word):
+    """(gram di prefisso, trigrammi interni da leggere) per una parola della ricerca."""
+    trigrams = [word[i:i + 3] for i in range(len(word) - 2)]
+    if len(trigrams) > MAX_QUERY_TRIGRAMS:
+        # primo, centrale e ultimo: la verifica finale scarta i falsi positivi
+        trigrams = [trigrams[0], trigrams[len(trigrams) // 2], trigrams[-1]]
+    return "p_" + word[:MAX_PREFIX], ["t_" + t for t in dict.fromkeys(trigrams)]
+
+
+def _best_weight(mask):
+    return max((weight for bit, weight in FIELDS.values() if mask & bit), default=0.0)
+
+
+def candidates(fetch, text, limit=20):
+    """
+    Candidati ordinati per punteggio approssimato: [(customerId, punteggio)].
+    `fetch(ids)` restituisce {gram: dati o None} (Firestore `get_all` o un dizionario
+    in memoria). Restituisce anche le letture fatte e le parole; None come
+    candidati se ogni parola ha un prefisso comune (ricerca troppo generica).
+    """
+    terms = query_words(text)
+    if not terms:
+        return [], 0, terms
+    plan = {word: word_grams(word) for word in terms}
+    ids = list(dict.fromkeys(gram for prefix, trigrams in plan.values() for gram in [prefix, *trigrams]))
+    grams = fetch(ids)
+
+    scores = None
+    for word, (prefix, trigrams) in plan.items():
+        prefix_doc = grams.get(prefix) or {}
+        if prefix_doc.get("common"):
+            # parola non selettiva: la controlla solo la verifica sui documenti
+            continue
+        trigram_docs = [doc for doc in (grams.get(gram) or {} for gram in trigrams) if not doc.get("common")]
+        matches = {customer_id: _best_weight(mask) * 1.5 for customer_id, mask in (prefix_doc.get("p") or {}).items()}
+        if trigram_docs:
+            inner = dict(trigram_docs[0].get("p") or {})
+            for doc in trigram_docs[1:]:
+                postings = doc.get("p") or {}
+                inner = {customer_id: mask & postings[customer_id] for customer_id, mask in inner.items()
+                         if customer_id in postings}
+            for customer_id, mask in inner.items():
+                weight = _best_weight(mask) * 0.5 or 0.25
+                if weight > matches.get(customer_id, 0):
+                    matches[customer_id] = weight
+        if scores is None:
+            scores = matches
+        else:
+            scores = {customer_id: score + matches[customer_id] for customer_id, score in scores.items()
+                      if customer_id in matches}
+    if scores is None:
+        return None, len(ids), terms
+    ranked = heapq.nlargest(limit, scores.items(), key=lambda item: (item[1], item[0]))
+    return ranked, len(ids), terms
+
+
+def match_score(data, terms):
+    """
+    Punteggio finale di un cliente: per ogni parola il miglior campo in cui
+    compare come parola intera, prefisso o sottostringa. None se una parola manca.
+    """
+    fields = {field: words(value) for field, value in indexed_values(data).items()}
+    total = 0.0
+    for term in terms:
+        best = 0.0
+        for field, field_words in fields.items():
+            weight = FIELDS[field][1]
+            for word in field_words:
+                if word == term:
+                    best = max(best, weight * 2)
+                elif word.startswith(term):
+                    best = max(best, weight * 1.5)
+                elif term in word:
+                    best = max(best, weight * 0.5)
+        if not best:
+            return None
+        total += best
+    return total
+
+
+def search(db, text, limit=20):
+    """
+    Ricerca su Firestore: {"results": [(id, dati, punteggio)], "reads", "tooGeneric"}.
+    Legge i gram della ricerca e i documenti dei primi `2 * limit` candidati.
+    """
+    def fetch(ids):
+        refs = [db.collection(SEARCH_COLLECTION).document(gram) for gram in ids]
+        return {snap.id: snap.to_dict() for snap in db.get_all(refs) if snap.exists}
+
+    ranked, reads, terms = candidates(fetch, text, limit * 2)
+    if ranked is None:
+        return {"results": [], "reads": reads, "tooGeneric": True}
+    refs = [db.collection("customers").document(customer_id) for customer_id, _ in ranked]
+    results = []
+    for snap in db.get_all(refs):
+        if not snap.exists:
+            continue
+        data = snap.to_dict() or {}
+        score = match_score(data, terms)
+        if score is not None:
+            results.append((snap.id, data, score))
+    results.sort(key=lambda item: (-item[2], item[0]))
+    return {"results": results[:limit], "reads": reads + len(refs), "tooGeneric": False}
+
+
+# ==================== AGGIORNAMENTO INCREMENTALE ====================
+
+def incremental_operations(db, changed, previous, common):
+    """
+    Operazioni (tipo, ref, dati) per portare l'indice dai valori `previous`
+    ({id: valori} da `customerSearchDocs`) ai documenti `changed` ({id: dati}).
+    Le posting sono modificate con scritture in merge, senza leggere i documenti dei gram.
+    """
+    from firebase_admin import firestore
+
+    index = db.collection(SEARCH_COLLECTION)
+    forward = db.collection(SEARCH_DOCS_COLLECTION)
+    ops = []
+    for customer_id, data in changed.items():
+        values = indexed_values(data)
+        old = doc_grams(previous.get(customer_id) or {})
+        new = doc_grams(values)
+        for gram in old.keys() - new.keys():
+            if gram not in common:
+                ops.append(("merge", index.document(gram), {"p": {customer_id: firestore.DELETE_FIELD},
+                                                              "n": firestore.Increment(-1)}))
+        for gram, mask in new.items():
+            if gram in common or old.get(gram) == mask:
+                continue
+            update = {"p": {customer_id: mask}}
+            if gram not in old:
+                update["n"] = firestore.Increment(1)
+            ops.append(("merge", index.document(gram), update))
+        ops.append(("set", forward.document(customer_id), {"v": values}))
+    return ops
@@ -0,0 +1,202 @@
+"""
+Punteggi RFM (recency, frequency, monetary) e valore stimato (LTV) dei clienti.
+
+Tutto è calcolato in modo vettoriale sulle colonne delle prenotazioni
+CONFIRMED, come in `analytics.py`: i clienti (o le coppie salone × cliente)
+vengono codificati con `pd.factorize` e le metriche aggregate con
+`np.bincount`/`np.maximum.at`, senza cicli per prenotazione.
+
+- recency: data dell'ultima visita (salvata come data, così il valore non
+  cambia ogni giorno); frequency: visite; monetary: somma di `servicePrice`
+- punteggi 1-5 per quintile di ciascuna metrica (5 = migliore)
+- segmento da punteggi R e F (`SEGMENTS`)
+- LTV = spesa media × visite all'anno × anni attesi, con anni attesi =
+  Σ retention^k per k = 1..`LTV_HORIZON_YEARS` e retention dal punteggio R
+
+Le metriche per salone usano i quintili calcolati all'interno del salone; le
+prenotazioni senza `salonId` valgono per il salone "default".
+"""
+import numpy as np
+import pandas as pd
+
+from salon_tools.analytics import REVENUE_STATUSES
+from salon_tools.occupancy import DEFAULT_SALON_KEY
+
+VALUE_FIELDS = ("customerId", "userId", "date", "status", "servicePrice", "salonId")
+
+SCORE_LEVELS = 5
+# Probabilità di tornare nell'anno successivo per punteggio R (1..5)
+RETENTION_BY_R = (0.10, 0.30, 0.50, 0.70, 0.85)
+LTV_HORIZON_YEARS = 3
+# Anzianità minima per la frequenza annua (evita stime enormi per i clienti nuovi)
+MIN_TENURE_DAYS = 90
+
+SEGMENTS = ("Campioni", "Fedeli", "Nuovi", "Promettenti", "A rischio", "Persi")
+
+LTV_EDGES = (0, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+def value_frame(records):
+    """DataFrame colonnare con i soli campi di `VALUE_FIELDS` (cliente da `customerId` o `userId`)."""
+    columns = {field: [] for field in VALUE_FIELDS}
+    for record in records:
+        for field in VALUE_FIELDS:
+            columns[field].append(record.get(field))
+    df = pd.DataFrame(columns)
+    df["customerId"] = df["customerId"].fillna(df.pop("userId"))
+    df["servicePrice"] = pd.to_numeric(df["servicePrice"], errors="coerce")
+    return df
+
+
+def _days(series):
+    """Colonna date (stringhe YYYY-MM-DD o datetime64) -> giorni dall'epoch (int64, -1 se mancante)."""
+    if not pd.api.types.is_datetime64_any_dtype(series):
+        series = pd.to_datetime(series, format="%Y-%m-%d", errors="coerce")
+    values = series.to_numpy().astype("datetime64[D]")
+    return np.where(np.isnat(values), -1, values.astype("int64"))
+
+
+def quantile_scores(values, groups=None):
+    """Punteggi 1..SCORE_LEVELS per quintile (rango percentuale), per gruppo se `groups` è dato."""
+    series = pd.Series(values)
+    pct = series.rank(pct=True) if groups is None else series.groupby(groups).rank(pct=True)
+    return np.clip(np.ceil(pct.to_numpy() * SCORE_LEVELS), 1, SCORE_LEVELS).astype("int8")
+
+
+def segments(r, f):
+    """Segmento (indice in `SEGMENTS`) da punteggi R e F."""
+    return np.select(
+        [(r >= 4) & (f >= 4), (r >= 3) & (f >= 3), r >= 4, r == 3, f >= 3],
+        [0, 1, 2, 3, 4],
+        default=5,
+    ).astype("int8")
+
+
+def _aggregate(codes, size, days, prices):
+    visits = np.bincount(codes, minlength=size)
+    monetary = np.bincount(codes, weights=prices, minlength=size)
+    last = np.full(size, np.iinfo("int64").min)
+    np.maximum.at(last, codes, days)
+    first = np.full(size, np.iinfo("int64").max)
+    np.minimum.at(first, codes, days)
+    return visits, monetary, first, last
+
+
+def _scores(as_of_day, visits, monetary, first, last, groups=None):
+    r = quantile_scores(last, groups)
+    f = quantile_scores(visits, groups)
+    m = quantile_scores(monetary, groups)
+    tenure = np.maximum(as_of_day - first, MIN_TENURE_DAYS)
+    annual_visits = visits * 365.0 / tenure
+    retention = np.asarray(RETENTION_BY_R)[r - 1]
+    expected_years = sum(retention ** k for k in range(1, LTV_HORIZON_YEARS + 1))
+    ltv = np.round(monetary / visits * annual_visits * expected_years)
+    return {"r": r, "f": f, "m": m, "segment": segments(r, f), "ltv": ltv}
+
+
+def compute_values(df, as_of):
+    """
+    Metriche per cliente e per salone × cliente dalle prenotazioni `df`
+    (colonne di `VALUE_FIELDS`) fino alla data `as_of` (datetime.date).
+
+    Restituisce (clienti, saloni): DataFrame indicizzati per `customerId` e
+    per (`salonId`, `customerId`) con lastVisit, firstVisit, visits, monetary,
+    r, f, m, segment e ltv.
+    """
+    as_of_day = int(np.datetime64(as_of, "D").astype("int64"))
+    days = _days(df["date"])
+    customers = df["customerId"].to_numpy(dtype=object)
+    valid = (
+        np.isin(df["status"].to_numpy(dtype=object), REVENUE_STATUSES)
+        & (days >= 0) & (days <= as_of_day)
+        & pd.notna(customers)
+    )
+    days = days[valid]
+    prices = np.nan_to_num(df["servicePrice"].to_numpy(dtype="float64")[valid])
+    codes, customer_ids = pd.factorize(customers[valid])
+    salon_codes, salon_ids = pd.factorize(df["salonId"].to_numpy(dtype=object)[valid], use_na_sentinel=False)
+    salon_ids = pd.Index(salon_ids).fillna(DEFAULT_SALON_KEY)
+
+    visits, monetary, first, last = _aggregate(codes, len(customer_ids), days, prices)
+    per_customer = pd.DataFrame({"visits": visits, "monetary": monetary, "firstDay": first, "lastDay": last},
+                                index=pd.Index(customer_ids, name="customerId"))
+    per_customer = per_customer.assign(**_scores(as_of_day, visits, monetary, first, last))
+
+    pair_codes, pairs = pd.factorize(salon_codes.astype("int64") * len(customer_ids) + codes)
+    visits, monetary, first, last = _aggregate(pair_codes, len(pairs), days, prices)
+    pair_salon = pairs // max(1, len(customer_ids))
+    per_salon = pd.DataFrame({
+        "salonId": salon_ids[pair_salon],
+        "customerId": customer_ids[pairs % max(1, len(customer_ids))],
+        "visits": visits, "monetary": monetary, "firstDay": first, "lastDay": last,
+    })
+    per_salon = per_salon.assign(**_scores(as_of_day, visits, monetary, first, last, pair_salon))
+    return per_customer, per_salon.set_index(["salonId", "customerId"])
+
+
+def _date(day):
+    return str(np.datetime64(int(day), "D"))
+
+
+def customer_value_doc(row):
+    """Mappa `value` del documento `customers` (solo valori che cambiano con nuove visite o quintili)."""
+    return {
+        "lastVisit": _date(row.lastDay),
+        "firstVisit": _date(row.firstDay),
+        "visits": int(row.visits),
+        "monetary": round(float(row.monetary), 2),
+        "r": int(row.r),
+        "f": int(row.f),
+        "m": int(row.m),
+        "rfm": f"{row.r}{row.f}{row.m}",
+        "segment": SEGMENTS[row.segment],
+        "ltv": int(row.ltv),
+    }
+
+
+def _counts(values, levels):
+    counts = np.bincount(np.asarray(values, dtype="int64"), minlength=levels + 1)
+    return {str(level): int(counts[level]) for level in range(1, levels + 1)}
+
+
+def salon_histogram(frame):
+    """Riepilogo di un salone: distribuzione dei punteggi, segmenti, LTV e percentili."""
+    edges = np.asarray(LTV_EDGES + (np.inf,))
+    ltv_counts, _ = np.histogram(frame["ltv"].to_numpy(), bins=edges)
+    segment_counts = np.bincount(frame["segment"].to_numpy(dtype="int64"), minlength=len(SEGMENTS))
+
+    def percentiles(column):
+        values = frame[column].to_numpy(dtype="float64")
+        if not len(values):
+            return {}
+        return {f"p{p}": round(float(v), 2) for p, v in zip((50, 90, 99), np.percentile(values, (50, 90, 99)))}
+
+    return {
+        "customers": int(len(frame)),
+        "visits": int(frame["visits"].sum()),
+        "revenue": round(float(frame["monetary"].sum()), 2),
+        "ltvTotal": int(frame["ltv"].sum()),
+        "r": _counts(frame["r"], SCORE_LEVELS),
+        "f": _counts(frame["f"], SCORE_LEVELS),
+        "m": _counts(frame["m"], SCORE_LEVELS),
+        "segments": {name: int(segment_counts[i]) for i, name in enumerate(SEGMENTS)},
+        "ltvHistogram": {"edges": list(LTV_EDGES), "counts": [int(c) for c in ltv_counts]},
+        "visitsPercentiles": percentiles("visits"),
+        "monetaryPercentiles": percentiles("monetary"),
+        "ltvPercentiles": percentiles("ltv"),
+    }
+
+
+def synthetic_value_bookings(n, customers, start_date, end_date, salons=3, seed=0):
+    """Prenotazioni casuali in colonne (clienti con frequenze diverse) per misurare i tempi."""
+    rng = np.random.default_rng(seed)
+    days = pd.date_range(start_date, end_date, freq="D")
+    # Pochi clienti molto frequenti e molti occasionali
+    customer = (rng.zipf(1.3, n) - 1) % customers
+    return pd.DataFrame({
+        "customerId": np.array([f"c{i}" for i in range(customers)], dtype=object)[customer],
+        "date": days[rng.integers(0, len(days), n)],
+        "status": rng.choice(("PENDING", "CONFIRMED", "REJECTED", "CANCELLED"), n, p=(0.1, 0.7, 0.08, 0.12)),
+        "servicePrice": rng.choice((20.0, 25.0, 30.0, 50.0, 60.0), n),
+        "salonId": rng.choice([f"salone-{i}" for i in range(salons)], n),
+    })
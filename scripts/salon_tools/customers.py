@@ -0,0 +1,151 @@
+"""
+Chiavi di ordinamento dei clienti e paginazione a cursore (keyset).
+
+La lista clienti è ordinata per `createdAt` (Timestamp di Firestore, dal più
+recente), `lastNameLower` o `emailLower`: copie normalizzate di `lastName` ed
+`email` (senza accenti, minuscole), come `customerSortKeys` in
+`lib/customer-sort-keys.ts`. I documenti più vecchi vengono completati dalla
+migrazione `0003_customer_sort_keys`.
+
+Una pagina è letta con `order_by(campo).order_by(__name__)` ripartendo dopo la
+coppia (valore, id) dell'ultimo cliente mostrato: costa `limit + 1` letture a
+qualsiasi profondità, mentre `offset` fa pagare anche i documenti saltati. Il
+cursore è JSON base64url `{"s", "v", "id"}`, con i Timestamp come
+[secondi, nanosecondi]: lo stesso formato di `getCustomersPage`.
+
+Prima della migrazione 0003 `createdAt` può essere ancora una stringa ISO (nel
+cursore resta una stringa) e Firestore esclude dagli ordinamenti i clienti
+senza `lastNameLower`/`emailLower`.
+"""
+import base64
+import calendar
+import json
+import unicodedata
+from datetime import datetime, timezone
+
+CUSTOMERS_COLLECTION = "customers"
+
+# ordinamento -> (campo, direzione)
+SORTS = {
+    "newest": ("createdAt", "DESCENDING"),
+    "lastName": ("lastNameLower", "ASCENDING"),
+    "email": ("emailLower", "ASCENDING"),
+}
+
+MAX_PAGE = 200
+
+
+def sort_key(value):
+    """Minuscolo, senza spazi ai lati e senza accenti ("Rossì " -> "rossi"), come `normalizeSortKey`."""
+    decomposed = unicodedata.normalize("NFD", value or "")
+    return "".join(ch for ch in decomposed if not "\u0300" <= ch <= "\u036f").lower().strip()
+
+
+def to_timestamp(value):
+    """datetime UTC da un Timestamp di Firestore o da una stringa ISO 8601; None se non interpretabile."""
+    if isinstance(value, datetime):
+        return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+    if isinstance(value, str) and value:
+        try:
+            moment = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            return None
+        return moment if moment.tzinfo else moment.replace(tzinfo=timezone.utc)
+    return None
+
+
+def expected_sort_fields(data):
+    """
+    Valori attesi delle chiavi di ordinamento. `createdAt` manca (None) se né
+    `createdAt` né `updatedAt` sono date valide.
+    """
+    return {
+        "createdAt": to_timestamp(data.get("createdAt")) or to_timestamp(data.get("updatedAt")),
+        "lastNameLower": sort_key(data.get("lastName")),
+        "emailLower": (data.get("email") or "").strip().lower(),
+    }
+
+
+# ==================== CURSORE ====================
+
+def _timestamp_pair(moment):
+    seconds = calendar.timegm(moment.utctimetuple())
+    nanos = getattr(moment, "nanosecond", None)
+    if not nanos:
+        nanos = moment.microsecond * 1000
+    return [seconds, nanos]
+
+
+def encode_cursor(sort, value, doc_id):
+    v = _timestamp_pair(value) if isinstance(value, datetime) else ("" if value is None else str(value))
+    raw = json.dumps({"s": sort, "v": v, "id": doc_id}, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+
+def decode_cursor(token, sort):
+    """(valore, id) del cursore; ValueError se è malformato o di un altro ordinamento."""
+    try:
+        cursor = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+    except (ValueError, TypeError) as exc:
+        raise ValueError(f"cursore non valido: {exc}") from None
+    if not isinstance(cursor, dict) or cursor.get("s") != sort or not isinstance(cursor.get("id"), str):
+        raise ValueError("cursore non valido per questo ordinamento")
+    value = cursor.get("v")
+    if SORTS[sort][0] == "createdAt" and not isinstance(value, str):
+        if not (isinstance(value, list) and len(value) == 2 and all(isinstance(x, int) for x in value)):
+            raise ValueError("cursore non valido: atteso [secondi, nanosecondi] o un testo")
+        from google.api_core.datetime_helpers import DatetimeWithNanoseconds
+        from google.protobuf.timestamp_pb2 import Timestamp
+
+        value = DatetimeWithNanoseconds.from_timestamp_pb(Timestamp(seconds=value[0], nanos=value[1]))
+    elif not isinstance(value, str):
+        raise ValueError("cursore non valido: atteso un testo")
+    return value, cursor["id"]
+
+
+# ==================== LETTURA ====================
+
+def page_query(db, sort="newest", tag=None):
+    field, direction = SORTS[sort]
+    query = db.collection(CUSTOMERS_COLLECTION)
+    if tag:
+        query = query.where("tags", "array_contains", tag)
+    return query.order_by(field, direction=direction).order_by("__name__", direction=direction)
+
+
+def read_page(db, sort="newest", limit=50, cursor=None, tag=None):
+    """
+    Una pagina di clienti: {"customers": [(id, dati)], "hasMore", "nextCursor"}.
+    Con `tag` usa gli indici composti tags + chiave di `firestore.indexes.json`.
+    """
+    if sort not in SORTS:
+        raise ValueError(f"ordinamento sconosciuto: {sort} (validi: {', '.join(SORTS)})")
+    limit = max(1, min(limit, MAX_PAGE))
+    field = SORTS[sort][0]
+    query = page_query(db, sort, tag)
+    if cursor:
+        value, doc_id = decode_cursor(cursor, sort)
+        query = query.start_after({field: value, "__name__": doc_id})
+    snaps = list(query.limit(limit + 1).stream())
+    has_more = len(snaps) > limit
+    snaps = snaps[:limit]
+    next_cursor = None
+    if has_more:
+        last = snaps[-1]
+        next_cursor = encode_cursor(sort, (last.to_dict() or {}).get(field), last.id)
+    return {
+        "customers": [(snap.id, snap.to_dict() or {}) for snap in snaps],
+        "hasMore": has_more,
+        "nextCursor": next_cursor,
+    }
+
+
+def iter_pages(db, sort="newest", limit=50, tag=None):
+    """Tutte le pagine in ordine, seguendo i cursori."""
+    cursor = None
+    while True:
+        page = read_page(db, sort, limit, cursor, tag)
+        yield page
+        if not page["hasMore"]:
+            return
+        cursor = page["nextCursor"]
@@ -0,0 +1,65 @@
+"""
+Statistiche giornaliere precalcolate (collezione `stats`).
+
+Un documento `stats/{salonId}_{date}` riassume le prenotazioni del giorno:
+conteggi per status, minuti prenotati, ricavo atteso e utilizzo rispetto alla
+capacità (`resources` × minuti di apertura). `getTodayStats` legge questo
+documento invece di interrogare tutte le prenotazioni della data.
+
+Come per `slotOccupancy`, le prenotazioni senza `salonId` confluiscono nel
+documento "default".
+"""
+from datetime import datetime, timezone
+
+from salon_tools.occupancy import DEFAULT_SALON_KEY
+from salon_tools.rules import ACTIVE_STATUSES, is_closed, to_minutes
+
+STATS_COLLECTION = "stats"
+STATS_META_COLLECTION = "statsMeta"
+STATS_META_DOC = "materializer"
+
+STATUSES = ("PENDING", "CONFIRMED", "REJECTED", "ALTERNATIVE_PROPOSED", "CANCELLED")
+
+
+def stats_doc_id(salon_id, date_str):
+    return f"{salon_id or DEFAULT_SALON_KEY}_{date_str}"
+
+
+def capacity_minutes(date_str, config):
+    """Minuti-risorsa disponibili nel giorno (0 se chiuso)."""
+    if is_closed(date_str, config):
+        return 0
+    open_minutes = max(0, to_minutes(config["closingTime"]) - to_minutes(config["openingTime"]))
+    return open_minutes * config["resources"]
+
+
+def build_stats(salon_id, date_str, bookings, config):
+    counts = {status: 0 for status in STATUSES}
+    booked_minutes = 0
+    expected_revenue = 0.0
+    confirmed_revenue = 0.0
+    for booking in bookings:
+        status = booking.get("status")
+        counts[status] = counts.get(status, 0) + 1
+        if status not in ACTIVE_STATUSES:
+            continue
+        if booking.get("startTime") and booking.get("endTime"):
+            booked_minutes += max(0, to_minutes(booking["endTime"]) - to_minutes(booking["startTime"]))
+        price = float(booking.get("servicePrice") or 0)
+        expected_revenue += price
+        if status == "CONFIRMED":
+            confirmed_revenue += price
+
+    capacity = capacity_minutes(date_str, config)
+    return {
+        "salonId": salon_id or DEFAULT_SALON_KEY,
+        "date": date_str,
+        "total": len(bookings),
+        "counts": counts,
+        "bookedMinutes": booked_minutes,
+        "capacityMinutes": capacity,
+        "utilization": round(booked_minutes / capacity, 4) if capacity else 0,
+        "expectedRevenue": round(expected_revenue, 2),
+        "confirmedRevenue": round(confirmed_revenue, 2),
+        "updatedAt": datetime.now(timezone.utc).isoformat(),
+    }
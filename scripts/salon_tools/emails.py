@@ -0,0 +1,232 @@
+"""
+Invio email tramite l'API di Resend, come `sendEmail` in `app/actions/email.ts`.
+
+- `render_reminder`: stesso template HTML di `sendBookingReminderEmail`
+- `render_alternatives`: stesso template HTML di `sendAlternativeSlotsEmail`
+- `TokenBucket`: limite di richieste al secondo condiviso tra le coroutine
+- `ResendClient`: POST a `/emails` su una sessione aiohttp (connessioni riusate),
+  con ritentativi su 429/5xx che rispettano `Retry-After` e header
+  `Idempotency-Key`, così un ritentativo non produce email doppie
+"""
+import asyncio
+import html
+import random
+import time
+from datetime import date
+
+RESEND_API_URL = "https://api.resend.com/emails"
+DEFAULT_FROM = "Salone <noreply@salone.it>"
+
+EMAIL_LOGS_COLLECTION = "emailLogs"
+REMINDER_TEMPLATE = "booking-reminder"
+ALTERNATIVES_TEMPLATE = "alternative-slots"
+
+_WEEKDAYS_IT = ("lunedì", "martedì", "mercoledì", "giovedì", "venerdì", "sabato", "domenica")
+_MONTHS_IT = (
+    "gennaio", "febbraio", "marzo", "aprile", "maggio", "giugno",
+    "luglio", "agosto", "settembre", "ottobre", "novembre", "dicembre",
+)
+
+_REMINDER_HTML = """
+      <!DOCTYPE html>
+      <html>
+        <head>
+          <meta charset="utf-8">
+          <style>
+            body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; }}
+            .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
+            .header {{ background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); color: white; padding: 30px; text-align: center; border-radius: 10px 10px 0 0; }}
+            .content {{ background: #f9f9f9; padding: 30px; border-radius: 0 0 10px 10px; }}
+            .info-box {{ background: white; padding: 20px; margin: 15px 0; border-radius: 5px; border-left: 4px solid #667eea; }}
+            .footer {{ text-align: center; margin-top: 20px; color: #666; font-size: 12px; }}
+          </style>
+        </head>
+        <body>
+          <div class="container">
+            <div class="header">
+              <h1>🔔 Promemoria Prenotazione</h1>
+            </div>
+            <div class="content">
+              <p>Ciao {first_name},</p>
+              <p>Ti ricordiamo che hai una prenotazione domani:</p>
+
+              <div class="info-box">
+                <h3>Dettagli Prenotazione</h3>
+                <p><strong>Servizio:</strong> {service_name}</p>
+                <p><strong>Data:</strong> {date_label}</p>
+                <p><strong>Orario:</strong> {start_time} - {end_time}</p>
+              </div>
+
+              <p>Ti aspettiamo!</p>
+
+              <div class="footer">
+                <p>Salone di Bellezza</p>
+                <p>Questa è una email automatica, non rispondere.</p>
+              </div>
+            </div>
+          </div>
+        </body>
+      </html>
+    """
+
+_ALTERNATIVE_HTML = """
+      <div style="background: white; padding: 15px; margin: 10px 0; border-radius: 5px; border-left: 4px solid #667eea;">
+        <strong>Opzione {number}:</strong><br>
+        Data: {date_label}<br>
+        Orario: {start_time} - {end_time}
+      </div>
+    """
+
+_ALTERNATIVES_HTML = """
+      <!DOCTYPE html>
+      <html>
+        <head>
+          <meta charset="utf-8">
+          <style>
+            body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; }}
+            .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
+            .header {{ background: linear-gradient(135deg, #f093fb 0%, #f5576c 100%); color: white; padding: 30px; text-align: center; border-radius: 10px 10px 0 0; }}
+            .content {{ background: #f9f9f9; padding: 30px; border-radius: 0 0 10px 10px; }}
+            .button {{ display: inline-block; padding: 12px 24px; background: #667eea; color: white; text-decoration: none; border-radius: 5px; margin: 10px 0; }}
+            .footer {{ text-align: center; margin-top: 20px; color: #666; font-size: 12px; }}
+          </style>
+        </head>
+        <body>
+          <div class="container">
+            <div class="header">
+              <h1>Slot alternativi disponibili</h1>
+            </div>
+            <div class="content">
+              <p>Ciao {first_name},</p>
+              <p>Lo slot che hai richiesto non è disponibile, ma abbiamo queste alternative per te:</p>
+              
+              {slots_html}
+              
+              <p style="text-align: center; margin: 20px 0;">
+                <a href="{app_url}/login?redirect=/account" class="button" style="display: inline-block; padding: 12px 24px; background: #667eea; color: white; text-decoration: none; border-radius: 5px; margin: 10px 0;">
+                  Accedi alla tua area personale
+                </a>
+              </p>
+              
+              <p style="text-align: center; color: #666; font-size: 14px;">
+                Accedi al tuo account per visualizzare e selezionare uno degli slot alternativi proposti.
+              </p>
+              
+              <div class="footer">
+                <p>Salone di Bellezza</p>
+                <p>Questa è una email automatica, non rispondere.</p>
+              </div>
+            </div>
+          </div>
+        </body>
+      </html>
+    """
+
+
+def format_date_it(date_str):
+    """"2025-03-03" -> "lunedì 3 marzo 2025" (come `toLocaleDateString("it-IT", ...)`)."""
+    day = date.fromisoformat(date_str)
+    return f"{_WEEKDAYS_IT[day.weekday()]} {day.day} {_MONTHS_IT[day.month - 1]} {day.year}"
+
+
+def render_reminder(booking, first_name):
+    """Oggetto e HTML del promemoria (template di `sendBookingReminderEmail`)."""
+    service_name = booking.get("serviceName") or ""
+    subject = "Promemoria prenotazione - " + service_name
+    body = _REMINDER_HTML.format(
+        first_name=html.escape(first_name or ""),
+        service_name=html.escape(service_name),
+        date_label=format_date_it(booking["date"]),
+        start_time=html.escape(booking.get("startTime") or ""),
+        end_time=html.escape(booking.get("endTime") or ""),
+    )
+    return subject, body
+
+
+def render_alternatives(service_name, first_name, slots, app_url="http://localhost:3000"):
+    """Oggetto e HTML della proposta di slot alternativi (template di `sendAlternativeSlotsEmail`)."""
+    subject = "Slot alternativi disponibili - " + (service_name or "")
+    slots_html = "".join(
+        _ALTERNATIVE_HTML.format(
+            number=number,
+            date_label=format_date_it(slot["date"]),
+            start_time=html.escape(slot["startTime"]),
+            end_time=html.escape(slot["endTime"]),
+        )
+        for number, slot in enumerate(slots, 1)
+    )
+    body = _ALTERNATIVES_HTML.format(
+        first_name=html.escape(first_name or ""),
+        slots_html=slots_html,
+        app_url=html.escape(app_url.rstrip("/")),
+    )
+    return subject, body
+
+
+class TokenBucket:
+    """`rate` richieste al secondo con raffiche fino a `burst`; `acquire()` attende il token."""
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst or max(1, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class ResendClient:
+    """Client asincrono per POST /emails; `send()` restituisce {"success", "messageId"|"error", "attempts"}."""
+
+    def __init__(self, session, api_key, url=RESEND_API_URL, bucket=None, max_retries=4, timeout=15):
+        self.session = session
+        self.api_key = api_key
+        self.url = url
+        self.bucket = bucket
+        self.max_retries = max_retries
+        self.timeout = timeout
+
+    async def send(self, to, subject, html_body, sender=DEFAULT_FROM, idempotency_key=None):
+        import aiohttp
+
+        headers = {"Content-Type": "application/json", "Authorization": f"Bearer {self.api_key}"}
+        if idempotency_key:
+            headers["Idempotency-Key"] = idempotency_key
+        payload = {"from": sender, "to": to, "subject": subject, "html": html_body}
+
+        error = None
+        for attempt in range(1, self.max_retries + 2):
+            if self.bucket:
+                await self.bucket.acquire()
+            retry_after = None
+            try:
+                async with self.session.post(
+                    self.url, json=payload, headers=headers, timeout=aiohttp.ClientTimeout(total=self.timeout)
+                ) as response:
+                    data = await response.json(content_type=None)
+                    if response.status < 300:
+                        return {"success": True, "messageId": (data or {}).get("id"), "attempts": attempt}
+                    error = (data or {}).get("message") or f"HTTP {response.status}"
+                    if response.status != 429 and response.status < 500:
+                        return {"success": False, "error": error, "attempts": attempt}
+                    retry_after = response.headers.get("Retry-After")
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as exc:
+                error = str(exc) or exc.__class__.__name__
+
+            if attempt <= self.max_retries:
+                try:
+                    delay = float(retry_after)
+                except (TypeError, ValueError):
+                    delay = min(30.0, 0.5 * 2 ** (attempt - 1)) * random.uniform(0.8, 1.2)
+                await asyncio.sleep(delay)
+        return {"success": False, "error": error or "Failed to send email", "attempts": self.max_retries + 1}
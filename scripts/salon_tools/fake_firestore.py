@@ -0,0 +1,234 @@
+"""
+Firestore in memoria con listener `on_snapshot`, per provare senza emulatore
+i processi che vivono di snapshot (`live_availability`).
+
+Supporta il sottoinsieme usato dagli script: `collection().where().limit()`,
+`document()`, `get()`/`stream()` e `on_snapshot(callback)`. Come nel client
+reale, il callback riceve `(documenti, cambiamenti, read_time)` su un thread
+separato: il primo snapshot contiene tutti i documenti come `ADDED`, i
+successivi solo i cambiamenti `ADDED`/`MODIFIED`/`REMOVED`. `flush()` attende
+che tutti gli snapshot in coda siano stati consegnati; `delay` simula il
+ritardo di consegna.
+"""
+import copy
+import enum
+import operator
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+
+ChangeType = enum.Enum("ChangeType", "ADDED MODIFIED REMOVED")
+
+_OPS = {
+    "==": operator.eq,
+    "!=": operator.ne,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+    "in": lambda value, options: value in options,
+}
+
+
+class FakeSnapshot:
+    def __init__(self, doc_id, data):
+        self.id = doc_id
+        self._data = data
+
+    @property
+    def exists(self):
+        return self._data is not None
+
+    def to_dict(self):
+        return copy.deepcopy(self._data)
+
+
+class FakeChange:
+    def __init__(self, change_type, document):
+        self.type = change_type
+        self.document = document
+
+
+class FakeWatch:
+    def __init__(self, store, target, callback):
+        self._store = store
+        self.target = target
+        self.callback = callback
+        self.visible = {}
+        self.delivered = False
+        self.is_active = True
+
+    def unsubscribe(self):
+        self.is_active = False
+        with self._store.lock:
+            if self in self._store.watches:
+                self._store.watches.remove(self)
+
+
+class FakeQuery:
+    def __init__(self, store, collection, filters=(), limit=None):
+        self._store = store
+        self.collection = collection
+        self.filters = tuple(filters)
+        self.limit_count = limit
+
+    def where(self, field, op, value):
+        if op not in _OPS:
+            raise ValueError(f"Operatore non supportato dal fake: {op}")
+        return FakeQuery(self._store, self.collection, self.filters + ((field, op, value),), self.limit_count)
+
+    def limit(self, count):
+        return FakeQuery(self._store, self.collection, self.filters, count)
+
+    def document(self, doc_id):
+        return FakeDocument(self._store, self.collection, doc_id)
+
+    def matches(self, data):
+        for field, op, value in self.filters:
+            if field not in data or not _OPS[op](data[field], value):
+                return False
+        return True
+
+    def evaluate(self, docs):
+        """{id: dati} dei documenti della collezione che soddisfano la query, in ordine di id."""
+        result = {}
+        for doc_id in sorted(docs):
+            if self.matches(docs[doc_id]):
+                result[doc_id] = docs[doc_id]
+                if self.limit_count is not None and len(result) >= self.limit_count:
+                    break
+        return result
+
+    def stream(self):
+        with self._store.lock:
+            docs = self.evaluate(self._store.collections.get(self.collection, {}))
+        return [FakeSnapshot(doc_id, copy.deepcopy(data)) for doc_id, data in docs.items()]
+
+    def get(self):
+        return self.stream()
+
+    def on_snapshot(self, callback):
+        return self._store.watch(self, callback)
+
+
+class FakeDocument:
+    def __init__(self, store, collection, doc_id):
+        self._store = store
+        self.collection = collection
+        self.id = doc_id
+
+    def evaluate(self, docs):
+        return {self.id: docs[self.id]} if self.id in docs else {}
+
+    def get(self):
+        with self._store.lock:
+            data = self._store.collections.get(self.collection, {}).get(self.id)
+        return FakeSnapshot(self.id, copy.deepcopy(data))
+
+    def on_snapshot(self, callback):
+        return self._store.watch(self, callback)
+
+
+class FakeFirestore:
+    def __init__(self, delay=0.0):
+        self.collections = {}
+        self.watches = []
+        self.lock = threading.RLock()
+        self.delay = delay
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._dispatch, name="fake-firestore-snapshots", daemon=True)
+        self._thread.start()
+
+    def collection(self, name):
+        return FakeQuery(self, name)
+
+    # ==================== SCRITTURE ====================
+
+    def set(self, collection, doc_id, data):
+        self._write(collection, doc_id, copy.deepcopy(data))
+
+    def update(self, collection, doc_id, fields):
+        with self.lock:
+            current = self.collections.get(collection, {}).get(doc_id)
+            if current is None:
+                raise KeyError(f"{collection}/{doc_id} non esiste")
+            self._write(collection, doc_id, {**current, **copy.deepcopy(fields)})
+
+    def delete(self, collection, doc_id):
+        self._write(collection, doc_id, None)
+
+    def _write(self, collection, doc_id, data):
+        with self.lock:
+            docs = self.collections.setdefault(collection, {})
+            if data is None:
+                docs.pop(doc_id, None)
+            else:
+                docs[doc_id] = data
+            read_time = datetime.now(timezone.utc)
+            for watch in self.watches:
+                if watch.target.collection == collection:
+                    self._notify(watch, read_time, doc_id)
+
+    # ==================== LISTENER ====================
+
+    def watch(self, target, callback):
+        watch = FakeWatch(self, target, callback)
+        with self.lock:
+            self.watches.append(watch)
+            self._notify(watch, datetime.now(timezone.utc))
+        return watch
+
+    def _notify(self, watch, read_time, doc_id=None):
+        """
+        Accoda lo snapshot di `watch` se il risultato è cambiato. Con `doc_id`
+        (e senza `limit`) valuta solo il documento scritto.
+        """
+        docs = self.collections.get(watch.target.collection, {})
+        if doc_id is not None and getattr(watch.target, "limit_count", None) is None:
+            data = docs.get(doc_id)
+            matched = data is not None and (
+                doc_id == watch.target.id if isinstance(watch.target, FakeDocument) else watch.target.matches(data))
+            current = {doc_id: data} if matched else {}
+            before = {doc_id: watch.visible[doc_id]} if doc_id in watch.visible else {}
+        else:
+            current = watch.target.evaluate(docs)
+            before = watch.visible
+        changes = []
+        for changed_id, data in current.items():
+            if changed_id not in before:
+                changes.append(FakeChange(ChangeType.ADDED, FakeSnapshot(changed_id, data)))
+            elif before[changed_id] != data:
+                changes.append(FakeChange(ChangeType.MODIFIED, FakeSnapshot(changed_id, data)))
+        for changed_id, data in before.items():
+            if changed_id not in current:
+                changes.append(FakeChange(ChangeType.REMOVED, FakeSnapshot(changed_id, data)))
+        if not changes and watch.delivered:
+            return
+        watch.delivered = True
+        if current is not before:
+            if before is watch.visible:
+                watch.visible = dict(current)
+            else:
+                watch.visible.pop(doc_id, None)
+                watch.visible.update(current)
+        if isinstance(watch.target, FakeDocument):
+            snapshots = [FakeSnapshot(watch.target.id, watch.visible.get(watch.target.id))]
+        else:
+            snapshots = [FakeSnapshot(visible_id, data) for visible_id, data in watch.visible.items()]
+        self._queue.put((watch, snapshots, changes, read_time))
+
+    def _dispatch(self):
+        while True:
+            watch, docs, changes, read_time = self._queue.get()
+            try:
+                if self.delay:
+                    time.sleep(self.delay)
+                if watch.is_active:
+                    watch.callback(docs, changes, read_time)
+            finally:
+                self._queue.task_done()
+
+    def flush(self):
+        """Attende la consegna di tutti gli snapshot accodati."""
+        self._queue.join()
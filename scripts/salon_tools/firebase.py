@@ -0,0 +1,98 @@
+"""
+Connessione a Firestore condivisa dagli script.
+
+Carica `.env.local` dalla root del progetto e inizializza Firebase Admin SDK
+solo alla prima chiamata di `get_db()`. Se `FIRESTORE_EMULATOR_HOST` è
+impostata, il client punta all'emulatore locale e le credenziali del service
+account non sono necessarie.
+"""
+import os
+import sys
+import threading
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+
+_db = None
+_db_lock = threading.Lock()
+
+
+def _emulator_credential(credentials):
+    """Credenziale anonima per l'emulatore Firestore (nessun token richiesto)."""
+    from google.auth.credentials import AnonymousCredentials
+
+    class EmulatorCredential(credentials.Base):
+        def get_credential(self):
+            return AnonymousCredentials()
+
+    return EmulatorCredential()
+
+
+def load_env():
+    """Carica `.env.local` dalla root del progetto (python-dotenv opzionale)."""
+    try:
+        from dotenv import load_dotenv
+    except ImportError:
+        return
+    env_path = PROJECT_ROOT / ".env.local"
+    if env_path.exists():
+        load_dotenv(env_path)
+
+
+def build_cred_dict():
+    """Costruisce il dizionario delle credenziali dalle variabili FIREBASE_ADMIN_*."""
+    project_id = os.getenv("FIREBASE_ADMIN_PROJECT_ID")
+    client_email = os.getenv("FIREBASE_ADMIN_CLIENT_EMAIL")
+    private_key_raw = os.getenv("FIREBASE_ADMIN_PRIVATE_KEY", "")
+
+    if not all([project_id, client_email, private_key_raw]):
+        raise RuntimeError(
+            "Variabili d'ambiente Firebase Admin mancanti "
+            "(FIREBASE_ADMIN_PROJECT_ID, FIREBASE_ADMIN_CLIENT_EMAIL, FIREBASE_ADMIN_PRIVATE_KEY)"
+        )
+
+    return {
+        "type": "service_account",
+        "project_id": project_id,
+        "private_key_id": os.getenv("FIREBASE_ADMIN_PRIVATE_KEY_ID", ""),
+        "private_key": private_key_raw.replace("\\n", "\n"),
+        "client_email": client_email,
+        "client_id": os.getenv("FIREBASE_ADMIN_CLIENT_ID", ""),
+        "auth_uri": "https://accounts.google.com/o/oauth2/auth",
+        "token_uri": "https://oauth2.googleapis.com/token",
+        "auth_provider_x509_cert_url": "https://www.googleapis.com/oauth2/v1/certs",
+        "client_x509_cert_url": f"https://www.googleapis.com/robot/v1/metadata/x509/{client_email.replace('@', '%40')}",
+    }
+
+
+def get_db():
+    """Restituisce il client Firestore, inizializzandolo alla prima chiamata (anche da più thread)."""
+    global _db
+    if _db is not None:
+        return _db
+
+    with _db_lock:
+        if _db is None:
+            _db = _init_db()
+    return _db
+
+
+def _init_db():
+    load_env()
+
+    try:
+        import firebase_admin
+        from firebase_admin import credentials, firestore
+    except ImportError:
+        print("[ERR] Errore: firebase-admin non installato")
+        print("Installa con: pip install firebase-admin")
+        sys.exit(1)
+
+    if not firebase_admin._apps:
+        if os.getenv("FIRESTORE_EMULATOR_HOST"):
+            project_id = os.getenv("FIREBASE_ADMIN_PROJECT_ID") or os.getenv("GCLOUD_PROJECT") or "demo-salone"
+            firebase_admin.initialize_app(_emulator_credential(credentials), {"projectId": project_id})
+        else:
+            firebase_admin.initialize_app(credentials.Certificate(build_cred_dict()))
+
+    return firestore.client()
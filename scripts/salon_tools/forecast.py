@@ -0,0 +1,263 @@
+"""
+Previsione della domanda per giorno della settimana × slot e risorse consigliate.
+
+`resources` è un numero unico per tutte le ore; la domanda invece ha picchi
+per giorno e orario. Qui:
+
+- `demand_tensor`: dallo storico un tensore settimane × 7 × slot con il carico
+  di ogni slot di `timeStep` minuti, cioè le risorse occupate in media
+  (minuti di sovrapposizione delle richieste, `bufferTime` incluso, diviso
+  `timeStep`). Contano anche le richieste rifiutate o con alternative
+  proposte: sono domanda che non è stata servita. Giorni chiusi = NaN.
+- modelli, tutti vettoriali su 7 × slot (il ciclo è solo sulle settimane):
+  `ses` (exponential smoothing stagionale settimanale, una serie per
+  giorno × slot, più valori di alpha insieme), `mean` (media storica) e
+  `naive` (stessa settimana precedente)
+- `backtest`: errori delle previsioni a una settimana sulle ultime settimane
+  (MAE, RMSE, WAPE, copertura delle risorse consigliate)
+- `recommended_resources`: con arrivi di Poisson e durate qualsiasi le risorse
+  occupate seguono una Poisson con media pari al carico (M/G/∞): si consiglia
+  il minimo k con P(occupate ≤ k) ≥ livello di servizio
+
+Giorni della settimana come JS `getDay()` (0 = domenica), come in `analytics.py`.
+"""
+import warnings
+from datetime import timedelta
+
+import numpy as np
+
+from salon_tools.rules import is_closed, to_minutes
+
+# Richieste che rappresentano domanda (le CANCELLED sono state ritirate dal cliente)
+DEMAND_STATUSES = ("PENDING", "CONFIRMED", "REJECTED", "ALTERNATIVE_PROPOSED")
+
+SES_ALPHAS = (0.05, 0.1, 0.2, 0.3, 0.5)
+WARMUP_WEEKS = 4
+MAX_RESOURCES = 50
+
+# Righe elaborate per volta nella matrice prenotazioni × slot
+CHUNK_ROWS = 200_000
+
+
+def slot_grid(config):
+    """Inizio e fine (minuti) degli slot di `timeStep` tra apertura e chiusura."""
+    opening = to_minutes(config["openingTime"])
+    closing = to_minutes(config["closingTime"])
+    starts = np.arange(opening, closing, config["timeStep"], dtype="float64")
+    return starts, np.minimum(starts + config["timeStep"], closing)
+
+
+def history_window(end_day, weeks):
+    """Prima data della finestra di `weeks` settimane intere che termina il giorno `end_day` (incluso)."""
+    return end_day - timedelta(days=7 * weeks - 1)
+
+
+def demand_tensor(day_offsets, starts, ends, config, first_day, weeks):
+    """
+    Carico per settimana × posizione nella settimana × slot.
+
+    `day_offsets`: giorni dall'inizio della finestra (`first_day`) di ogni
+    richiesta; `starts`/`ends`: minuti dalla mezzanotte. La posizione p
+    corrisponde al giorno `first_day + p` di ogni settimana.
+    """
+    slot_start, slot_end = slot_grid(config)
+    days = 7 * weeks
+    load = np.zeros((days, len(slot_start)))
+    keep = (day_offsets >= 0) & (day_offsets < days)
+    day_offsets, starts = day_offsets[keep], starts[keep]
+    ends = ends[keep] + config["bufferTime"]
+    for offset in range(0, len(day_offsets), CHUNK_ROWS):
+        s = starts[offset:offset + CHUNK_ROWS, None]
+        e = ends[offset:offset + CHUNK_ROWS, None]
+        overlap = np.clip(np.minimum(e, slot_end) - np.maximum(s, slot_start), 0, None)
+        np.add.at(load, day_offsets[offset:offset + CHUNK_ROWS], overlap)
+    load /= (slot_end - slot_start)
+
+    closed = np.array([is_closed((first_day + timedelta(days=d)).isoformat(), config) for d in range(days)])
+    load[closed] = np.nan
+    return load.reshape(weeks, 7, len(slot_start))
+
+
+def js_weekdays(first_day):
+    """Giorno della settimana JS di ogni posizione 0..6 della settimana che inizia con `first_day`."""
+    return [((first_day + timedelta(days=p)).weekday() + 1) % 7 for p in range(7)]
+
+
+# ==================== MODELLI ====================
+
+def ses_forecasts(tensor, alphas=SES_ALPHAS, warmup=WARMUP_WEEKS):
+    """
+    Previsioni a una settimana dell'exponential smoothing per ogni alpha.
+
+    Restituisce (previsioni A × settimane × 7 × slot, livelli finali A × 7 × slot):
+    la previsione della settimana w usa solo le settimane precedenti; le
+    settimane con il giorno chiuso (NaN) non aggiornano il livello.
+    """
+    alphas = np.asarray(alphas, dtype="float64")[:, None, None]
+    weeks = tensor.shape[0]
+    with warnings.catch_warnings():
+        # Slot sempre chiusi nel periodo iniziale: media di soli NaN
+        warnings.simplefilter("ignore", RuntimeWarning)
+        level = np.nanmean(tensor[:max(1, min(warmup, weeks))], axis=0)
+    level = np.broadcast_to(np.nan_to_num(level), (len(alphas),) + tensor.shape[1:]).copy()
+    forecasts = np.empty((len(alphas),) + tensor.shape)
+    for week in range(weeks):
+        forecasts[:, week] = level
+        observed = tensor[week]
+        update = ~np.isnan(observed)
+        level = np.where(update, level + alphas * (np.nan_to_num(observed) - level), level)
+    return forecasts, level
+
+
+def mean_forecasts(tensor):
+    """Media delle settimane precedenti (espandente), ignorando i giorni chiusi; ultima = media di tutte."""
+    values = np.nan_to_num(tensor)
+    counts = (~np.isnan(tensor)).cumsum(axis=0)
+    sums = values.cumsum(axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        running = np.where(counts > 0, sums / np.maximum(counts, 1), 0.0)
+    forecasts = np.concatenate([np.zeros((1,) + tensor.shape[1:]), running[:-1]], axis=0)
+    return forecasts, running[-1]
+
+
+def naive_forecasts(tensor):
+    """Stesso giorno × slot della settimana precedente (0 se chiuso o assente)."""
+    values = np.nan_to_num(tensor)
+    forecasts = np.concatenate([np.zeros((1,) + tensor.shape[1:]), values[:-1]], axis=0)
+    return forecasts, values[-1]
+
+
+def poisson_quantile(mean, level, max_k=MAX_RESOURCES):
+    """Minimo k con P(Poisson(mean) ≤ k) ≥ level, elemento per elemento."""
+    mean = np.asarray(mean, dtype="float64")
+    pmf = np.exp(-mean)
+    cdf = pmf.copy()
+    k = np.zeros(mean.shape, dtype="int64")
+    for i in range(1, max_k + 1):
+        short = cdf < level
+        if not short.any():
+            break
+        k += short
+        pmf = pmf * mean / i
+        cdf = cdf + pmf
+    return k
+
+
+def recommended_resources(expected, service_level, min_resources=1, max_resources=MAX_RESOURCES):
+    """Risorse per slot: quantile di Poisson del carico previsto, tra `min_resources` e `max_resources`."""
+    return np.clip(poisson_quantile(expected, service_level, max_resources), min_resources, max_resources)
+
+
+def error_metrics(forecasts, actual, service_level):
+    """MAE, RMSE, WAPE e copertura (carico ≤ risorse consigliate) sulle celle aperte."""
+    mask = ~np.isnan(actual)
+    if not mask.any():
+        return {"cells": 0}
+    f = forecasts[mask]
+    a = actual[mask]
+    errors = f - a
+    total = a.sum()
+    return {
+        "cells": int(mask.sum()),
+        "mae": round(float(np.abs(errors).mean()), 4),
+        "rmse": round(float(np.sqrt((errors ** 2).mean())), 4),
+        "wape": round(float(np.abs(errors).sum() / total), 4) if total > 0 else None,
+        "bias": round(float(errors.mean()), 4),
+        "coverage": round(float((a <= poisson_quantile(f, service_level)).mean()), 4),
+    }
+
+
+def backtest(tensor, backtest_weeks, service_level, alphas=SES_ALPHAS):
+    """
+    Errori delle previsioni a una settimana sulle ultime `backtest_weeks`
+    settimane per ogni modello e la scelta del migliore (WAPE, poi MAE).
+    Restituisce (metriche {modello: {...}}, modello scelto, previsione 7 × slot del modello).
+    """
+    weeks = tensor.shape[0]
+    tail = slice(max(WARMUP_WEEKS, weeks - backtest_weeks), weeks)
+    actual = tensor[tail]
+    candidates = {}
+    ses, levels = ses_forecasts(tensor, alphas)
+    for i, alpha in enumerate(alphas):
+        candidates[f"ses:{alpha:g}"] = (ses[i], levels[i])
+    candidates["mean"] = mean_forecasts(tensor)
+    candidates["naive"] = naive_forecasts(tensor)
+
+    metrics = {name: error_metrics(forecasts[tail], actual, service_level)
+               for name, (forecasts, _) in candidates.items()}
+
+    def score(name):
+        m = metrics[name]
+        return (m.get("wape") if m.get("wape") is not None else np.inf, m.get("mae", np.inf))
+
+    best = min(candidates, key=score)
+    return metrics, best, candidates[best][1]
+
+
+# ==================== PREVISIONE ====================
+
+def forecast_salon(day_offsets, starts, ends, config, end_day, weeks, backtest_weeks, service_level,
+                   horizon_weeks, min_resources=1):
+    """
+    Modello scelto dal backtest e previsione per le prossime `horizon_weeks`
+    settimane dopo `end_day`. I dati per giorno della settimana sono indicizzati
+    con JS getDay(); le date chiuse della configurazione hanno 0 risorse.
+    """
+    first_day = history_window(end_day, weeks)
+    tensor = demand_tensor(day_offsets, starts, ends, config, first_day, weeks)
+    metrics, model, expected = backtest(tensor, backtest_weeks, service_level)
+    resources = recommended_resources(expected, service_level, min_resources)
+    positions = js_weekdays(first_day)
+    by_weekday = {positions[p]: p for p in range(7)}
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        history = np.nanmean(tensor, axis=0)
+        peak = np.nanmax(tensor, axis=0)
+
+    upcoming = []
+    for offset in range(1, 7 * horizon_weeks + 1):
+        day = end_day + timedelta(days=offset)
+        weekday = (day.weekday() + 1) % 7
+        closed = is_closed(day.isoformat(), config)
+        upcoming.append({"date": day.isoformat(), "weekday": weekday, "closed": bool(closed)})
+
+    slot_start, _ = slot_grid(config)
+    return {
+        "slots": [f"{int(m) // 60:02d}:{int(m) % 60:02d}" for m in slot_start],
+        "from": first_day.isoformat(),
+        "to": end_day.isoformat(),
+        "model": model,
+        "metrics": metrics,
+        "expected": {w: expected[p] for w, p in by_weekday.items()},
+        "resources": {w: resources[p] for w, p in by_weekday.items()},
+        "historyMean": {w: np.nan_to_num(history[p]) for w, p in by_weekday.items()},
+        "historyPeak": {w: np.nan_to_num(peak[p]) for w, p in by_weekday.items()},
+        "upcoming": upcoming,
+    }
+
+
+def synthetic_requests(weeks, end_day, config, daily_requests=40, seed=0):
+    """
+    Richieste casuali con picchi realistici (sabato pomeriggio, sera in
+    settimana, mattine tranquille) come (giorni dall'inizio, inizio, fine).
+    """
+    rng = np.random.default_rng(seed)
+    first_day = history_window(end_day, weeks)
+    slot_start, _ = slot_grid(config)
+    hours = slot_start / 60
+    weekday_factor = np.array([0.0, 0.7, 0.8, 0.9, 1.0, 1.3, 1.8])  # JS getDay
+    profile = 0.5 + np.exp(-((hours - 17.5) ** 2) / 4)
+    offsets, starts, ends = [], [], []
+    for d in range(7 * weeks):
+        day = first_day + timedelta(days=d)
+        weekday = (day.weekday() + 1) % 7
+        rates = daily_requests * weekday_factor[weekday] * profile / profile.sum()
+        if weekday == 6:
+            rates = rates * np.where(hours >= 14, 1.6, 0.8)
+        counts = rng.poisson(rates * (1 + 0.004 * d / 7))
+        begin = np.repeat(slot_start, counts)
+        offsets.append(np.full(len(begin), d))
+        starts.append(begin)
+        ends.append(begin + rng.choice((30, 45, 60, 90), len(begin)))
+    return np.concatenate(offsets), np.concatenate(starts), np.concatenate(ends)
@@ -0,0 +1,656 @@
+"""
+Forme delle query Firestore del codice e confronto con `firestore.indexes.json`.
+
+Le query vengono estratte in modo statico:
+
+- `scripts/**/*.py`: dall'AST, seguendo le catene `collection().where().order_by()`
+  e le variabili riassegnate (`query = query.where(...)`)
+- `app/**/*.ts` e `lib/*.ts`: con un piccolo scanner delle catene dell'Admin SDK
+  (`.collection().where().orderBy()`) e delle chiamate `query(collection(), where(), orderBy())`
+  dell'SDK client
+
+Una clausola aggiunta dentro un `if` è opzionale: la query viene contata sia con
+sia senza. Campi e direzioni non letterali (variabili) diventano `?` e la forma
+è "dinamica": non genera indici mancanti ma tiene in uso gli indici compatibili.
+
+Per ogni forma `required_index` calcola l'indice composto necessario secondo le
+regole di Firestore (uguaglianze, poi ordinamenti espliciti, poi campi con
+filtri di intervallo non ordinati); le query con sole uguaglianze o su un solo
+campo usano gli indici automatici a campo singolo.
+"""
+import ast
+import json
+import re
+from pathlib import Path
+
+ANY = "?"
+
+EQUALITY_OPS = {"==", "in"}
+ARRAY_OPS = {"array_contains", "array-contains", "array_contains_any", "array-contains-any"}
+RANGE_OPS = {"<", "<=", ">", ">=", "!=", "not-in", "not_in"}
+
+PY_QUERY_METHODS = {"where", "order_by", "limit", "limit_to_last", "offset", "start_at", "start_after",
+                    "end_at", "end_before", "select"}
+PY_RUN_METHODS = {"stream", "get", "count", "on_snapshot", "avg", "sum"}
+TS_QUERY_METHODS = {"where", "orderBy", "limit", "limitToLast", "offset", "startAt", "startAfter",
+                    "endAt", "endBefore", "select"}
+TS_RUN_METHODS = {"get", "stream", "count", "onSnapshot"}
+
+# Commento che segnala un ordinamento fatto in memoria per evitare un indice
+_IN_MEMORY_HINT = re.compile(r"evitare index|avoid index requirement", re.IGNORECASE)
+
+
+def new_shape(collection, source, line, function):
+    return {"collection": collection, "filters": [], "orders": [], "limit": False,
+            "source": source, "line": line, "function": function, "inMemorySort": False}
+
+
+def _extend(shape, method, args):
+    """Copia della forma con una clausola in più; `args` già convertiti in valori o ANY."""
+    shape = {**shape, "filters": list(shape["filters"]), "orders": list(shape["orders"])}
+    if method == "where":
+        field, op = args
+        shape["filters"].append((field, op))
+    elif method in ("order_by", "orderBy"):
+        field, direction = args
+        shape["orders"].append((field, direction))
+    elif method in ("limit", "limit_to_last", "limitToLast"):
+        shape["limit"] = True
+    return shape
+
+
+def _direction(value):
+    if value is None:
+        return "ASCENDING"
+    if value == ANY:
+        return ANY
+    return "DESCENDING" if str(value).lower().startswith("desc") else "ASCENDING"
+
+
+# ==================== PYTHON ====================
+
+def _py_constants(trees):
+    """Costanti stringa a livello di modulo (es. WAITLIST_COLLECTION) di tutti i file."""
+    constants = {}
+    for tree in trees:
+        for node in tree.body:
+            if isinstance(node, ast.Assign) and isinstance(node.value, ast.Constant) \
+                    and isinstance(node.value.value, str):
+                for target in node.targets:
+                    if isinstance(target, ast.Name):
+                        constants[target.id] = node.value.value
+    return constants
+
+
+class _PyExtractor:
+    def __init__(self, source, constants):
+        self.source = source
+        self.constants = constants
+        self.shapes = []
+
+    def value(self, node):
+        if isinstance(node, ast.Constant) and isinstance(node.value, str):
+            return node.value
+        if isinstance(node, ast.Name) and node.id in self.constants:
+            return self.constants[node.id]
+        if isinstance(node, ast.Attribute) and node.attr in ("ASCENDING", "DESCENDING"):
+            return node.attr
+        return ANY
+
+    def chain(self, node):
+        """(radice, [(metodo, nodo Call)]) di una catena di chiamate a metodi."""
+        calls = []
+        while isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute):
+            calls.append((node.func.attr, node))
+            node = node.func.value
+        return node, calls[::-1]
+
+    def clause_args(self, method, call):
+        if method == "where":
+            kwargs = {kw.arg: kw.value for kw in call.keywords}
+            if "filter" in kwargs and isinstance(kwargs["filter"], ast.Call):
+                args = kwargs["filter"].args
+            else:
+                args = call.args or [kwargs.get("field_path"), kwargs.get("op_string")]
+            if len(args) < 2 or args[0] is None:
+                return ANY, ANY
+            return self.value(args[0]), self.value(args[1])
+        if method == "order_by":
+            direction = call.args[1] if len(call.args) > 1 else next(
+                (kw.value for kw in call.keywords if kw.arg == "direction"), None)
+            return self.value(call.args[0]) if call.args else ANY, _direction(
+                None if direction is None else self.value(direction))
+        return None
+
+    def shapes_of(self, node, variables, function):
+        """Varianti di forma di un'espressione, o None se non è una query."""
+        root, calls = self.chain(node)
+        variants = None
+        start = 0
+        for i, (method, call) in enumerate(calls):
+            if method == "collection":
+                variants = [new_shape(self.value(call.args[0]) if call.args else ANY, self.source,
+                                      call.lineno, function)]
+                start = i + 1
+            elif method in ("document", "collection_group"):
+                variants = None
+                start = i + 1
+        if variants is None:
+            if start == 0 and isinstance(root, ast.Name) and root.id in variables:
+                variants = variables[root.id]
+            else:
+                return None
+        for method, call in calls[start:]:
+            if method in PY_QUERY_METHODS:
+                variants = [_extend(v, method, self.clause_args(method, call)) for v in variants]
+            elif method not in PY_RUN_METHODS:
+                return None
+        return variants
+
+    def visit_function(self, function, body):
+        variables = {}
+        recorded = []
+
+        def record(variants, line):
+            for variant in variants:
+                recorded.append({**variant, "line": line})
+
+        def walk(statements, conditional):
+            for stmt in statements:
+                if isinstance(stmt, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                    self.visit_function(stmt.name, stmt.body)
+                    continue
+                if isinstance(stmt, ast.ClassDef):
+                    for item in stmt.body:
+                        if isinstance(item, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                            self.visit_function(f"{stmt.name}.{item.name}", item.body)
+                    continue
+                if isinstance(stmt, ast.Assign) and len(stmt.targets) == 1 and isinstance(stmt.targets[0], ast.Name):
+                    name = stmt.targets[0].id
+                    variants = self.shapes_of(stmt.value, variables, function)
+                    if variants is not None:
+                        previous = variables.get(name) if conditional else None
+                        variables[name] = variants + (previous or [])
+                        self.scan_runs(stmt.value, variables, function, record, skip=stmt.value)
+                        continue
+                for child in ast.iter_child_nodes(stmt):
+                    if isinstance(child, ast.expr):
+                        self.scan_runs(child, variables, function, record)
+                for field in ("body", "orelse", "finalbody", "handlers"):
+                    block = getattr(stmt, field, None)
+                    if isinstance(block, list) and block and isinstance(block[0], (ast.stmt, ast.ExceptHandler)):
+                        nested = [s for h in block for s in (h.body if isinstance(h, ast.ExceptHandler) else [h])]
+                        walk(nested, conditional or not isinstance(stmt, (ast.With, ast.AsyncWith)))
+
+        walk(body, False)
+        # Le query restituite o eseguite sono registrate dove compaiono; le variabili
+        # costruite e mai eseguite qui (passate ad altre funzioni) alla fine della funzione
+        used = {(v["collection"], tuple(v["filters"]), tuple(v["orders"])) for v in recorded}
+        for variants in variables.values():
+            for variant in variants:
+                key = (variant["collection"], tuple(variant["filters"]), tuple(variant["orders"]))
+                if key not in used:
+                    recorded.append(variant)
+                    used.add(key)
+        self.shapes.extend(recorded)
+
+    def scan_runs(self, expr, variables, function, record, skip=None):
+        """Catene eseguite o restituite dentro un'espressione."""
+        for node in ast.walk(expr):
+            if node is skip or not isinstance(node, ast.Call) or not isinstance(node.func, ast.Attribute):
+                continue
+            if node.func.attr not in PY_RUN_METHODS and node.func.attr not in PY_QUERY_METHODS:
+                continue
+            variants = self.shapes_of(node, variables, function)
+            if variants is not None and node.func.attr in PY_RUN_METHODS:
+                record(variants, node.lineno)
+
+
+def extract_python(paths, root):
+    trees = {}
+    for path in paths:
+        try:
+            trees[path] = ast.parse(path.read_text(encoding="utf-8"), filename=str(path))
+        except SyntaxError:
+            continue
+    constants = _py_constants(trees.values())
+    shapes = []
+    for path, tree in trees.items():
+        extractor = _PyExtractor(str(path.relative_to(root)), constants)
+        extractor.visit_function("<module>", tree.body)
+        shapes.extend(extractor.shapes)
+    return shapes
+
+
+# ==================== TYPESCRIPT ====================
+
+_TS_STRING = re.compile(r"""^(["'`])(.*)\1$""", re.S)
+_TS_CONST = re.compile(r"""(?:export\s+)?const\s+([A-Z_][A-Z0-9_]*)\s*=\s*["']([^"']+)["']""")
+_TS_FUNCTION = re.compile(r"(?:async\s+)?function\s+(\w+)|(?:const|let)\s+(\w+)\s*=\s*async\b")
+_TS_IDENT = re.compile(r"[A-Za-z_$][\w$]*")
+_TS_CONDITIONAL = re.compile(r"\b(if|else|for|while|catch|switch|case)\b[^;{}]*$")
+
+
+def _strip_ts_comments(text):
+    """Commenti sostituiti da spazi (le posizioni restano valide per i numeri di riga)."""
+    out = []
+    i, n = 0, len(text)
+    while i < n:
+        ch = text[i]
+        if ch in "\"'`":
+            j = i + 1
+            while j < n and text[j] != ch:
+                j += 2 if text[j] == "\\" else 1
+            out.append(text[i:j + 1])
+            i = j + 1
+        elif text.startswith("//", i):
+            j = text.find("\n", i)
+            j = n if j == -1 else j
+            out.append(" " * (j - i))
+            i = j
+        elif text.startswith("/*", i):
+            j = text.find("*/", i + 2)
+            j = n if j == -1 else j + 2
+            out.append(re.sub(r"[^\n]", " ", text[i:j]))
+            i = j
+        else:
+            out.append(ch)
+            i += 1
+    return "".join(out)
+
+
+def _balanced(text, start):
+    """Indice dopo la parentesi che chiude quella aperta in `start`."""
+    depth = 0
+    i = start
+    while i < len(text):
+        ch = text[i]
+        if ch in "\"'`":
+            j = i + 1
+            while j < len(text) and text[j] != ch:
+                j += 2 if text[j] == "\\" else 1
+            i = j
+        elif ch in "([{":
+            depth += 1
+        elif ch in ")]}":
+            depth -= 1
+            if depth == 0:
+                return i + 1
+        i += 1
+    return len(text)
+
+
+def _split_args(text):
+    args, depth, current, quote = [], 0, [], None
+    for ch in text:
+        if quote:
+            current.append(ch)
+            if ch == quote:
+                quote = None
+            continue
+        if ch in "\"'`":
+            quote = ch
+        elif ch in "([{":
+            depth += 1
+        elif ch in ")]}":
+            depth -= 1
+        elif ch == "," and depth == 0:
+            args.append("".join(current).strip())
+            current = []
+            continue
+        current.append(ch)
+    if "".join(current).strip():
+        args.append("".join(current).strip())
+    return args
+
+
+class _TsExtractor:
+    def __init__(self, source, text, constants):
+        self.source = source
+        self.raw = text
+        self.text = _strip_ts_comments(text)
+        self.constants = constants
+        self.shapes = []
+        self.functions = [(m.start(), m.group(1) or m.group(2)) for m in _TS_FUNCTION.finditer(self.text)]
+
+    def line(self, pos):
+        return self.text.count("\n", 0, pos) + 1
+
+    def function_at(self, pos):
+        name = "<module>"
+        for start, fn in self.functions:
+            if start > pos:
+                break
+            name = fn
+        return name
+
+    def value(self, arg):
+        arg = arg.strip()
+        match = _TS_STRING.match(arg)
+        if match and "${" not in match.group(2):
+            return match.group(2)
+        if arg.replace(" ", "") == "FieldPath.documentId()":
+            return "__name__"
+        return self.constants.get(arg, ANY)
+
+    def clause_args(self, method, args):
+        args = _split_args(args)
+        if method == "where":
+            if len(args) < 2:
+                return ANY, ANY
+            return self.value(args[0]), self.value(args[1])
+        if method == "orderBy":
+            return (self.value(args[0]) if args else ANY), _direction(self.value(args[1]) if len(args) > 1 else None)
+        return None
+
+    def calls_after(self, pos):
+        """Catena `.metodo(args)` a partire da `pos`: [(metodo, args, inizio)], fine."""
+        calls = []
+        text = self.text
+        while True:
+            match = re.compile(r"\s*\.\s*([A-Za-z_]\w*)\s*\(").match(text, pos)
+            if not match:
+                return calls, pos
+            open_paren = match.end() - 1
+            end = _balanced(text, open_paren)
+            calls.append((match.group(1), text[open_paren + 1:end - 1], match.start()))
+            pos = end
+
+    def conditional(self, pos):
+        """La riga o il blocco in cui si trova `pos` è dentro un if/else/ciclo della funzione."""
+        line_start = self.text.rfind("\n", 0, pos) + 1
+        if re.search(r"\bif\s*\(.*\)\s*$", self.text[line_start:pos]):
+            return True
+        depth = 0
+        i = pos
+        function_start = max((start for start, _ in self.functions if start <= pos), default=0)
+        while i > function_start:
+            i -= 1
+            ch = self.text[i]
+            if ch == "}":
+                depth += 1
+            elif ch == "{":
+                if depth == 0:
+                    header = self.text[self.text.rfind("\n", 0, self.text.rfind("\n", 0, i)) + 1:i]
+                    header = header.replace("\n", " ")
+                    if _TS_CONDITIONAL.search(header) or re.search(r"\)\s*$", header) and "=>" not in header \
+                            and re.search(r"\b(if|for|while)\s*\(", header):
+                        return True
+                else:
+                    depth -= 1
+        return False
+
+    def extract(self):
+        variables = {}
+        text = self.text
+        ident = re.compile(r"(?<![\w$.])([A-Za-z_$][\w$]*)(?=\s*\.\s*[A-Za-z_])")
+        pending = []
+        for match in ident.finditer(text):
+            calls, end = self.calls_after(match.end())
+            if not calls:
+                continue
+            pending.append((match.start(), match.group(1), calls, end))
+
+        current_function = None
+        for start, root, calls, end in pending:
+            function = self.function_at(start)
+            if function != current_function:
+                self.flush(variables)
+                variables = {}
+                current_function = function
+            variants = None
+            first = 0
+            for i, (method, args, _) in enumerate(calls):
+                if method == "collection":
+                    argv = _split_args(args)
+                    variants = [new_shape(self.value(argv[0]) if argv else ANY, self.source, self.line(start),
+                                          function)]
+                    first = i + 1
+                elif method in ("doc", "collectionGroup"):
+                    variants = None
+                    first = i + 1
+            if variants is None and first == 0 and root in variables:
+                variants = variables[root]["variants"]
+            if variants is None:
+                continue
+            ok = True
+            ran = False
+            for method, args, _ in calls[first:]:
+                if method in TS_QUERY_METHODS:
+                    variants = [_extend(v, method, self.clause_args(method, args)) for v in variants]
+                elif method in TS_RUN_METHODS:
+                    ran = True
+                    break
+                else:
+                    ok = False
+                    break
+            if not ok:
+                continue
+            variants = [{**v, "line": self.line(start)} for v in variants]
+
+            before = text[max(0, start - 80):start]
+            assign = re.search(r"(?:\b(?:let|const|var)\s+)?([A-Za-z_$][\w$]*)\s*(?::\s*[\w<>]+\s*)?=\s*(?:await\s+)?$",
+                               before)
+            if assign and not ran:
+                name = assign.group(1)
+                keep = variables.get(name, {}).get("variants") if self.conditional(start) and name == root else None
+                variables[name] = {"variants": variants + (keep or []), "ran": False}
+            else:
+                self.shapes.extend(variants)
+                if root in variables:
+                    variables[root]["ran"] = True
+        self.flush(variables)
+
+        # query(collection(db, "x"), where(...), orderBy(...)) dell'SDK client
+        refs = {m.group(1): m.group(2) for m in re.finditer(
+            r"\b(?:const|let)\s+(\w+)\s*=\s*collection\(\s*\w+\s*,\s*([^)]+)\)", text)}
+        for match in re.finditer(r"(?<![\w.])query\s*\(", text):
+            end = _balanced(text, match.end() - 1)
+            args = _split_args(text[match.end():end - 1])
+            if not args:
+                continue
+            head = args[0]
+            inline = re.match(r"collection\(\s*\w+\s*,\s*(.+)\)$", head)
+            collection = self.value(inline.group(1)) if inline else (self.value(refs[head]) if head in refs else None)
+            if collection is None:
+                continue
+            shape = new_shape(collection, self.source, self.line(match.start()), self.function_at(match.start()))
+            for clause in args[1:]:
+                call = re.match(r"(\w+)\((.*)\)$", clause, re.S)
+                if call and call.group(1) in TS_QUERY_METHODS:
+                    shape = _extend(shape, call.group(1), self.clause_args(call.group(1), call.group(2)))
+            self.shapes.append(shape)
+
+        for shape in self.shapes:
+            shape["inMemorySort"] = self.in_memory_sort(shape["function"])
+        return self.shapes
+
+    def flush(self, variables):
+        for entry in variables.values():
+            if not entry["ran"]:
+                self.shapes.extend(entry["variants"])
+
+    def in_memory_sort(self, function):
+        starts = [start for start, name in self.functions if name == function]
+        if not starts:
+            return False
+        following = [start for start, _ in self.functions if start > starts[0]]
+        body = self.raw[starts[0]:following[0] if following else len(self.raw)]
+        return bool(_IN_MEMORY_HINT.search(body))
+
+
+def extract_typescript(paths, root):
+    texts = {path: path.read_text(encoding="utf-8") for path in paths}
+    constants = {}
+    for text in texts.values():
+        constants.update({name: value for name, value in _TS_CONST.findall(text)})
+    shapes = []
+    for path, text in texts.items():
+        shapes.extend(_TsExtractor(str(path.relative_to(root)), text, constants).extract())
+    return shapes
+
+
+def extract_all(root):
+    root = Path(root)
+    ts = sorted(p for pattern in ("app/**/*.ts", "lib/*.ts") for p in root.glob(pattern))
+    py = sorted(p for p in (root / "scripts").rglob("*.py") if "__pycache__" not in p.parts)
+    shapes = extract_typescript(ts, root) + extract_python(py, root)
+    unique = {}
+    for shape in shapes:
+        key = (shape["source"], shape["function"], shape["collection"], tuple(shape["filters"]), tuple(shape["orders"]))
+        if key in unique:
+            unique[key]["limit"] = unique[key]["limit"] or shape["limit"]
+        else:
+            unique[key] = shape
+    return list(unique.values())
+
+
+# ==================== INDICI ====================
+
+def index_key(collection_group, scope, fields):
+    """Chiave confrontabile di un indice: (collezione, scope, ((campo, ordine o arrayConfig), ...))."""
+    normalized = tuple(
+        (f["fieldPath"], f.get("order") or f.get("arrayConfig") or f.get("vectorConfig") and "VECTOR")
+        for f in fields
+    )
+    # Firestore aggiunge `__name__` in coda agli indici restituiti
+    if normalized and normalized[-1][0] == "__name__":
+        normalized = normalized[:-1]
+    return collection_group, scope or "COLLECTION", normalized
+
+
+def load_index_file(path):
+    return json.loads(Path(path).read_text(encoding="utf-8"))
+
+
+def declared_indexes(spec):
+    """[(posizione, chiave, indice)] nell'ordine del file."""
+    return [(i, index_key(index["collectionGroup"], index.get("queryScope"), index["fields"]), index)
+            for i, index in enumerate(spec.get("indexes", []))]
+
+
+def required_index(shape):
+    """
+    Campi dell'indice composto necessario [(campo, "EQ" | "CONTAINS" | direzione)],
+    o None se bastano gli indici a campo singolo.
+    """
+    equality, contains, ranges = [], [], []
+    for field, op in shape["filters"]:
+        if field == "__name__":
+            continue
+        if op in EQUALITY_OPS:
+            equality.append(field)
+        elif op in ARRAY_OPS:
+            contains.append(field)
+        elif op in RANGE_OPS or op == ANY:
+            ranges.append(field)
+    orders = [(field, direction) for field, direction in shape["orders"] if field != "__name__"]
+    ordered = {field for field, _ in orders}
+    tail = orders + [(field, "ASCENDING") for field in sorted(set(ranges)) if field not in ordered]
+    if not tail:
+        return None
+    head = [(field, "EQ") for field in sorted(set(equality) - ordered)]
+    head += [(field, "CONTAINS") for field in sorted(set(contains))]
+    fields = head + tail
+    if len({field for field, _ in fields}) < 2:
+        return None
+    return fields
+
+
+def is_dynamic(fields):
+    return any(field == ANY or mode == ANY for field, mode in fields)
+
+
+def satisfies(declared, required):
+    """L'indice dichiarato (campi normalizzati) serve la query che richiede `required`."""
+    if len(declared) != len(required):
+        return False
+    head = [(f, m) for f, m in required if m in ("EQ", "CONTAINS")]
+    n = len(head)
+    declared_head = declared[:n]
+    for field, mode in head:
+        wanted = ("CONTAINS",) if mode == "CONTAINS" else ("ASCENDING", "DESCENDING")
+        if not any(_same(field, f) and m in wanted for f, m in declared_head):
+            return False
+    if len({f for f, _ in declared_head}) != n:
+        return False
+    return all(_same(field, f) and (mode == ANY or mode == m)
+               for (field, mode), (f, m) in zip(required[n:], declared[n:]))
+
+
+def _same(wanted, field):
+    return wanted == ANY or wanted == field
+
+
+def to_index(collection, fields):
+    return {
+        "collectionGroup": collection,
+        "queryScope": "COLLECTION",
+        "fields": [
+            {"fieldPath": field, "arrayConfig": "CONTAINS"} if mode == "CONTAINS"
+            else {"fieldPath": field, "order": "ASCENDING" if mode == "EQ" else mode}
+            for field, mode in fields
+        ],
+    }
+
+
+def analyze(shapes, spec):
+    """
+    Confronto tra forme e indici dichiarati. Restituisce un dizionario con:
+    `queries` (forma, indice richiesto, stato), `missing`, `duplicates`,
+    `singleField`, `unused` e `corrected` (il file da scrivere).
+    """
+    declared = declared_indexes(spec)
+    used = set()
+    queries, missing = [], {}
+    for shape in shapes:
+        required = required_index(shape)
+        entry = {"shape": shape, "required": required, "status": "single-field", "index": None}
+        if required is not None and shape["collection"] != ANY:
+            matches = [pos for pos, key, _ in declared
+                       if key[0] == shape["collection"] and satisfies(key[2], required)]
+            used.update(matches)
+            if matches:
+                entry["status"], entry["index"] = "covered", matches[0]
+            elif is_dynamic(required):
+                entry["status"] = "dynamic"
+            else:
+                entry["status"] = "missing"
+                missing.setdefault((shape["collection"], tuple(required)), []).append(shape)
+        elif required is not None:
+            entry["status"] = "dynamic"
+        queries.append(entry)
+
+    seen, duplicates, single = {}, [], []
+    for pos, key, _ in declared:
+        if len(key[2]) < 2:
+            single.append(pos)
+        elif key in seen:
+            duplicates.append((pos, seen[key]))
+        else:
+            seen[key] = pos
+    duplicate_positions = {pos for pos, _ in duplicates}
+    unused = [pos for pos, key, _ in declared
+              if pos not in used and pos not in duplicate_positions and pos not in single]
+    return {
+        "queries": queries,
+        "missing": missing,
+        "duplicates": duplicates,
+        "singleField": single,
+        "unused": unused,
+        "declared": declared,
+    }
+
+
+def corrected_spec(spec, report, keep_unused=False):
+    """File degli indici senza duplicati, indici a campo singolo e (salvo `keep_unused`) non usati, più i mancanti."""
+    drop = {pos for pos, _ in report["duplicates"]} | set(report["singleField"])
+    if not keep_unused:
+        drop |= set(report["unused"])
+    indexes = [index for pos, _, index in report["declared"] if pos not in drop]
+    indexes += [to_index(collection, list(fields)) for collection, fields in sorted(report["missing"])]
+    return {**spec, "indexes": indexes, "fieldOverrides": spec.get("fieldOverrides", [])}
+
+
+def describe_fields(fields):
+    return ", ".join(f"{field} {mode}" for field, mode in fields)
@@ -0,0 +1,197 @@
+"""
+Integrità referenziale tra collezioni (riferimenti a documenti inesistenti).
+
+Ogni riferimento è (collezione, campo, collezione di destinazione): per
+esempio `bookings.serviceId` -> `services`. Le collezioni di destinazione
+vengono lette una volta (solo gli ID) in insiemi compatti:
+
+- `SortedIdSet`: hash a 64 bit degli ID in un array ordinato (8 byte per ID),
+  ricerca con `np.searchsorted`; collisioni trascurabili
+- `BloomIdSet`: filtro di Bloom a dimensione fissa per i tenant molto grandi;
+  un falso positivo può solo nascondere un riferimento mancante, mai
+  segnalarne uno inesistente
+
+I riferimenti delle collezioni sorgente vengono controllati a blocchi
+(`ReferenceChecker`), in modo vettoriale, senza tenere in memoria i documenti.
+"""
+import hashlib
+import math
+from array import array
+
+import numpy as np
+
+# (collezione, campo, destinazione, campo alternativo)
+REFERENCES = (
+    ("bookings", "serviceId", "services", None),
+    ("bookings", "customerId", "customers", "userId"),
+    ("bookings", "salonId", "salons", None),
+    ("adminUsers", "uid", "admins", None),
+    ("services", "salonId", "salons", None),
+)
+
+# Valori che non sono riferimenti (prenotazioni senza cliente registrato)
+IGNORED_VALUES = ("", "anonymous")
+
+# Correzioni di `--fix repair` per tipo di riferimento (None = campo rimosso); gli altri tipi vengono marcati
+REPAIRS = {
+    "adminUsers.uid": {"active": False},  # come un account disattivato: il login per username non lo usa più
+    "services.salonId": {"salonId": None},
+    "bookings.salonId": {"salonId": None},  # torna al salone "default"
+}
+
+# Documenti letti tra due controlli vettoriali
+CHECK_CHUNK = 10_000
+
+
+def reference_type(reference):
+    collection, field, _, _ = reference
+    return f"{collection}.{field}"
+
+
+def id_hashes(ids):
+    """Hash blake2b a 128 bit di ogni ID come array (n, 2) di uint64."""
+    digests = b"".join(hashlib.blake2b(str(i).encode("utf-8"), digest_size=16).digest() for i in ids)
+    return np.frombuffer(digests, dtype="<u8").reshape(-1, 2)
+
+
+class SortedIdSet:
+    """Insieme di ID come array ordinato degli hash a 64 bit; si aggiunge con `add` e si chiude con `freeze`."""
+
+    def __init__(self):
+        self._pending = array("Q")
+        self._sorted = np.empty(0, dtype="uint64")
+        self.count = 0
+
+    def add(self, ids):
+        hashes = id_hashes(ids)
+        self._pending.frombytes(np.ascontiguousarray(hashes[:, 0]).tobytes())
+        self.count += len(hashes)
+
+    def freeze(self):
+        merged = np.concatenate([self._sorted, np.frombuffer(self._pending, dtype="uint64")])
+        self._sorted = np.unique(merged)
+        self._pending = array("Q")
+        return self
+
+    def contains(self, hashes):
+        keys = hashes[:, 0]
+        if not len(self._sorted):
+            return np.zeros(len(keys), dtype=bool)
+        positions = np.minimum(np.searchsorted(self._sorted, keys), len(self._sorted) - 1)
+        return self._sorted[positions] == keys
+
+    @property
+    def nbytes(self):
+        return self._sorted.nbytes + self._pending.itemsize * len(self._pending)
+
+
+class BloomIdSet:
+    """Filtro di Bloom dimensionato per `capacity` ID con probabilità di falso positivo `fp_rate`."""
+
+    def __init__(self, capacity, fp_rate=1e-3):
+        capacity = max(1, int(capacity))
+        bits = math.ceil(-capacity * math.log(fp_rate) / math.log(2) ** 2)
+        self.bits = max(64, bits)
+        self.hashes = max(1, round(self.bits / capacity * math.log(2)))
+        self._array = np.zeros((self.bits + 7) // 8, dtype="uint8")
+        self.count = 0
+
+    def _positions(self, hashes):
+        # Double hashing: h1 + i * h2 (Kirsch-Mitzenmacher)
+        steps = np.arange(self.hashes, dtype="uint64")
+        with np.errstate(over="ignore"):
+            return (hashes[:, :1] + steps * (hashes[:, 1:] | np.uint64(1))) % np.uint64(self.bits)
+
+    def add(self, ids):
+        positions = self._positions(id_hashes(ids)).ravel()
+        masks = np.left_shift(np.uint8(1), (positions & np.uint64(7)).astype("uint8"))
+        np.bitwise_or.at(self._array, positions >> np.uint64(3), masks)
+        self.count += len(ids)
+
+    def freeze(self):
+        return self
+
+    def contains(self, hashes):
+        positions = self._positions(hashes)
+        bits = (self._array[positions >> np.uint64(3)] >> (positions & np.uint64(7)).astype("uint8")) & 1
+        return bits.all(axis=1)
+
+    @property
+    def nbytes(self):
+        return self._array.nbytes
+
+
+class ReferenceChecker:
+    """
+    Controlla a blocchi i riferimenti di una collezione sorgente: `add` accoda
+    (ID documento, valore), `flush` controlla i valori accodati in un'unica
+    ricerca vettoriale e restituisce le coppie con destinazione inesistente.
+    """
+
+    def __init__(self, reference, targets):
+        self.reference = reference
+        self.type = reference_type(reference)
+        self.field = reference[1]
+        self.targets = targets
+        self.checked = 0
+        self.dangling = 0
+        self._missing_values = set()
+        self._doc_ids = []
+        self._values = []
+
+    def add(self, doc_id, value):
+        if value is None or value in IGNORED_VALUES:
+            return
+        self._doc_ids.append(doc_id)
+        self._values.append(str(value))
+
+    def flush(self):
+        if not self._values:
+            return []
+        hashes = id_hashes(self._values)
+        missing = np.flatnonzero(~self.targets.contains(hashes))
+        found = [(self._doc_ids[i], self._values[i]) for i in missing]
+        self._missing_values.update(int(h) for h in hashes[missing, 0])
+        self.checked += len(self._values)
+        self.dangling += len(found)
+        self._doc_ids, self._values = [], []
+        return found
+
+    def summary(self):
+        return {
+            "type": self.type,
+            "target": self.reference[2],
+            "checked": self.checked,
+            "dangling": self.dangling,
+            "missingTargets": len(self._missing_values),
+        }
+
+
+def scan_order(references):
+    """
+    Ordine di lettura delle collezioni: prima le sole destinazioni, poi le
+    sorgenti, con le sorgenti che sono anche destinazioni (es. `services`)
+    prima di quelle che le referenziano. Ogni collezione compare una volta.
+    """
+    sources = {collection for collection, _, _, _ in references}
+    targets = {target for _, _, target, _ in references}
+    order = sorted(targets - sources)
+    remaining = sorted(sources)
+    while remaining:
+        ready = [c for c in remaining
+                 if not any(source == c and target in remaining and target != c
+                            for source, _, target, _ in references)]
+        # Dipendenze circolari: si procede comunque (riferimenti controllati con l'insieme parziale)
+        ready = ready or remaining[:1]
+        for collection in ready:
+            order.append(collection)
+            remaining.remove(collection)
+    return order
+
+
+def reference_value(data, reference):
+    _, field, _, fallback = reference
+    value = data.get(field)
+    if value is None and fallback:
+        value = data.get(fallback)
+    return value
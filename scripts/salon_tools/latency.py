@@ -0,0 +1,109 @@
+"""
+Istogramma di latenza log-lineare (stile HDR Histogram).
+
+I valori sono registrati in microsecondi in bucket con 2^SUB_BITS sotto-bucket
+per ottava: errore relativo massimo < 1%, memoria proporzionale al numero di
+bucket occupati e `merge()` esatto, quindi istogrammi prodotti da worker o file
+diversi si combinano senza perdere precisione.
+"""
+
+SUB_BITS = 8
+
+
+def _bucket_index(value):
+    if value < (1 << SUB_BITS):
+        return value
+    shift = value.bit_length() - SUB_BITS
+    return (shift << SUB_BITS) + (value >> shift)
+
+
+def _bucket_value(index):
+    """Valore rappresentativo (punto medio) del bucket."""
+    shift = index >> SUB_BITS
+    if shift == 0:
+        return index
+    low = (index & ((1 << SUB_BITS) - 1)) << shift
+    return low + ((1 << shift) - 1) / 2
+
+
+class LatencyHistogram:
+    def __init__(self):
+        self.counts = {}
+        self.count = 0
+        self.total_us = 0
+        self.min_us = None
+        self.max_us = None
+
+    def record_us(self, value, count=1):
+        value = max(0, int(value))
+        index = _bucket_index(value)
+        self.counts[index] = self.counts.get(index, 0) + count
+        self.count += count
+        self.total_us += value * count
+        self.min_us = value if self.min_us is None else min(self.min_us, value)
+        self.max_us = value if self.max_us is None else max(self.max_us, value)
+
+    def record_ms(self, value_ms, count=1):
+        self.record_us(round(value_ms * 1000), count)
+
+    def merge(self, other):
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.count += other.count
+        self.total_us += other.total_us
+        if other.min_us is not None:
+            self.min_us = other.min_us if self.min_us is None else min(self.min_us, other.min_us)
+        if other.max_us is not None:
+            self.max_us = other.max_us if self.max_us is None else max(self.max_us, other.max_us)
+        return self
+
+    def percentile_ms(self, q):
+        """Percentile `q` (0-100) in millisecondi, None se l'istogramma è vuoto."""
+        if not self.count:
+            return None
+        if q >= 100:
+            return self.max_us / 1000
+        rank = max(1, -(-self.count * q // 100))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                value = min(max(_bucket_value(index), self.min_us), self.max_us)
+                return value / 1000
+        return self.max_us / 1000
+
+    def summary(self, percentiles=(50, 95, 99)):
+        """Riepilogo compatto in millisecondi, adatto ai report JSON."""
+        if not self.count:
+            return {"count": 0}
+        result = {
+            "count": self.count,
+            "min": round(self.min_us / 1000, 3),
+            "mean": round(self.total_us / self.count / 1000, 3),
+            "max": round(self.max_us / 1000, 3),
+        }
+        for q in percentiles:
+            result[f"p{q:g}"] = round(self.percentile_ms(q), 3)
+        return result
+
+    def to_dict(self):
+        return {
+            "subBits": SUB_BITS,
+            "count": self.count,
+            "totalUs": self.total_us,
+            "minUs": self.min_us,
+            "maxUs": self.max_us,
+            "counts": {str(index): count for index, count in sorted(self.counts.items())},
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        if data.get("subBits", SUB_BITS) != SUB_BITS:
+            raise ValueError(f"Istogramma con subBits={data.get('subBits')} non compatibile (atteso {SUB_BITS})")
+        hist = cls()
+        hist.counts = {int(index): count for index, count in data.get("counts", {}).items()}
+        hist.count = data.get("count", 0)
+        hist.total_us = data.get("totalUs", 0)
+        hist.min_us = data.get("minUs")
+        hist.max_us = data.get("maxUs")
+        return hist
@@ -0,0 +1,357 @@
+"""
+Modello in memoria della disponibilità, aggiornato dai listener `on_snapshot`.
+
+`AvailabilityModel` tiene la configurazione effettiva (primo documento di
+`salons` con `config`, altrimenti `settings/config`, altrimenti i default:
+come `getAvailableSlots`) e gli intervalli delle prenotazioni PENDING/CONFIRMED
+dei prossimi `days` giorni, indicizzati per data. Ogni cambiamento ricevuto dai
+listener tocca solo la data interessata e invalida la cache degli slot di
+quella data; la risposta a una richiesta di slot è un lookup in cache o un
+ricalcolo sulla sola giornata.
+
+`LiveAvailability` apre i tre listener (salone, `settings/config`,
+prenotazioni della finestra), sposta la finestra quando cambia il giorno e
+tiene le metriche per listener:
+
+- `lag`: istogramma di `ora - read_time` degli snapshot (ritardo di consegna,
+  include lo scarto tra gli orologi del server e di questa macchina)
+- `ageS`: secondi dall'ultimo snapshot; Firestore non invia snapshot senza
+  cambiamenti, quindi cresce anche quando tutto è in ordine
+- `consistent`: snapshot iniziale ricevuto e stream ancora attivo; il modello
+  risponde come `fresh` solo se tutti i listener lo sono
+
+Le date fuori dalla finestra sollevano `OutOfWindow`: il chiamante deve
+ripiegare sulla lettura diretta da Firestore.
+"""
+import threading
+import time
+from datetime import date, timedelta
+
+from salon_tools.latency import LatencyHistogram
+from salon_tools.rules import ACTIVE_STATUSES, DEFAULT_CONFIG, from_minutes, is_closed, merge_config, to_minutes
+
+LISTENERS = ("salon", "settings", "bookings")
+
+
+class OutOfWindow(ValueError):
+    pass
+
+
+def booking_interval(data):
+    """(data, inizio, fine) in minuti di una prenotazione che occupa capacità, altrimenti None."""
+    if not data or data.get("status") not in ACTIVE_STATUSES or not data.get("date"):
+        return None
+    start, end = data.get("startMin"), data.get("endMin")
+    if not isinstance(start, int) or not isinstance(end, int) or isinstance(start, bool):
+        if not data.get("startTime") or not data.get("endTime"):
+            return None
+        start, end = to_minutes(data["startTime"]), to_minutes(data["endTime"])
+    return data["date"], start, end
+
+
+class ListenerMetrics:
+    def __init__(self):
+        self.snapshots = 0
+        self.changes = 0
+        self.last_snapshot = None
+        self.subscribed = None
+        self.initial = False
+        self.active = False
+        self.lag = LatencyHistogram()
+
+    def record(self, changes, read_time):
+        now = time.time()
+        self.snapshots += 1
+        self.changes += changes
+        self.last_snapshot = now
+        self.initial = True
+        if read_time is not None:
+            self.lag.record_ms(max(0.0, (now - read_time.timestamp()) * 1000))
+
+    def to_dict(self):
+        now = time.time()
+        return {
+            "consistent": self.initial and self.active,
+            "snapshots": self.snapshots,
+            "changes": self.changes,
+            "ageS": None if self.last_snapshot is None else round(now - self.last_snapshot, 3),
+            "subscribedS": None if self.subscribed is None else round(now - self.subscribed, 3),
+            "lag": self.lag.summary(),
+        }
+
+
+class AvailabilityModel:
+    def __init__(self, days, today=None):
+        self.days = days
+        self.lock = threading.Lock()
+        self.salon_config = None
+        self.settings_config = None
+        self.config = merge_config(None)
+        self.first_day = today or date.today()
+        self.day_intervals = {}
+        self.booking_dates = {}
+        self.cache = {}
+        self.metrics = {name: ListenerMetrics() for name in LISTENERS}
+        self.queries = LatencyHistogram()
+
+    # ==================== FINESTRA ====================
+
+    def window(self):
+        """(prima, ultima) data della finestra, come stringhe YYYY-MM-DD."""
+        return self.first_day.isoformat(), (self.first_day + timedelta(days=self.days - 1)).isoformat()
+
+    def in_window(self, date_str):
+        first, last = self.window()
+        return first <= date_str <= last
+
+    # ==================== AGGIORNAMENTI ====================
+
+    def set_config(self, source, data):
+        """Aggiorna la configurazione da `salon` (campo `config` del salone) o `settings`."""
+        with self.lock:
+            if source == "salon":
+                self.salon_config = (data or {}).get("config") or None
+            else:
+                self.settings_config = data
+            config = self.salon_config or self.settings_config
+            self.config = merge_config(config if config else None)
+            self.cache.clear()
+
+    def replace_bookings(self, docs, first_day=None):
+        """Sostituisce tutte le prenotazioni (snapshot iniziale o nuova finestra): [(id, dati)]."""
+        with self.lock:
+            if first_day is not None:
+                self.first_day = first_day
+            self.day_intervals = {}
+            self.booking_dates = {}
+            self.cache.clear()
+            for doc_id, data in docs:
+                self._add(doc_id, data)
+
+    def apply_booking(self, doc_id, data):
+        """Applica un cambiamento; `data` None per una prenotazione rimossa o uscita dalla finestra."""
+        with self.lock:
+            self._remove(doc_id)
+            self._add(doc_id, data)
+
+    def _add(self, doc_id, data):
+        interval = booking_interval(data)
+        if interval is None or not self.in_window(interval[0]):
+            return
+        day, start, end = interval
+        self.day_intervals.setdefault(day, {})[doc_id] = (start, end)
+        self.booking_dates[doc_id] = day
+        self.cache.pop(day, None)
+
+    def _remove(self, doc_id):
+        day = self.booking_dates.pop(doc_id, None)
+        if day is None:
+            return
+        intervals = self.day_intervals.get(day)
+        if intervals is not None:
+            intervals.pop(doc_id, None)
+            if not intervals:
+                del self.day_intervals[day]
+        self.cache.pop(day, None)
+
+    # ==================== INTERROGAZIONI ====================
+
+    def _check_date(self, date_str):
+        date.fromisoformat(date_str)
+        if not self.in_window(date_str):
+            first, last = self.window()
+            raise OutOfWindow(f"{date_str} fuori dalla finestra {first} - {last}")
+
+    def slots(self, date_str, duration):
+        """Orari di inizio disponibili, come `rules.available_slots` sulle prenotazioni in memoria."""
+        started = time.perf_counter()
+        with self.lock:
+            self._check_date(date_str)
+            day_cache = self.cache.setdefault(date_str, {})
+            slots = day_cache.get(duration)
+            if slots is None:
+                slots = day_cache[duration] = tuple(
+                    from_minutes(start) for start, free in self._grid(date_str, duration) if free > 0
+                )
+            self.queries.record_us((time.perf_counter() - started) * 1_000_000)
+        return list(slots)
+
+    def capacity(self, date_str, duration, start_time=None):
+        """
+        Risorse libere per ogni orario di inizio (durata + buffer, come gli slot),
+        oppure per `start_time` con il controllo di `createBooking` (solo durata).
+        """
+        started = time.perf_counter()
+        with self.lock:
+            self._check_date(date_str)
+            config = self.config
+            if start_time is not None:
+                start = to_minutes(start_time)
+                end = start + duration
+                if is_closed(date_str, config) or start < to_minutes(config["openingTime"]) \
+                        or end > to_minutes(config["closingTime"]):
+                    free = 0
+                else:
+                    free = config["resources"] - self._conflicts(date_str, start, end)
+                result = {"start": start_time, "free": max(0, free), "resources": config["resources"]}
+            else:
+                result = {
+                    "resources": config["resources"],
+                    "slots": [{"start": from_minutes(start), "free": max(0, free)}
+                              for start, free in self._grid(date_str, duration)],
+                }
+            self.queries.record_us((time.perf_counter() - started) * 1_000_000)
+        return result
+
+    def _conflicts(self, date_str, start, end):
+        buffer_time = self.config["bufferTime"]
+        return sum(1 for s, e in self.day_intervals.get(date_str, {}).values() if start < e + buffer_time and s < end)
+
+    def _grid(self, date_str, duration):
+        """[(inizio, risorse libere)] per gli orari di inizio della giornata (durata + buffer)."""
+        config = self.config
+        if duration <= 0 or is_closed(date_str, config):
+            return []
+        opening = to_minutes(config["openingTime"])
+        closing = to_minutes(config["closingTime"])
+        buffer_time = config["bufferTime"]
+        length = duration + buffer_time
+        intervals = sorted(self.day_intervals.get(date_str, {}).values())
+        grid = []
+        current = opening
+        while current + length <= closing:
+            end = current + length
+            conflicts = 0
+            for start, finish in intervals:
+                if start >= end:
+                    break
+                if current < finish + buffer_time:
+                    conflicts += 1
+            grid.append((current, config["resources"] - conflicts))
+            current += config["timeStep"]
+        return grid
+
+    # ==================== STATO ====================
+
+    def fresh(self):
+        return all(m.initial and m.active for m in self.metrics.values())
+
+    def stats(self):
+        with self.lock:
+            first, last = self.window()
+            bookings = len(self.booking_dates)
+            days = len(self.day_intervals)
+            cached = sum(len(entry) for entry in self.cache.values())
+            config = {key: self.config[key] for key in DEFAULT_CONFIG}
+        return {
+            "fresh": self.fresh(),
+            "window": {"from": first, "to": last, "days": self.days},
+            "bookings": bookings,
+            "daysWithBookings": days,
+            "cachedAnswers": cached,
+            "config": config,
+            "listeners": {name: metrics.to_dict() for name, metrics in self.metrics.items()},
+            "queries": self.queries.summary(),
+        }
+
+
+class LiveAvailability:
+    """
+    Collega un `AvailabilityModel` ai listener di `db` (client Firestore o
+    `fake_firestore.FakeFirestore`). `salon_id` None usa il primo salone, come
+    `getAvailableSlots`.
+    """
+
+    def __init__(self, db, days=14, salon_id=None, today=None):
+        self.db = db
+        self.salon_id = salon_id
+        self.today = today or date.today
+        self.model = AvailabilityModel(days, self.today())
+        self.watches = {}
+        self.generation = 0
+        self.lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self, maintenance_interval=30.0):
+        salons = self.db.collection("salons")
+        if self.salon_id:
+            salon_target = salons.document(self.salon_id)
+        else:
+            salon_target = salons.limit(1)
+        self._subscribe("salon", salon_target, self._on_salon)
+        self._subscribe("settings", self.db.collection("settings").document("config"), self._on_settings)
+        self._subscribe_bookings(self.model.first_day)
+        if maintenance_interval:
+            self._thread = threading.Thread(target=self._maintenance, args=(maintenance_interval,),
+                                            name="availability-maintenance", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        with self.lock:
+            for watch in self.watches.values():
+                watch.unsubscribe()
+            self.watches.clear()
+        for metrics in self.model.metrics.values():
+            metrics.active = False
+
+    def _subscribe(self, name, target, callback):
+        metrics = self.model.metrics[name]
+        metrics.initial = False
+        metrics.active = True
+        metrics.subscribed = time.time()
+        with self.lock:
+            previous = self.watches.get(name)
+            self.watches[name] = target.on_snapshot(callback)
+        if previous is not None:
+            previous.unsubscribe()
+
+    def _subscribe_bookings(self, first_day):
+        with self.lock:
+            self.generation += 1
+            generation = self.generation
+        last_day = (first_day + timedelta(days=self.model.days - 1)).isoformat()
+        query = self.db.collection("bookings").where("date", ">=", first_day.isoformat()).where("date", "<=", last_day)
+        state = {"initial": True}
+
+        def on_bookings(docs, changes, read_time):
+            if generation != self.generation:
+                return
+            if state["initial"]:
+                # Il primo snapshot contiene tutta la finestra: ricostruisce il modello
+                state["initial"] = False
+                self.model.replace_bookings(((doc.id, doc.to_dict()) for doc in docs), first_day)
+            else:
+                for change in changes:
+                    removed = change.type.name == "REMOVED"
+                    self.model.apply_booking(change.document.id, None if removed else change.document.to_dict())
+            self.model.metrics["bookings"].record(len(changes), read_time)
+
+        self._subscribe("bookings", query, on_bookings)
+
+    def _on_salon(self, docs, changes, read_time):
+        data = next((doc.to_dict() for doc in docs if doc.exists), None)
+        self.model.set_config("salon", data)
+        self.model.metrics["salon"].record(len(changes), read_time)
+
+    def _on_settings(self, docs, changes, read_time):
+        data = next((doc.to_dict() for doc in docs if doc.exists), None)
+        self.model.set_config("settings", data)
+        self.model.metrics["settings"].record(len(changes), read_time)
+
+    def _maintenance(self, interval):
+        while not self._stop.wait(interval):
+            self.check()
+
+    def check(self):
+        """Sposta la finestra al nuovo giorno e segna come non consistenti i listener chiusi."""
+        today = self.today()
+        if today != self.model.first_day:
+            self._subscribe_bookings(today)
+        with self.lock:
+            watches = dict(self.watches)
+        for name, watch in watches.items():
+            if not getattr(watch, "is_active", True):
+                self.model.metrics[name].active = False
@@ -0,0 +1,284 @@
+"""
+Parsing e aggregazione dei log prodotti da `lib/logger.ts`.
+
+Formato di una riga:
+    [2025-03-01T10:15:02.123Z] [INFO] Available slots fetched {"date":"2025-03-04","duration":42}
+
+Le righe possono avere un prefisso (es. timestamp di Docker o del process
+manager): viene cercata la prima occorrenza di `[timestamp] [LEVEL] `.
+Il contesto JSON finale è facoltativo e viene decodificato solo se serve
+(contiene `"duration"` oppure la riga è un errore).
+
+Le statistiche (`LogStats`) usano `LatencyHistogram` e sono serializzabili e
+combinabili con `merge()`: file o porzioni di file elaborati in parallelo
+producono lo stesso risultato di un'unica passata.
+"""
+import json
+import re
+from datetime import datetime
+
+from salon_tools.latency import LatencyHistogram
+
+LINE_RE = re.compile(rb"\[(\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2})(?:\.\d+)?Z?\] \[(INFO|WARN|ERROR|DEBUG)\] ")
+
+# Nei WARN `duration` indica la durata di un servizio, non la latenza dell'azione
+LATENCY_LEVELS = (b"INFO", b"ERROR", b"DEBUG")
+
+_LOGGER_CALL_RE = re.compile(r"logger\.(?:info|warn|error|debug)\(\s*\"([^\"]+)\"")
+_FUNCTION_RE = re.compile(r"^export\s+(?:async\s+)?function\s+(\w+)", re.MULTILINE)
+
+
+def load_action_map(project_root):
+    """
+    Mappa messaggio di log -> nome della funzione esportata che lo emette,
+    ricavata dai sorgenti di `app/` e `lib/`. I messaggi usati da più funzioni
+    (es. "Salon not found") restano non mappati.
+    """
+    owners = {}
+    for pattern in ("app/**/*.ts", "lib/**/*.ts"):
+        for path in project_root.glob(pattern):
+            source = path.read_text(encoding="utf-8", errors="replace")
+            functions = [(m.start(), m.group(1)) for m in _FUNCTION_RE.finditer(source)]
+            for match in _LOGGER_CALL_RE.finditer(source):
+                owner = None
+                for position, name in functions:
+                    if position > match.start():
+                        break
+                    owner = name
+                if owner:
+                    owners.setdefault(match.group(1), set()).add(owner)
+    return {message: names.pop() for message, names in owners.items() if len(names) == 1}
+
+
+class _EpochCache:
+    """Converte "YYYY-MM-DDTHH:MM:SS" in epoch, memorizzando per secondo (le righe arrivano in ordine)."""
+
+    def __init__(self):
+        self.cache = {}
+
+    def __call__(self, stamp):
+        epoch = self.cache.get(stamp)
+        if epoch is None:
+            if len(self.cache) > 4096:
+                self.cache.clear()
+            epoch = datetime.fromisoformat(stamp.decode() + "+00:00").timestamp()
+            self.cache[stamp] = epoch
+        return epoch
+
+
+def parse_line(line):
+    """
+    Restituisce (timestamp bytes, livello bytes, messaggio bytes, resto) oppure None
+    se la riga non è nel formato del logger. `resto` contiene l'eventuale contesto JSON.
+    """
+    match = LINE_RE.search(line)
+    if not match:
+        return None
+    body = line[match.end():].rstrip(b"\r\n")
+    split = body.find(b" {")
+    if split < 0:
+        return match.group(1), match.group(2), body, b""
+    return match.group(1), match.group(2), body[:split], body[split + 1:]
+
+
+_DURATION_RE = re.compile(rb'"duration":\s*(-?\d+(?:\.\d+)?)[,}]')
+
+
+def extract_duration(raw):
+    """
+    Campo `duration` di primo livello del contesto. Se il contesto è piatto (una
+    sola graffa aperta) basta una regex; altrimenti si decodifica il JSON, perché
+    un `duration` annidato (es. in `input`) non è la latenza dell'azione.
+    """
+    if raw.count(b"{") == 1:
+        match = _DURATION_RE.search(raw)
+        if match:
+            value = match.group(1)
+            return float(value) if b"." in value else int(value)
+        return None
+    context = decode_context(raw)
+    if isinstance(context, dict):
+        value = context.get("duration")
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return value
+    return None
+
+
+def decode_context(raw):
+    """Contesto JSON finale; se il messaggio contiene " {" si prova dal successivo."""
+    while raw:
+        try:
+            return json.loads(raw)
+        except ValueError:
+            nxt = raw.find(b" {", 1)
+            if nxt < 0:
+                return None
+            raw = raw[nxt + 1:]
+    return None
+
+
+class LogStats:
+    """
+    Conteggi per livello, latenze (`duration` in ms) e intervallo temporale di un
+    gruppo di righe. Le durate sono prima contate per valore (di solito interi in ms,
+    da `Date.now()`) e riversate nell'istogramma solo quando serve.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.warnings = 0
+        self.first = None
+        self.last = None
+        self._hist = LatencyHistogram()
+        self._pending = {}
+
+    @property
+    def hist(self):
+        if self._pending:
+            for value, count in self._pending.items():
+                self._hist.record_ms(value, count)
+            self._pending = {}
+        return self._hist
+
+    def add(self, epoch, level, duration):
+        self.count += 1
+        if level == b"ERROR":
+            self.errors += 1
+        elif level == b"WARN":
+            self.warnings += 1
+        if duration is not None:
+            self._pending[duration] = self._pending.get(duration, 0) + 1
+        if self.first is None or epoch < self.first:
+            self.first = epoch
+        if self.last is None or epoch > self.last:
+            self.last = epoch
+
+    def merge(self, other):
+        self.count += other.count
+        self.errors += other.errors
+        self.warnings += other.warnings
+        self.hist.merge(other.hist)
+        if other.first is not None:
+            self.first = other.first if self.first is None else min(self.first, other.first)
+        if other.last is not None:
+            self.last = other.last if self.last is None else max(self.last, other.last)
+        return self
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "warnings": self.warnings,
+            "first": self.first,
+            "last": self.last,
+            "latency": self.hist.to_dict(),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        stats = cls()
+        stats.count = data["count"]
+        stats.errors = data["errors"]
+        stats.warnings = data["warnings"]
+        stats.first = data["first"]
+        stats.last = data["last"]
+        stats._hist = LatencyHistogram.from_dict(data["latency"])
+        return stats
+
+
+class LogAggregator:
+    """
+    Statistiche per finestra temporale di `window` secondi e chiave (azione o
+    messaggio); i totali per chiave sono l'unione delle finestre. `action_map`
+    traduce i messaggi in nomi di funzione.
+    """
+
+    def __init__(self, window=60, action_map=None):
+        self.window = window
+        self.action_map = action_map or {}
+        self.windows = {}
+        self.lines = 0
+        self.skipped = 0
+        self._retired = {}
+        self._epoch = _EpochCache()
+        self._keys = {}
+
+    def _key(self, message):
+        key = self._keys.get(message)
+        if key is None:
+            text = message.decode("utf-8", errors="replace")
+            key = self.action_map.get(text, text)
+            self._keys[message] = key
+        return key
+
+    def feed(self, line):
+        self.lines += 1
+        parsed = parse_line(line)
+        if parsed is None:
+            self.skipped += 1
+            return
+        stamp, level, message, rest = parsed
+        duration = None
+        if rest and level in LATENCY_LEVELS and b'"duration"' in rest:
+            duration = extract_duration(rest)
+        self.record(self._epoch(stamp), level, self._key(message), duration)
+
+    def record(self, epoch, level, key, duration):
+        bucket = (int(epoch // self.window) * self.window, key)
+        stats = self.windows.get(bucket)
+        if stats is None:
+            stats = self.windows[bucket] = LogStats()
+        stats.add(epoch, level, duration)
+
+    @property
+    def totals(self):
+        """Statistiche per chiave su tutto l'input (finestre correnti più quelle già scartate)."""
+        totals = {key: LogStats().merge(stats) for key, stats in self._retired.items()}
+        for (_, key), stats in self.windows.items():
+            totals.setdefault(key, LogStats()).merge(stats)
+        return totals
+
+    def merge(self, other):
+        if other.window != self.window:
+            raise ValueError(f"Finestre diverse: {self.window}s e {other.window}s")
+        for target, source in ((self.windows, other.windows), (self._retired, other._retired)):
+            for key, stats in source.items():
+                if key in target:
+                    target[key].merge(stats)
+                else:
+                    target[key] = stats
+        self.lines += other.lines
+        self.skipped += other.skipped
+        return self
+
+    def drop_windows_before(self, epoch):
+        """Scarta le finestre più vecchie di `epoch` (modalità --follow), conservandole nei totali."""
+        for bucket in [b for b in self.windows if b[0] + self.window <= epoch]:
+            stats = self.windows.pop(bucket)
+            retired = self._retired.get(bucket[1])
+            if retired is None:
+                self._retired[bucket[1]] = stats
+            else:
+                retired.merge(stats)
+
+    def to_dict(self):
+        return {
+            "window": self.window,
+            "lines": self.lines,
+            "skipped": self.skipped,
+            "retired": {key: stats.to_dict() for key, stats in self._retired.items()},
+            "windows": [
+                {"start": start, "key": key, **stats.to_dict()} for (start, key), stats in sorted(self.windows.items())
+            ],
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        agg = cls(window=data["window"])
+        agg.lines = data["lines"]
+        agg.skipped = data["skipped"]
+        agg._retired = {key: LogStats.from_dict(stats) for key, stats in data.get("retired", {}).items()}
+        for item in data["windows"]:
+            agg.windows[(item["start"], item["key"])] = LogStats.from_dict(item)
+        return agg
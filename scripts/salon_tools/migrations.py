@@ -0,0 +1,264 @@
+"""
+Migrazioni versionate dello schema Firestore.
+
+Ogni migrazione ha un numero progressivo (`id`, es. "0001") e, in genere, una
+collezione da attraversare: i documenti vengono divisi in blocchi per intervalli
+di ID (gli ID automatici sono uniformi sull'alfabeto [0-9A-Za-z]) ed elaborati in
+parallelo, a pagine ordinate per `__name__`.
+
+Stato su Firestore:
+
+- `migrations/state`: `version` (ultima migrazione applicata) e `applied.{id}`
+  con data, documenti letti/scritti e velocità
+- `migrations/{id}`: avanzamento dell'esecuzione in corso, con l'ultimo ID
+  elaborato per blocco. Dopo un'interruzione l'esecuzione riparte da lì
+
+Il checkpoint di una pagina viene scritto dopo le sue scritture: una pagina può
+quindi essere rielaborata dopo un crash e `migrate_doc` deve essere idempotente
+(un documento già migrato restituisce un esito senza operazioni).
+"""
+import importlib.util
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+
+from salon_tools.queries import commit_in_batches
+
+MIGRATIONS_COLLECTION = "migrations"
+STATE_DOC = "state"
+
+# Caratteri degli ID automatici di Firestore, in ordine di confronto (ASCII)
+ID_ALPHABET = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"
+
+
+class Migration:
+    """
+    Base delle migrazioni. Le sottoclassi definiscono `id`, `name`, `collection`
+    e `migrate_doc`; `prepare` e `finalize` girano una volta prima e dopo la
+    scansione (anche in dry-run, dove `finalize` non deve scrivere).
+    """
+
+    id = None
+    name = ""
+    description = ""
+    collection = None
+
+    def prepare(self, db):
+        pass
+
+    def migrate_doc(self, db, doc_id, data):
+        """Restituisce (esito, operazioni) con operazioni (tipo, ref, dati) per `commit_in_batches`."""
+        raise NotImplementedError
+
+    def finalize(self, db, dry_run):
+        """Operazioni finali; restituisce un Counter di esiti da aggiungere al riepilogo."""
+        return Counter()
+
+
+def load_migrations(directory):
+    """Migrazioni dei file `NNNN_nome.py` nella cartella (variabile `MIGRATION`), in ordine di id."""
+    migrations = []
+    for path in sorted(Path(directory).glob("[0-9][0-9][0-9][0-9]_*.py")):
+        spec = importlib.util.spec_from_file_location(f"migration_{path.stem}", path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        migration = module.MIGRATION
+        if migration.id != path.stem[:4]:
+            raise ValueError(f"{path.name}: id {migration.id!r} diverso dal prefisso del file")
+        migrations.append(migration)
+    ids = [m.id for m in migrations]
+    if len(set(ids)) != len(ids):
+        raise ValueError(f"ID di migrazione duplicati: {ids}")
+    return migrations
+
+
+# ==================== BLOCCHI PER ID ====================
+
+def id_chunks(count):
+    """
+    `count` intervalli [inizio, fine) di ID documento, su prefissi di due caratteri
+    dell'alfabeto degli ID automatici. Il primo e l'ultimo sono aperti, così anche
+    ID con altri caratteri (es. uid di Firebase Auth con "-" o "_") sono coperti.
+    """
+    space = len(ID_ALPHABET) ** 2
+    count = max(1, min(count, space))
+    bounds = []
+    for i in range(1, count):
+        index = i * space // count
+        bounds.append(ID_ALPHABET[index // len(ID_ALPHABET)] + ID_ALPHABET[index % len(ID_ALPHABET)])
+    edges = [None, *bounds, None]
+    return [(f"{i:03d}", edges[i], edges[i + 1]) for i in range(count)]
+
+
+def iter_chunk_pages(db, collection, start, end, after, page_size):
+    """Pagine di (id, dati) del blocco, ordinate per ID, dopo l'ID `after`."""
+    ref = db.collection(collection)
+    while True:
+        query = ref.order_by("__name__")
+        if after is not None:
+            query = query.where("__name__", ">", ref.document(after))
+        elif start is not None:
+            query = query.where("__name__", ">=", ref.document(start))
+        if end is not None:
+            query = query.where("__name__", "<", ref.document(end))
+        page = [(snap.id, snap.to_dict() or {}) for snap in query.limit(page_size).stream()]
+        if not page:
+            return
+        yield page
+        after = page[-1][0]
+        if len(page) < page_size:
+            return
+
+
+# ==================== STATO ====================
+
+def _now():
+    return datetime.now(timezone.utc).isoformat()
+
+
+def read_state(db):
+    snap = db.collection(MIGRATIONS_COLLECTION).document(STATE_DOC).get()
+    state = (snap.to_dict() or {}) if snap.exists else {}
+    state.setdefault("version", None)
+    state.setdefault("applied", {})
+    return state
+
+
+def read_run(db, migration_id):
+    snap = db.collection(MIGRATIONS_COLLECTION).document(migration_id).get()
+    return (snap.to_dict() or {}) if snap.exists else None
+
+
+# ==================== ESECUZIONE ====================
+
+class Progress:
+    """Contatori condivisi tra i worker, con stampa periodica di documenti/secondo."""
+
+    def __init__(self, label, every=5.0, initial=None):
+        self.label = label
+        self.every = every
+        self.outcomes = Counter(initial or {})
+        self.read = 0
+        self.written = 0
+        self.started = time.perf_counter()
+        self._printed = self.started
+        self._lock = threading.Lock()
+
+    def add(self, read, written, outcomes):
+        with self._lock:
+            self.read += read
+            self.written += written
+            self.outcomes.update(outcomes)
+            now = time.perf_counter()
+            if now - self._printed >= self.every:
+                self._printed = now
+                print(f"  ... {self.label}: {self.read} documenti letti, {self.written} scritture "
+                      f"({self.rate():.0f} doc/s)", flush=True)
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def rate(self):
+        return self.read / max(self.elapsed(), 1e-9)
+
+
+def run_chunk(db, migration, chunk, checkpoint, page_size, dry_run, progress, run_ref, samples):
+    """Elabora un blocco dall'ultimo ID del checkpoint, aggiornandolo dopo ogni pagina."""
+    key, start, end = chunk
+    docs = checkpoint.get("docs", 0)
+    written = checkpoint.get("written", 0)
+    outcomes = Counter(checkpoint.get("outcomes") or {})
+    for page in iter_chunk_pages(db, migration.collection, start, end, checkpoint.get("last"), page_size):
+        page_outcomes = Counter()
+        operations = []
+        for doc_id, data in page:
+            outcome, ops = migration.migrate_doc(db, doc_id, data)
+            page_outcomes[outcome] += 1
+            operations.extend(ops)
+            if ops and len(samples) < 10:
+                samples.append((doc_id, outcome, ops))
+        if not dry_run:
+            commit_in_batches(db, operations)
+        docs += len(page)
+        written += len(operations)
+        outcomes.update(page_outcomes)
+        if not dry_run:
+            run_ref.update({
+                f"chunks.{key}": {"last": page[-1][0], "docs": docs, "written": written,
+                                  "outcomes": dict(outcomes), "done": False},
+                "updatedAt": _now(),
+            })
+        progress.add(len(page), len(operations), page_outcomes)
+    if not dry_run:
+        run_ref.update({
+            f"chunks.{key}": {"last": None, "docs": docs, "written": written, "outcomes": dict(outcomes), "done": True},
+            "updatedAt": _now(),
+        })
+    return key, docs, written
+
+
+def run_migration(db, migration, workers=8, chunk_count=32, page_size=500, dry_run=False):
+    """
+    Esegue (o riprende) una migrazione e, se completata senza dry-run, la registra
+    in `migrations/state`. Restituisce il riepilogo dell'esecuzione.
+    """
+    run_ref = db.collection(MIGRATIONS_COLLECTION).document(migration.id)
+    run = None if dry_run else read_run(db, migration.id)
+    if run and run.get("status") == "running":
+        chunk_count = run.get("chunkCount", chunk_count)
+        print(f"Ripresa di {migration.id} avviata il {run.get('startedAt')}")
+    else:
+        run = {"id": migration.id, "name": migration.name, "status": "running", "chunkCount": chunk_count,
+               "startedAt": _now(), "chunks": {}}
+        if not dry_run:
+            run_ref.set(run)
+
+    migration.prepare(db)
+    previous_outcomes = Counter()
+    for checkpoint in run["chunks"].values():
+        previous_outcomes.update(checkpoint.get("outcomes") or {})
+    progress = Progress(migration.id, initial=previous_outcomes)
+    samples = []
+    read_before = sum(c.get("docs", 0) for c in run["chunks"].values())
+    written_before = sum(c.get("written", 0) for c in run["chunks"].values())
+
+    if migration.collection:
+        chunks = [c for c in id_chunks(chunk_count) if not run["chunks"].get(c[0], {}).get("done")]
+        print(f"{migration.id} {migration.name}: collezione {migration.collection}, "
+              f"{len(chunks)}/{chunk_count} blocchi da elaborare, {workers} worker")
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = [
+                pool.submit(run_chunk, db, migration, chunk, run["chunks"].get(chunk[0], {}),
+                            page_size, dry_run, progress, run_ref, samples)
+                for chunk in chunks
+            ]
+            for future in futures:
+                future.result()
+
+    progress.outcomes.update(migration.finalize(db, dry_run))
+    elapsed = progress.elapsed()
+    summary = {
+        "name": migration.name,
+        "docs": read_before + progress.read,
+        "written": written_before + progress.written,
+        "outcomes": dict(progress.outcomes),
+        "seconds": round(elapsed, 2),
+        "docsPerSec": round(progress.rate(), 1),
+        "samples": samples,
+    }
+    if dry_run:
+        return summary
+
+    completed_at = _now()
+    run_ref.update({"status": "completed", "completedAt": completed_at, "updatedAt": completed_at})
+    state_ref = db.collection(MIGRATIONS_COLLECTION).document(STATE_DOC)
+    version = read_state(db)["version"]
+    state_ref.set({
+        "version": max(version or migration.id, migration.id),
+        "updatedAt": completed_at,
+        "applied": {migration.id: {k: v for k, v in summary.items() if k != "samples"} | {"completedAt": completed_at}},
+    }, merge=True)
+    return summary
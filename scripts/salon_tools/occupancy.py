@@ -0,0 +1,72 @@
+"""
+Contatori di occupazione degli slot (collezione `slotOccupancy`).
+
+Stesso formato di `lib/slot-occupancy.ts`: un documento `{salonId}_{date}` con
+`counts[i]` = prenotazioni PENDING/CONFIRMED che occupano il bucket i
+(larghezza `bucketMinutes`, indice 0 = 00:00). Ogni prenotazione occupa
+[startTime, endTime + bufferTime).
+"""
+from datetime import datetime, timezone
+
+from salon_tools.rules import ACTIVE_STATUSES, to_minutes
+
+SLOT_OCCUPANCY_COLLECTION = "slotOccupancy"
+DEFAULT_SALON_KEY = "default"
+MINUTES_PER_DAY = 24 * 60
+
+
+def occupancy_doc_id(salon_id, date_str):
+    return f"{salon_id or DEFAULT_SALON_KEY}_{date_str}"
+
+
+def bucket_count(bucket_minutes):
+    return -(-MINUTES_PER_DAY // bucket_minutes)
+
+
+def bucket_range(start_min, end_min, bucket_minutes):
+    """Indici [from, to) dei bucket che coprono l'intervallo [start_min, end_min)."""
+    return max(0, start_min // bucket_minutes), min(bucket_count(bucket_minutes), -(-end_min // bucket_minutes))
+
+
+def apply_booking(counts, booking, bucket_minutes, buffer_time, delta):
+    start, end = bucket_range(
+        to_minutes(booking["startTime"]), to_minutes(booking["endTime"]) + buffer_time, bucket_minutes
+    )
+    for i in range(start, end):
+        counts[i] = max(0, counts[i] + delta)
+
+
+def build_counts(bookings, bucket_minutes, buffer_time):
+    counts = [0] * bucket_count(bucket_minutes)
+    for booking in bookings:
+        if booking.get("status") not in ACTIVE_STATUSES:
+            continue
+        if not booking.get("startTime") or not booking.get("endTime"):
+            continue
+        apply_booking(counts, booking, bucket_minutes, buffer_time, 1)
+    return counts
+
+
+def max_occupancy(doc, start_min, end_min):
+    """Occupazione massima sull'intervallo [start_min, end_min)."""
+    start, end = bucket_range(start_min, end_min, doc["bucketMinutes"])
+    return max(doc["counts"][start:end], default=0)
+
+
+def build_doc(salon_id, date_str, bookings, bucket_minutes, buffer_time):
+    return {
+        "salonId": salon_id or DEFAULT_SALON_KEY,
+        "date": date_str,
+        "bucketMinutes": bucket_minutes,
+        "bufferTime": buffer_time,
+        "counts": build_counts(bookings, bucket_minutes, buffer_time),
+        "updatedAt": datetime.now(timezone.utc).isoformat(),
+    }
+
+
+def diff_counts(expected, actual):
+    """Bucket in cui i contatori salvati differiscono da quelli ricalcolati: [(indice, atteso, salvato)]."""
+    size = max(len(expected), len(actual or []))
+    expected = list(expected) + [0] * (size - len(expected))
+    actual = list(actual or []) + [0] * (size - len(actual or []))
+    return [(i, e, a) for i, (e, a) in enumerate(zip(expected, actual)) if e != a]
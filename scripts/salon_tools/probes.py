@@ -0,0 +1,285 @@
+"""
+Controlli di salute eseguiti in parallelo, ciascuno con la propria scadenza.
+
+Ogni probe riceve la scadenza assoluta (`time.monotonic()`) e la usa come
+timeout delle proprie chiamate; il runner li avvia tutti insieme in thread
+daemon e considera `timeout` quelli che non finiscono in tempo, senza
+attenderli. Esito di un probe:
+
+    {"name", "status": "ok" | "warn" | "fail" | "timeout" | "skip", "ms", "detail", "data"}
+
+- `env`: variabili FIREBASE_ADMIN_* e formato della chiave privata
+- `config`: validità di `settings/config` e di `salons/*.config`
+- `services`: servizi attivi per salone
+- `indexes`: indici composti di `firestore.indexes.json` presenti e pronti
+- `http`: risposta di `/healthz`
+"""
+import json
+import os
+import re
+import threading
+import time
+
+from salon_tools.firebase import PROJECT_ROOT, load_env
+from salon_tools.index_advisor import index_key
+from salon_tools.occupancy import DEFAULT_SALON_KEY
+
+FAILING = ("fail", "timeout")
+
+# Scadenze predefinite in millisecondi
+DEFAULT_DEADLINES = {"env": 50, "config": 900, "services": 900, "indexes": 900, "http": 500}
+
+REQUIRED_ENV = ("FIREBASE_ADMIN_PROJECT_ID", "FIREBASE_ADMIN_CLIENT_EMAIL", "FIREBASE_ADMIN_PRIVATE_KEY")
+
+_HHMM = re.compile(r"^([01]\d|2[0-3]):[0-5]\d$")
+_DATE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+
+
+class ProbeError(Exception):
+    """Controllo fallito, con i dati raccolti fino a quel punto."""
+
+    def __init__(self, detail, data=None):
+        super().__init__(detail)
+        self.data = data
+
+
+class ProbeWarning(ProbeError):
+    """Il probe è riuscito ma ha trovato qualcosa da segnalare."""
+
+
+def remaining(deadline):
+    """Secondi rimasti prima della scadenza, da passare come timeout alle chiamate."""
+    return max(0.001, deadline - time.monotonic())
+
+
+def _emulator():
+    return bool(os.getenv("FIRESTORE_EMULATOR_HOST"))
+
+
+# ==================== PROBE ====================
+
+def probe_env(deadline):
+    load_env()
+    if _emulator():
+        return f"emulatore {os.getenv('FIRESTORE_EMULATOR_HOST')}", {"emulator": True}
+    missing = [name for name in REQUIRED_ENV if not os.getenv(name)]
+    if missing:
+        raise RuntimeError(f"variabili mancanti: {', '.join(missing)}")
+    key = os.getenv("FIREBASE_ADMIN_PRIVATE_KEY").replace("\\n", "\n")
+    if not key.strip().startswith("-----BEGIN") or "-----END" not in key:
+        raise RuntimeError("FIREBASE_ADMIN_PRIVATE_KEY non è una chiave PEM")
+    return os.getenv("FIREBASE_ADMIN_PROJECT_ID"), {"emulator": False, "projectId": os.getenv("FIREBASE_ADMIN_PROJECT_ID")}
+
+
+def config_problems(config):
+    """Errori di una configurazione del salone (stessi campi di `SalonConfig`)."""
+    problems = []
+    opening, closing = config.get("openingTime"), config.get("closingTime")
+    for field, value in (("openingTime", opening), ("closingTime", closing)):
+        if value is not None and not (isinstance(value, str) and _HHMM.match(value)):
+            problems.append(f"{field} non valido: {value!r}")
+    if isinstance(opening, str) and isinstance(closing, str) and _HHMM.match(opening) and _HHMM.match(closing) \
+            and opening >= closing:
+        problems.append(f"openingTime {opening} non precede closingTime {closing}")
+    for field, minimum in (("timeStep", 1), ("resources", 1), ("bufferTime", 0)):
+        value = config.get(field)
+        if value is not None and (isinstance(value, bool) or not isinstance(value, (int, float))
+                                  or value != int(value) or value < minimum):
+            problems.append(f"{field} non valido: {value!r}")
+    days = config.get("closedDaysOfWeek")
+    if days is not None and (not isinstance(days, list) or any(d not in range(7) for d in days)):
+        problems.append(f"closedDaysOfWeek non valido: {days!r}")
+    dates = config.get("closedDates")
+    if dates is not None and (not isinstance(dates, list)
+                              or any(not isinstance(d, str) or not _DATE.match(d) for d in dates)):
+        problems.append("closedDates contiene date non nel formato YYYY-MM-DD")
+    return problems
+
+
+def probe_config(deadline):
+    from salon_tools.firebase import get_db
+
+    db = get_db()
+    settings = db.collection("settings").document("config").get(timeout=remaining(deadline))
+    salons = list(db.collection("salons").select(["config"]).stream(timeout=remaining(deadline)))
+    sources = [("settings/config", settings.to_dict() or {})] if settings.exists else []
+    sources += [(f"salons/{snap.id}", (snap.to_dict() or {}).get("config") or {}) for snap in salons]
+
+    problems = {source: config_problems(config) for source, config in sources}
+    problems = {source: found for source, found in problems.items() if found}
+    data = {"settings": settings.exists, "salons": len(salons), "problems": problems}
+    if problems:
+        raise ProbeError("; ".join(f"{source}: {', '.join(found)}" for source, found in problems.items()), data)
+    if not settings.exists and not salons:
+        raise ProbeWarning("nessuna configurazione: in uso i valori predefiniti", data)
+    return f"settings/config {'presente' if settings.exists else 'assente'}, {len(salons)} saloni", data
+
+
+def probe_services(deadline):
+    from salon_tools.firebase import get_db
+
+    db = get_db()
+    query = db.collection("services").where("active", "==", True).select(["salonId"])
+    per_salon = {}
+    for snap in query.stream(timeout=remaining(deadline)):
+        salon = (snap.to_dict() or {}).get("salonId") or DEFAULT_SALON_KEY
+        per_salon[salon] = per_salon.get(salon, 0) + 1
+    salons = [snap.id for snap in db.collection("salons").select([]).stream(timeout=remaining(deadline))]
+    total = sum(per_salon.values())
+    if not total:
+        raise RuntimeError("nessun servizio attivo")
+    # I servizi senza salonId valgono per tutti i saloni
+    empty = [salon for salon in salons if not per_salon.get(salon) and not per_salon.get(DEFAULT_SALON_KEY)]
+    data = {"active": total, "perSalon": per_salon}
+    if empty:
+        raise ProbeWarning(f"saloni senza servizi attivi: {', '.join(empty)}", data)
+    return f"{total} servizi attivi", data
+
+
+def expected_indexes(path=None):
+    """Indici composti dichiarati (quelli a un solo campo sono automatici e vengono ignorati)."""
+    spec = json.loads((path or PROJECT_ROOT / "firestore.indexes.json").read_text(encoding="utf-8"))
+    return {
+        index_key(index["collectionGroup"], index.get("queryScope"), index["fields"])
+        for index in spec.get("indexes", [])
+        if len(index["fields"]) > 1
+    }
+
+
+def deployed_indexes(deadline):
+    """{chiave: stato} degli indici composti del database, dall'API REST di Firestore."""
+    import firebase_admin
+    from google.auth.transport.requests import AuthorizedSession
+
+    from salon_tools.firebase import get_db
+
+    get_db()
+    app = firebase_admin.get_app()
+    session = AuthorizedSession(app.credential.get_credential())
+    url = (f"https://firestore.googleapis.com/v1/projects/{app.project_id}"
+           "/databases/(default)/collectionGroups/-/indexes")
+    deployed, token = {}, None
+    while True:
+        response = session.get(url, params={"pageToken": token} if token else None, timeout=remaining(deadline))
+        response.raise_for_status()
+        body = response.json()
+        for index in body.get("indexes", []):
+            collection_group = index["name"].split("/collectionGroups/")[1].split("/")[0]
+            deployed[index_key(collection_group, index.get("queryScope"), index.get("fields", []))] = index.get("state")
+        token = body.get("nextPageToken")
+        if not token:
+            return deployed
+
+
+def _describe(key):
+    collection_group, _, fields = key
+    return f"{collection_group}({', '.join(f'{path} {order}' for path, order in fields)})"
+
+
+def probe_indexes(deadline):
+    if _emulator():
+        return None
+    expected = expected_indexes()
+    deployed = deployed_indexes(deadline)
+    missing = sorted(expected - set(deployed))
+    building = sorted(key for key in expected & set(deployed) if deployed[key] != "READY")
+    extra = sorted(set(deployed) - expected)
+    data = {
+        "expected": len(expected),
+        "deployed": len(deployed),
+        "missing": [_describe(key) for key in missing],
+        "building": [_describe(key) for key in building],
+        "undeclared": [_describe(key) for key in extra],
+    }
+    if missing:
+        raise ProbeError(f"{len(missing)} indici mancanti: {'; '.join(data['missing'])}", data)
+    if building:
+        raise ProbeWarning(f"{len(building)} indici in costruzione", data)
+    if extra:
+        raise ProbeWarning(f"{len(extra)} indici non dichiarati in firestore.indexes.json", data)
+    return f"{len(expected)} indici composti pronti", data
+
+
+def probe_http(deadline, url=None):
+    import urllib.request
+
+    base = url or os.getenv("NEXT_PUBLIC_APP_URL")
+    if not base:
+        return None
+    target = base.rstrip("/") + "/healthz"
+    with urllib.request.urlopen(target, timeout=remaining(deadline)) as response:
+        status = response.status
+        body = json.loads(response.read() or b"{}")
+    data = {"url": target, "status": status, "body": body}
+    if status != 200 or body.get("status") != "ok":
+        raise ProbeError(f"{target} ha risposto {status} {body.get('status')!r}", data)
+    return f"{target} 200", data
+
+
+PROBES = {
+    "env": probe_env,
+    "config": probe_config,
+    "services": probe_services,
+    "indexes": probe_indexes,
+    "http": probe_http,
+}
+
+
+# ==================== ESECUZIONE ====================
+
+def _run_one(name, fn, deadline, kwargs, results):
+    started = time.monotonic()
+    try:
+        outcome = fn(deadline, **kwargs)
+        if outcome is None:
+            status, detail, data = "skip", "non applicabile", None
+        else:
+            status, (detail, data) = "ok", outcome
+    except ProbeWarning as exc:
+        status, detail, data = "warn", str(exc), exc.data
+    except ProbeError as exc:
+        status, detail, data = "fail", str(exc), exc.data
+    except Exception as exc:
+        status, detail, data = "fail", f"{type(exc).__name__}: {exc}", None
+    results[name] = {
+        "name": name,
+        "status": status,
+        "ms": round((time.monotonic() - started) * 1000, 1),
+        "detail": detail,
+        "data": data,
+    }
+
+
+def run_probes(names=None, deadlines=None, url=None):
+    """
+    Esegue i probe in parallelo. Restituisce {"ok", "ms", "probes": [esito, ...]}
+    nell'ordine di `PROBES`; `ok` è falso se un probe è fallito o scaduto.
+    """
+    deadlines = {**DEFAULT_DEADLINES, **(deadlines or {})}
+    names = [name for name in PROBES if names is None or name in names]
+    results = {}
+    started = time.monotonic()
+    threads = {}
+    for name in names:
+        kwargs = {"url": url} if name == "http" else {}
+        deadline = started + deadlines[name] / 1000
+        thread = threading.Thread(target=_run_one, args=(name, PROBES[name], deadline, kwargs, results),
+                                  name=f"probe-{name}", daemon=True)
+        thread.start()
+        threads[name] = (thread, deadline)
+    for name, (thread, deadline) in threads.items():
+        thread.join(remaining(deadline))
+        if name not in results:
+            results[name] = {
+                "name": name,
+                "status": "timeout",
+                "ms": deadlines[name],
+                "detail": f"nessuna risposta entro {deadlines[name]} ms",
+                "data": None,
+            }
+    probes = [results[name] for name in names]
+    return {
+        "ok": not any(p["status"] in FAILING for p in probes),
+        "ms": round((time.monotonic() - started) * 1000, 1),
+        "probes": probes,
+    }
@@ -0,0 +1,116 @@
+"""
+Letture e scritture Firestore ricorrenti negli script.
+
+Le query rispecchiano quelle delle server actions: configurazione da
+`salons/{id}.config` con fallback su `settings/config`, prenotazioni per
+intervallo di date con `where("date", ">=")`/`where("date", "<=")`.
+"""
+from datetime import date, timedelta
+
+from salon_tools.rules import merge_config
+
+# Limite di operazioni per WriteBatch in Firestore
+BATCH_LIMIT = 500
+
+
+def load_settings_config(db):
+    """Configurazione da `settings/config` con i default (come `createBooking`)."""
+    snap = db.collection("settings").document("config").get()
+    return merge_config(snap.to_dict() if snap.exists else None)
+
+
+def load_salon_config(db, salon_id=None):
+    """
+    Configurazione di un salone: `salons/{id}.config`, oppure il primo salone
+    se `salon_id` è None (come `getAvailableSlots`), con fallback su `settings/config`.
+    """
+    if salon_id:
+        snap = db.collection("salons").document(salon_id).get()
+        data = snap.to_dict() if snap.exists else None
+    else:
+        docs = list(db.collection("salons").limit(1).stream())
+        data = docs[0].to_dict() if docs else None
+    if data and data.get("config"):
+        return merge_config(data["config"])
+    return load_settings_config(db)
+
+
+def load_salon_configs(db, salon_ids=(), default_key="default"):
+    """
+    {salonId: configurazione} di tutti i saloni (con fallback su `settings/config`);
+    se `default_key` è tra `salon_ids` ed è assente, usa il primo salone (prenotazioni senza `salonId`).
+    """
+    settings = db.collection("settings").document("config").get()
+    settings_config = settings.to_dict() if settings.exists else None
+    configs = {}
+    for doc in db.collection("salons").stream():
+        data = doc.to_dict() or {}
+        configs[doc.id] = merge_config(data.get("config") or settings_config or None)
+    if default_key in salon_ids and default_key not in configs:
+        configs[default_key] = load_salon_config(db)
+    return configs
+
+
+def bookings_query(db, start_date, end_date, salon_id=None):
+    query = db.collection("bookings").where("date", ">=", start_date).where("date", "<=", end_date)
+    if salon_id:
+        query = query.where("salonId", "==", salon_id)
+    return query
+
+
+def iter_bookings(db, start_date, end_date, salon_id=None):
+    """Genera (id, dati) delle prenotazioni nell'intervallo di date, in streaming."""
+    for doc in bookings_query(db, start_date, end_date, salon_id).stream():
+        data = doc.to_dict()
+        if data:
+            yield doc.id, data
+
+
+def date_range(start_date, end_date):
+    """Date YYYY-MM-DD da `start_date` a `end_date` inclusi."""
+    current = date.fromisoformat(start_date)
+    last = date.fromisoformat(end_date)
+    while current <= last:
+        yield current.isoformat()
+        current += timedelta(days=1)
+
+
+def split_date_range(start_date, end_date, chunk_days):
+    """Suddivide l'intervallo in blocchi (inizio, fine) di al massimo `chunk_days` giorni."""
+    current = date.fromisoformat(start_date)
+    last = date.fromisoformat(end_date)
+    while current <= last:
+        chunk_end = min(last, current + timedelta(days=chunk_days - 1))
+        yield current.isoformat(), chunk_end.isoformat()
+        current = chunk_end + timedelta(days=1)
+
+
+def commit_in_batches(db, operations, batch_size=BATCH_LIMIT):
+    """
+    Esegue operazioni (tipo, ref, dati) in WriteBatch da `batch_size`;
+    tipo è "set", "merge", "update" o "delete". Restituisce il numero di operazioni scritte.
+    """
+    written = 0
+    batch = db.batch()
+    pending = 0
+    for op, ref, data in operations:
+        if op == "set":
+            batch.set(ref, data)
+        elif op == "merge":
+            batch.set(ref, data, merge=True)
+        elif op == "update":
+            batch.update(ref, data)
+        elif op == "delete":
+            batch.delete(ref)
+        else:
+            raise ValueError(f"Operazione non supportata: {op}")
+        pending += 1
+        if pending >= batch_size:
+            batch.commit()
+            written += pending
+            batch = db.batch()
+            pending = 0
+    if pending:
+        batch.commit()
+        written += pending
+    return written
@@ -0,0 +1,328 @@
+"""
+Replay delle richieste di prenotazione storiche con configurazioni alternative.
+
+La traccia è un array NumPy strutturato (`TRACE_DTYPE`), una riga per
+richiesta ordinata per `createdAt`, salvato in `.npy` e aperto in memory map
+(`np.load(..., mmap_mode="r")`) da ogni processo di replay: i processi
+condividono le stesse pagine del file invece di ricevere una copia.
+
+Una richiesta chiede il giorno `day` alle `start` per `duration` minuti. Nel
+replay viene accettata se l'orario sarebbe stato tra quelli proposti da
+`getAvailableSlots` (vedi `rules.available_slots`): giorno aperto, orario
+sulla griglia `timeStep` dall'apertura, fine + `bufferTime` entro la chiusura
+e conflitti (buffer incluso) inferiori a `resources`. Con `shift` > 0, se
+l'orario richiesto non è disponibile il cliente sceglie lo slot disponibile
+più vicino entro `shift` minuti nello stesso giorno.
+
+Le prenotazioni poi cancellate, rifiutate o spostate dall'admin liberano lo
+slot al loro `updatedAt` (`released`), come è successo nella realtà.
+"""
+import json
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from salon_tools.analytics import REVENUE_STATUSES, hhmm_to_minutes, parse_iso_utc
+from salon_tools.booking_time import js_iso
+from salon_tools.rules import is_closed, merge_config, to_minutes
+
+# Codici di `status` nella traccia
+STATUSES = ("PENDING", "CONFIRMED", "REJECTED", "ALTERNATIVE_PROPOSED", "CANCELLED")
+# Stati finali che hanno liberato lo slot occupato alla richiesta
+RELEASED_STATUSES = ("REJECTED", "ALTERNATIVE_PROPOSED", "CANCELLED")
+
+NEVER = np.iinfo("int64").max
+_EPOCH = date(1970, 1, 1)
+
+TRACE_DTYPE = np.dtype([
+    ("at", "i8"),          # createdAt, secondi dall'epoch
+    ("released", "i8"),    # updatedAt se lo slot è stato liberato, altrimenti NEVER
+    ("day", "i4"),         # data richiesta, giorni dall'epoch
+    ("start", "i2"),       # minuti dalla mezzanotte
+    ("duration", "i2"),    # minuti
+    ("salon", "i2"),       # indice in meta["salons"]
+    ("status", "i1"),      # indice in STATUSES (stato finale storico)
+    ("price", "f4"),       # servicePrice
+])
+
+TRACE_FIELDS = ("date", "startTime", "endTime", "startMin", "endMin", "status", "salonId", "servicePrice",
+                "createdAt", "updatedAt")
+
+# Motivi di rifiuto: giorno chiuso, fuori orario, orario fuori griglia (senza slot vicini), capacità esaurita
+REJECT_REASONS = ("closed", "hours", "grid", "full")
+
+
+# ==================== TRACCIA ====================
+
+def _epoch_seconds(values):
+    strings = pd.Series([js_iso(v) if hasattr(v, "astimezone") else v for v in values], dtype="object")
+    parsed = parse_iso_utc(strings).to_numpy().astype("datetime64[s]")
+    return np.where(np.isnat(parsed), -1, parsed.astype("int64"))
+
+
+def build_trace(records, default_salon):
+    """
+    Traccia ordinata per `createdAt` da prenotazioni (dict con `TRACE_FIELDS`).
+    Restituisce (traccia, elenco dei salonId); le prenotazioni senza `salonId`
+    vanno in `default_salon`, quelle senza orari validi o `createdAt` sono scartate.
+    """
+    columns = {field: [] for field in TRACE_FIELDS}
+    for record in records:
+        for field in TRACE_FIELDS:
+            columns[field].append(record.get(field))
+    df = pd.DataFrame(columns, dtype="object")
+
+    start = pd.to_numeric(df["startMin"], errors="coerce").to_numpy(dtype="float64")
+    start = np.where(np.isnan(start), hhmm_to_minutes(df["startTime"]), start)
+    end = pd.to_numeric(df["endMin"], errors="coerce").to_numpy(dtype="float64")
+    end = np.where(np.isnan(end), hhmm_to_minutes(df["endTime"]), end)
+    day = pd.to_datetime(df["date"], format="%Y-%m-%d", errors="coerce").to_numpy().astype("datetime64[D]")
+    status = pd.Categorical(df["status"], categories=STATUSES).codes
+    at = _epoch_seconds(df["createdAt"])
+    updated = _epoch_seconds(df["updatedAt"])
+    valid = ~np.isnan(start) & ~np.isnan(end) & (end > start) & ~np.isnat(day) & (status >= 0) & (at >= 0)
+
+    salon_codes, salons = pd.factorize(df["salonId"].fillna(default_salon).to_numpy(dtype=object)[valid])
+    released = np.isin(np.asarray(STATUSES, dtype=object)[status[valid]], RELEASED_STATUSES)
+    trace = np.empty(int(valid.sum()), dtype=TRACE_DTYPE)
+    trace["at"] = at[valid]
+    trace["released"] = np.where(released, np.maximum(updated[valid], at[valid]), NEVER)
+    trace["day"] = day[valid].astype("int64")
+    trace["start"] = start[valid]
+    trace["duration"] = end[valid] - start[valid]
+    trace["salon"] = salon_codes
+    trace["status"] = status[valid]
+    trace["price"] = np.nan_to_num(pd.to_numeric(df["servicePrice"], errors="coerce").to_numpy(dtype="float64"))[valid]
+    trace = trace[np.argsort(trace["at"], kind="stable")]
+    return trace, [str(s) for s in salons]
+
+
+def save_trace(path, trace, meta):
+    """Scrive `path` (.npy) e i metadati (saloni, configurazioni, periodo) in `path`.json."""
+    np.save(path, trace, allow_pickle=False)
+    with open(f"{path}.json", "w", encoding="utf-8") as handle:
+        json.dump(meta, handle, ensure_ascii=False, indent=2)
+
+
+def open_trace(path):
+    """(traccia in memory map, metadati)."""
+    with open(f"{path}.json", encoding="utf-8") as handle:
+        meta = json.load(handle)
+    return np.load(path, mmap_mode="r", allow_pickle=False), meta
+
+
+# ==================== SCENARI ====================
+
+def parse_value(key, raw):
+    """Valore di una chiave di `SalonConfig` da riga di comando ("0|6" per le liste)."""
+    if key in ("closedDaysOfWeek", "closedDates"):
+        items = [item for item in raw.split("|") if item]
+        return [int(item) for item in items] if key == "closedDaysOfWeek" else items
+    if key in ("timeStep", "resources", "bufferTime"):
+        return int(raw)
+    return raw
+
+
+def parse_scenario(spec):
+    """"nome chiave=valore ..." (nome opzionale) -> (nome, override)."""
+    tokens = spec.split()
+    name = tokens.pop(0) if tokens and "=" not in tokens[0] else None
+    overrides = {}
+    for token in tokens:
+        key, _, raw = token.partition("=")
+        if not key or not _:
+            raise ValueError(f"override non valido: {token!r} (atteso chiave=valore)")
+        overrides[key] = parse_value(key, raw)
+    return name or " ".join(tokens), overrides
+
+
+def scenario_configs(base_configs, overrides):
+    """Configurazione di ogni salone con gli override dello scenario applicati."""
+    return {salon: merge_config({**config, **overrides}) for salon, config in base_configs.items()}
+
+
+# ==================== REPLAY ====================
+
+class _SalonRules:
+    """Parametri della configurazione in minuti e cache dei giorni chiusi."""
+
+    def __init__(self, config):
+        self.config = config
+        self.opening = to_minutes(config["openingTime"])
+        self.closing = to_minutes(config["closingTime"])
+        self.step = config["timeStep"]
+        self.buffer = config["bufferTime"]
+        self.resources = config["resources"]
+        self._closed = {}
+
+    def closed(self, day):
+        if day not in self._closed:
+            self._closed[day] = is_closed(str(np.datetime64(day, "D")), self.config)
+        return self._closed[day]
+
+    def candidates(self, start, duration, shift):
+        """Inizi sulla griglia entro `shift` minuti da `start` che stanno nell'orario, dal più vicino."""
+        last = self.closing - duration - self.buffer
+        if last < self.opening:
+            return []
+        low = max(self.opening, start - shift)
+        high = min(last, start + shift)
+        first = self.opening + -(-(low - self.opening) // self.step) * self.step
+        starts = range(first, high + 1, self.step)
+        return sorted(starts, key=lambda s: (abs(s - start), s))
+
+    def in_hours(self, start, duration):
+        return self.opening <= start and start + duration + self.buffer <= self.closing
+
+    def fits(self, start, duration, intervals):
+        slot_end = start + duration + self.buffer
+        conflicts = 0
+        for booked_start, booked_end in intervals:
+            if start < booked_end + self.buffer and booked_start < slot_end:
+                conflicts += 1
+                if conflicts >= self.resources:
+                    return False
+        return True
+
+
+def replay(trace, configs, salons, shift=0, days=None):
+    """
+    Riproduce la traccia con le configurazioni {salonId: config}. Restituisce
+    (metriche totali, metriche per salone) con richieste, accettate (di cui
+    spostate), rifiutate per motivo, revenue delle accettate poi confermate,
+    minuti occupati a fine periodo e utilizzo sulla capacità dei giorni `days`
+    (giorni dall'epoch; default: dalla prima all'ultima data della traccia).
+    """
+    rules = [_SalonRules(configs[salon]) for salon in salons]
+    n = len(trace)
+    at = np.asarray(trace["at"])
+    released_at = np.asarray(trace["released"])
+    request_days = np.asarray(trace["day"]).tolist()
+    starts = np.asarray(trace["start"]).tolist()
+    durations = np.asarray(trace["duration"]).tolist()
+    salon_codes = np.asarray(trace["salon"]).tolist()
+
+    release_order = np.flatnonzero(released_at != NEVER)
+    release_order = release_order[np.argsort(released_at[release_order], kind="stable")]
+    release_times = released_at[release_order]
+    # Rilasci da applicare prima di ogni richiesta: quelli con updatedAt < createdAt
+    release_upto = np.searchsorted(release_times, at, side="left").tolist()
+    release_order = release_order.tolist()
+
+    booked = {}
+    assigned = [None] * n
+    outcome = np.zeros(n, dtype="int8")  # 0 accettata, 1 spostata, 2+ motivo del rifiuto
+    applied = 0
+    for i in range(n):
+        while applied < release_upto[i]:
+            row = release_order[applied]
+            applied += 1
+            if assigned[row] is not None:
+                booked[(salon_codes[row], request_days[row])].remove(assigned[row])
+                assigned[row] = None
+
+        salon_rules = rules[salon_codes[i]]
+        day = request_days[i]
+        if salon_rules.closed(day):
+            outcome[i] = 2
+            continue
+        candidates = salon_rules.candidates(starts[i], durations[i], shift)
+        if not candidates:
+            outcome[i] = 4 if salon_rules.in_hours(starts[i], durations[i]) else 3
+            continue
+        key = (salon_codes[i], day)
+        intervals = booked.setdefault(key, [])
+        for start in candidates:
+            if salon_rules.fits(start, durations[i], intervals):
+                interval = (start, start + durations[i])
+                intervals.append(interval)
+                assigned[i] = interval
+                outcome[i] = 0 if start == starts[i] else 1
+                break
+        else:
+            outcome[i] = 5
+
+    held = np.array([interval is not None for interval in assigned], dtype=bool) & (released_at == NEVER)
+    if days is None:
+        all_days = np.asarray(trace["day"])
+        days = range(int(all_days.min()), int(all_days.max()) + 1) if n else range(0)
+    return summarize(trace, outcome, held, rules, salons, days)
+
+
+def _capacity_minutes(rule, days):
+    open_days = sum(1 for day in days if not rule.closed(day))
+    return open_days * max(0, rule.closing - rule.opening) * rule.resources
+
+
+def summarize(trace, outcome, held, rules, salons, days):
+    accepted = outcome <= 1
+    revenue_codes = [STATUSES.index(s) for s in REVENUE_STATUSES]
+    confirmed = np.isin(np.asarray(trace["status"]), revenue_codes)
+    price = np.asarray(trace["price"], dtype="float64")
+    duration = np.asarray(trace["duration"], dtype="int64")
+    salon = np.asarray(trace["salon"])
+
+    def metrics(mask, capacity):
+        booked_minutes = int(duration[mask & held].sum())
+        return {
+            "requests": int(mask.sum()),
+            "accepted": int((mask & accepted).sum()),
+            "moved": int((mask & (outcome == 1)).sum()),
+            "rejected": {reason: int((mask & (outcome == 2 + k)).sum()) for k, reason in enumerate(REJECT_REASONS)},
+            "revenue": round(float(price[mask & accepted & confirmed].sum()), 2),
+            "bookedMinutes": booked_minutes,
+            "capacityMinutes": capacity,
+            "utilization": round(booked_minutes / capacity, 4) if capacity else None,
+        }
+
+    per_salon = {}
+    for code, salon_id in enumerate(salons):
+        per_salon[salon_id] = metrics(salon == code, _capacity_minutes(rules[code], days))
+    total = metrics(np.ones(len(trace), dtype=bool), sum(m["capacityMinutes"] for m in per_salon.values()))
+    return total, per_salon
+
+
+def run_scenario(path, name, overrides, shift):
+    """Eseguito in un processo: apre la traccia in memory map e riproduce uno scenario."""
+    trace, meta = open_trace(path)
+    configs = scenario_configs(meta["configs"], overrides)
+    days = range(epoch_day(meta["from"]), epoch_day(meta["to"]) + 1)
+    total, per_salon = replay(trace, configs, meta["salons"], shift, days)
+    return {"name": name, "overrides": overrides, "total": total, "salons": per_salon}
+
+
+def historical(trace):
+    """Esito reale della traccia: richieste per stato finale e revenue delle CONFIRMED."""
+    status = np.asarray(trace["status"])
+    counts = np.bincount(status, minlength=len(STATUSES))
+    confirmed = status == STATUSES.index("CONFIRMED")
+    return {
+        "requests": int(len(trace)),
+        "statuses": {s: int(counts[i]) for i, s in enumerate(STATUSES)},
+        "revenue": round(float(np.asarray(trace["price"], dtype="float64")[confirmed].sum()), 2),
+    }
+
+
+def synthetic_trace(n, first_day, last_day, salons=3, seed=0):
+    """Richieste casuali (ordinate per `createdAt`) con orari sulla griglia di 15 minuti, per misurare i tempi."""
+    rng = np.random.default_rng(seed)
+    first = int(np.datetime64(first_day, "D").astype("int64"))
+    span = (last_day - first_day).days + 1
+    trace = np.empty(n, dtype=TRACE_DTYPE)
+    trace["day"] = first + rng.integers(0, span, n)
+    lead = rng.exponential(6 * 86400, n).astype("int64")
+    trace["at"] = trace["day"].astype("int64") * 86400 + 8 * 3600 - lead
+    trace["start"] = 9 * 60 + 15 * rng.integers(0, 36, n)
+    trace["duration"] = rng.choice((30, 45, 60, 90), n)
+    trace["salon"] = rng.integers(0, salons, n)
+    trace["status"] = rng.choice(len(STATUSES), n, p=(0.1, 0.65, 0.08, 0.05, 0.12))
+    released = np.isin(trace["status"], [STATUSES.index(s) for s in RELEASED_STATUSES])
+    trace["released"] = np.where(released, trace["at"] + rng.integers(600, 3 * 86400, n), NEVER)
+    trace["price"] = rng.choice((20.0, 25.0, 30.0, 50.0, 60.0), n)
+    return trace[np.argsort(trace["at"], kind="stable")], [f"salone-{i}" for i in range(salons)]
+
+
+def epoch_day(date_str):
+    """Giorni dall'epoch di una data YYYY-MM-DD."""
+    return (date.fromisoformat(date_str) - _EPOCH).days
@@ -0,0 +1,119 @@
+"""
+Regole di disponibilità degli slot, allineate a `app/actions/availability.ts`
+e `app/actions/create-booking.ts`.
+
+Gli orari sono gestiti come minuti dalla mezzanotte: le funzioni accettano
+le stringhe "HH:mm" salvate nei documenti `bookings` e le convertono una volta.
+"""
+from datetime import date as date_cls
+
+DEFAULT_CONFIG = {
+    "openingTime": "09:00",
+    "closingTime": "19:00",
+    "timeStep": 15,
+    "resources": 3,
+    "bufferTime": 10,
+    "closedDaysOfWeek": [],
+    "closedDates": [],
+}
+
+# Solo queste prenotazioni occupano capacità
+ACTIVE_STATUSES = ("PENDING", "CONFIRMED")
+
+SLOT_UNAVAILABLE_ERROR = "Questo slot temporale non è più disponibile. Si prega di selezionare un altro orario."
+
+
+def merge_config(config=None):
+    """Applica i default a una configurazione parziale (come `{ ...defaultConfig, ...config }`)."""
+    merged = dict(DEFAULT_CONFIG)
+    if config:
+        merged.update({k: v for k, v in config.items() if v is not None})
+    merged["timeStep"] = int(merged["timeStep"])
+    merged["resources"] = int(merged["resources"])
+    merged["bufferTime"] = int(merged["bufferTime"])
+    return merged
+
+
+def to_minutes(hhmm):
+    """Converte "HH:mm" in minuti dalla mezzanotte."""
+    hours, minutes = hhmm.split(":")
+    return int(hours) * 60 + int(minutes)
+
+
+def from_minutes(total):
+    """Converte minuti dalla mezzanotte in "HH:mm" (modulo 24h, come date-fns format)."""
+    total %= 24 * 60
+    return f"{total // 60:02d}:{total % 60:02d}"
+
+
+def js_day_of_week(date_str):
+    """Giorno della settimana con la convenzione JS `getDay()` (0 = domenica)."""
+    return (date_cls.fromisoformat(date_str).weekday() + 1) % 7
+
+
+def is_closed(date_str, config):
+    """True se la data è in `closedDates` o cade in un giorno in `closedDaysOfWeek`."""
+    if date_str in (config.get("closedDates") or []):
+        return True
+    return js_day_of_week(date_str) in (config.get("closedDaysOfWeek") or [])
+
+
+def active_intervals(bookings):
+    """Estrae gli intervalli (start, end) in minuti delle prenotazioni PENDING/CONFIRMED."""
+    intervals = []
+    for booking in bookings:
+        if booking.get("status") not in ACTIVE_STATUSES:
+            continue
+        start, end = booking.get("startTime"), booking.get("endTime")
+        if not start or not end:
+            continue
+        intervals.append((to_minutes(start), to_minutes(end)))
+    return intervals
+
+
+def count_conflicts(slot_start, slot_end, intervals, buffer_time):
+    """Numero di prenotazioni che si sovrappongono a [slot_start, slot_end), buffer incluso."""
+    return sum(1 for start, end in intervals if slot_start < end + buffer_time and start < slot_end)
+
+
+def available_slots(date_str, service_duration, config, bookings):
+    """
+    Orari di inizio disponibili per un servizio in una data.
+
+    Stessa logica di `getAvailableSlots`: lo slot occupa `durata + bufferTime`
+    e deve chiudersi entro l'orario di chiusura; è disponibile se i conflitti
+    con le prenotazioni esistenti (buffer incluso) sono meno di `resources`.
+    """
+    if service_duration <= 0 or is_closed(date_str, config):
+        return []
+
+    opening = to_minutes(config["openingTime"])
+    closing = to_minutes(config["closingTime"])
+    step = config["timeStep"]
+    buffer_time = config["bufferTime"]
+    resources = config["resources"]
+    intervals = active_intervals(bookings)
+
+    slots = []
+    current = opening
+    while current <= closing:
+        slot_end = current + service_duration + buffer_time
+        if slot_end > closing:
+            break
+        if count_conflicts(current, slot_end, intervals, buffer_time) < resources:
+            slots.append(from_minutes(current))
+        current += step
+    return slots
+
+
+def can_book(start_time, service_duration, config, bookings):
+    """
+    Controllo finale di `createBooking`: orari di apertura e conflitti
+    (sul solo intervallo del servizio) inferiori a `resources`.
+    """
+    start = to_minutes(start_time)
+    end = start + service_duration
+    if start < to_minutes(config["openingTime"]) or end > to_minutes(config["closingTime"]):
+        return False
+    intervals = active_intervals(bookings)
+    return count_conflicts(start, end, intervals, config["bufferTime"]) < config["resources"]
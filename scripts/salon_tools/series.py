@@ -0,0 +1,283 @@
+"""
+Serie di prenotazioni ricorrenti (stesso servizio e orario ogni N settimane).
+
+- `series_dates`: date delle occorrenze
+- `load_day_bookings`: prenotazioni di tutte le date della serie con una sola query
+- `check_series`: controllo di tutte le occorrenze in un unico passaggio
+  vettoriale (NumPy), con le regole di `getAvailableSlots`: data non passata, giorno aperto, slot
+  sulla griglia `timeStep`, `durata + bufferTime` entro la chiusura e conflitti
+  (buffer incluso) inferiori a `resources`. Per le occorrenze rifiutate propone
+  gli orari disponibili più vicini dello stesso giorno
+- `commit_series`: scrive le occorrenze accettate, i contatori `slotOccupancy`
+  e il documento `bookingSeries/{id}` in un'unica transaction: o tutte o nessuna
+"""
+from datetime import date, datetime, timedelta, timezone
+
+import numpy as np
+
+from salon_tools.booking_time import js_iso, time_fields
+from salon_tools.occupancy import (
+    SLOT_OCCUPANCY_COLLECTION,
+    apply_booking,
+    build_doc,
+    max_occupancy,
+    occupancy_doc_id,
+)
+from salon_tools.rules import ACTIVE_STATUSES, from_minutes, is_closed, to_minutes
+
+SERIES_COLLECTION = "bookingSeries"
+
+# Limite dell'operatore "in" di Firestore
+IN_QUERY_LIMIT = 30
+
+# Ogni occorrenza scrive prenotazione + contatore del giorno; serve margine per il documento della serie
+MAX_OCCURRENCES = 200
+
+
+class SeriesConflictError(Exception):
+    """Un'occorrenza è stata occupata tra il controllo e la transaction: nessuna scrittura."""
+
+
+def series_dates(start_date, every_weeks, occurrences):
+    first = date.fromisoformat(start_date)
+    return [(first + timedelta(weeks=every_weeks * i)).isoformat() for i in range(occurrences)]
+
+
+def load_day_bookings(db, dates):
+    """
+    Prenotazioni delle date indicate con una sola query: `in` sulle date se sono
+    al massimo 30, altrimenti intervallo dalla prima all'ultima, filtrato in memoria.
+    """
+    wanted = set(dates)
+    if len(wanted) <= IN_QUERY_LIMIT:
+        query = db.collection("bookings").where("date", "in", sorted(wanted))
+    else:
+        query = db.collection("bookings").where("date", ">=", min(wanted)).where("date", "<=", max(wanted))
+    return [data for data in (doc.to_dict() for doc in query.stream()) if data and data.get("date") in wanted]
+
+
+def _booking_arrays(dates, bookings):
+    """Indice della data, inizio e fine (minuti) delle prenotazioni attive, ordinate per data."""
+    index = {day: i for i, day in enumerate(dates)}
+    rows = []
+    for booking in bookings:
+        if booking.get("status") not in ACTIVE_STATUSES or booking.get("date") not in index:
+            continue
+        fields = time_fields(booking)
+        if fields is None:
+            continue
+        start = booking.get("startMin", fields["startMin"])
+        end = booking.get("endMin", fields["endMin"])
+        rows.append((index[booking["date"]], start, end))
+    if not rows:
+        empty = np.empty(0, dtype=np.int32)
+        return empty, empty, empty
+    arr = np.array(sorted(rows), dtype=np.int32)
+    return arr[:, 0], arr[:, 1], arr[:, 2]
+
+
+def _suggest(start_min, duration, config, b_start, b_end, limit):
+    """Orari disponibili del giorno più vicini a `start_min` (a parità di distanza, il più presto)."""
+    opening = to_minutes(config["openingTime"])
+    closing = to_minutes(config["closingTime"])
+    buffer_time = config["bufferTime"]
+    grid = np.arange(opening, closing - duration - buffer_time + 1, config["timeStep"], dtype=np.int32)
+    if not grid.size:
+        return []
+    grid_end = grid + duration + buffer_time
+    conflicts = ((grid[:, None] < b_end[None, :] + buffer_time) & (b_start[None, :] < grid_end[:, None])).sum(axis=1)
+    free = grid[conflicts < config["resources"]]
+    free = free[free != start_min]
+    order = np.lexsort((free, np.abs(free - start_min)))
+    return [from_minutes(int(m)) for m in free[order[:limit]]]
+
+
+def check_series(dates, start_time, duration, config, bookings, suggestions=3, today=None):
+    """
+    Esito di ogni occorrenza: {"date", "startTime", "endTime", "ok", "reason",
+    "conflicts", "suggestions"}. `reason` è "past" (prima di `today`, default
+    oggi), "closed", "outside-hours", "off-grid" o "full".
+    """
+    today = (today or date.today()).isoformat()
+    start = to_minutes(start_time)
+    end = start + duration
+    opening = to_minutes(config["openingTime"])
+    closing = to_minutes(config["closingTime"])
+    buffer_time = config["bufferTime"]
+    b_day, b_start, b_end = _booking_arrays(dates, bookings)
+
+    # Tutte le occorrenze contro tutte le prenotazioni caricate: stesso orario, date diverse
+    occ_day = np.arange(len(dates), dtype=np.int32)
+    overlap = (
+        (occ_day[:, None] == b_day[None, :])
+        & (start < b_end[None, :] + buffer_time)
+        & (b_start[None, :] < end + buffer_time)
+    )
+    conflicts = overlap.sum(axis=1)
+
+    if start < opening or end + buffer_time > closing:
+        shared_reason = "outside-hours"
+    elif (start - opening) % config["timeStep"]:
+        shared_reason = "off-grid"
+    else:
+        shared_reason = None
+
+    # Confini delle prenotazioni di ciascun giorno nell'array ordinato per data
+    bounds = np.searchsorted(b_day, np.arange(len(dates) + 1))
+    results = []
+    for i, day in enumerate(dates):
+        if day < today:
+            reason = "past"
+        elif is_closed(day, config):
+            reason = "closed"
+        elif shared_reason:
+            reason = shared_reason
+        elif conflicts[i] >= config["resources"]:
+            reason = "full"
+        else:
+            reason = None
+        proposed = []
+        if reason and reason not in ("past", "closed") and suggestions:
+            lo, hi = bounds[i], bounds[i + 1]
+            proposed = _suggest(start, duration, config, b_start[lo:hi], b_end[lo:hi], suggestions)
+        results.append({
+            "date": day,
+            "startTime": from_minutes(start),
+            "endTime": from_minutes(end),
+            "ok": reason is None,
+            "reason": reason,
+            "conflicts": int(conflicts[i]),
+            "suggestions": proposed,
+        })
+    return results
+
+
+def booking_document(day, start_time, end_time, service_id, service, customer_id, customer, status,
+                     series_id, index, created_at):
+    """Documento come il `bookingData` di `createBooking`, con i riferimenti alla serie."""
+    customer = customer or {}
+    price = float(service.get("price") or 0)
+    data = {
+        "date": day,
+        "startTime": start_time,
+        "endTime": end_time,
+        "status": status,
+        "customerId": customer_id,
+        "serviceId": service_id,
+        "serviceName": service.get("name") or "",
+        "servicePrice": price,
+        "price": price,
+        "customerName": f"{customer.get('firstName') or ''} {customer.get('lastName') or ''}".strip(),
+        "customerEmail": customer.get("email") or "",
+        "createdAt": created_at,
+        "seriesId": series_id,
+        "seriesIndex": index,
+    }
+    data.update(time_fields(data))
+    return data
+
+
+def commit_series(db, series_ref, config, duration, series_data, bookings_data):
+    """
+    Scrive in una transaction le prenotazioni accettate, i contatori dei loro
+    giorni e il documento della serie. I contatori sono riletti nella
+    transaction (come in `createBooking`): se un'occorrenza nel frattempo ha
+    raggiunto `resources` solleva `SeriesConflictError` e non scrive nulla.
+    """
+    from firebase_admin import firestore
+
+    booking_refs = [db.collection("bookings").document() for _ in bookings_data]
+    occupancy_refs = [
+        db.collection(SLOT_OCCUPANCY_COLLECTION).document(occupancy_doc_id(None, data["date"]))
+        for data in bookings_data
+    ]
+
+    @firestore.transactional
+    def write(transaction):
+        # Prima tutte le letture: in una transaction non si legge dopo aver scritto
+        snaps = {snap.id: snap for snap in transaction.get_all(occupancy_refs)}
+        docs = []
+        for ref, data in zip(occupancy_refs, bookings_data):
+            snap = snaps.get(ref.id)
+            doc = snap.to_dict() if snap is not None and snap.exists else None
+            if (
+                not doc
+                or doc.get("bucketMinutes") != config["timeStep"]
+                or doc.get("bufferTime") != config["bufferTime"]
+            ):
+                query = db.collection("bookings").where("date", "==", data["date"])
+                day = [d.to_dict() for d in transaction.get(query)]
+                doc = build_doc(None, data["date"], day, config["timeStep"], config["bufferTime"])
+            start = to_minutes(data["startTime"])
+            if max_occupancy(doc, start, start + duration) >= config["resources"]:
+                raise SeriesConflictError(f"{data['date']} {data['startTime']} non più disponibile")
+            docs.append(doc)
+
+        now = datetime.now(timezone.utc).isoformat()
+        for ref, doc, data in zip(occupancy_refs, docs, bookings_data):
+            apply_booking(doc["counts"], data, doc["bucketMinutes"], doc["bufferTime"], 1)
+            transaction.set(ref, {**doc, "updatedAt": now})
+        for ref, data in zip(booking_refs, bookings_data):
+            transaction.create(ref, data)
+        ids = [ref.id for ref in booking_refs]
+        transaction.set(series_ref, {**series_data, "bookingIds": ids})
+        return ids
+
+    return write(db.transaction())
+
+
+def create_series(db, customer_id, service_id, start_date, start_time, every_weeks, occurrences,
+                  status="PENDING", suggestions=3, all_or_nothing=False, dry_run=False):
+    """
+    Crea una serie: carica servizio, cliente, configurazione e prenotazioni delle
+    date coinvolte, controlla le occorrenze e scrive quelle accettate.
+    Restituisce {"seriesId", "bookingIds", "occurrences", "written"}.
+    """
+    from salon_tools.queries import load_settings_config
+
+    if not 1 <= occurrences <= MAX_OCCURRENCES:
+        raise ValueError(f"Numero di occorrenze non valido (1-{MAX_OCCURRENCES})")
+    if every_weeks < 1:
+        raise ValueError("L'intervallo deve essere di almeno una settimana")
+    if start_date < date.today().isoformat():
+        raise ValueError("La data di inizio non può essere nel passato")
+
+    service_snap = db.collection("services").document(service_id).get()
+    service = service_snap.to_dict() if service_snap.exists else None
+    if not service or not service.get("active"):
+        raise ValueError("Il servizio selezionato non è disponibile.")
+    duration = int(service.get("duration") or 0)
+    if duration <= 0:
+        raise ValueError("Durata servizio non valida.")
+    customer_snap = db.collection("customers").document(customer_id).get()
+    customer = customer_snap.to_dict() if customer_snap.exists else None
+
+    config = load_settings_config(db)
+    dates = series_dates(start_date, every_weeks, occurrences)
+    results = check_series(dates, start_time, duration, config, load_day_bookings(db, dates), suggestions)
+    accepted = [r for r in results if r["ok"]]
+    outcome = {"seriesId": None, "bookingIds": [], "occurrences": results, "written": False}
+    if dry_run or not accepted or (all_or_nothing and len(accepted) < len(results)):
+        return outcome
+
+    created_at = js_iso(datetime.now(timezone.utc))
+    series_ref = db.collection(SERIES_COLLECTION).document()
+    bookings_data = [
+        booking_document(r["date"], r["startTime"], r["endTime"], service_id, service, customer_id, customer,
+                         status, series_ref.id, i, created_at)
+        for i, r in enumerate(results) if r["ok"]
+    ]
+    series_data = {
+        "customerId": customer_id,
+        "serviceId": service_id,
+        "startDate": start_date,
+        "startTime": start_time,
+        "everyWeeks": every_weeks,
+        "occurrences": occurrences,
+        "skippedDates": [r["date"] for r in results if not r["ok"]],
+        "status": status,
+        "createdAt": created_at,
+    }
+    booking_ids = commit_series(db, series_ref, config, duration, series_data, bookings_data)
+    outcome.update(seriesId=series_ref.id, bookingIds=booking_ids, written=True)
+    return outcome
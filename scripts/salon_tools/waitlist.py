@@ -0,0 +1,193 @@
+"""
+Lista d'attesa (collezione `waitlist`) e abbinamento degli slot liberati.
+
+Una richiesta in attesa indica salone, servizio (con la durata denormalizzata),
+un intervallo di date e una `timePreference` del cliente. Quando una
+prenotazione diventa CANCELLED o REJECTED la sua capacità torna libera:
+`WaitlistIndex` trova la richiesta migliore con una ricerca in memoria per
+(salone, data, fascia oraria) e durata, senza query.
+
+Ordine di priorità: prima chi non ha lasciato scadere proposte precedenti
+(`missedProposals`), poi la richiesta più vecchia (`createdAt`).
+"""
+import heapq
+from bisect import bisect_right, insort
+from collections import defaultdict
+from datetime import date, timedelta
+
+from salon_tools.occupancy import DEFAULT_SALON_KEY
+from salon_tools.rules import ACTIVE_STATUSES, count_conflicts, from_minutes, is_closed, to_minutes
+
+WAITLIST_COLLECTION = "waitlist"
+WAITLIST_META_COLLECTION = "waitlistMeta"
+WAITLIST_META_DOC = "matcher"
+
+# Prenotazioni che liberano capacità
+FREEING_STATUSES = ("CANCELLED", "REJECTED")
+
+PREFERENCE_ANY = "Flessibile"
+PREFERENCE_WEEKEND = "Weekend"
+
+
+def time_preference(start_min):
+    """Fascia oraria (`TimePreference`) di un orario di inizio."""
+    if start_min < 13 * 60:
+        return "Mattina"
+    if start_min < 17 * 60:
+        return "Pomeriggio"
+    return "Sera"
+
+
+def is_weekend(date_str):
+    return date.fromisoformat(date_str).weekday() >= 5
+
+
+class WaitlistIndex:
+    """
+    Richieste in attesa indicizzate per (salonId, data, preferenza) -> durata ->
+    heap di (missedProposals, createdAt, id). Una richiesta compare in ogni giorno
+    del suo intervallo; le rimozioni sono pigre (le voci non più valide vengono
+    scartate quando arrivano in cima allo heap).
+    """
+
+    def __init__(self, today=None):
+        self.today = today or date.today().isoformat()
+        self.entries = {}
+        self._priority = {}
+        self._heaps = defaultdict(dict)
+        self._durations = defaultdict(list)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def add(self, entry_id, entry):
+        """Aggiunge (o sostituisce) una richiesta WAITING; ignora quelle scadute o incomplete."""
+        self.remove(entry_id)
+        duration = int(entry.get("serviceDuration") or 0)
+        first = max(entry.get("dateFrom") or "", self.today)
+        last = entry.get("dateTo") or ""
+        if duration <= 0 or not first or first > last:
+            return False
+        salon = entry.get("salonId") or DEFAULT_SALON_KEY
+        preference = entry.get("timePreference") or PREFERENCE_ANY
+        priority = (int(entry.get("missedProposals") or 0), entry.get("createdAt") or "", entry_id)
+        self.entries[entry_id] = entry
+        self._priority[entry_id] = priority
+        current, end = date.fromisoformat(first), date.fromisoformat(last)
+        while current <= end:
+            key = (salon, current.isoformat(), preference)
+            heap = self._heaps[key].get(duration)
+            if heap is None:
+                heap = self._heaps[key][duration] = []
+                insort(self._durations[key], duration)
+            heapq.heappush(heap, priority)
+            current += timedelta(days=1)
+        return True
+
+    def remove(self, entry_id):
+        self._priority.pop(entry_id, None)
+        return self.entries.pop(entry_id, None)
+
+    def _head(self, heap, exclude):
+        """Prima voce valida dello heap, scartando quelle rimosse o sostituite."""
+        while heap and self._priority.get(heap[0][2]) != heap[0]:
+            heapq.heappop(heap)
+        if not heap or heap[0][2] not in exclude:
+            return heap[0] if heap else None
+        # Raro: la cima è esclusa (ha lasciato scadere proprio questo slot)
+        for priority in sorted(heap):
+            if self._priority.get(priority[2]) == priority and priority[2] not in exclude:
+                return priority
+        return None
+
+    def _lookup_keys(self, salon, date_str, start_min):
+        keys = [(salon, date_str, time_preference(start_min)), (salon, date_str, PREFERENCE_ANY)]
+        if is_weekend(date_str):
+            keys.append((salon, date_str, PREFERENCE_WEEKEND))
+        return keys
+
+    def best(self, salon, date_str, start_min, max_duration, exclude=()):
+        """
+        Richiesta prioritaria che accetta la data e l'orario, con durata del
+        servizio non superiore a `max_duration`: (id, richiesta) o None.
+        """
+        best = None
+        for key in self._lookup_keys(salon or DEFAULT_SALON_KEY, date_str, start_min):
+            durations = self._durations.get(key)
+            if not durations:
+                continue
+            heaps = self._heaps[key]
+            for duration in durations[:bisect_right(durations, max_duration)]:
+                head = self._head(heaps[duration], exclude)
+                if head is not None and (best is None or head < best):
+                    best = head
+        if best is None:
+            return None
+        return best[2], self.entries[best[2]]
+
+
+def day_intervals(bookings):
+    """Intervalli (start, end) in minuti delle prenotazioni attive, dai campi numerici se presenti."""
+    intervals = []
+    for booking in bookings:
+        if booking.get("status") not in ACTIVE_STATUSES or not booking.get("startTime") or not booking.get("endTime"):
+            continue
+        start = booking.get("startMin")
+        end = booking.get("endMin")
+        intervals.append((
+            start if isinstance(start, int) else to_minutes(booking["startTime"]),
+            end if isinstance(end, int) else to_minutes(booking["endTime"]),
+        ))
+    return intervals
+
+
+def slot_available(date_str, start_min, duration, config, intervals):
+    """Stessa regola di `getAvailableSlots` per un singolo orario di inizio."""
+    opening = to_minutes(config["openingTime"])
+    closing = to_minutes(config["closingTime"])
+    buffer_time = config["bufferTime"]
+    if is_closed(date_str, config) or start_min < opening or (start_min - opening) % config["timeStep"]:
+        return False
+    end = start_min + duration + buffer_time
+    if end > closing:
+        return False
+    return count_conflicts(start_min, end, intervals, buffer_time) < config["resources"]
+
+
+def match_freed(index, freed, day_bookings, config, excluded=None):
+    """
+    Abbina le prenotazioni liberate (id, dati) alle richieste in attesa.
+
+    Ogni prenotazione liberata libera una risorsa: viene proposta a una sola
+    richiesta, se lo slot risulta davvero disponibile per la sua durata. Le
+    proposte sono aggiunte agli intervalli del giorno, così due slot liberati
+    nello stesso giorno non vengono contati due volte.
+    Restituisce (proposte [(entry_id, richiesta, AlternativeSlot, booking_id)], esiti per booking).
+    """
+    intervals = {day: day_intervals(bookings) for day, bookings in day_bookings.items()}
+    excluded = excluded or {}
+    proposals = []
+    outcomes = {}
+    for booking_id, booking in freed:
+        day = booking.get("date")
+        if not day or day < index.today or not booking.get("startTime") or not booking.get("endTime"):
+            outcomes[booking_id] = "skipped"
+            continue
+        start = booking.get("startMin") if isinstance(booking.get("startMin"), int) else to_minutes(booking["startTime"])
+        end = booking.get("endMin") if isinstance(booking.get("endMin"), int) else to_minutes(booking["endTime"])
+        found = index.best(booking.get("salonId"), day, start, end - start, excluded.get(booking_id, ()))
+        if found is None:
+            outcomes[booking_id] = "no-match"
+            continue
+        entry_id, entry = found
+        duration = int(entry["serviceDuration"])
+        day_list = intervals.setdefault(day, [])
+        if not slot_available(day, start, duration, config, day_list):
+            outcomes[booking_id] = "taken"
+            continue
+        index.remove(entry_id)
+        day_list.append((start, start + duration))
+        slot = {"date": day, "startTime": from_minutes(start), "endTime": from_minutes(start + duration)}
+        proposals.append((entry_id, entry, slot, booking_id))
+        outcomes[booking_id] = "proposed"
+    return proposals, outcomes
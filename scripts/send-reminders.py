@@ -0,0 +1,426 @@
+"""
+Invio dei promemoria per le prenotazioni CONFIRMED di domani.
+
+Equivalente schedulabile (cron) di `sendBookingReminderEmail` in
+`app/actions/email.ts`:
+
+1. una sola query per intervallo sulle prenotazioni CONFIRMED (indice status/date/startTime)
+2. lettura in blocco dei clienti (`get_all`) e dei log già presenti
+3. "prenotazione" dei promemoria: un documento `emailLogs/booking-reminder_{bookingId}`
+   con status "pending", creato in batch con precondizione (create o update
+   sull'ultima versione letta), così due esecuzioni parallele non inviano due volte
+4. invio asincrono (aiohttp, connessioni riusate) con concorrenza limitata e
+   token bucket sul numero di richieste al secondo
+5. esito scritto sugli stessi documenti con commit a blocchi
+
+È idempotente: le prenotazioni con un promemoria già inviato (anche da log
+scritti dall'app, con ID casuale) vengono saltate; quelle con invio fallito o
+con una "pending" scaduta vengono ritentate.
+
+Uso:
+    python scripts/send-reminders.py                       # domani, Europe/Rome
+    python scripts/send-reminders.py --date 2025-03-04 --dry-run
+    python scripts/send-reminders.py --mock-resend --mock-fail-rate 0.05 --rate 20
+
+Con --mock-resend le email vanno a un server HTTP locale che simula Resend
+(latenza, errori 5xx, limite di richieste con 429) e alla fine riporta
+richieste ricevute, duplicati e picco di richieste al secondo.
+
+Requisiti:
+- pip install firebase-admin python-dotenv aiohttp
+- RESEND_API_KEY e (opzionale) EMAIL_FROM in .env.local
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+from collections import Counter, deque
+from datetime import date, datetime, timedelta, timezone
+
+from salon_tools.emails import (
+    DEFAULT_FROM,
+    EMAIL_LOGS_COLLECTION,
+    REMINDER_TEMPLATE,
+    RESEND_API_URL,
+    ResendClient,
+    TokenBucket,
+    render_reminder,
+)
+from salon_tools.firebase import get_db, load_env
+from salon_tools.queries import BATCH_LIMIT, commit_in_batches
+
+# Limite di valori per un filtro "in" di Firestore
+IN_FILTER_LIMIT = 30
+
+
+def reminder_log_id(booking_id):
+    return f"{REMINDER_TEMPLATE}_{booking_id}"
+
+
+def now_iso():
+    return datetime.now(timezone.utc).isoformat()
+
+
+# ==================== SELEZIONE ====================
+
+def select_bookings(db, start_date, end_date):
+    query = (
+        db.collection("bookings")
+        .where("status", "==", "CONFIRMED")
+        .where("date", ">=", start_date)
+        .where("date", "<=", end_date)
+    )
+    bookings = []
+    for doc in query.stream():
+        data = doc.to_dict()
+        if data:
+            bookings.append((doc.id, data))
+    return bookings
+
+
+def load_customers(db, bookings):
+    ids = {b.get("customerId") or b.get("userId") for _, b in bookings}
+    refs = [db.collection("customers").document(i) for i in ids if i]
+    return {snap.id: snap.to_dict() for snap in db.get_all(refs) if snap.exists} if refs else {}
+
+
+def load_existing_logs(db, booking_ids):
+    """
+    Log dei promemoria già presenti: i documenti con ID deterministico scritti da
+    questo script e i log "sent" con ID casuale scritti da `logEmail` nell'app.
+    """
+    logs = db.collection(EMAIL_LOGS_COLLECTION)
+    refs = [logs.document(reminder_log_id(i)) for i in booking_ids]
+    prefix = reminder_log_id("")
+    own = {snap.id[len(prefix):]: snap for snap in db.get_all(refs) if snap.exists} if refs else {}
+
+    sent_by_app = set()
+    ids = list(booking_ids)
+    for offset in range(0, len(ids), IN_FILTER_LIMIT):
+        query = (
+            logs.where("template", "==", REMINDER_TEMPLATE)
+            .where("status", "==", "sent")
+            .where("bookingId", "in", ids[offset:offset + IN_FILTER_LIMIT])
+        )
+        sent_by_app.update(doc.get("bookingId") for doc in query.stream())
+    return own, sent_by_app
+
+
+def plan_jobs(bookings, customers, own_logs, sent_by_app, stale_minutes):
+    """Separa le prenotazioni da inviare da quelle da saltare (con il motivo)."""
+    jobs, skipped = [], Counter()
+    stale_before = (datetime.now(timezone.utc) - timedelta(minutes=stale_minutes)).isoformat()
+    for booking_id, booking in bookings:
+        snap = own_logs.get(booking_id)
+        log = (snap.to_dict() or {}) if snap else {}
+        if booking_id in sent_by_app or log.get("status") == "sent":
+            skipped["già inviato"] += 1
+            continue
+        if log.get("status") == "pending" and (log.get("claimedAt") or "") > stale_before:
+            skipped["in corso (altra esecuzione)"] += 1
+            continue
+
+        customer_id = booking.get("customerId") or booking.get("userId")
+        customer = customers.get(customer_id) or {}
+        to = customer.get("email") or booking.get("customerEmail")
+        if not to:
+            skipped["email mancante"] += 1
+            continue
+        first_name = customer.get("firstName") or (booking.get("customerName") or "").split(" ")[0]
+        subject, html_body = render_reminder(booking, first_name)
+        jobs.append({
+            "bookingId": booking_id,
+            "customerId": customer_id,
+            "to": to,
+            "subject": subject,
+            "html": html_body,
+            "previous": snap,
+        })
+    return jobs, skipped
+
+
+# ==================== CLAIM ====================
+
+def _claim_write(db, batch, job, claimed_at):
+    ref = db.collection(EMAIL_LOGS_COLLECTION).document(reminder_log_id(job["bookingId"]))
+    data = {
+        "to": job["to"],
+        "subject": job["subject"],
+        "template": REMINDER_TEMPLATE,
+        "bookingId": job["bookingId"],
+        "customerId": job["customerId"],
+        "status": "pending",
+        "claimedAt": claimed_at,
+        "sentAt": claimed_at,
+    }
+    previous = job["previous"]
+    if previous is None:
+        batch.create(ref, data)
+    else:
+        # Solo se nessun altro ha modificato il log dopo la nostra lettura
+        batch.update(ref, data, option=db.write_option(last_update_time=previous.update_time))
+
+
+def claim_jobs(db, jobs):
+    """
+    Crea/aggiorna i log "pending" in batch atomici. Se un batch fallisce per una
+    precondizione (log creato o modificato da un'altra esecuzione) i suoi
+    documenti vengono ritentati uno per uno e quelli in conflitto scartati.
+    """
+    from google.api_core import exceptions
+
+    claimed_at = now_iso()
+    claimed = []
+    for offset in range(0, len(jobs), BATCH_LIMIT):
+        chunk = jobs[offset:offset + BATCH_LIMIT]
+        batch = db.batch()
+        for job in chunk:
+            _claim_write(db, batch, job, claimed_at)
+        try:
+            batch.commit()
+            claimed.extend(chunk)
+            continue
+        except (exceptions.AlreadyExists, exceptions.FailedPrecondition, exceptions.Conflict):
+            pass
+        for job in chunk:
+            single = db.batch()
+            _claim_write(db, single, job, claimed_at)
+            try:
+                single.commit()
+                claimed.append(job)
+            except (exceptions.AlreadyExists, exceptions.FailedPrecondition, exceptions.Conflict):
+                continue
+    return claimed
+
+
+# ==================== INVIO ====================
+
+class ResultWriter:
+    """Accumula gli esiti e li scrive in commit da `flush_every` documenti, fuori dall'event loop."""
+
+    def __init__(self, db, flush_every=100):
+        self.db = db
+        self.flush_every = flush_every
+        self.pending = []
+        self.written = 0
+
+    async def add(self, job, result):
+        data = {
+            "status": "sent" if result["success"] else "failed",
+            "sentAt": now_iso(),
+            "attempts": result["attempts"],
+        }
+        if result.get("messageId"):
+            data["messageId"] = result["messageId"]
+        if result.get("error"):
+            data["error"] = str(result["error"])
+        ref = self.db.collection(EMAIL_LOGS_COLLECTION).document(reminder_log_id(job["bookingId"]))
+        self.pending.append(("update", ref, data))
+        if len(self.pending) >= self.flush_every:
+            await self.flush()
+
+    async def flush(self):
+        operations, self.pending = self.pending, []
+        if operations:
+            self.written += await asyncio.to_thread(commit_in_batches, self.db, operations)
+
+
+async def dispatch(jobs, client, writer, concurrency, sender):
+    queue = asyncio.Queue()
+    for job in jobs:
+        queue.put_nowait(job)
+    outcomes = Counter()
+    latencies = []
+
+    async def worker():
+        while True:
+            try:
+                job = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            started = time.perf_counter()
+            result = await client.send(
+                job["to"], job["subject"], job["html"], sender=sender,
+                idempotency_key=f"{REMINDER_TEMPLATE}/{job['bookingId']}",
+            )
+            latencies.append(time.perf_counter() - started)
+            outcomes["inviati" if result["success"] else "falliti"] += 1
+            if result["attempts"] > 1:
+                outcomes["ritentativi"] += result["attempts"] - 1
+            await writer.add(job, result)
+
+    await asyncio.gather(*(worker() for _ in range(min(concurrency, len(jobs)) or 1)))
+    await writer.flush()
+    return outcomes, latencies
+
+
+# ==================== MOCK RESEND ====================
+
+class MockResend:
+    """
+    Server HTTP locale con l'interfaccia di POST /emails: latenza casuale, errori
+    5xx con probabilità `fail_rate` e 429 oltre `limit` richieste al secondo.
+    """
+
+    def __init__(self, latency_ms=80, fail_rate=0.0, limit=None):
+        self.latency_ms = latency_ms
+        self.fail_rate = fail_rate
+        self.limit = limit
+        self.stats = Counter()
+        self.keys = Counter()
+        self.recent = deque()
+        self.peak_rps = 0
+        self.runner = None
+        self.url = None
+
+    async def handle(self, request):
+        from aiohttp import web
+
+        now = time.monotonic()
+        self.recent.append(now)
+        while self.recent and self.recent[0] <= now - 1:
+            self.recent.popleft()
+        self.peak_rps = max(self.peak_rps, len(self.recent))
+        self.stats["richieste"] += 1
+
+        if self.limit and len(self.recent) > self.limit:
+            self.stats["429"] += 1
+            return web.json_response({"message": "Too many requests"}, status=429, headers={"Retry-After": "1"})
+        await asyncio.sleep(random.uniform(0.5, 1.5) * self.latency_ms / 1000)
+        if random.random() < self.fail_rate:
+            self.stats["5xx"] += 1
+            return web.json_response({"message": "Internal server error"}, status=500)
+
+        body = await request.json()
+        if not body.get("to") or not request.headers.get("Authorization", "").startswith("Bearer "):
+            return web.json_response({"message": "Invalid request"}, status=422)
+        key = request.headers.get("Idempotency-Key")
+        if key:
+            self.keys[key] += 1
+        self.stats["accettate"] += 1
+        return web.json_response({"id": f"mock-{self.stats['accettate']}"})
+
+    async def start(self):
+        from aiohttp import web
+
+        app = web.Application()
+        app.router.add_post("/emails", self.handle)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.url = f"http://127.0.0.1:{port}/emails"
+        return self.url
+
+    async def stop(self):
+        if self.runner:
+            await self.runner.cleanup()
+
+    def report(self):
+        duplicates = sum(n - 1 for n in self.keys.values() if n > 1)
+        return {**self.stats, "chiaviDuplicate": duplicates, "piccoRichiesteAlSecondo": self.peak_rps}
+
+
+# ==================== MAIN ====================
+
+def target_dates(args):
+    if args.date:
+        start = date.fromisoformat(args.date)
+    else:
+        from zoneinfo import ZoneInfo
+
+        start = datetime.now(ZoneInfo(args.tz)).date() + timedelta(days=1)
+    return start.isoformat(), (start + timedelta(days=args.days - 1)).isoformat()
+
+
+async def run(args, db, jobs):
+    import aiohttp
+
+    mock = None
+    url = args.resend_url
+    api_key = os.getenv("RESEND_API_KEY")
+    if args.mock_resend:
+        mock = MockResend(args.mock_latency_ms, args.mock_fail_rate, args.mock_limit)
+        url = await mock.start()
+        api_key = api_key or "re_mock"
+        print(f"Mock Resend su {url}")
+
+    connector = aiohttp.TCPConnector(limit=args.concurrency, keepalive_timeout=30)
+    started = time.perf_counter()
+    try:
+        async with aiohttp.ClientSession(connector=connector) as session:
+            client = ResendClient(session, api_key, url, TokenBucket(args.rate, args.burst), args.max_retries)
+            writer = ResultWriter(db)
+            outcomes, latencies = await dispatch(jobs, client, writer, args.concurrency, args.sender)
+    finally:
+        if mock:
+            await mock.stop()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    p95 = latencies[int(len(latencies) * 0.95) - 1] if latencies else 0
+    print(f"\nEsito: {dict(outcomes)} in {elapsed:.1f}s ({len(jobs) / elapsed if elapsed else 0:.1f} email/s)")
+    print(f"Latenza per email (ritentativi inclusi): p95 {p95 * 1000:.0f} ms")
+    print(f"Log aggiornati: {writer.written}")
+    if mock:
+        print(f"Mock Resend: {mock.report()}")
+    return outcomes
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Promemoria email per le prenotazioni CONFIRMED di domani")
+    parser.add_argument("--date", help="Data degli appuntamenti YYYY-MM-DD (default: domani)")
+    parser.add_argument("--days", type=int, default=1, help="Giorni a partire da --date")
+    parser.add_argument("--tz", default="Europe/Rome", help="Fuso orario per calcolare 'domani'")
+    parser.add_argument("--concurrency", type=int, default=10, help="Invii contemporanei")
+    parser.add_argument("--rate", type=float, default=2, help="Richieste al secondo verso Resend (token bucket)")
+    parser.add_argument("--burst", type=int, help="Raffica massima del token bucket (default: --rate)")
+    parser.add_argument("--max-retries", type=int, default=4, help="Ritentativi su 429/5xx/errori di rete")
+    parser.add_argument("--stale-minutes", type=int, default=30,
+                        help="Dopo quanti minuti un log 'pending' di un'altra esecuzione si considera abbandonato")
+    parser.add_argument("--sender", default=None, help="Mittente (default: EMAIL_FROM)")
+    parser.add_argument("--resend-url", default=RESEND_API_URL)
+    parser.add_argument("--dry-run", action="store_true", help="Mostra cosa verrebbe inviato, senza scrivere né inviare")
+    parser.add_argument("--mock-resend", action="store_true", help="Invia a un server Resend simulato in locale")
+    parser.add_argument("--mock-latency-ms", type=float, default=80)
+    parser.add_argument("--mock-fail-rate", type=float, default=0.0)
+    parser.add_argument("--mock-limit", type=int, help="Richieste al secondo oltre le quali il mock risponde 429")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    load_env()
+    args.sender = args.sender or os.getenv("EMAIL_FROM") or DEFAULT_FROM
+    if not args.dry_run and not args.mock_resend and not os.getenv("RESEND_API_KEY"):
+        print("[ERR] RESEND_API_KEY non impostata (usare --dry-run o --mock-resend)")
+        sys.exit(1)
+
+    db = get_db()
+    start_date, end_date = target_dates(args)
+    bookings = select_bookings(db, start_date, end_date)
+    customers = load_customers(db, bookings)
+    own_logs, sent_by_app = load_existing_logs(db, [booking_id for booking_id, _ in bookings])
+    jobs, skipped = plan_jobs(bookings, customers, own_logs, sent_by_app, args.stale_minutes)
+
+    print(f"Prenotazioni CONFIRMED {start_date} -> {end_date}: {len(bookings)}")
+    print(f"Da inviare: {len(jobs)}, saltate: {dict(skipped) or 0}")
+    if args.dry_run:
+        for job in jobs[:20]:
+            print(f"  - {job['bookingId']}: {job['to']} | {job['subject']}")
+        return
+    if not jobs:
+        return
+
+    claimed = claim_jobs(db, jobs)
+    if len(claimed) < len(jobs):
+        print(f"[WARN] {len(jobs) - len(claimed)} promemoria già presi in carico da un'altra esecuzione")
+    outcomes = asyncio.run(run(args, db, claimed))
+    sys.exit(1 if outcomes.get("falliti") else 0)
+
+
+if __name__ == "__main__":
+    main()
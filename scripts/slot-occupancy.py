@@ -0,0 +1,306 @@
+"""
+Migrazione e verifica dei contatori di occupazione degli slot (`slotOccupancy`).
+
+I contatori (vedi `lib/slot-occupancy.ts`) permettono a `createBooking` e
+`getAvailableSlots` di controllare la capacità leggendo un solo documento per
+giorno, dentro una transaction. Questo script:
+
+- migrate: costruisce i documenti mancanti dalle prenotazioni esistenti, in
+           parallelo per blocchi di date. Usa `create()`: un documento già
+           scritto dall'app (anche tra la lettura e la scrittura) non viene
+           toccato; quelli con una configurazione diversa li ricostruisce
+           l'app, il drift lo corregge `verify --repair`
+- verify:  ricalcola i contatori dalle prenotazioni e segnala le differenze
+           (drift); con --interval resta in esecuzione e ripete il controllo,
+           con --repair riscrive i documenti errati in una transaction
+
+L'app usa un solo documento per data (`default_{date}`, tutte le prenotazioni
+del giorno). I documenti `{salonId}_{date}` di versioni precedenti non sono
+aggiornati da nessuno: `verify` li segnala come "per-salon" e `--repair` li
+cancella.
+
+Uso:
+    python scripts/slot-occupancy.py migrate --from 2024-01-01 --to 2026-12-31 --workers 8
+    python scripts/slot-occupancy.py verify --days 30 --interval 300
+    python scripts/slot-occupancy.py verify --from 2025-01-01 --to 2025-12-31 --repair --json
+
+Requisiti:
+- pip install firebase-admin python-dotenv
+"""
+import argparse
+import json
+import sys
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta, timezone
+
+from salon_tools.firebase import get_db
+from salon_tools.occupancy import (
+    DEFAULT_SALON_KEY,
+    SLOT_OCCUPANCY_COLLECTION,
+    build_doc,
+    diff_counts,
+    occupancy_doc_id,
+)
+from salon_tools.queries import BATCH_LIMIT, iter_bookings, load_settings_config, split_date_range
+from salon_tools.rules import ACTIVE_STATUSES
+
+
+def group_bookings(db, start_date, end_date):
+    """Prenotazioni del blocco raggruppate per chiave contatore (salone "default", date)."""
+    groups = defaultdict(list)
+    for _, booking in iter_bookings(db, start_date, end_date):
+        booking_date = booking.get("date")
+        if not booking_date:
+            continue
+        # Il documento "default" copre tutte le prenotazioni della data, come in createBooking
+        groups[(DEFAULT_SALON_KEY, booking_date)].append(booking)
+    return groups
+
+
+def load_occupancy_docs(db, start_date, end_date):
+    query = (
+        db.collection(SLOT_OCCUPANCY_COLLECTION)
+        .where("date", ">=", start_date)
+        .where("date", "<=", end_date)
+    )
+    return {doc.id: doc.to_dict() for doc in query.stream()}
+
+
+# ==================== MIGRATE ====================
+
+def create_missing(db, docs):
+    """
+    Crea i documenti (ref, dati) in batch con `create()`. Se un batch fallisce
+    perché un documento esiste già, i suoi documenti vengono ritentati uno per
+    uno e quelli esistenti saltati. Restituisce il numero di documenti creati.
+    """
+    from google.api_core import exceptions
+
+    created = 0
+    for offset in range(0, len(docs), BATCH_LIMIT):
+        chunk = docs[offset:offset + BATCH_LIMIT]
+        batch = db.batch()
+        for ref, doc in chunk:
+            batch.create(ref, doc)
+        try:
+            batch.commit()
+            created += len(chunk)
+            continue
+        except (exceptions.AlreadyExists, exceptions.Conflict):
+            pass
+        for ref, doc in chunk:
+            try:
+                ref.create(doc)
+                created += 1
+            except (exceptions.AlreadyExists, exceptions.Conflict):
+                continue
+    return created
+
+
+def migrate_chunk(db, start_date, end_date, config, dry_run):
+    groups = group_bookings(db, start_date, end_date)
+    docs = []
+    bookings = 0
+    for (salon_key, booking_date), day_bookings in groups.items():
+        bookings += len(day_bookings)
+        doc = build_doc(salon_key, booking_date, day_bookings, config["timeStep"], config["bufferTime"])
+        ref = db.collection(SLOT_OCCUPANCY_COLLECTION).document(occupancy_doc_id(salon_key, booking_date))
+        docs.append((ref, doc))
+    written = 0 if dry_run else create_missing(db, docs)
+    return {"range": (start_date, end_date), "bookings": bookings, "docs": len(docs), "written": written}
+
+
+def run_migrate(args):
+    db = get_db()
+    config = load_settings_config(db)
+    chunks = list(split_date_range(args.start, args.end, args.chunk_days))
+    print(f"Migrazione {args.start} -> {args.end}: {len(chunks)} blocchi, {args.workers} worker")
+    print(f"Bucket: {config['timeStep']} min, bufferTime: {config['bufferTime']} min")
+    if args.dry_run:
+        print("[DRY-RUN] Nessuna scrittura")
+
+    started = time.perf_counter()
+    totals = {"bookings": 0, "docs": 0, "written": 0}
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        futures = [
+            pool.submit(migrate_chunk, db, start, end, config, args.dry_run)
+            for start, end in chunks
+        ]
+        for future in futures:
+            result = future.result()
+            for key in totals:
+                totals[key] += result[key]
+            start, end = result["range"]
+            print(f"  [OK] {start} -> {end}: {result['bookings']} prenotazioni, {result['docs']} documenti")
+
+    elapsed = time.perf_counter() - started
+    skipped = 0 if args.dry_run else totals["docs"] - totals["written"]
+    print(f"\n[OK] {totals['docs']} documenti ({totals['written']} creati, {skipped} già presenti) "
+          f"da {totals['bookings']} prenotazioni in {elapsed:.1f}s")
+
+
+# ==================== VERIFY ====================
+
+def verify_chunk(db, start_date, end_date, config):
+    groups = group_bookings(db, start_date, end_date)
+    stored = load_occupancy_docs(db, start_date, end_date)
+    issues = []
+
+    keys = set(groups)
+    for doc_id, doc in sorted(stored.items()):
+        salon_key = doc.get("salonId", DEFAULT_SALON_KEY)
+        if salon_key == DEFAULT_SALON_KEY:
+            keys.add((salon_key, doc.get("date")))
+        else:
+            # Documenti per salone di versioni precedenti: nessuno li aggiorna più
+            issues.append({"docId": doc_id, "type": "per-salon"})
+
+    for salon_key, booking_date in sorted(keys):
+        doc_id = occupancy_doc_id(salon_key, booking_date)
+        doc = stored.get(doc_id)
+        day_bookings = groups.get((salon_key, booking_date), [])
+        has_active = any(b.get("status") in ACTIVE_STATUSES for b in day_bookings)
+
+        if doc is None:
+            # Documento assente: createBooking lo ricostruisce alla prima prenotazione
+            if has_active:
+                issues.append({"docId": doc_id, "type": "missing"})
+            continue
+
+        if doc.get("bucketMinutes") != config["timeStep"] or doc.get("bufferTime") != config["bufferTime"]:
+            issues.append({
+                "docId": doc_id,
+                "type": "stale-config",
+                "bucketMinutes": doc.get("bucketMinutes"),
+                "bufferTime": doc.get("bufferTime"),
+            })
+            continue
+
+        expected = build_doc(salon_key, booking_date, day_bookings, config["timeStep"], config["bufferTime"])
+        diffs = diff_counts(expected["counts"], doc.get("counts"))
+        if diffs:
+            issues.append({
+                "docId": doc_id,
+                "type": "drift",
+                "buckets": len(diffs),
+                "maxAbsDiff": max(abs(e - a) for _, e, a in diffs),
+                "overCounted": sum(1 for _, e, a in diffs if a > e),
+                "underCounted": sum(1 for _, e, a in diffs if a < e),
+            })
+    return issues
+
+
+def repair_doc(db, doc_id, config):
+    """Ricostruisce un documento dentro una transaction, per non perdere incrementi concorrenti."""
+    from firebase_admin import firestore
+
+    salon_key, booking_date = doc_id.rsplit("_", 1)
+    ref = db.collection(SLOT_OCCUPANCY_COLLECTION).document(doc_id)
+    query = db.collection("bookings").where("date", "==", booking_date)
+
+    @firestore.transactional
+    def rebuild(transaction):
+        transaction.get(ref)
+        bookings = [doc.to_dict() for doc in transaction.get(query)]
+        transaction.set(ref, build_doc(salon_key, booking_date, bookings, config["timeStep"], config["bufferTime"]))
+
+    rebuild(db.transaction())
+
+
+def verify_once(db, args):
+    config = load_settings_config(db)
+    chunks = list(split_date_range(args.start, args.end, args.chunk_days))
+    started = time.perf_counter()
+    issues = []
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        for chunk_issues in pool.map(lambda c: verify_chunk(db, c[0], c[1], config), chunks):
+            issues.extend(chunk_issues)
+
+    repaired = 0
+    if args.repair:
+        for issue in issues:
+            if issue["type"] == "per-salon":
+                db.collection(SLOT_OCCUPANCY_COLLECTION).document(issue["docId"]).delete()
+            else:
+                repair_doc(db, issue["docId"], config)
+            repaired += 1
+
+    counts = defaultdict(int)
+    for issue in issues:
+        counts[issue["type"]] += 1
+    return {
+        "checkedAt": datetime.now(timezone.utc).isoformat(),
+        "range": {"from": args.start, "to": args.end},
+        "elapsedSeconds": round(time.perf_counter() - started, 3),
+        "issues": dict(counts),
+        "repaired": repaired,
+        "details": issues,
+    }
+
+
+def run_verify(args):
+    db = get_db()
+    while True:
+        if args.days:
+            args.start = date.today().isoformat()
+            args.end = (date.today() + timedelta(days=args.days - 1)).isoformat()
+        report = verify_once(db, args)
+
+        if args.json:
+            print(json.dumps(report), flush=True)
+        else:
+            status = "[OK]" if not report["details"] else "[WARN]"
+            print(f"{status} {report['checkedAt']} {args.start} -> {args.end}: "
+                  f"problemi {report['issues'] or 0}, riparati {report['repaired']} "
+                  f"({report['elapsedSeconds']}s)", flush=True)
+            for issue in report["details"][:20]:
+                print(f"    - {issue['docId']}: {issue['type']}")
+
+        if not args.interval:
+            sys.exit(1 if report["details"] and not args.repair else 0)
+        time.sleep(args.interval)
+
+
+# ==================== MAIN ====================
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Contatori di occupazione degli slot (slotOccupancy)")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    def add_range(p):
+        p.add_argument("--from", dest="start", help="Data iniziale YYYY-MM-DD")
+        p.add_argument("--to", dest="end", help="Data finale YYYY-MM-DD")
+        p.add_argument("--workers", type=int, default=8, help="Blocchi di date elaborati in parallelo")
+        p.add_argument("--chunk-days", type=int, default=7, help="Giorni per blocco")
+
+    migrate = sub.add_parser("migrate", help="Costruisce i contatori dalle prenotazioni esistenti")
+    add_range(migrate)
+    migrate.add_argument("--dry-run", action="store_true")
+
+    verify = sub.add_parser("verify", help="Confronta i contatori con le prenotazioni")
+    add_range(verify)
+    verify.add_argument("--days", type=int, help="Verifica da oggi per N giorni (ricalcolato a ogni giro)")
+    verify.add_argument("--interval", type=float, default=0, help="Ripeti ogni N secondi (0 = una volta)")
+    verify.add_argument("--repair", action="store_true", help="Ricostruisce i documenti con problemi")
+    verify.add_argument("--json", action="store_true", help="Output JSON, una riga per giro")
+
+    args = parser.parse_args(argv)
+    if args.command == "migrate" and not (args.start and args.end):
+        parser.error("migrate richiede --from e --to")
+    if args.command == "verify" and not args.days and not (args.start and args.end):
+        parser.error("verify richiede --days oppure --from e --to")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.command == "migrate":
+        run_migrate(args)
+    else:
+        run_verify(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,690 @@
+"""
+Stress test concorrente per la race condition di `createBooking`.
+
+In origine `createBooking` (app/actions/create-booking.ts) leggeva le prenotazioni
+del giorno, controllava le sovrapposizioni e poi scriveva con `bookingRef.set`,
+fuori da una transaction: tentativi simultanei sullo stesso slot potevano
+superare `resources`. Ora il controllo finale avviene in una transaction sui
+contatori `slotOccupancy`. Questo script lancia raffiche di tentativi concorrenti
+e misura quante prenotazioni sono state accettate oltre la capacità.
+
+Target disponibili:
+- http:     server Next locale (`pnpm dev`) con LOADTEST_API_ENABLED=true,
+            chiamate a POST /api/loadtest con l'action `createBooking`
+            (header `x-loadtest-token` da LOADTEST_API_TOKEN, se impostato)
+- emulator: replica Python di `createBooking` contro l'emulatore Firestore
+            (richiede FIRESTORE_EMULATOR_HOST)
+- memory:   stessa replica su uno store in memoria con latenza simulata,
+            utile per verificare lo script senza emulatore
+
+Con --logic legacy la replica usa il vecchio controllo non transazionale,
+per confrontare i due comportamenti.
+
+Con --check-release (solo target http) lo script verifica invece che il rifiuto
+di una prenotazione con `salonId` liberi lo slot restituito da `getAvailableSlots`:
+satura lo slot --start-time, assegna un salone a una delle prenotazioni, la
+rifiuta con `rejectBooking` e rilegge gli slot (exit code 2 se resta occupato).
+`rejectBooking` richiede LOADTEST_API_TOKEN, sia sul server sia qui.
+
+Uso tipico:
+    python scripts/stress-booking.py --target http --service-id <id> --concurrency 20 --bursts 5
+    python scripts/stress-booking.py --target memory --concurrency 50 --report stress.json
+    python scripts/stress-booking.py --target http --service-id <id> --check-release
+
+Requisiti:
+- pip install aiohttp              (target http)
+- pip install firebase-admin       (target emulator, --cleanup, --check-release)
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+import uuid
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+
+from salon_tools.booking_time import time_fields
+from salon_tools.firebase import load_env
+from salon_tools.latency import LatencyHistogram
+from salon_tools.occupancy import (
+    SLOT_OCCUPANCY_COLLECTION,
+    apply_booking,
+    build_doc,
+    max_occupancy,
+    occupancy_doc_id,
+)
+from salon_tools.rules import (
+    DEFAULT_CONFIG,
+    SLOT_UNAVAILABLE_ERROR,
+    available_slots,
+    can_book,
+    from_minutes,
+    merge_config,
+    to_minutes,
+)
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+
+# Header del token condiviso di /api/loadtest (LOADTEST_API_TOKEN)
+LOADTEST_TOKEN_HEADER = "x-loadtest-token"
+
+# salonId assegnato alla prenotazione rifiutata da --check-release
+CHECK_SALON_ID = "stress-salon"
+# Prenotazioni massime create per saturare lo slot in --check-release
+CHECK_MAX_BOOKINGS = 50
+
+ACCEPTED = "accepted"
+REJECTED = "rejected"
+ERROR = "error"
+
+
+# ==================== STAND-IN DI createBooking ====================
+
+class MemoryStore:
+    """Store in memoria con latenza simulata per ogni lettura/scrittura."""
+
+    def __init__(self, config, service, latency_ms):
+        self.config = config
+        self.service = service
+        self.latency = latency_ms / 1000
+        self.bookings = {}
+        self.occupancy = {}
+        self.locks = {}
+
+    async def _io(self):
+        # Jitter +-50% per rendere realistico l'interleaving delle richieste
+        await asyncio.sleep(self.latency * random.uniform(0.5, 1.5))
+
+    async def get_service(self, service_id):
+        await self._io()
+        return dict(self.service) if service_id == self.service["id"] else None
+
+    async def get_config(self):
+        await self._io()
+        return dict(self.config)
+
+    async def get_day_bookings(self, date_str):
+        await self._io()
+        return [dict(b) for b in self.bookings.values() if b["date"] == date_str]
+
+    async def get_customer(self, customer_id):
+        await self._io()
+        return None
+
+    async def add_booking(self, data):
+        await self._io()
+        booking_id = uuid.uuid4().hex[:20]
+        self.bookings[booking_id] = data
+        return booking_id
+
+    async def reserve_with_counters(self, data, config, duration):
+        """Transaction sui contatori: il lock per data simula la serializzazione di Firestore."""
+        lock = self.locks.setdefault(data["date"], asyncio.Lock())
+        async with lock:
+            await self._io()
+            doc = self.occupancy.get(data["date"])
+            if doc is None:
+                day = [b for b in self.bookings.values() if b["date"] == data["date"]]
+                doc = build_doc(None, data["date"], day, config["timeStep"], config["bufferTime"])
+            start = to_minutes(data["startTime"])
+            if max_occupancy(doc, start, start + duration) >= config["resources"]:
+                return None
+            apply_booking(doc["counts"], data, doc["bucketMinutes"], doc["bufferTime"], 1)
+            await self._io()
+            self.occupancy[data["date"]] = doc
+            booking_id = uuid.uuid4().hex[:20]
+            self.bookings[booking_id] = data
+            return booking_id
+
+    async def delete_bookings(self, ids):
+        for booking_id in ids:
+            booking = self.bookings.pop(booking_id, None)
+            if booking:
+                self.occupancy.pop(booking["date"], None)
+
+
+class FirestoreStore:
+    """Stesse letture/scritture di `createBooking`, eseguite in thread sul client Firestore."""
+
+    def __init__(self, db):
+        self.db = db
+
+    async def get_service(self, service_id):
+        snap = await asyncio.to_thread(self.db.collection("services").document(service_id).get)
+        return {"id": snap.id, **snap.to_dict()} if snap.exists else None
+
+    async def get_config(self):
+        snap = await asyncio.to_thread(self.db.collection("settings").document("config").get)
+        return snap.to_dict() if snap.exists else {}
+
+    async def get_day_bookings(self, date_str):
+        query = self.db.collection("bookings").where("date", "==", date_str)
+        docs = await asyncio.to_thread(query.get)
+        return [doc.to_dict() for doc in docs]
+
+    async def get_customer(self, customer_id):
+        snap = await asyncio.to_thread(self.db.collection("customers").document(customer_id).get)
+        return snap.to_dict() if snap.exists else None
+
+    async def add_booking(self, data):
+        ref = self.db.collection("bookings").document()
+        await asyncio.to_thread(ref.set, data)
+        return ref.id
+
+    async def reserve_with_counters(self, data, config, duration):
+        return await asyncio.to_thread(self._reserve_sync, data, config, duration)
+
+    def _reserve_sync(self, data, config, duration):
+        from firebase_admin import firestore
+
+        occupancy_ref = self.db.collection(SLOT_OCCUPANCY_COLLECTION).document(occupancy_doc_id(None, data["date"]))
+        booking_ref = self.db.collection("bookings").document()
+
+        @firestore.transactional
+        def reserve(transaction):
+            snap = occupancy_ref.get(transaction=transaction)
+            doc = snap.to_dict() if snap.exists else None
+            if (
+                not doc
+                or doc.get("bucketMinutes") != config["timeStep"]
+                or doc.get("bufferTime") != config["bufferTime"]
+            ):
+                query = self.db.collection("bookings").where("date", "==", data["date"])
+                day = [d.to_dict() for d in transaction.get(query)]
+                doc = build_doc(None, data["date"], day, config["timeStep"], config["bufferTime"])
+            start = to_minutes(data["startTime"])
+            if max_occupancy(doc, start, start + duration) >= config["resources"]:
+                return None
+            apply_booking(doc["counts"], data, doc["bucketMinutes"], doc["bufferTime"], 1)
+            transaction.set(occupancy_ref, doc)
+            transaction.set(booking_ref, data)
+            return booking_ref.id
+
+        return reserve(self.db.transaction())
+
+    async def delete_bookings(self, ids):
+        dates = set()
+        for start in range(0, len(ids), 500):
+            batch = self.db.batch()
+            for booking_id in ids[start:start + 500]:
+                ref = self.db.collection("bookings").document(booking_id)
+                snap = await asyncio.to_thread(ref.get)
+                if snap.exists:
+                    dates.add(snap.to_dict().get("date"))
+                batch.delete(ref)
+            await asyncio.to_thread(batch.commit)
+        # I contatori delle date toccate vengono ricostruiti alla prossima prenotazione
+        for booking_date in dates:
+            ref = self.db.collection(SLOT_OCCUPANCY_COLLECTION).document(occupancy_doc_id(None, booking_date))
+            await asyncio.to_thread(ref.delete)
+
+
+async def create_booking_standin(store, service_id, date_str, start_time, user_id, logic="counters"):
+    """
+    Replica dei passi di `createBooking`. Con logic="counters" il controllo finale
+    e la scrittura avvengono in una transaction sui contatori `slotOccupancy`;
+    con logic="legacy" si usa il vecchio double-check non atomico.
+    """
+    service = await store.get_service(service_id)
+    if not service or not service.get("active"):
+        return {"success": False, "error": "Il servizio selezionato non è disponibile."}
+    duration = int(service.get("duration") or 0)
+
+    config = merge_config(await store.get_config())
+
+    # getAvailableSlots: lettura delle prenotazioni del giorno
+    day_bookings = await store.get_day_bookings(date_str)
+    if start_time not in available_slots(date_str, duration, config, day_bookings):
+        return {"success": False, "error": SLOT_UNAVAILABLE_ERROR}
+
+    if logic == "legacy":
+        # Double-check finale: seconda lettura, poi scrittura non atomica
+        day_bookings = await store.get_day_bookings(date_str)
+        if not can_book(start_time, duration, config, day_bookings):
+            return {"success": False, "error": SLOT_UNAVAILABLE_ERROR}
+
+    await store.get_customer(user_id)
+
+    data = {
+        "date": date_str,
+        "startTime": start_time,
+        "endTime": from_minutes(to_minutes(start_time) + duration),
+        "status": "PENDING",
+        "customerId": user_id,
+        "serviceId": service_id,
+        "serviceName": service.get("name", ""),
+        "servicePrice": float(service.get("price") or 0),
+        "price": float(service.get("price") or 0),
+        "customerName": "",
+        "customerEmail": "",
+        "createdAt": datetime.now(timezone.utc).isoformat(),
+        "stressTest": True,
+    }
+    data.update(time_fields(data))
+
+    if logic == "legacy":
+        booking_id = await store.add_booking(data)
+    else:
+        booking_id = await store.reserve_with_counters(data, config, duration)
+        if booking_id is None:
+            return {"success": False, "error": SLOT_UNAVAILABLE_ERROR}
+    return {"success": True, "id": booking_id}
+
+
+# ==================== CLIENT ====================
+
+class StandInClient:
+    def __init__(self, store, logic):
+        self.store = store
+        self.logic = logic
+
+    async def create_booking(self, payload):
+        return await create_booking_standin(
+            self.store, payload["serviceId"], payload["date"], payload["startTime"], payload["userId"], self.logic
+        )
+
+    async def close(self):
+        pass
+
+
+class HttpClient:
+    """Chiama le server actions tramite POST /api/loadtest con connessioni in pool."""
+
+    def __init__(self, base_url, concurrency, timeout):
+        try:
+            import aiohttp
+        except ImportError:
+            print("[ERR] Errore: aiohttp non installato")
+            print("Installa con: pip install aiohttp")
+            sys.exit(1)
+        load_env()
+        token = os.getenv("LOADTEST_API_TOKEN")
+        self.url = base_url.rstrip("/") + "/api/loadtest"
+        self.session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=concurrency),
+            timeout=aiohttp.ClientTimeout(total=timeout),
+            headers={LOADTEST_TOKEN_HEADER: token} if token else None,
+        )
+
+    async def call(self, action, *args):
+        async with self.session.post(self.url, json={"action": action, "args": list(args)}) as response:
+            if response.status == 404:
+                raise RuntimeError("Endpoint /api/loadtest disabilitato: avvia il server con LOADTEST_API_ENABLED=true")
+            if response.status == 401:
+                raise RuntimeError("Endpoint /api/loadtest: LOADTEST_API_TOKEN mancante o diverso da quello del server")
+            body = await response.json()
+            if response.status != 200:
+                return {"success": False, "error": body.get("error", f"HTTP {response.status}")}
+            return body["result"]
+
+    async def create_booking(self, payload):
+        return await self.call("createBooking", payload)
+
+    async def close(self):
+        await self.session.close()
+
+
+# ==================== RAFFICHE ====================
+
+def classify(result):
+    if result.get("success"):
+        return ACCEPTED
+    if result.get("error") == SLOT_UNAVAILABLE_ERROR:
+        return REJECTED
+    return ERROR
+
+
+def count_over_capacity(accepted, config, existing=()):
+    """
+    Prenotazioni accettate oltre la capacità fisica del salone.
+
+    Le accettate vengono riapplicate nell'ordine di completamento su contatori
+    al minuto (ogni prenotazione occupa [inizio, fine + bufferTime)): ognuna
+    che trova già `resources` prenotazioni in un suo minuto è un overbooking.
+    """
+    doc = build_doc(None, "", [dict(b, status="PENDING") for b in existing], 1, config["bufferTime"])
+    over = 0
+    for booking in accepted:
+        start, end = to_minutes(booking["startTime"]), to_minutes(booking["endTime"])
+        if max_occupancy(doc, start, end) >= config["resources"]:
+            over += 1
+        else:
+            apply_booking(doc["counts"], booking, 1, config["bufferTime"], 1)
+    return over
+
+
+def pick_start_times(args, config, count):
+    if args.mode == "slot":
+        return [args.start_time] * count
+    slots = available_slots(args.date_for_grid, args.duration, config, [])
+    return [random.choice(slots) for _ in range(count)]
+
+
+async def run_burst(client, args, config, burst_index, date_str, existing):
+    gate = asyncio.Event()
+    run_id = uuid.uuid4().hex[:8]
+    start_times = pick_start_times(args, config, args.concurrency)
+    results = []
+
+    async def attempt(n):
+        payload = {
+            "serviceId": args.service_id,
+            "date": date_str,
+            "startTime": start_times[n],
+            "userId": f"stress-{run_id}-{n}",
+        }
+        await gate.wait()
+        started = time.perf_counter()
+        try:
+            result = await client.create_booking(payload)
+        except RuntimeError:
+            # Endpoint disabilitato: interrompe l'intera esecuzione
+            raise
+        except Exception as e:
+            result = {"success": False, "error": f"{type(e).__name__}: {e}"}
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        outcome = classify(result)
+        results.append({
+            "outcome": outcome,
+            "latencyMs": elapsed_ms,
+            "id": result.get("id"),
+            "error": result.get("error") if outcome == ERROR else None,
+            "startTime": payload["startTime"],
+            "endTime": from_minutes(to_minutes(payload["startTime"]) + args.duration),
+        })
+
+    tasks = [asyncio.create_task(attempt(n)) for n in range(args.concurrency)]
+    await asyncio.sleep(0)
+    burst_started = time.perf_counter()
+    gate.set()
+    await asyncio.gather(*tasks)
+    wall_s = time.perf_counter() - burst_started
+
+    hist = LatencyHistogram()
+    for r in results:
+        hist.record_ms(r["latencyMs"])
+    accepted = [r for r in results if r["outcome"] == ACCEPTED]
+    errors = [r["error"] for r in results if r["outcome"] == ERROR]
+
+    return {
+        "burst": burst_index,
+        "date": date_str,
+        "attempts": len(results),
+        "accepted": len(accepted),
+        "rejected": sum(1 for r in results if r["outcome"] == REJECTED),
+        "errors": len(errors),
+        "errorSamples": sorted(set(errors))[:5],
+        "overCapacity": count_over_capacity(accepted, config, existing),
+        "wallSeconds": round(wall_s, 4),
+        "throughputPerSec": round(len(results) / wall_s, 2) if wall_s > 0 else None,
+        "latencyMs": hist.summary(),
+        "_hist": hist,
+        "_ids": [r["id"] for r in accepted if r["id"]],
+    }
+
+
+# ==================== RILASCIO DELLO SLOT ====================
+
+async def check_release(client, store, args, date_str):
+    """
+    Satura lo slot `args.start_time` con `createBooking`, assegna `CHECK_SALON_ID`
+    all'ultima prenotazione (come fanno serie, chiusure e waitlist) e la rifiuta
+    con `rejectBooking`: lo slot deve tornare tra quelli di `getAvailableSlots`,
+    che legge i contatori `slotOccupancy/default_{date}`.
+    """
+    run_id = uuid.uuid4().hex[:8]
+    created = []
+    result = {"date": date_str, "startTime": args.start_time, "released": False}
+    try:
+        for n in range(CHECK_MAX_BOOKINGS):
+            slots = await client.call("getAvailableSlots", date_str, args.duration)
+            if args.start_time not in slots:
+                break
+            booking = await client.create_booking({
+                "serviceId": args.service_id,
+                "date": date_str,
+                "startTime": args.start_time,
+                "userId": f"stress-{run_id}-{n}",
+            })
+            if not booking.get("success"):
+                result["error"] = f"createBooking: {booking.get('error')}"
+                return result
+            created.append(booking["id"])
+        else:
+            result["error"] = f"slot ancora libero dopo {CHECK_MAX_BOOKINGS} prenotazioni"
+            return result
+        result["booked"] = len(created)
+        if not created:
+            result["error"] = "slot non disponibile prima del controllo"
+            return result
+
+        booking_ref = store.db.collection("bookings").document(created[-1])
+        await asyncio.to_thread(booking_ref.update, {"salonId": CHECK_SALON_ID})
+        rejected = await client.call("rejectBooking", created[-1], "stress-booking", "check-release")
+        if not rejected.get("success"):
+            result["error"] = f"rejectBooking: {rejected.get('error')}"
+            return result
+
+        slots = await client.call("getAvailableSlots", date_str, args.duration)
+        result["released"] = args.start_time in slots
+        return result
+    finally:
+        if created:
+            await store.delete_bookings(created)
+
+
+async def run_check_release(args):
+    from salon_tools.firebase import get_db
+
+    date_str = args.date or (date.today() + timedelta(days=300)).isoformat()
+    client = HttpClient(args.base_url, 1, args.timeout)
+    try:
+        result = await check_release(client, FirestoreStore(get_db()), args, date_str)
+    finally:
+        await client.close()
+
+    print(f"Slot {result['date']} {result['startTime']}: saturato con {result.get('booked', 0)} prenotazioni")
+    if result.get("error"):
+        print(f"[ERR] {result['error']}")
+        return 1
+    if not result["released"]:
+        print(f"[ERR] Dopo rejectBooking lo slot non è tornato disponibile in getAvailableSlots "
+              f"(salonId {CHECK_SALON_ID})")
+        return 2
+    print("[OK] rejectBooking ha liberato lo slot visto da getAvailableSlots")
+    return 0
+
+
+def git_commit():
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_ROOT, capture_output=True, text=True, timeout=5
+        )
+        return out.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def app_version():
+    try:
+        return json.loads((PROJECT_ROOT / "package.json").read_text(encoding="utf-8")).get("version")
+    except (OSError, ValueError):
+        return None
+
+
+# ==================== MAIN ====================
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Stress test concorrente di createBooking")
+    parser.add_argument("--target", choices=["http", "emulator", "memory"], default="memory")
+    parser.add_argument("--base-url", default="http://localhost:3000", help="URL del server Next (target http)")
+    parser.add_argument("--service-id", default="stress-service", help="ID del servizio da prenotare")
+    parser.add_argument("--duration", type=int, default=30, help="Durata servizio in minuti (target http/memory)")
+    parser.add_argument("--date", help="Prima data YYYY-MM-DD (default: tra 300 giorni)")
+    parser.add_argument("--same-date", action="store_true", help="Tutte le raffiche sulla stessa data")
+    parser.add_argument("--logic", choices=["counters", "legacy"], default="counters",
+                        help="Replica di createBooking (target emulator/memory): transaction sui contatori o legacy")
+    parser.add_argument("--mode", choices=["slot", "day"], default="slot",
+                        help="slot: stesso orario per tutti; day: orari casuali nella giornata")
+    parser.add_argument("--start-time", default="10:00", help="Orario usato in modalità slot")
+    parser.add_argument("--concurrency", type=int, default=20, help="Tentativi simultanei per raffica")
+    parser.add_argument("--bursts", type=int, default=3, help="Numero di raffiche")
+    parser.add_argument("--interval", type=float, default=1.0, help="Pausa tra raffiche (secondi)")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Timeout per richiesta HTTP (secondi)")
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="Latenza simulata per operazione (target memory)")
+    parser.add_argument("--resources", type=int, default=DEFAULT_CONFIG["resources"],
+                        help="Risorse del salone (target http/memory; emulator legge settings/config)")
+    parser.add_argument("--buffer-time", type=int, default=DEFAULT_CONFIG["bufferTime"])
+    parser.add_argument("--keep", action="store_true", help="Non cancellare le prenotazioni create (emulator/memory)")
+    parser.add_argument("--cleanup", action="store_true",
+                        help="Target http: cancella le prenotazioni create via Firebase Admin")
+    parser.add_argument("--report", help="Scrive il report JSON in questo file")
+    parser.add_argument("--history", help="Aggiunge il riepilogo a questo file JSONL (storico tra release)")
+    parser.add_argument("--fail-on-overbooking", action="store_true", help="Exit code 2 se ci sono overbooking")
+    parser.add_argument("--check-release", action="store_true",
+                        help="Target http: verifica che rejectBooking liberi lo slot di getAvailableSlots")
+    return parser.parse_args(argv)
+
+
+async def run(args):
+    base_date = date.fromisoformat(args.date) if args.date else date.today() + timedelta(days=300)
+    args.date_for_grid = base_date.isoformat()
+
+    db = None
+    config = merge_config({"resources": args.resources, "bufferTime": args.buffer_time})
+    if args.target == "http":
+        client = HttpClient(args.base_url, args.concurrency, args.timeout)
+        store = None
+    elif args.target == "emulator":
+        if not os.getenv("FIRESTORE_EMULATOR_HOST"):
+            print("[ERR] Target emulator: imposta FIRESTORE_EMULATOR_HOST (es. localhost:8080)")
+            sys.exit(1)
+        from salon_tools.firebase import get_db
+        db = get_db()
+        store = FirestoreStore(db)
+        service = await store.get_service(args.service_id)
+        if not service:
+            print(f"[ERR] Servizio {args.service_id} non trovato nell'emulatore")
+            sys.exit(1)
+        args.duration = int(service.get("duration") or 0)
+        config = merge_config(await store.get_config())
+        client = StandInClient(store, args.logic)
+    else:
+        service = {"id": args.service_id, "name": "Stress", "duration": args.duration, "price": 0, "active": True}
+        store = MemoryStore(config, service, args.latency_ms)
+        client = StandInClient(store, args.logic)
+
+    print(f"Target: {args.target} | raffiche: {args.bursts} x {args.concurrency} | modalità: {args.mode}")
+    print(f"Capacità: resources={config['resources']} bufferTime={config['bufferTime']} durata={args.duration}min")
+
+    bursts = []
+    created_ids = []
+    total_hist = LatencyHistogram()
+    started = time.perf_counter()
+    try:
+        for i in range(args.bursts):
+            date_str = (base_date if args.same_date else base_date + timedelta(days=i)).isoformat()
+            existing = await store.get_day_bookings(date_str) if store else []
+            existing = [b for b in existing if b.get("status") in ("PENDING", "CONFIRMED")]
+            burst = await run_burst(client, args, config, i + 1, date_str, existing)
+            total_hist.merge(burst.pop("_hist"))
+            created_ids.extend(burst.pop("_ids"))
+            bursts.append(burst)
+            print(
+                f"  Raffica {i + 1}: accettate {burst['accepted']}/{burst['attempts']}, "
+                f"overbooking {burst['overCapacity']}, errori {burst['errors']}, "
+                f"p95 {burst['latencyMs'].get('p95')} ms"
+            )
+            if i + 1 < args.bursts:
+                await asyncio.sleep(args.interval)
+    finally:
+        await client.close()
+    wall_s = time.perf_counter() - started
+
+    if created_ids and store and not args.keep:
+        await store.delete_bookings(created_ids)
+        print(f"[OK] Cancellate {len(created_ids)} prenotazioni di test")
+    elif created_ids and args.cleanup:
+        from salon_tools.firebase import get_db
+        await FirestoreStore(get_db()).delete_bookings(created_ids)
+        print(f"[OK] Cancellate {len(created_ids)} prenotazioni di test")
+
+    attempts = sum(b["attempts"] for b in bursts)
+    return {
+        "tool": "stress-booking",
+        "generatedAt": datetime.now(timezone.utc).isoformat(),
+        "appVersion": app_version(),
+        "commit": git_commit(),
+        "target": args.target,
+        "params": {
+            "mode": args.mode,
+            "logic": args.logic if args.target != "http" else None,
+            "concurrency": args.concurrency,
+            "bursts": args.bursts,
+            "startTime": args.start_time if args.mode == "slot" else None,
+            "durationMin": args.duration,
+            "resources": config["resources"],
+            "bufferTime": config["bufferTime"],
+        },
+        "totals": {
+            "attempts": attempts,
+            "accepted": sum(b["accepted"] for b in bursts),
+            "rejected": sum(b["rejected"] for b in bursts),
+            "errors": sum(b["errors"] for b in bursts),
+            "overCapacity": sum(b["overCapacity"] for b in bursts),
+            "wallSeconds": round(wall_s, 3),
+            "throughputPerSec": round(attempts / sum(b["wallSeconds"] for b in bursts), 2) if bursts else None,
+            "latencyMs": total_hist.summary(),
+        },
+        "bursts": bursts,
+    }
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.check_release:
+        if args.target != "http":
+            print("[ERR] --check-release richiede --target http")
+            sys.exit(1)
+        try:
+            sys.exit(asyncio.run(run_check_release(args)))
+        except RuntimeError as e:
+            print(f"[ERR] {e}")
+            sys.exit(1)
+
+    try:
+        report = asyncio.run(run(args))
+    except RuntimeError as e:
+        print(f"[ERR] {e}")
+        sys.exit(1)
+
+    totals = report["totals"]
+    print("\n" + "=" * 50)
+    print(f"Tentativi:      {totals['attempts']}")
+    print(f"Accettate:      {totals['accepted']}")
+    print(f"Rifiutate:      {totals['rejected']}")
+    print(f"Errori:         {totals['errors']}")
+    print(f"Overbooking:    {totals['overCapacity']}")
+    print(f"Throughput:     {totals['throughputPerSec']} req/s")
+    lat = totals["latencyMs"]
+    print(f"Latenza (ms):   p50 {lat.get('p50')} | p95 {lat.get('p95')} | p99 {lat.get('p99')}")
+
+    if args.report:
+        Path(args.report).write_text(json.dumps(report, indent=2), encoding="utf-8")
+        print(f"\n[OK] Report scritto in {args.report}")
+    if args.history:
+        summary = {k: report[k] for k in ("generatedAt", "appVersion", "commit", "target", "params", "totals")}
+        with open(args.history, "a", encoding="utf-8") as f:
+            f.write(json.dumps(summary) + "\n")
+        print(f"[OK] Riepilogo aggiunto a {args.history}")
+
+    if args.fail_on_overbooking and totals["overCapacity"] > 0:
+        sys.exit(2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,357 @@
+"""
+Abbinamento della lista d'attesa alle prenotazioni cancellate o rifiutate.
+
+Quando una prenotazione diventa CANCELLED o REJECTED (`rejectBooking`) la sua
+capacità torna libera senza che nessuno lo sappia. Questo script, a ogni ciclo:
+
+1. legge le prenotazioni modificate dall'ultimo watermark (`waitlistMeta/matcher`,
+   query a campo singolo su `updatedAt`) che hanno liberato capacità
+2. cerca in un indice in memoria (`salon_tools/waitlist.py`) la richiesta in
+   attesa migliore per salone, data, fascia oraria e durata del servizio
+3. verifica lo slot sulle prenotazioni del giorno (lette con query `in`, 30
+   date alla volta) e lo propone alla richiesta come `AlternativeSlot`
+   (`status: "PROPOSED"`, `proposedSlot`), con scadenza `--hold-minutes`
+4. rimette in attesa le proposte scadute (`missedProposals` + 1) e offre lo
+   stesso slot alla richiesta successiva; la scrittura ha come precondizione
+   l'`update_time` letto, per non sovrascrivere un'accettazione concorrente
+
+Il cliente accetta con `acceptWaitlistProposal` (`app/actions/waitlist.ts`), che
+prenota la richiesta in una transaction (PROPOSED -> ACCEPTING) e poi passa da
+`createBooking`. L'indice viene caricato una volta e poi aggiornato
+con le sole richieste create o modificate dopo il watermark.
+
+Uso:
+    python scripts/waitlist-matcher.py run --dry-run
+    python scripts/waitlist-matcher.py run --interval 30 --hold-minutes 120
+    python scripts/waitlist-matcher.py benchmark --entries 100000 --freed 5000
+
+Requisiti:
+- pip install firebase-admin python-dotenv
+"""
+import argparse
+import random
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta, timezone
+
+from salon_tools.booking_time import js_iso
+from salon_tools.queries import BATCH_LIMIT, commit_in_batches, load_settings_config
+from salon_tools.rules import DEFAULT_CONFIG, from_minutes, merge_config, to_minutes
+from salon_tools.waitlist import (
+    FREEING_STATUSES,
+    WAITLIST_COLLECTION,
+    WAITLIST_META_COLLECTION,
+    WAITLIST_META_DOC,
+    WaitlistIndex,
+    match_freed,
+)
+
+# Limite dell'operatore "in" di Firestore
+IN_QUERY_LIMIT = 30
+
+
+class Matcher:
+    def __init__(self, db, args):
+        self.db = db
+        self.args = args
+        self.index = None
+        self.today = None
+        self.offered = set()
+
+    # ---------- indice ----------
+
+    def load_index(self):
+        self.today = date.today().isoformat()
+        self.index = WaitlistIndex(self.today)
+        query = self.db.collection(WAITLIST_COLLECTION).where("status", "==", "WAITING")
+        for snap in query.stream():
+            self.index.add(snap.id, snap.to_dict() or {})
+
+    def refresh_index(self, since):
+        """Richieste create o modificate da `since`: aggiunte se WAITING, altrimenti rimosse."""
+        if date.today().isoformat() != self.today:
+            # Cambio di giorno: si ricarica per escludere le date passate
+            self.load_index()
+            return
+        waitlist = self.db.collection(WAITLIST_COLLECTION)
+        for field in ("createdAt", "updatedAt"):
+            for snap in waitlist.where(field, ">=", since).stream():
+                data = snap.to_dict() or {}
+                if data.get("status") == "WAITING":
+                    self.index.add(snap.id, data)
+                else:
+                    self.index.remove(snap.id)
+
+    # ---------- letture ----------
+
+    def freed_bookings(self, since):
+        query = self.db.collection("bookings").where("updatedAt", ">=", since)
+        freed = []
+        for snap in query.stream():
+            data = snap.to_dict() or {}
+            if data.get("status") in FREEING_STATUSES and (data.get("date") or "") >= self.today:
+                freed.append((snap.id, data))
+        return freed
+
+    def expired_proposals(self, now):
+        """Proposte scadute (snapshot) e id delle prenotazioni di origine ancora in offerta."""
+        expired, active_sources = [], set()
+        query = self.db.collection(WAITLIST_COLLECTION).where("status", "==", "PROPOSED")
+        for snap in query.stream():
+            data = snap.to_dict() or {}
+            if (data.get("proposalExpiresAt") or "") < now:
+                expired.append(snap)
+            elif data.get("sourceBookingId"):
+                active_sources.add(data["sourceBookingId"])
+        return expired, active_sources
+
+    def reset_expired(self, snaps, now_iso):
+        """
+        Riporta in WAITING le proposte scadute, solo se non modificate dopo la
+        lettura: un `acceptWaitlistProposal` concorrente (ACCEPTING/BOOKED) vince.
+        Se un batch fallisce per la precondizione si ritenta documento per documento.
+        Restituisce le coppie (id, richiesta) effettivamente riportate in attesa.
+        """
+        from firebase_admin import firestore
+        from google.api_core import exceptions
+
+        errors = (exceptions.FailedPrecondition, exceptions.NotFound, exceptions.Conflict)
+        update = {
+            "status": "WAITING",
+            "missedProposals": firestore.Increment(1),
+            "proposedSlot": firestore.DELETE_FIELD,
+            "proposedAt": firestore.DELETE_FIELD,
+            "proposalExpiresAt": firestore.DELETE_FIELD,
+            "sourceBookingId": firestore.DELETE_FIELD,
+            "updatedAt": now_iso,
+        }
+
+        def write(batch, snap):
+            batch.update(snap.reference, update, option=self.db.write_option(last_update_time=snap.update_time))
+
+        if self.args.dry_run:
+            return [(snap.id, snap.to_dict() or {}) for snap in snaps]
+        reset = []
+        for offset in range(0, len(snaps), BATCH_LIMIT):
+            chunk = snaps[offset:offset + BATCH_LIMIT]
+            batch = self.db.batch()
+            for snap in chunk:
+                write(batch, snap)
+            try:
+                batch.commit()
+                reset += chunk
+                continue
+            except errors:
+                pass
+            for snap in chunk:
+                single = self.db.batch()
+                write(single, snap)
+                try:
+                    single.commit()
+                    reset.append(snap)
+                except errors:
+                    continue
+        return [(snap.id, snap.to_dict() or {}) for snap in reset]
+
+    def load_days(self, dates):
+        """Prenotazioni delle date indicate, query `in` da 30 date in parallelo."""
+        dates = sorted(dates)
+        groups = [dates[i:i + IN_QUERY_LIMIT] for i in range(0, len(dates), IN_QUERY_LIMIT)]
+
+        def load(group):
+            query = self.db.collection("bookings").where("date", "in", group)
+            return [snap.to_dict() or {} for snap in query.stream()]
+
+        days = {day: [] for day in dates}
+        with ThreadPoolExecutor(max_workers=max(1, min(8, len(groups)))) as pool:
+            for bookings in pool.map(load, groups):
+                for booking in bookings:
+                    days.setdefault(booking.get("date"), []).append(booking)
+        return days
+
+    # ---------- ciclo ----------
+
+    def cycle(self, since):
+        now = datetime.now(timezone.utc)
+        now_iso = js_iso(now)
+        if self.index is None:
+            self.load_index()
+        elif since:
+            self.refresh_index(since)
+
+        freed = self.freed_bookings(since) if since else []
+        expired, active_sources = self.expired_proposals(now_iso)
+
+        # Le proposte scadute tornano in attesa e lo slot va alla richiesta successiva
+        expired = self.reset_expired(expired, now_iso)
+        operations = []
+        excluded = {}
+        waitlist = self.db.collection(WAITLIST_COLLECTION)
+        for entry_id, entry in expired:
+            self.index.add(entry_id, {**entry, "missedProposals": int(entry.get("missedProposals") or 0) + 1})
+            if entry.get("sourceBookingId"):
+                excluded.setdefault(entry["sourceBookingId"], set()).add(entry_id)
+                self.offered.discard(entry["sourceBookingId"])
+        if excluded:
+            refs = [self.db.collection("bookings").document(booking_id) for booking_id in excluded]
+            known = {booking_id for booking_id, _ in freed}
+            freed += [(snap.id, snap.to_dict() or {}) for snap in self.db.get_all(refs)
+                      if snap.exists and snap.id not in known]
+
+        # Una prenotazione liberata già in offerta (o riletta per la sovrapposizione) non si ripropone
+        freed = [(bid, b) for bid, b in freed if bid not in active_sources and bid not in self.offered]
+        freed.sort(key=lambda item: (item[1].get("date") or "", item[1].get("startTime") or ""))
+
+        config = load_settings_config(self.db)
+        day_bookings = self.load_days({b["date"] for _, b in freed if b.get("date")}) if freed else {}
+        started = time.perf_counter()
+        proposals, outcomes = match_freed(self.index, freed, day_bookings, config, excluded)
+        match_us = (time.perf_counter() - started) * 1e6
+
+        expires = js_iso(now + timedelta(minutes=self.args.hold_minutes))
+        for entry_id, entry, slot, booking_id in proposals:
+            operations.append(("update", waitlist.document(entry_id), {
+                "status": "PROPOSED",
+                "proposedSlot": slot,
+                "proposedAt": now_iso,
+                "proposalExpiresAt": expires,
+                "sourceBookingId": booking_id,
+                "updatedAt": now_iso,
+            }))
+        if not self.args.dry_run:
+            commit_in_batches(self.db, operations)
+            self.offered.update(booking_id for _, _, _, booking_id in proposals)
+
+        counts = {}
+        for outcome in outcomes.values():
+            counts[outcome] = counts.get(outcome, 0) + 1
+        return {
+            "freed": len(freed),
+            "expired": len(expired),
+            "outcomes": counts,
+            "proposals": proposals,
+            "waiting": len(self.index),
+            "matchUsPerSlot": match_us / len(freed) if freed else 0,
+        }
+
+
+def read_watermark(db):
+    snap = db.collection(WAITLIST_META_COLLECTION).document(WAITLIST_META_DOC).get()
+    return (snap.to_dict() or {}).get("watermark") if snap.exists else None
+
+
+def run_matcher(args):
+    from salon_tools.firebase import get_db
+
+    db = get_db()
+    matcher = Matcher(db, args)
+    watermark = read_watermark(db)
+    if not watermark:
+        # Prima esecuzione: si considerano le cancellazioni delle ultime --since-hours ore
+        watermark = js_iso(datetime.now(timezone.utc) - timedelta(hours=args.since_hours))
+    mode = " [DRY-RUN]" if args.dry_run else ""
+    while True:
+        run_started = datetime.now(timezone.utc)
+        since = js_iso(datetime.fromisoformat(watermark.replace("Z", "+00:00")) - timedelta(seconds=args.overlap))
+        result = matcher.cycle(since)
+        outcomes = ", ".join(f"{k} {v}" for k, v in sorted(result["outcomes"].items())) or "-"
+        print(f"[OK] {datetime.now().strftime('%H:%M:%S')}{mode} {result['freed']} slot liberati ({outcomes}), "
+              f"{result['expired']} proposte scadute, {result['waiting']} in attesa, "
+              f"abbinamento {result['matchUsPerSlot']:.1f} µs/slot", flush=True)
+        for entry_id, entry, slot, booking_id in result["proposals"][:args.show]:
+            print(f"     {entry_id} ({entry.get('customerId')}, {entry.get('serviceName') or entry.get('serviceId')}) "
+                  f"<- {slot['date']} {slot['startTime']}-{slot['endTime']} da {booking_id}")
+        watermark = js_iso(run_started)
+        if not args.dry_run:
+            db.collection(WAITLIST_META_COLLECTION).document(WAITLIST_META_DOC).set({
+                "watermark": watermark,
+                "lastRunAt": js_iso(datetime.now(timezone.utc)),
+                "lastRunProposals": len(result["proposals"]),
+            }, merge=True)
+        if not args.interval:
+            return
+        time.sleep(args.interval)
+
+
+# ==================== BENCHMARK ====================
+
+def run_benchmark(args):
+    rng = random.Random(args.seed)
+    today = date.today()
+    config = merge_config(DEFAULT_CONFIG)
+    opening, closing = to_minutes(config["openingTime"]), to_minutes(config["closingTime"])
+    preferences = ("Mattina", "Pomeriggio", "Sera", "Weekend", "Flessibile")
+    durations = (30, 45, 60, 90, 120)
+
+    index = WaitlistIndex(today.isoformat())
+    started = time.perf_counter()
+    for i in range(args.entries):
+        first = today + timedelta(days=rng.randrange(args.days))
+        index.add(f"w{i}", {
+            "serviceDuration": rng.choice(durations),
+            "dateFrom": first.isoformat(),
+            "dateTo": (first + timedelta(days=rng.randrange(1, args.window + 1))).isoformat(),
+            "timePreference": rng.choice(preferences),
+            "createdAt": f"2025-01-01T00:00:{i:09d}",
+        })
+    build_s = time.perf_counter() - started
+
+    freed = []
+    for i in range(args.freed):
+        start = rng.randrange(opening, closing - 120, config["timeStep"])
+        day = (today + timedelta(days=rng.randrange(args.days))).isoformat()
+        freed.append((f"b{i}", {"date": day, "startTime": from_minutes(start),
+                                "endTime": from_minutes(start + rng.choice(durations)), "status": "CANCELLED"}))
+
+    lookups = []
+    for _, booking in freed:
+        start, end = to_minutes(booking["startTime"]), to_minutes(booking["endTime"])
+        t0 = time.perf_counter_ns()
+        index.best(None, booking["date"], start, end - start)
+        lookups.append(time.perf_counter_ns() - t0)
+    lookups = [ns / 1000 for ns in lookups]
+    percentiles = statistics.quantiles(lookups * 2 if len(lookups) == 1 else lookups, n=100, method="inclusive")
+
+    started = time.perf_counter()
+    proposals, outcomes = match_freed(index, freed, {}, config)
+    match_s = time.perf_counter() - started
+
+    print(f"Indice: {args.entries:,} richieste su {args.days} giorni costruito in {build_s:.2f}s")
+    print(f"Ricerca della richiesta migliore ({args.freed:,} slot): p50 {percentiles[49]:.1f} µs, "
+          f"p99 {percentiles[98]:.1f} µs, max {max(lookups):.1f} µs")
+    print(f"Abbinamento completo con rimozione: {len(proposals):,} proposte in {match_s * 1000:.1f} ms "
+          f"({match_s / args.freed * 1e6:.1f} µs/slot)")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Abbina la lista d'attesa agli slot liberati")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run = sub.add_parser("run", help="Propone gli slot liberati alle richieste in attesa")
+    run.add_argument("--hold-minutes", type=int, default=120, help="Validità di una proposta")
+    run.add_argument("--since-hours", type=float, default=24, help="Prima esecuzione: cancellazioni delle ultime N ore")
+    run.add_argument("--overlap", type=int, default=120, help="Secondi riletti prima del watermark")
+    run.add_argument("--interval", type=float, default=0, help="Ripeti ogni N secondi (0 = una volta)")
+    run.add_argument("--show", type=int, default=10, help="Proposte mostrate per ciclo")
+    run.add_argument("--dry-run", action="store_true", help="Mostra le proposte senza scriverle")
+
+    bench = sub.add_parser("benchmark", help="Latenza dell'indice su dati sintetici (nessun accesso a Firestore)")
+    bench.add_argument("--entries", type=int, default=50_000, help="Richieste in attesa")
+    bench.add_argument("--freed", type=int, default=5_000, help="Slot liberati")
+    bench.add_argument("--days", type=int, default=30, help="Giorni coperti")
+    bench.add_argument("--window", type=int, default=7, help="Ampiezza massima dell'intervallo di una richiesta")
+    bench.add_argument("--seed", type=int, default=42)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.command == "run":
+        run_matcher(args)
+    else:
+        run_benchmark(args)
+
+
+if __name__ == "__main__":
+    main()
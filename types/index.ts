@@ -63,13 +63,46 @@ export interface Customer {
   // Metadata
   tags: string[] // Auto-generated tags for segmentation
   internalNotes?: string // Admin-only notes
+  // Normalized sort keys (see lib/customer-sort-keys.ts)
+  lastNameLower?: string
+  emailLower?: string
+  // RFM/LTV scores written by scripts/customer-value.py
+  value?: CustomerValue
+  valueUpdatedAt?: string
   createdAt: string
   updatedAt?: string
 }
 
+export interface CustomerValue {
+  lastVisit: string // YYYY-MM-DD, last CONFIRMED booking
+  firstVisit: string // YYYY-MM-DD
+  visits: number // CONFIRMED bookings
+  monetary: number // sum of servicePrice
+  r: number // 1-5 quintile scores (5 = best)
+  f: number
+  m: number
+  rfm: string // e.g. "545"
+  segment: string // "Campioni" | "Fedeli" | "Nuovi" | "Promettenti" | "A rischio" | "Persi"
+  ltv: number // estimated value of the next years, EUR
+}
+
 // ==================== PRENOTAZIONI ====================
 export type BookingStatus = "PENDING" | "CONFIRMED" | "REJECTED" | "ALTERNATIVE_PROPOSED" | "CANCELLED"
 
+export interface BookingSeries {
+  id: string
+  customerId: string
+  serviceId: string
+  startDate: string // YYYY-MM-DD of the first occurrence
+  startTime: string // HH:mm
+  everyWeeks: number
+  occurrences: number
+  bookingIds: string[]
+  skippedDates: string[] // occurrences not created (closed or full)
+  status: BookingStatus
+  createdAt: string
+}
+
 export interface AlternativeSlot {
   date: string // YYYY-MM-DD
   startTime: string // HH:mm
@@ -81,6 +114,11 @@ export interface Booking {
   date: string // YYYY-MM-DD
   startTime: string // HH:mm
   endTime: string // HH:mm
+  startMin?: number // minutes from midnight (startTime)
+  endMin?: number // minutes from midnight (endTime)
+  startAt?: number // minutes since epoch of date + startTime (wall clock read as UTC)
+  seriesId?: string // bookingSeries/{id} for recurring bookings
+  seriesIndex?: number // occurrence number within the series
   status: BookingStatus
   customerId: string // Changed from userId to customerId
   serviceId: string
@@ -100,6 +138,54 @@ export interface Booking {
   rejectedBy?: string // Admin UID who rejected
 }
 
+// ==================== OCCUPAZIONE SLOT ====================
+export interface SlotOccupancy {
+  salonId: string // "default" when bookings have no salonId
+  date: string // YYYY-MM-DD
+  bucketMinutes: number // bucket width (the salon timeStep when built)
+  bufferTime: number // buffer included in each booking's occupied range
+  counts: number[] // active bookings per bucket, index 0 = 00:00
+  updatedAt: string
+}
+
+// ==================== LISTA D'ATTESA ====================
+// ACCEPTING: acceptWaitlistProposal is creating the booking
+export type WaitlistStatus = "WAITING" | "PROPOSED" | "ACCEPTING" | "BOOKED" | "CANCELLED"
+
+export interface WaitlistEntry {
+  id: string
+  salonId: string // "default" when bookings have no salonId
+  customerId: string
+  serviceId: string
+  serviceName?: string
+  serviceDuration: number // minutes, denormalized from the service
+  dateFrom: string // YYYY-MM-DD, first acceptable date
+  dateTo: string // YYYY-MM-DD, last acceptable date
+  timePreference: TimePreference
+  status: WaitlistStatus
+  proposedSlot?: AlternativeSlot // slot freed by a cancellation, offered by scripts/waitlist-matcher.py
+  proposedAt?: string
+  proposalExpiresAt?: string
+  sourceBookingId?: string // CANCELLED/REJECTED booking that freed the slot
+  bookingId?: string // booking created when the proposal is accepted
+  createdAt: string
+  updatedAt?: string
+}
+
+// ==================== STATISTICHE GIORNALIERE ====================
+export interface DailyStats {
+  salonId: string // "default" when bookings have no salonId
+  date: string // YYYY-MM-DD
+  total: number
+  counts: Record<BookingStatus, number>
+  bookedMinutes: number // PENDING/CONFIRMED service minutes
+  capacityMinutes: number // resources × opening minutes (0 when closed)
+  utilization: number // bookedMinutes / capacityMinutes
+  expectedRevenue: number // servicePrice of PENDING/CONFIRMED bookings
+  confirmedRevenue: number
+  updatedAt: string
+}
+
 // ==================== UTENTI (Admin) ====================
 export interface User {
   id: string
@@ -120,6 +206,19 @@ export interface EmailLog {
   sentAt: string
   status: "sent" | "failed" | "pending"
   error?: string
+  messageId?: string // Resend message id (scripts/send-reminders.py)
+  claimedAt?: string // When a dispatcher run took charge of the email ("pending")
+  attempts?: number
+}
+
+// Daily rollup of compacted emailLogs (scripts/compact-email-logs.py)
+export interface EmailLogRollup {
+  date: string // YYYY-MM-DD of sentAt
+  template: string
+  total: number
+  counts: Partial<Record<EmailLog["status"], number>>
+  errorCounts?: Record<string, number> // normalized error message -> count
+  updatedAt: string
 }
 
 // ==================== SEGMENTAZIONE ====================